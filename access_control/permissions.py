@@ -1,22 +1,119 @@
+import time
+
 from django.core.cache import cache
 from .models import ModulePermission, Role
 
+# Shared-cache keys. The version is bumped whenever a Role, Module or
+# ModulePermission changes, which retires every compiled matrix at once and
+# keeps all worker processes consistent.
+MATRIX_VERSION_KEY = 'access_control:matrix_version'
+MATRIX_KEY = 'access_control:matrix:{role_id}:{version}'
+MATRIX_TIMEOUT = None  # Matrices only go stale through a version bump
+
+# Attribute used to memoise the matrix on the user object for the request
+USER_MATRIX_ATTR = '_module_permission_matrix'
+
+ACCESS, MODIFY, DELETE = 0, 1, 2
+
+
 class PermissionManager:
+    # Process-level tier: {role_id: (version, matrix)}
+    _local_matrices = {}
+
+    @classmethod
+    def get_matrix_version(cls):
+        """Return the current permission matrix version from the shared cache"""
+        version = cache.get(MATRIX_VERSION_KEY)
+        if version is None:
+            cache.add(MATRIX_VERSION_KEY, time.time_ns(), MATRIX_TIMEOUT)
+            version = cache.get(MATRIX_VERSION_KEY)
+        return version
+
+    @classmethod
+    def invalidate(cls):
+        """Retire all compiled permission matrices in every process"""
+        cache.set(MATRIX_VERSION_KEY, time.time_ns(), MATRIX_TIMEOUT)
+        cls._local_matrices.clear()
+
+    @classmethod
+    def compile_matrix(cls, role_id):
+        """
+        Build the permission matrix for a role with a single query.
+        Returns a dict of module name -> (can_access, can_modify, can_delete)
+        """
+        rows = ModulePermission.objects.filter(
+            role_id=role_id,
+            module__is_active=True
+        ).values_list('module__name', 'can_access', 'can_modify', 'can_delete')
+        return {name: (access, modify, delete) for name, access, modify, delete in rows}
+
+    @classmethod
+    def get_role_matrix(cls, role_id):
+        """
+        Return the compiled permission matrix for a role, looking in the
+        process tier, then the shared cache, and compiling it on a miss
+        """
+        if role_id is None:
+            return {}
+
+        version = cls.get_matrix_version()
+        local = cls._local_matrices.get(role_id)
+        if local is not None and local[0] == version:
+            return local[1]
+
+        key = MATRIX_KEY.format(role_id=role_id, version=version)
+        matrix = cache.get(key)
+        if matrix is None:
+            matrix = cls.compile_matrix(role_id)
+            cache.set(key, matrix, MATRIX_TIMEOUT)
+
+        cls._local_matrices[role_id] = (version, matrix)
+        return matrix
+
+    @classmethod
+    def get_user_matrix(cls, user):
+        """
+        Return the permission matrix for the user's role, memoised on the
+        user object so repeated checks within a request cost nothing
+        """
+        role_id = getattr(user, 'role_id', None)
+        memo = getattr(user, USER_MATRIX_ATTR, None)
+        if memo is not None and memo[0] == role_id:
+            return memo[1]
+
+        matrix = cls.get_role_matrix(role_id)
+        try:
+            setattr(user, USER_MATRIX_ATTR, (role_id, matrix))
+        except AttributeError:
+            pass
+        return matrix
+
+    @classmethod
+    def get_permissions(cls, role):
+        """
+        Return the role's permissions as a dict of module name ->
+        {'can_access', 'can_modify', 'can_delete'}
+        """
+        role_id = role.id if isinstance(role, Role) else role
+        return {
+            name: {'can_access': bits[ACCESS], 'can_modify': bits[MODIFY], 'can_delete': bits[DELETE]}
+            for name, bits in cls.get_role_matrix(role_id).items()
+        }
+
+    @classmethod
+    def _check(cls, user, module_name, bit):
+        permission = cls.get_user_matrix(user).get(module_name)
+        if permission is None:
+            return False
+        return permission[bit]
+
     @classmethod
     def check_module_access(cls, user, module_name):
         """
         Check if user has access to a specific module
         Returns True if user has access, False otherwise
         """
-        try:
-            permission = ModulePermission.objects.get(
-                role=user.role,
-                module__name=module_name,
-                module__is_active=True
-            )
-            return permission.can_access
-        except ModulePermission.DoesNotExist:
-            return False
+        return cls._check(user, module_name, ACCESS)
 
     @classmethod
     def check_module_modify(cls, user, module_name):
@@ -24,15 +121,7 @@ class PermissionManager:
         Check if user has modify permission for a specific module
         Returns True if user can modify, False otherwise
         """
-        try:
-            permission = ModulePermission.objects.get(
-                role=user.role,
-                module__name=module_name,
-                module__is_active=True
-            )
-            return permission.can_modify
-        except ModulePermission.DoesNotExist:
-            return False
+        return cls._check(user, module_name, MODIFY)
 
     @classmethod
     def check_module_delete(cls, user, module_name):
@@ -40,12 +129,4 @@ class PermissionManager:
         Check if user has delete permission for a specific module
         Returns True if user can delete, False otherwise
         """
-        try:
-            permission = ModulePermission.objects.get(
-                role=user.role,
-                module__name=module_name,
-                module__is_active=True
-            )
-            return permission.can_delete
-        except ModulePermission.DoesNotExist:
-            return False
\ No newline at end of file
+        return cls._check(user, module_name, DELETE)
@@ -0,0 +1,147 @@
+"""
+Serving of stored files behind a view's own permission checks.
+
+serve_file() answers for a FieldFile once the view has decided the user may
+see it:
+
+- every response carries an ETag and Last-Modified built from the file's
+  size and modification time, and a client whose copy is current gets a 304
+  (or a 412 for a failed If-Match/If-Unmodified-Since);
+- a single "Range: bytes=..." request gets a 206 with just those bytes, so
+  videos can be seeked without downloading them first; If-Range is honoured
+  and unsatisfiable ranges get a 416;
+- with PROTECTED_MEDIA_SERVER set, the body is left to the front-end server:
+  'nginx' answers with X-Accel-Redirect to PROTECTED_MEDIA_INTERNAL_URL,
+  'sendfile' with X-Sendfile and the file's path (Apache mod_xsendfile,
+  lighttpd). The front-end server then handles ranges itself. For nginx,
+  the internal location maps onto MEDIA_ROOT:
+
+      location /protected-media/ {
+          internal;
+          alias /path/to/media/;
+      }
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+
+
+def stat_file(field_file):
+    """(size, modification timestamp) of a stored file, raising Http404 if it is missing"""
+    storage, name = field_file.storage, field_file.name
+    try:
+        try:
+            stat = os.stat(storage.path(name))
+            return stat.st_size, int(stat.st_mtime)
+        except NotImplementedError:
+            # Remote storage without local paths
+            return storage.size(name), int(storage.get_modified_time(name).timestamp())
+    except OSError:
+        raise Http404("File not found")
+
+
+def parse_range(header, size):
+    """(start, end) of a single "bytes=" range, None to send the whole file,
+    or False if the range cannot be satisfied"""
+    if not header or not header.startswith('bytes=') or ',' in header:
+        # Multiple ranges are answered with the whole file
+        return None
+    start, _, end = header[6:].strip().partition('-')
+    try:
+        if not start:
+            # The last N bytes
+            length = int(end)
+            if length <= 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a Range request may be answered with a part of the file"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _chunks(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def serve_file(request, field_file, filename=None, as_attachment=False, content_type=None):
+    """Response serving a stored file, for a request the caller has already authorised"""
+    if not field_file:
+        raise Http404("No file")
+    name = field_file.name
+    filename = filename or os.path.basename(name)
+    content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    size, last_modified = stat_file(field_file)
+    etag = f'"{last_modified:x}-{size:x}"'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Each use must be revalidated, which costs a 304 when unchanged
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return finish(conditional)
+
+    disposition = content_disposition_header(as_attachment, filename)
+    server = settings.PROTECTED_MEDIA_SERVER
+    if server:
+        response = HttpResponse(content_type=content_type)
+        if server == 'nginx':
+            response['X-Accel-Redirect'] = settings.PROTECTED_MEDIA_INTERNAL_URL + quote(name)
+        else:
+            response['X-Sendfile'] = field_file.path
+        response['Content-Disposition'] = disposition
+        return finish(response)
+
+    byte_range = None
+    if request.method in ('GET', 'HEAD') and if_range_matches(request, etag, last_modified):
+        byte_range = parse_range(request.headers.get('Range'), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return finish(response)
+
+    file = field_file.storage.open(name, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_chunks(file, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = disposition
+    return finish(response)
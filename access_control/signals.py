@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Module, Role, ModulePermission
+from .permissions import PermissionManager
+
+
+@receiver([post_save, post_delete], sender=ModulePermission)
+@receiver([post_save, post_delete], sender=Module)
+@receiver([post_save, post_delete], sender=Role)
+def invalidate_permission_matrix(sender, instance, **kwargs):
+    """Retire compiled permission matrices once the change is committed"""
+    transaction.on_commit(PermissionManager.invalidate)
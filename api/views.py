@@ -7,7 +7,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
-from django.db import DatabaseError
+from django.db import DatabaseError, transaction
 from django.db.utils import IntegrityError 
 from django.shortcuts import render, get_object_or_404
 from django.utils.encoding import force_bytes
@@ -48,6 +48,7 @@ from query_management.serializers import QuerySerializer, QueryTagSerializer, Ch
 from patient_management.models import (
     Patient, MedicalHistory, Medication, VitiligoAssessment, TreatmentPlan
 )
+from appointment_management.booking import SlotUnavailable, claim_slot
 from appointment_management.models import Appointment, DoctorTimeSlot
 from query_management.models import Query, QueryTag, QueryAttachment
 from doctor_management.models import (
@@ -545,15 +546,17 @@ class CreateAppointmentView(APIView):
         serializer = AppointmentCreateSerializer(data=request.data)
         try:
             if serializer.is_valid():
-                appointment = serializer.save(patient=request.user)
-                
-                # Update the DoctorTimeSlot to mark it as unavailable
-                doctor_time_slot = appointment.time_slot
-                doctor_time_slot.is_available = False
-                doctor_time_slot.save()
+                with transaction.atomic():
+                    # Claim the DoctorTimeSlot before saving, so only one booking gets it
+                    doctor_time_slot = serializer.validated_data.get('time_slot')
+                    if doctor_time_slot:
+                        claim_slot(doctor_time_slot)
+                    serializer.save(patient=request.user)
 
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except SlotUnavailable:
+            return Response({"error": "Time slot is not available"}, status=status.HTTP_400_BAD_REQUEST)
         except DoctorTimeSlot.DoesNotExist:
             return Response({"error": "Time slot does not exist"}, status=status.HTTP_400_BAD_REQUEST)
         except DatabaseError as e:
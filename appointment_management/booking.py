@@ -0,0 +1,87 @@
+"""
+Claiming and releasing DoctorTimeSlots for appointments.
+
+A slot is claimed with one conditional UPDATE
+(`... SET is_available = false WHERE id IN (...) AND is_available`), so of
+several requests racing for the same slot exactly one succeeds, whatever the
+other requests read beforehand. Claim the slot in the same transaction that
+saves the appointment, after any other validation, so that a failed save
+also gives the slot back:
+
+    with transaction.atomic():
+        claim_slot(timeslot)
+        appointment.time_slot = timeslot
+        appointment.save()
+"""
+import logging
+
+from django.db import transaction
+
+from dashboard.cache import bump_generation
+from .models import Appointment, DoctorTimeSlot
+
+logger = logging.getLogger(__name__)
+
+
+class SlotUnavailable(Exception):
+    """Raised when a time slot has already been booked"""
+
+    def __init__(self, slot_ids):
+        self.slot_ids = slot_ids
+        super().__init__(f"Time slots no longer available: {', '.join(map(str, slot_ids))}")
+
+
+def claim_slots(slots):
+    """
+    Mark every slot as booked, or none of them if any is already booked.
+    Raises SlotUnavailable naming the slots that were taken.
+    """
+    slot_ids = {slot.pk for slot in slots}
+    try:
+        with transaction.atomic():
+            claimed = DoctorTimeSlot.objects.filter(pk__in=slot_ids, is_available=True).update(is_available=False)
+            if claimed != len(slot_ids):
+                raise SlotUnavailable([])
+    except SlotUnavailable:
+        taken = sorted(DoctorTimeSlot.objects.filter(pk__in=slot_ids, is_available=False).values_list('pk', flat=True))
+        logger.info(f"Could not claim time slots, already booked: {taken}")
+        raise SlotUnavailable(taken)
+
+    for slot in slots:
+        slot.is_available = False
+
+
+def claim_slot(slot):
+    """Mark a single slot as booked, raising SlotUnavailable if it already is"""
+    claim_slots([slot])
+
+
+def release_slot(slot):
+    """Make a slot available again, e.g. when its appointment is cancelled"""
+    DoctorTimeSlot.objects.filter(pk=slot.pk).update(is_available=True)
+    slot.is_available = True
+
+
+def book_series(slots, patient, appointment_type='PHOTOTHERAPY', **appointment_fields):
+    """
+    Book one appointment per slot for a recurring series, such as a course
+    of phototherapy sessions. Either every slot is booked or none is.
+    """
+    slots = list(slots)
+    with transaction.atomic():
+        claim_slots(slots)
+        appointments = Appointment.objects.bulk_create([
+            Appointment(
+                patient=patient,
+                doctor_id=slot.doctor_id,
+                center_id=slot.center_id,
+                date=slot.date,
+                time_slot=slot,
+                appointment_type=appointment_type,
+                **appointment_fields
+            )
+            for slot in slots
+        ])
+        # bulk_create skips the post_save signal that invalidates the dashboards
+        transaction.on_commit(lambda: bump_generation(Appointment))
+        return appointments
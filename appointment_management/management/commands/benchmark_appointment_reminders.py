@@ -0,0 +1,238 @@
+import random
+import time
+from datetime import time as clock_time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from appointment_management.models import (
+    Appointment,
+    AppointmentReminder,
+    Center,
+    DoctorTimeSlot,
+    ReminderConfiguration,
+    ReminderTemplate,
+)
+from appointment_management.reminders import (
+    ACTIVE_STATUSES,
+    SCHEDULE_GRACE,
+    SCHEDULE_LOOKAHEAD,
+    appointment_start,
+    dispatch_reminders,
+    schedule_reminders,
+)
+from notifications.models import EmailNotification, SMSNotification
+
+User = get_user_model()
+
+# (days before, hours before) of each seeded template
+TEMPLATE_OFFSETS = [(7, 0), (1, 0), (0, 2)]
+# Channels of each seeded configuration
+CHANNELS = {
+    'CONSULTATION': {'email': True, 'sms': True},
+    'FOLLOW_UP': {'email': True, 'sms': False},
+    'PROCEDURE': {'email': False, 'sms': True},
+    'PHOTOTHERAPY': {},
+}
+REMINDER_TYPES = {
+    'CONSULTATION': 'BOTH',
+    'FOLLOW_UP': 'EMAIL',
+    'PROCEDURE': 'SMS',
+    'PHOTOTHERAPY': 'BOTH',
+}
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back the rows seeded for the benchmark"""
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Schedule and queue reminders for a large number of seeded appointments, '
+        'check them against a plain Python computation and check that a second '
+        'run creates nothing. Seeded rows are rolled back when the benchmark finishes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--appointments',
+            type=int,
+            default=20000,
+            help='Number of upcoming appointments'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=14,
+            help='Days ahead the appointments are spread over'
+        )
+        parser.add_argument(
+            '--patients',
+            type=int,
+            default=500,
+            help='Number of patients the appointments belong to'
+        )
+        parser.add_argument(
+            '--max-seconds',
+            type=float,
+            default=None,
+            help='Fail if scheduling or dispatching takes longer than this'
+        )
+
+    def handle(self, *args, **kwargs):
+        results = None
+        try:
+            with transaction.atomic():
+                now = timezone.now()
+                appointments, templates = self.seed(kwargs, now)
+                results = self.measure(appointments, templates, now)
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            pass
+
+        first_seconds, second_seconds, dispatch_seconds, created, claimed, notifications = results
+        self.stdout.write(
+            f"First run: {created} reminders for {kwargs['appointments']} appointments in {first_seconds:.2f}s\n"
+            f"Second run: nothing new in {second_seconds:.2f}s\n"
+            f"Dispatch a day later: {claimed} reminders as {notifications} notifications in {dispatch_seconds:.2f}s"
+        )
+        limit = kwargs['max_seconds']
+        if limit is not None and max(first_seconds, dispatch_seconds) > limit:
+            raise CommandError(f"Scheduling or dispatching took longer than {limit}s")
+
+        self.stdout.write(self.style.SUCCESS(
+            "All reminders matched a plain Python computation and none were created twice"
+        ))
+
+    def seed(self, options, now):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        today = timezone.localdate(now)
+
+        # Only the seeded configurations take part
+        ReminderConfiguration.objects.all().delete()
+        templates = ReminderTemplate.objects.bulk_create([
+            ReminderTemplate(
+                name=f'Benchmark {days}d {hours}h',
+                days_before=days,
+                hours_before=hours,
+                message_template='Dear {patient}, your {type} with {doctor} is on {date} at {time}.'
+            )
+            for days, hours in TEMPLATE_OFFSETS
+        ])
+        for appointment_type, channels in CHANNELS.items():
+            configuration = ReminderConfiguration.objects.create(appointment_type=appointment_type, reminder_types=channels)
+            configuration.templates.set(templates)
+
+        center = Center.objects.create(name=f'Benchmark Center {suffix}', address='Benchmark', contact_number='0')
+        doctors = User.objects.bulk_create([
+            User(email=f'benchmark.doctor.{i}.{suffix}@example.com', first_name='Doctor', last_name=str(i))
+            for i in range(10)
+        ])
+        patients = User.objects.bulk_create([
+            User(
+                email=f'benchmark.patient.{i}.{suffix}@example.com',
+                first_name='Patient',
+                last_name=str(i),
+                phone_number=f'9{i:09d}'
+            )
+            for i in range(options['patients'])
+        ])
+        slots = DoctorTimeSlot.objects.bulk_create([
+            DoctorTimeSlot(
+                doctor=doctor,
+                center=center,
+                date=today + timedelta(days=day),
+                start_time=clock_time(hour),
+                end_time=clock_time(hour + 1)
+            )
+            for doctor in doctors for day in range(options['days'] + 1) for hour in range(8, 20)
+        ])
+
+        appointments = []
+        for _ in range(options['appointments']):
+            slot = random.choice(slots)
+            appointments.append(Appointment(
+                patient=random.choice(patients),
+                doctor_id=slot.doctor_id,
+                center=center,
+                # Some appointments have no time slot yet
+                time_slot=slot if random.random() < 0.9 else None,
+                date=slot.date,
+                appointment_type=random.choice(list(CHANNELS)),
+                status=random.choice(ACTIVE_STATUSES + ['CANCELLED', 'COMPLETED'])
+            ))
+        Appointment.objects.bulk_create(appointments, batch_size=1000)
+        return appointments, templates
+
+    def expected_reminders(self, appointments, templates, now):
+        """{(appointment id, template id): (reminder date, reminder type)}, one appointment at a time"""
+        expected = {}
+        longest = max(timedelta(days=template.days_before, hours=template.hours_before) for template in templates)
+        last_day = timezone.localdate(now + longest + SCHEDULE_LOOKAHEAD)
+        for appointment in appointments:
+            if appointment.status not in ACTIVE_STATUSES or appointment.date > last_day:
+                continue
+            start = appointment_start(appointment.date, appointment.time_slot.start_time if appointment.time_slot else None)
+            if start <= now:
+                continue
+            for template in templates:
+                reminder_date = start - timedelta(days=template.days_before, hours=template.hours_before)
+                if reminder_date >= now - SCHEDULE_GRACE:
+                    expected[(appointment.pk, template.pk)] = (reminder_date, REMINDER_TYPES[appointment.appointment_type])
+        return expected
+
+    def seeded_reminders(self, appointments):
+        return {
+            (appointment_id, template_id): (reminder_date, reminder_type)
+            for appointment_id, template_id, reminder_date, reminder_type in AppointmentReminder.objects.filter(
+                appointment__in=[appointment.pk for appointment in appointments]
+            ).values_list('appointment_id', 'template_id', 'reminder_date', 'reminder_type').iterator()
+        }
+
+    def measure(self, appointments, templates, now):
+        expected = self.expected_reminders(appointments, templates, now)
+
+        started = time.perf_counter()
+        created = schedule_reminders(now)
+        first_seconds = time.perf_counter() - started
+        reminders = self.seeded_reminders(appointments)
+        if reminders != expected:
+            missing, extra = set(expected) - set(reminders), set(reminders) - set(expected)
+            raise CommandError(
+                f"Scheduled {len(reminders)} reminders, expected {len(expected)} "
+                f"({len(missing)} missing, {len(extra)} unexpected or different)"
+            )
+
+        started = time.perf_counter()
+        created_again = schedule_reminders(now)
+        second_seconds = time.perf_counter() - started
+        if created_again or self.seeded_reminders(appointments) != expected:
+            raise CommandError(f"The second run created {created_again} reminders")
+
+        # Everything due within the next day, for appointments that have not started by then
+        later = now + timedelta(days=1)
+        starts = {
+            appointment.pk: appointment_start(appointment.date, appointment.time_slot.start_time if appointment.time_slot else None)
+            for appointment in appointments
+        }
+        due = {key: value for key, value in expected.items() if value[0] <= later and starts[key[0]] > later}
+        emails_before, texts_before = EmailNotification.objects.count(), SMSNotification.objects.count()
+
+        started = time.perf_counter()
+        claimed = dispatch_reminders(later)
+        dispatch_seconds = time.perf_counter() - started
+        sent = set(AppointmentReminder.objects.filter(
+            appointment__in=[appointment.pk for appointment in appointments],
+            status='SENT'
+        ).values_list('appointment_id', 'template_id'))
+        if sent != set(due):
+            raise CommandError(f"Queued {len(sent)} reminders, expected {len(due)}")
+
+        notifications = (EmailNotification.objects.count() - emails_before) + (SMSNotification.objects.count() - texts_before)
+        expected_notifications = sum(2 if reminder_type == 'BOTH' else 1 for _, reminder_type in due.values())
+        if notifications < expected_notifications:
+            raise CommandError(f"Queued {notifications} notifications, expected {expected_notifications}")
+        return first_seconds, second_seconds, dispatch_seconds, created, claimed, notifications
@@ -0,0 +1,147 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time as clock_time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from appointment_management.booking import SlotUnavailable, book_series, claim_slot
+from appointment_management.models import Appointment, Center, DoctorTimeSlot
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Book the same time slots from many threads at once and check that no '
+        'slot is booked twice. The slots, appointments and users created are '
+        'deleted when the benchmark finishes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--slots',
+            type=int,
+            default=200,
+            help='Number of time slots to compete for'
+        )
+        parser.add_argument(
+            '--contenders',
+            type=int,
+            default=4,
+            help='Number of booking attempts made for every slot'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=16,
+            help='Number of threads booking concurrently'
+        )
+        parser.add_argument(
+            '--series-length',
+            type=int,
+            default=1,
+            help='Book recurring series of this many consecutive slots instead of single slots'
+        )
+
+    def handle(self, *args, **kwargs):
+        slot_count = kwargs['slots']
+        series_length = kwargs['series_length']
+        if series_length < 1 or series_length > slot_count:
+            raise CommandError('--series-length must be between 1 and --slots')
+
+        doctor, patient, center = self.create_fixtures()
+        try:
+            slots = self.create_slots(doctor, center, slot_count)
+
+            # Every attempt is a run of consecutive slots, and each start is tried by several requests
+            starts = list(range(0, slot_count - series_length + 1, series_length)) * kwargs['contenders']
+            random.shuffle(starts)
+            attempts = [slots[start:start + series_length] for start in starts]
+
+            def book(series):
+                try:
+                    self.book(patient, series)
+                    return True
+                except SlotUnavailable:
+                    return False
+                finally:
+                    connections.close_all()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=kwargs['workers']) as executor:
+                results = list(executor.map(book, attempts))
+            elapsed = time.perf_counter() - started
+
+            self.report(slots, results, elapsed, series_length)
+        finally:
+            DoctorTimeSlot.objects.filter(center=center).delete()
+            center.delete()
+            User.objects.filter(pk__in=[doctor.pk, patient.pk]).delete()
+
+    def create_fixtures(self):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        doctor = User.objects.create_user(email=f'benchmark.doctor.{suffix}@example.com')
+        patient = User.objects.create_user(email=f'benchmark.patient.{suffix}@example.com')
+        center = Center.objects.create(name=f'Benchmark Center {suffix}', address='Benchmark', contact_number='0')
+        return doctor, patient, center
+
+    def create_slots(self, doctor, center, count):
+        first_day = timezone.localdate() + timedelta(days=1)
+        return DoctorTimeSlot.objects.bulk_create([
+            DoctorTimeSlot(
+                doctor=doctor,
+                center=center,
+                date=first_day + timedelta(days=i // 8),
+                start_time=clock_time(9 + i % 8),
+                end_time=clock_time(10 + i % 8),
+            )
+            for i in range(count)
+        ])
+
+    def book(self, patient, series):
+        # Fresh instances, since claiming updates the objects it is given
+        series = [DoctorTimeSlot(pk=slot.pk, doctor_id=slot.doctor_id, center_id=slot.center_id, date=slot.date)
+                  for slot in series]
+        if len(series) > 1:
+            book_series(series, patient)
+            return
+
+        slot = series[0]
+        with transaction.atomic():
+            claim_slot(slot)
+            Appointment.objects.create(
+                patient=patient,
+                doctor_id=slot.doctor_id,
+                center_id=slot.center_id,
+                date=slot.date,
+                time_slot=slot,
+            )
+
+    def report(self, slots, results, elapsed, series_length):
+        slot_ids = [slot.pk for slot in slots]
+        booked = sum(results)
+        self.stdout.write(
+            f"{len(results)} booking attempts from {len(slots)} slots in {elapsed:.2f}s "
+            f"({len(results) / elapsed:.0f} attempts/s): {booked} booked, {len(results) - booked} rejected"
+        )
+
+        appointments = Appointment.objects.filter(time_slot__in=slot_ids)
+        double_booked = appointments.values('time_slot').annotate(count=Count('id')).filter(count__gt=1).count()
+        if double_booked:
+            raise CommandError(f"{double_booked} slots were booked more than once")
+
+        appointment_slots = set(appointments.values_list('time_slot', flat=True))
+        unavailable_slots = set(DoctorTimeSlot.objects.filter(
+            pk__in=slot_ids, is_available=False
+        ).values_list('pk', flat=True))
+        if appointment_slots != unavailable_slots:
+            raise CommandError("Slot availability does not match the appointments booked")
+        if len(appointment_slots) != booked * series_length:
+            raise CommandError("A series was only partly booked")
+
+        self.stdout.write(self.style.SUCCESS(f"No double bookings: {len(appointment_slots)} slots booked once each"))
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    AppointmentReminder = apps.get_model('appointment_management', 'AppointmentReminder')
+
+    # Keep the first reminder created for each appointment and template
+    duplicates = AppointmentReminder.objects.filter(template__isnull=False).order_by().values(
+        'appointment', 'template'
+    ).annotate(first=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates.iterator():
+        AppointmentReminder.objects.filter(
+            appointment=duplicate['appointment'],
+            template=duplicate['template']
+        ).exclude(id=duplicate['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointment_management', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointmentreminder',
+            constraint=models.UniqueConstraint(condition=models.Q(('template__isnull', False)), fields=('appointment', 'template'), name='unique_appointment_reminder_template'),
+        ),
+    ]
@@ -220,6 +220,8 @@ class AppointmentReminder(models.Model):
         ('FAILED', 'Failed'),
     ]
 
+    MAX_PER_APPOINTMENT = 5
+
     appointment = models.ForeignKey(
         'Appointment', 
         on_delete=models.CASCADE, 
@@ -260,6 +262,14 @@ class AppointmentReminder(models.Model):
             models.Index(fields=['reminder_date', 'status']),
             models.Index(fields=['appointment', 'status']),
         ]
+        constraints = [
+            # One reminder per template, so repeated scheduling runs are idempotent
+            models.UniqueConstraint(
+                fields=['appointment', 'template'],
+                condition=Q(template__isnull=False),
+                name='unique_appointment_reminder_template'
+            ),
+        ]
 
     def __str__(self):
         return f"Reminder for {self.appointment} at {self.reminder_date}"
@@ -275,8 +285,8 @@ class AppointmentReminder(models.Model):
                 raise ValidationError("Reminder cannot be scheduled after the appointment")
             
             # Don't allow too many reminders
-            if self.appointment.reminders.count() >= 5:
-                raise ValidationError("Maximum 5 reminders allowed per appointment")
+            if self.appointment.reminders.count() >= self.MAX_PER_APPOINTMENT:
+                raise ValidationError(f"Maximum {self.MAX_PER_APPOINTMENT} reminders allowed per appointment")
 
     def save(self, *args, **kwargs):
         self.full_clean()
@@ -0,0 +1,263 @@
+"""
+Scheduling and dispatch of appointment reminders.
+
+schedule_reminders() turns the active ReminderConfigurations into
+AppointmentReminder rows in one pass over the upcoming appointments. The
+configured templates are loaded once, appointments are read as plain value
+rows, and each reminder is due at the appointment's start less its
+template's days and hours. Rows are written with
+bulk_create(ignore_conflicts=True) against the (appointment, template)
+unique constraint, so runs may repeat or overlap without creating
+duplicates. Pending reminders of appointments moved since they were
+created are moved to the new due time, or failed if that has passed.
+
+dispatch_reminders() claims due reminders in batches with
+select_for_update(skip_locked=True), renders each template's message and
+hands them to the notification queue as EmailNotification and
+SMSNotification rows in the same transaction; notifications.delivery sends
+them on. Reminders of rescheduled appointments are moved to their new time
+rather than sent, and those of cancelled or past appointments are failed.
+"""
+import logging
+from datetime import datetime, time as datetime_time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from notifications.delivery import queue_delivery
+from notifications.models import EmailNotification, SMSNotification
+
+from .models import Appointment, AppointmentReminder, ReminderConfiguration, ReminderTemplate
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ['PENDING', 'SCHEDULED', 'CONFIRMED']
+SCHEDULE_GRACE = timedelta(minutes=15)  # Reminders this late are still sent; longer than the beat interval
+SCHEDULE_LOOKAHEAD = timedelta(days=1)  # Appointments are picked up this long before their earliest reminder
+REMINDER_SUBJECT = 'Appointment Reminder'
+DEFAULT_MESSAGE = 'Reminder: your {type} appointment with {doctor} is on {date} at {time}.'
+
+
+def appointment_start(date, start_time):
+    """Aware start of an appointment; those without a time slot start at APPOINTMENT_REMINDER_DEFAULT_TIME"""
+    start_time = start_time or datetime_time.fromisoformat(settings.APPOINTMENT_REMINDER_DEFAULT_TIME)
+    return timezone.make_aware(datetime.combine(date, start_time))
+
+
+def reminder_offset(template):
+    return timedelta(days=template.days_before, hours=template.hours_before)
+
+
+def reminder_type_for(reminder_types, template_id):
+    """Channel of a template's reminders from a configuration's reminder_types, None if both are off.
+
+    reminder_types is {"email": bool, "sms": bool}, optionally overridden per
+    template under the template's id; a configuration without options uses both.
+    """
+    options = reminder_types if isinstance(reminder_types, dict) else {}
+    options = options.get(str(template_id), options)
+    email, sms = options.get('email'), options.get('sms')
+    if email is None and sms is None:
+        return 'BOTH'
+    if email and sms:
+        return 'BOTH'
+    if email:
+        return 'EMAIL'
+    if sms:
+        return 'SMS'
+    return None
+
+
+def configured_reminders():
+    """{appointment type: [(template id, offset, reminder type)]} of the active configurations"""
+    configurations = ReminderConfiguration.objects.filter(is_active=True).prefetch_related(
+        Prefetch('templates', queryset=ReminderTemplate.objects.filter(is_active=True))
+    )
+    plan = {}
+    for configuration in configurations:
+        reminders = []
+        for template in configuration.templates.all()[:AppointmentReminder.MAX_PER_APPOINTMENT]:
+            reminder_type = reminder_type_for(configuration.reminder_types, template.pk)
+            if reminder_type:
+                reminders.append((template.pk, reminder_offset(template), reminder_type))
+        if reminders:
+            plan[configuration.appointment_type] = reminders
+    return plan
+
+
+def schedule_reminders(now=None, batch_size=None):
+    """Create the missing reminders of every upcoming appointment and move the pending ones of
+    rescheduled appointments. Returns the number created"""
+    now = now or timezone.now()
+    batch_size = batch_size or settings.APPOINTMENT_REMINDER_BATCH_SIZE
+    plan = configured_reminders()
+    if not plan:
+        return 0
+
+    # Appointments further ahead are left to later runs
+    longest = max(offset for reminders in plan.values() for _, offset, _ in reminders)
+    today = timezone.localdate(now)
+    appointments = Appointment.objects.filter(
+        appointment_type__in=list(plan),
+        status__in=ACTIVE_STATUSES,
+        date__range=(today, timezone.localdate(now + longest + SCHEDULE_LOOKAHEAD))
+    )
+    # {(appointment, template): (id, reminder date) of a pending reminder, None once it has been handled}
+    existing = {
+        (appointment_id, template_id): (reminder_id, reminder_date) if status == 'PENDING' else None
+        for reminder_id, appointment_id, template_id, status, reminder_date in AppointmentReminder.objects.filter(
+            appointment__in=appointments.values('id'),
+            template__isnull=False
+        ).values_list('id', 'appointment_id', 'template_id', 'status', 'reminder_date').iterator()
+    }
+
+    earliest = now - SCHEDULE_GRACE
+    pending, created = [], 0
+    moved, too_late = [], []
+    rows = appointments.order_by().values_list('id', 'appointment_type', 'date', 'time_slot__start_time')
+    for appointment_id, appointment_type, date, start_time in rows.iterator(chunk_size=batch_size):
+        start = appointment_start(date, start_time)
+        if start <= now:
+            continue
+        for template_id, offset, reminder_type in plan[appointment_type]:
+            reminder_date = start - offset
+            key = (appointment_id, template_id)
+            if key in existing:
+                # Pending reminders follow their appointment when it is moved
+                reminder = existing[key]
+                if reminder and reminder[1] != reminder_date:
+                    if reminder_date < earliest:
+                        too_late.append(reminder[0])
+                    else:
+                        moved.append(AppointmentReminder(id=reminder[0], reminder_date=reminder_date, updated_at=now))
+                continue
+            if reminder_date < earliest:
+                continue
+            pending.append(AppointmentReminder(
+                appointment_id=appointment_id,
+                template_id=template_id,
+                reminder_type=reminder_type,
+                reminder_date=reminder_date
+            ))
+        if len(pending) >= batch_size:
+            AppointmentReminder.objects.bulk_create(pending, ignore_conflicts=True)
+            created += len(pending)
+            pending = []
+    if pending:
+        AppointmentReminder.objects.bulk_create(pending, ignore_conflicts=True)
+        created += len(pending)
+    # Reminders sent meanwhile keep their date
+    AppointmentReminder.objects.filter(status='PENDING').bulk_update(moved, ['reminder_date', 'updated_at'], batch_size=500)
+    AppointmentReminder.objects.filter(id__in=too_late, status='PENDING').update(
+        status='FAILED', failure_reason='Appointment was moved too close to send this reminder', updated_at=now
+    )
+
+    logger.info(
+        f"Scheduled {created} appointment reminders, moved {len(moved)} "
+        f"and failed {len(too_late)} of rescheduled appointments"
+    )
+    return created
+
+
+def render_message(reminder, start):
+    appointment = reminder.appointment
+    message = reminder.template.message_template if reminder.template else DEFAULT_MESSAGE
+    return message.format(
+        patient=appointment.patient.get_full_name().strip() or appointment.patient.email,
+        doctor=f"Dr. {appointment.doctor.get_full_name().strip()}",
+        date=appointment.date.strftime('%d %b %Y'),
+        time=timezone.localtime(start).strftime('%I:%M %p') if appointment.time_slot else 'the scheduled time',
+        type=appointment.get_appointment_type_display()
+    )
+
+
+def dispatch_batch(now=None, limit=None):
+    """Queue up to `limit` due reminders as notifications. Returns the number of reminders claimed"""
+    now = now or timezone.now()
+    limit = limit or settings.APPOINTMENT_REMINDER_BATCH_SIZE
+
+    with transaction.atomic():
+        ids = list(AppointmentReminder.objects.filter(
+            status='PENDING',
+            reminder_date__lte=now
+        ).select_for_update(skip_locked=True).order_by('reminder_date', 'id').values_list('id', flat=True)[:limit])
+        if not ids:
+            return 0
+        reminders = list(AppointmentReminder.objects.filter(id__in=ids).select_related(
+            'appointment__patient', 'appointment__doctor', 'appointment__time_slot', 'template'
+        ))
+
+        # Outcomes are written with one UPDATE per distinct outcome
+        sent, failures, moved = [], {}, []
+        emails, texts = [], []
+        for reminder in reminders:
+            appointment = reminder.appointment
+            start = appointment_start(
+                appointment.date, appointment.time_slot.start_time if appointment.time_slot else None
+            )
+            if appointment.status not in ACTIVE_STATUSES:
+                failures.setdefault(f"Appointment is {appointment.get_status_display().lower()}", []).append(reminder.pk)
+                continue
+            if start <= now:
+                failures.setdefault("Appointment has already started", []).append(reminder.pk)
+                continue
+            if reminder.template:
+                due = start - reminder_offset(reminder.template)
+                if due > now:
+                    # The appointment was moved later
+                    reminder.reminder_date = due
+                    moved.append(reminder)
+                    continue
+            try:
+                message = render_message(reminder, start)
+            except Exception as e:
+                # A broken template fails only its own reminders, never the batch
+                logger.error(f"Could not render appointment reminder {reminder.pk}: {str(e)}")
+                failures.setdefault(f"Could not render reminder: {type(e).__name__}: {str(e)}", []).append(reminder.pk)
+                continue
+
+            patient = appointment.patient
+            queued = False
+            if reminder.reminder_type in ('EMAIL', 'BOTH') and patient.email:
+                emails.append(EmailNotification(user=patient, subject=REMINDER_SUBJECT, message=message))
+                queued = True
+            if reminder.reminder_type in ('SMS', 'BOTH') and patient.phone_number:
+                texts.append(SMSNotification(user=patient, phone_number=patient.phone_number, message=message))
+                queued = True
+            if queued:
+                sent.append(reminder.pk)
+            else:
+                failures.setdefault("Patient has no email address or phone number for this reminder", []).append(reminder.pk)
+
+        EmailNotification.objects.bulk_create(emails, batch_size=500)
+        SMSNotification.objects.bulk_create(texts, batch_size=500)
+        AppointmentReminder.objects.filter(id__in=sent).update(
+            status='SENT', sent=True, sent_at=now, failure_reason='', updated_at=now
+        )
+        for reason, failed_ids in failures.items():
+            AppointmentReminder.objects.filter(id__in=failed_ids).update(
+                status='FAILED', failure_reason=reason, updated_at=now
+            )
+        for reminder in moved:
+            reminder.updated_at = now
+        AppointmentReminder.objects.bulk_update(moved, ['reminder_date', 'updated_at'], batch_size=500)
+        if emails or texts:
+            queue_delivery()
+
+    logger.info(
+        f"Queued {len(sent)}/{len(reminders)} appointment reminders as "
+        f"{len(emails)} emails and {len(texts)} SMS"
+    )
+    return len(reminders)
+
+
+def dispatch_reminders(now=None):
+    """Queue due reminders batch by batch until none are left. Returns the number claimed"""
+    total = 0
+    while True:
+        claimed = dispatch_batch(now)
+        if not claimed:
+            return total
+        total += claimed
@@ -0,0 +1,10 @@
+from celery import shared_task
+
+from .reminders import dispatch_reminders, schedule_reminders
+
+
+@shared_task(ignore_result=True)
+def send_appointment_reminders():
+    """Schedule reminders for upcoming appointments and queue those that are due"""
+    schedule_reminders()
+    dispatch_reminders()
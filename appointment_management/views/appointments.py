@@ -53,6 +53,7 @@ from patient_management.models import MedicalHistory
 from notifications.services import NotificationService
 from notifications.models import NotificationType
 
+from ..booking import SlotUnavailable, claim_slot, release_slot
 from ..utils import get_template_path
 from ..forms import AppointmentCreateForm
 from ..models import (
@@ -189,11 +190,14 @@ class AppointmentCreateView(LoginRequiredMixin, CreateView):
                         messages.error(self.request, 'Follow-up appointments must be scheduled at least 1 day in advance')
                         return self.form_invalid(form)
 
-                # Set the timeslot and mark it as unavailable
+                # Claim the timeslot; another booking may have taken it since the check above
+                try:
+                    claim_slot(timeslot)
+                except SlotUnavailable:
+                    messages.error(self.request, 'This time slot is no longer available')
+                    return self.form_invalid(form)
+
                 appointment.time_slot = timeslot
-                timeslot.is_available = False
-                timeslot.save()
-                
                 appointment.save()
 
                 # Create notifications outside the transaction
@@ -467,20 +471,24 @@ def update_appointment_timeslot(request, appointment_id):
             )
 
         # Update the appointment
-        with transaction.atomic():
-            # Make old timeslot available if it exists
-            if appointment.time_slot:
-                old_timeslot = appointment.time_slot
-                old_timeslot.is_available = True
-                old_timeslot.save()
+        try:
+            with transaction.atomic():
+                # Claim the new timeslot first, so a lost race leaves the old one booked
+                claim_slot(timeslot)
 
-            # Update appointment with new timeslot
-            appointment.time_slot = timeslot
-            appointment.save()
+                # Make old timeslot available if it exists
+                if appointment.time_slot:
+                    release_slot(appointment.time_slot)
 
-            # Mark new timeslot as unavailable
-            timeslot.is_available = False
-            timeslot.save()
+                # Update appointment with new timeslot
+                appointment.time_slot = timeslot
+                appointment.save()
+        except SlotUnavailable:
+            logger.error(f"TimeSlot {timeslot_id} was booked by another request")
+            return Response(
+                {"error": "TimeSlot is not available"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         # Return updated appointment data
         response_data = {
@@ -557,8 +565,7 @@ def update_appointment_status(request, appointment_id):
                     )
                     
                     if appointment.time_slot:
-                        appointment.time_slot.is_available = True
-                        appointment.time_slot.save()
+                        release_slot(appointment.time_slot)
                         logger.info(f"Released time slot for cancelled appointment {appointment_id}")
 
                     # Create cancellation notifications outside the transaction
@@ -669,8 +676,7 @@ class AppointmentDeleteView(LoginRequiredMixin, UserPassesTestMixin, View):
             with transaction.atomic():
                 # If there's a time slot, mark it as available again
                 if appointment.time_slot:
-                    appointment.time_slot.is_available = True
-                    appointment.time_slot.save()
+                    release_slot(appointment.time_slot)
                     logger.info(f"Released time slot for appointment {appointment_id}")
                 
                 appointment.delete()
@@ -708,24 +714,24 @@ class AppointmentRescheduleView(LoginRequiredMixin, UserPassesTestMixin, View):
                 return redirect('appointment_dashboard')
 
             with transaction.atomic():
+                # Claim the new timeslot first, so a lost race leaves the old one booked
+                claim_slot(new_timeslot)
+
                 # Make the old timeslot available
                 if appointment.time_slot:
-                    old_timeslot = appointment.time_slot
-                    old_timeslot.is_available = True
-                    old_timeslot.save()
+                    release_slot(appointment.time_slot)
 
                 # Update appointment with new timeslot
                 appointment.time_slot = new_timeslot
                 appointment.date = new_timeslot.date
                 appointment.save()
 
-                # Mark new timeslot as unavailable
-                new_timeslot.is_available = False
-                new_timeslot.save()
-
             messages.success(request, 'Appointment rescheduled successfully')
             return redirect('appointment_dashboard')
 
+        except SlotUnavailable:
+            messages.error(request, 'Selected time slot is no longer available')
+            return redirect('appointment_dashboard')
         except Exception as e:
             logger.error(f"Error rescheduling appointment: {str(e)}")
             messages.error(request, 'Error rescheduling appointment')
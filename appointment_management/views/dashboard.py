@@ -46,6 +46,7 @@ from rest_framework.response import Response
 # Local application imports
 from access_control.models import Role
 from access_control.permissions import PermissionManager
+from dashboard.utils import cache_dashboard_data
 from doctor_management.models import DoctorProfile
 from error_handling.views import handler403, handler404, handler500
 from patient_management.models import MedicalHistory
@@ -127,18 +128,22 @@ class AppointmentDashboardView(LoginRequiredMixin, ListView):
             
         return queryset.filter(**filters).order_by('-date', '-time_slot__start_time')
 
+    @cache_dashboard_data('appointment_dashboard_stats', depends_on=(Appointment,))
+    def get_dashboard_stats(self):
+        today = timezone.localdate()
+        return {
+            'total_appointments': Appointment.objects.count(),
+            'pending_appointments': Appointment.objects.filter(status='PENDING').count(),
+            'completed_appointments': Appointment.objects.filter(status='COMPLETED').count(),
+            'today_appointments': Appointment.objects.filter(date=today).count(),
+        }
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        today = timezone.now().date()
-        start_of_month = today.replace(day=1)
         
         # Basic statistics
+        context.update(self.get_dashboard_stats())
         context.update({
-            'total_appointments': Appointment.objects.count(),
-            'pending_appointments': Appointment.objects.filter(status='PENDING').count(),
-            'completed_appointments': Appointment.objects.filter(status='COMPLETED').count(),
-            'today_appointments': Appointment.objects.filter(date=today).count(),
-            
             # Current filters for template
             'current_filters': {
                 'priority': self.request.GET.get('priority', ''),
@@ -49,6 +49,8 @@ from access_control.permissions import PermissionManager
 from doctor_management.models import DoctorProfile
 from error_handling.views import handler403, handler404, handler500
 from patient_management.models import MedicalHistory
+from reporting_and_analytics.export_jobs import AsyncExportMixin
+from reporting_and_analytics.exports import PdfExport, csv_response, iter_queryset
 
 from ..utils import get_template_path
 from ..forms import AppointmentCreateForm
@@ -67,7 +69,9 @@ logger = logging.getLogger(__name__)
 # Get the User model
 User = get_user_model()
 
-class AppointmentExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class AppointmentExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'appointment_management'
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'appointment_management')
 
@@ -119,11 +123,7 @@ class AppointmentExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             return redirect('appointment_dashboard')
 
     def export_csv(self, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="appointments_report.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
+        header = [
             'Appointment ID',
             'Patient Name',
             'Doctor Name',
@@ -136,49 +136,49 @@ class AppointmentExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             'Created At',
             'Last Updated',
             'Cancellation Reason'
-        ])
-
-        for appointment in queryset:
-            cancellation_reason = appointment.cancellation_reason.reason if hasattr(appointment, 'cancellation_reason') else 'N/A'
-            writer.writerow([
-                appointment.id,
-                appointment.patient.get_full_name(),
-                appointment.doctor.get_full_name(),
-                appointment.date,
-                appointment.time_slot.start_time if appointment.time_slot else 'N/A',
-                appointment.get_appointment_type_display(),
-                appointment.get_status_display(),
-                appointment.get_priority_display(),
-                appointment.notes or 'N/A',
-                appointment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                appointment.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                cancellation_reason
-            ])
+        ]
 
-        return response
+        def rows():
+            for appointment in iter_queryset(queryset.select_related('cancellation_reason')):
+                cancellation_reason = appointment.cancellation_reason.reason if hasattr(appointment, 'cancellation_reason') else 'N/A'
+                yield [
+                    appointment.id,
+                    appointment.patient.get_full_name(),
+                    appointment.doctor.get_full_name(),
+                    appointment.date,
+                    appointment.time_slot.start_time if appointment.time_slot else 'N/A',
+                    appointment.get_appointment_type_display(),
+                    appointment.get_status_display(),
+                    appointment.get_priority_display(),
+                    appointment.notes or 'N/A',
+                    appointment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    appointment.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    cancellation_reason
+                ]
+
+        return csv_response('appointments_report.csv', header, rows())
 
     def export_pdf(self, queryset):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="appointments_report.pdf"'
-
-        doc = SimpleDocTemplate(response, pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-        elements = []
+        pdf = PdfExport(pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
 
         # Styles
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        normal_style = styles['Normal']
+        title_style = pdf.styles['Heading1']
 
         # Title
-        elements.append(Paragraph('Appointments Report', title_style))
-        elements.append(Spacer(1, 20))
+        pdf.add(Paragraph('Appointments Report', title_style), Spacer(1, 20))
 
         # Statistics
+        counts = queryset.aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='PENDING')),
+            completed=Count('id', filter=Q(status='COMPLETED')),
+            cancelled=Count('id', filter=Q(status='CANCELLED')),
+        )
         stats = [
-            ['Total Appointments:', str(queryset.count())],
-            ['Pending Appointments:', str(queryset.filter(status='PENDING').count())],
-            ['Completed Appointments:', str(queryset.filter(status='COMPLETED').count())],
-            ['Cancelled Appointments:', str(queryset.filter(status='CANCELLED').count())]
+            ['Total Appointments:', str(counts['total'])],
+            ['Pending Appointments:', str(counts['pending'])],
+            ['Completed Appointments:', str(counts['completed'])],
+            ['Cancelled Appointments:', str(counts['cancelled'])]
         ]
 
         stats_table = Table(stats, colWidths=[150, 100])
@@ -189,35 +189,36 @@ class AppointmentExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
         ]))
-        elements.append(stats_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(stats_table, Spacer(1, 20))
 
         # Appointments table
-        data = [['Date', 'Time', 'Patient', 'Doctor', 'Type', 'Status']]
-        for appointment in queryset:
-            data.append([
+        rows = (
+            [
                 appointment.date.strftime('%Y-%m-%d'),
                 appointment.time_slot.start_time.strftime('%H:%M') if appointment.time_slot else 'N/A',
                 appointment.patient.get_full_name(),
                 appointment.doctor.get_full_name(),
                 appointment.get_appointment_type_display(),
                 appointment.get_status_display()
-            ])
-
-        table = Table(data, colWidths=[70, 50, 100, 100, 80, 80])
-        table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E5E7EB')),  # Light gray background
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),  # Changed text color
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        elements.append(table)
+            ]
+            for appointment in iter_queryset(queryset)
+        )
+        pdf.add_table(
+            ['Date', 'Time', 'Patient', 'Doctor', 'Type', 'Status'],
+            rows,
+            col_widths=[70, 50, 100, 100, 80, 80],
+            style=[
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 8),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E5E7EB')),  # Light gray background
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),  # Changed text color
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ]
+        )
 
-        doc.build(elements)
-        return response
+        return pdf.response('appointments_report.pdf')
     
 
 class AppointmentExportSingleView(LoginRequiredMixin, UserPassesTestMixin, View):
@@ -3,6 +3,7 @@ from django.contrib import admin
 from .models.base import Gender, BodyModel, BodyView
 from .models.regions import BodyRegion 
 from .models.coordinates import BodyImage, CoordinateGroup, Coordinate, RegionMeasurement
+from .models.lesions import LesionOutline
 
 # Register the models
 admin.site.register(Gender)
@@ -12,4 +13,5 @@ admin.site.register(BodyRegion)
 admin.site.register(BodyImage)
 admin.site.register(CoordinateGroup)
 admin.site.register(Coordinate)
-admin.site.register(RegionMeasurement)
\ No newline at end of file
+admin.site.register(RegionMeasurement)
+admin.site.register(LesionOutline)
\ No newline at end of file
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BodyMappingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'body_mapping'
+
+    def ready(self):
+        import body_mapping.signals
@@ -0,0 +1,510 @@
+"""
+Region geometry and body-surface scoring.
+
+Region outlines are stored as one Coordinate row per vertex. get_body_model()
+loads the outlines of every image of a BodyModel in one query and packs each
+image's vertices into NumPy arrays, one slice per polygon, so every outline
+area comes out of a single vectorized shoelace pass. get_region_tree() loads
+the whole BodyRegion tree in one query and expands the materialized paths
+into (region, ancestor) pairs, so any per-region value can be rolled up to
+every ancestor with one bincount.
+
+Both are compiled once per process and reused until the models they were
+built from change: saving or deleting a BodyRegion, BodyImage,
+CoordinateGroup or Coordinate bumps that model's generation (see signals.py).
+
+Each compiled image also has a HitIndex, a uniform grid of the outlines'
+bounding boxes, which answers which regions contain a point or overlap a box
+by testing only the few outlines registered in the cells it touches.
+
+score_lesions() turns the LesionOutline rows of an assessment into BSA and
+VASI figures. Each lesion covers the fraction of its region given by its
+area over the region's outline area across all views of the body model, and
+each region counts for its surface_area_percent of the body (or the sum of
+its sub-regions' when it has none). VASI weighs every lesion's share by its
+residual depigmentation.
+"""
+import logging
+import math
+import threading
+from collections import namedtuple
+from functools import cached_property
+
+import numpy as np
+
+from dashboard.cache import get_generations
+
+from .models.coordinates import BodyImage, Coordinate, CoordinateGroup
+from .models.regions import BodyRegion
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY_MODELS = (BodyImage, CoordinateGroup, Coordinate)
+
+RegionScore = namedtuple('RegionScore', ['bsa', 'vasi'])
+Score = namedtuple('Score', ['bsa', 'vasi', 'regions', 'skipped'])
+
+_compiled = {}
+_compile_lock = threading.Lock()
+
+
+def pack_polygons(polygons):
+    """(xs, ys, starts) arrays for a list of [[x, y], ...] polygons"""
+    lengths = np.fromiter((len(polygon) for polygon in polygons), dtype=np.int64, count=len(polygons))
+    starts = np.zeros(len(polygons), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    points = np.array([point for polygon in polygons for point in polygon], dtype=np.float64).reshape(-1, 2)
+    return points[:, 0].copy(), points[:, 1].copy(), starts
+
+
+def polygon_areas(xs, ys, starts):
+    """Area of every packed polygon, by the shoelace formula. Polygons must not be empty"""
+    if not len(starts):
+        return np.zeros(0)
+    # Index of the next vertex, wrapping around at the end of each polygon
+    following = np.arange(1, len(xs) + 1)
+    following[np.append(starts[1:], len(xs)) - 1] = starts
+    cross = xs * ys[following] - xs[following] * ys
+    return np.abs(np.add.reduceat(cross, starts)) / 2
+
+
+def polygon_bounds(xs, ys, starts):
+    """(min_x, min_y, max_x, max_y) of every packed polygon, as an (n, 4) array"""
+    if not len(starts):
+        return np.zeros((0, 4))
+    return np.column_stack([
+        np.minimum.reduceat(xs, starts),
+        np.minimum.reduceat(ys, starts),
+        np.maximum.reduceat(xs, starts),
+        np.maximum.reduceat(ys, starts),
+    ])
+
+
+def parse_resolution(resolution):
+    """(width, height) of a "1920x1080" resolution string, or None"""
+    try:
+        width, height = (float(value) for value in resolution.lower().split('x'))
+    except (AttributeError, ValueError):
+        return None
+    return (width, height) if width > 0 and height > 0 else None
+
+
+class CompiledImage:
+    """The active region outlines of one BodyImage, packed into arrays"""
+
+    def __init__(self, body_image_id, group_ids, region_ids, xs, ys, starts, size=None):
+        self.body_image_id = body_image_id
+        self.group_ids = group_ids
+        self.region_ids = region_ids
+        self.xs, self.ys, self.starts = xs, ys, starts
+        self.ends = np.append(starts[1:], len(xs)).astype(np.int64)
+        self.size = size
+        self.areas = polygon_areas(xs, ys, starts)
+        self.bounds = polygon_bounds(xs, ys, starts)
+
+    def polygon(self, index):
+        """Vertices of one outline as an (n, 2) array"""
+        start, end = self.starts[index], self.ends[index]
+        return np.column_stack([self.xs[start:end], self.ys[start:end]])
+
+    @cached_property
+    def hit_index(self):
+        return HitIndex(self)
+
+
+def segment_meets_box(px, py, qx, qy, min_x, min_y, max_x, max_y):
+    """Whether the segment from (px, py) to (qx, qy) meets a box, by Liang-Barsky clipping"""
+    enter, leave = 0.0, 1.0
+    dx, dy = qx - px, qy - py
+    for direction, distance in ((-dx, px - min_x), (dx, max_x - px), (-dy, py - min_y), (dy, max_y - py)):
+        if direction == 0:
+            if distance < 0:
+                return False
+        elif direction < 0:
+            enter = max(enter, distance / direction)
+        else:
+            leave = min(leave, distance / direction)
+        if enter > leave:
+            return False
+    return True
+
+
+class HitIndex:
+    """
+    Point and box lookups over the outlines of one image.
+
+    The image is divided into a grid of cells a fraction of a typical outline
+    across. Each outline is registered in the cells it touches, either as
+    crossing the cell (an edge passes through it) or as containing all of it.
+    Lookups mostly resolve from the cells alone: only outlines crossing a cell
+    the point or the box border falls in need an exact test, which only looks
+    at the outline's edges within the rows of cells involved.
+    """
+    CELLS_PER_OUTLINE = 16  # Grid cells across a typical outline
+    MAX_CELLS = 1024  # Grid cells across the image at most
+
+    def __init__(self, image):
+        self.image = image
+        self.bounds = [tuple(bounds) for bounds in image.bounds.tolist()]
+        self.region_ids = image.region_ids.tolist()
+        # Smallest outlines first, so the most specific region is listed first
+        self.order = {index: rank for rank, index in enumerate(np.argsort(image.areas, kind='stable').tolist())}
+        self.inside, self.crossing, self.row_edges = {}, {}, {}
+        self.extent = None
+        if not len(image.starts):
+            return
+
+        bounds = image.bounds
+        self.extent = (float(bounds[:, 0].min()), float(bounds[:, 1].min()),
+                       float(bounds[:, 2].max()), float(bounds[:, 3].max()))
+        min_x, min_y, max_x, max_y = self.extent
+        typical = float(np.median(np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])))
+        cell_size = max(typical / self.CELLS_PER_OUTLINE, 1e-9)
+        self.columns = min(max(math.ceil((max_x - min_x) / cell_size), 1), self.MAX_CELLS)
+        self.rows = min(max(math.ceil((max_y - min_y) / cell_size), 1), self.MAX_CELLS)
+        self.cell_width = max((max_x - min_x) / self.columns, 1e-9)
+        self.cell_height = max((max_y - min_y) / self.rows, 1e-9)
+
+        # Every edge as (px, py, qx, qy, low, high, inverse slope), computed for all outlines at once
+        following = np.arange(1, len(image.xs) + 1)
+        following[image.ends - 1] = image.starts
+        qx, qy = image.xs[following], image.ys[following]
+        dy = qy - image.ys
+        edges = list(zip(
+            image.xs.tolist(), image.ys.tolist(), qx.tolist(), qy.tolist(),
+            np.minimum(image.ys, qy).tolist(), np.maximum(image.ys, qy).tolist(),
+            np.divide(qx - image.xs, dy, out=np.zeros(len(dy)), where=dy != 0).tolist()
+        ))
+
+        inside, crossing = {}, {}
+        for index, (start, end) in enumerate(zip(image.starts.tolist(), image.ends.tolist())):
+            for row, row_edges in self.edges_by_row(edges[start:end]).items():
+                self.row_edges[(index, row)] = row_edges
+                crossed, contained = self.scan_row(row, row_edges)
+                for column in crossed:
+                    crossing.setdefault(row * self.columns + column, []).append(index)
+                for column in contained - crossed:
+                    inside.setdefault(row * self.columns + column, []).append(index)
+        self.inside = {cell: tuple(indexes) for cell, indexes in inside.items()}
+        self.crossing = {cell: tuple(indexes) for cell, indexes in crossing.items()}
+
+    def edges_by_row(self, edges):
+        """An outline's edges by the rows of cells they span"""
+        rows = {}
+        for edge in edges:
+            for row in range(self.row(edge[4]), self.row(edge[5]) + 1):
+                rows.setdefault(row, []).append(edge)
+        return {row: tuple(row_edges) for row, row_edges in rows.items()}
+
+    def scan_row(self, row, edges):
+        """Columns of one row of cells that an outline's edges cross, and those whose centre it contains"""
+        top = self.extent[1] + row * self.cell_height
+        bottom = top + self.cell_height
+        crossed = set()
+        for px, py, qx, qy, low, high, inverse_slope in edges:
+            # The part of the edge within the row
+            if py == qy:
+                start_x, end_x = px, qx
+            else:
+                start_x = px + (max(low, top) - py) * inverse_slope
+                end_x = px + (min(high, bottom) - py) * inverse_slope
+            first, last = sorted((self.column(start_x), self.column(end_x)))
+            crossed.update(range(first, last + 1))
+
+        # Runs of the centre line inside the outline, between pairs of edge crossings
+        centre = top + self.cell_height / 2
+        crossings = sorted(
+            px + (centre - py) * inverse_slope
+            for px, py, _, _, low, high, inverse_slope in edges if low <= centre < high
+        )
+        contained = set()
+        for enter, leave in zip(crossings[::2], crossings[1::2]):
+            first = math.ceil((enter - self.extent[0]) / self.cell_width - 0.5)
+            last = math.floor((leave - self.extent[0]) / self.cell_width - 0.5)
+            contained.update(range(max(first, 0), min(last, self.columns - 1) + 1))
+        return crossed, contained
+
+    def column(self, x):
+        return min(max(int((x - self.extent[0]) / self.cell_width), 0), self.columns - 1)
+
+    def row(self, y):
+        return min(max(int((y - self.extent[1]) / self.cell_height), 0), self.rows - 1)
+
+    def contains(self, index, x, y):
+        """Whether an outline contains a point, by ray casting"""
+        inside = False
+        # Only edges spanning the point's row of cells can straddle it
+        for px, py, _, _, low, high, inverse_slope in self.row_edges.get((index, self.row(y)), ()):
+            if low <= y < high and x < px + (y - py) * inverse_slope:
+                inside = not inside
+        return inside
+
+    def overlaps_box(self, index, min_x, min_y, max_x, max_y):
+        """Whether an outline and a box overlap"""
+        for row in range(self.row(min_y), self.row(max_y) + 1):
+            for px, py, qx, qy, _, _, _ in self.row_edges.get((index, row), ()):
+                if segment_meets_box(px, py, qx, qy, min_x, min_y, max_x, max_y):
+                    return True
+        # No edge meets the box, so it lies wholly inside or outside the outline
+        return self.contains(index, min_x, min_y)
+
+    def sorted_regions(self, indexes):
+        region_ids = []
+        for index in sorted(indexes, key=self.order.__getitem__):
+            if self.region_ids[index] not in region_ids:
+                region_ids.append(self.region_ids[index])
+        return region_ids
+
+    def regions_at(self, x, y):
+        """Ids of the regions whose outline contains a point, most specific first"""
+        if self.extent is None:
+            return []
+        min_x, min_y, max_x, max_y = self.extent
+        if not (min_x <= x <= max_x and min_y <= y <= max_y):
+            return []
+        cell = self.row(y) * self.columns + self.column(x)
+        found = list(self.inside.get(cell, ()))
+        for index in self.crossing.get(cell, ()):
+            if self.contains(index, x, y):
+                found.append(index)
+        return self.sorted_regions(found)
+
+    def regions_in_box(self, min_x, min_y, max_x, max_y):
+        """Ids of the regions whose outline overlaps a box, most specific first"""
+        if self.extent is None:
+            return []
+        if min_x > self.extent[2] or max_x < self.extent[0] or min_y > self.extent[3] or max_y < self.extent[1]:
+            return []
+        first_column, last_column = self.column(min_x), self.column(max_x)
+        first_row, last_row = self.row(min_y), self.row(max_y)
+        found, border = set(), set()
+        for row in range(first_row, last_row + 1):
+            inner_row = first_row < row < last_row
+            for cell in range(row * self.columns + first_column, row * self.columns + last_column + 1):
+                contained = self.inside.get(cell)
+                if contained:
+                    found.update(contained)
+                crossing = self.crossing.get(cell)
+                if crossing:
+                    # An edge in a cell the box covers entirely lies in the box
+                    column = cell - row * self.columns
+                    if inner_row and first_column < column < last_column:
+                        found.update(crossing)
+                    else:
+                        border.update(crossing)
+        for index in border - found:
+            if self.overlaps_box(index, min_x, min_y, max_x, max_y):
+                found.add(index)
+        return self.sorted_regions(found)
+
+
+class CompiledBodyModel:
+    """Compiled outlines of every image of a BodyModel, with outline area totals per region"""
+
+    def __init__(self, body_model_id, images):
+        self.body_model_id = body_model_id
+        self.images = images
+        region_ids = np.concatenate([image.region_ids for image in images.values()] or [np.zeros(0, np.int64)])
+        areas = np.concatenate([image.areas for image in images.values()] or [np.zeros(0)])
+        self.region_ids, inverse = np.unique(region_ids, return_inverse=True)
+        self.region_areas = np.bincount(inverse, weights=areas, minlength=len(self.region_ids))
+
+
+class RegionTree:
+    """Every BodyRegion, indexed for vectorized roll-ups along the materialized paths"""
+
+    def __init__(self, rows):
+        """`rows` are (id, path, surface_area_percent, code, name) tuples"""
+        rows = sorted(rows)
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.index = {region_id: i for i, region_id in enumerate(self.ids.tolist())}
+        self.labels = {row[0]: (row[3], row[4]) for row in rows}
+        self.parents = np.full(len(rows), -1, dtype=np.int64)
+
+        # (region, ancestor) pairs, each region counting as its own ancestor
+        descendants, ancestors = [], []
+        for i, (region_id, path) in enumerate(row[:2] for row in rows):
+            lineage = [self.index[int(ancestor_id)] for ancestor_id in path.split('/')[:-1]
+                       if int(ancestor_id) in self.index] or [i]
+            descendants.extend([i] * len(lineage))
+            ancestors.extend(lineage)
+            if len(lineage) > 1:
+                self.parents[i] = lineage[-2]
+        self.descendants = np.array(descendants, dtype=np.int64)
+        self.ancestors = np.array(ancestors, dtype=np.int64)
+
+        # A region without its own share of the body surface counts for the sum of its sub-regions'
+        own = [row[2] for row in rows]
+        depth = np.bincount(self.descendants, minlength=len(rows))
+        self.weights = np.zeros(len(rows))
+        children_total = np.zeros(len(rows))
+        for i in np.argsort(-depth, kind='stable').tolist():
+            self.weights[i] = own[i] if own[i] is not None else children_total[i]
+            if self.parents[i] >= 0:
+                children_total[self.parents[i]] += self.weights[i]
+        self.roots = np.flatnonzero(self.parents < 0)
+
+    def positions(self, region_ids):
+        """Index of each region id in the tree, -1 for unknown regions"""
+        return np.array([self.index.get(int(region_id), -1) for region_id in region_ids], dtype=np.int64)
+
+    def roll_up(self, values):
+        """Total of a per-region value over each region and everything below it"""
+        return np.bincount(self.ancestors, weights=values[self.descendants], minlength=len(self.ids))
+
+
+def _cached(key, depends_on, build):
+    """Process-wide compiled object, rebuilt when a model it depends on has changed"""
+    generations = tuple(get_generations(depends_on))
+    entry = _compiled.get(key)
+    if entry is not None and entry[0] == generations:
+        return entry[1]
+    with _compile_lock:
+        entry = _compiled.get(key)
+        if entry is not None and entry[0] == generations:
+            return entry[1]
+        value = build()
+        _compiled[key] = (generations, value)
+        return value
+
+
+def clear_compiled():
+    """Drop every compiled object held by this process"""
+    _compiled.clear()
+
+
+def compile_body_model(body_model_id):
+    rows = Coordinate.objects.filter(
+        coordinate_group__body_image__body_model_id=body_model_id,
+        coordinate_group__is_active=True
+    ).order_by('coordinate_group__body_image_id', 'coordinate_group_id', 'sequence', 'id').values_list(
+        'coordinate_group__body_image_id', 'coordinate_group_id', 'coordinate_group__body_region_id',
+        'x_coordinate', 'y_coordinate'
+    )
+    data = np.array(list(rows), dtype=np.float64).reshape(-1, 5)
+    image_ids, image_starts = np.unique(data[:, 0], return_index=True)
+    image_ends = np.append(image_starts[1:], len(data))
+
+    sizes = {
+        image_id: parse_resolution(resolution)
+        for image_id, resolution in BodyImage.objects.filter(body_model_id=body_model_id).values_list('id', 'resolution')
+    }
+
+    images = {}
+    for image_id, start, end in zip(image_ids.astype(np.int64).tolist(), image_starts, image_ends):
+        block = data[start:end]
+        group_ids, starts = np.unique(block[:, 1], return_index=True)
+        images[image_id] = CompiledImage(
+            image_id,
+            group_ids.astype(np.int64),
+            block[starts, 2].astype(np.int64),
+            block[:, 3].copy(),
+            block[:, 4].copy(),
+            starts.astype(np.int64),
+            sizes.get(image_id)
+        )
+    # Images without any outline still get an entry
+    for image_id, size in sizes.items():
+        if image_id not in images:
+            images[image_id] = CompiledImage(
+                image_id, np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0), np.zeros(0),
+                np.zeros(0, np.int64), size
+            )
+    return CompiledBodyModel(body_model_id, images)
+
+
+def get_body_model(body_model_id):
+    """Compiled outlines of a body model's images"""
+    return _cached(('body_model', body_model_id), GEOMETRY_MODELS, lambda: compile_body_model(body_model_id))
+
+
+def get_image_models():
+    """Body model id of every BodyImage, by image id"""
+    return _cached(('image_models',), (BodyImage,), lambda: dict(BodyImage.objects.values_list('id', 'body_model_id')))
+
+
+def get_compiled_image(body_image_id):
+    """Compiled outlines of one BodyImage, or None if there is no such image"""
+    body_model_id = get_image_models().get(body_image_id)
+    if body_model_id is None:
+        return None
+    return get_body_model(body_model_id).images.get(body_image_id)
+
+
+def get_region_tree():
+    """The compiled BodyRegion tree"""
+    return _cached(
+        ('region_tree',),
+        (BodyRegion,),
+        lambda: RegionTree(list(BodyRegion.objects.values_list('id', 'path', 'surface_area_percent', 'code', 'name')))
+    )
+
+
+def score_lesions(lesions):
+    """
+    BSA and VASI, in percent of the body surface, of LesionOutline rows (with
+    body_image loaded). Per-region figures include everything below the region.
+    Lesions whose region has no outline on the body model are counted in `skipped`
+    """
+    lesions = [lesion for lesion in lesions if len(lesion.points) >= 3]
+    if not lesions:
+        return Score(0.0, 0.0, {}, 0)
+    tree = get_region_tree()
+
+    xs, ys, starts = pack_polygons([lesion.points for lesion in lesions])
+    lesion_areas = polygon_areas(xs, ys, starts)
+    positions = tree.positions([lesion.body_region_id for lesion in lesions])
+    depigmentation = np.array([lesion.depigmentation for lesion in lesions], dtype=np.float64)
+
+    # Outline area of each lesion's region, including its sub-regions, over every view of the body model
+    outline_areas = np.zeros(len(lesions))
+    model_ids = np.array([lesion.body_image.body_model_id for lesion in lesions], dtype=np.int64)
+    for model_id in np.unique(model_ids).tolist():
+        body_model = get_body_model(model_id)
+        region_areas = np.zeros(len(tree.ids))
+        known = tree.positions(body_model.region_ids)
+        np.add.at(region_areas, known[known >= 0], body_model.region_areas[known >= 0])
+        in_model = model_ids == model_id
+        outline_areas[in_model] = tree.roll_up(region_areas)[positions[in_model]]
+
+    scored = (positions >= 0) & (outline_areas > 0)
+    share = np.zeros(len(lesions))
+    share[scored] = lesion_areas[scored] / outline_areas[scored]
+
+    # Share of each region covered, never more than all of it
+    count = len(tree.ids)
+    covered = np.bincount(positions[scored], weights=share[scored], minlength=count)
+    weighted = np.bincount(positions[scored], weights=(share * depigmentation)[scored], minlength=count)
+    scale = np.divide(np.minimum(covered, 1.0), covered, out=np.zeros(count), where=covered > 0)
+
+    bsa = tree.roll_up(covered * scale * tree.weights)
+    vasi = tree.roll_up(weighted * scale * tree.weights)
+    # Lesions marked on both a region and its sub-regions cannot cover more than the region
+    cap = np.divide(np.minimum(bsa, tree.weights), bsa, out=np.zeros(count), where=bsa > 0)
+    bsa, vasi = bsa * cap, vasi * cap
+
+    regions = {
+        int(tree.ids[i]): RegionScore(float(bsa[i]), float(vasi[i]))
+        for i in np.flatnonzero(bsa > 0).tolist()
+    }
+    total_bsa = min(float(bsa[tree.roots].sum()), 100.0)
+    total_vasi = min(float(vasi[tree.roots].sum()), 100.0)
+    return Score(total_bsa, total_vasi, regions, int(len(lesions) - scored.sum()))
+
+
+def update_assessment_scores(assessment_id):
+    """Recompute an assessment's BSA and VASI from its lesion outlines. Returns the Score"""
+    from patient_management.models import VitiligoAssessment
+    from .models.lesions import LesionOutline
+
+    lesions = list(LesionOutline.objects.filter(assessment_id=assessment_id).select_related('body_image').only(
+        'points', 'depigmentation', 'body_region_id', 'body_image__body_model_id'
+    ))
+    score = score_lesions(lesions)
+    VitiligoAssessment.objects.filter(pk=assessment_id).update(
+        body_surface_area_affected=round(score.bsa, 2),
+        vasi_score=round(score.vasi, 2)
+    )
+    if score.skipped:
+        logger.warning(f"{score.skipped} lesions of assessment {assessment_id} lie in regions without an outline")
+    return score
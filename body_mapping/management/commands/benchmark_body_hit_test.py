@@ -0,0 +1,164 @@
+import math
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from body_mapping.geometry import clear_compiled, compile_body_model
+from body_mapping.models.base import BodyModel, BodyView, Gender
+from body_mapping.models.coordinates import BodyImage, Coordinate, CoordinateGroup
+from body_mapping.models.regions import BodyRegion
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back the rows seeded for the benchmark"""
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time point and box lookups on the body map hit-test index and check '
+        'every answer against a plain Python scan of all outlines. Seeded rows '
+        'are rolled back when the benchmark finishes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--regions',
+            type=int,
+            default=200,
+            help='Number of region outlines on the body image'
+        )
+        parser.add_argument(
+            '--vertices',
+            type=int,
+            default=64,
+            help='Vertices per region outline'
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=2000,
+            help='Number of point and of box lookups'
+        )
+        parser.add_argument(
+            '--max-latency-us',
+            type=float,
+            default=None,
+            help='Fail if the median latency of either lookup exceeds this value'
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            with transaction.atomic():
+                image, outlines = self.seed(kwargs['regions'], kwargs['vertices'])
+                started = time.perf_counter()
+                index = compile_body_model(image.body_model_id).images[image.pk].hit_index
+                build_ms = (time.perf_counter() - started) * 1000
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            pass
+        finally:
+            clear_compiled()
+
+        points = [(random.uniform(0, 1000), random.uniform(0, 2000)) for _ in range(kwargs['queries'])]
+        boxes = [
+            (x, y, x + random.uniform(1, 60), y + random.uniform(1, 60))
+            for x, y in ((random.uniform(0, 1000), random.uniform(0, 2000)) for _ in range(kwargs['queries']))
+        ]
+        point_timings, point_results = self.time_lookups(index.regions_at, points)
+        box_timings, box_results = self.time_lookups(index.regions_in_box, boxes)
+
+        for (x, y), found in zip(points, point_results):
+            expected = {region_id for region_id, outline in outlines if self.contains(outline, x, y)}
+            if set(found) != expected:
+                raise CommandError(f"Point ({x}, {y}) found regions {found}, expected {sorted(expected)}")
+        for box, found in zip(boxes, box_results):
+            expected = {region_id for region_id, outline in outlines if self.overlaps(outline, *box)}
+            if set(found) != expected:
+                raise CommandError(f"Box {box} found regions {found}, expected {sorted(expected)}")
+        hits = sum(1 for found in point_results if found)
+
+        point_us, box_us = statistics.median(point_timings), statistics.median(box_timings)
+        self.stdout.write(
+            f"Index built in {build_ms:.2f} ms over {len(outlines)} outlines\n"
+            f"Point lookups: median {point_us:.1f} us, max {max(point_timings):.1f} us ({hits} hits)\n"
+            f"Box lookups: median {box_us:.1f} us, max {max(box_timings):.1f} us"
+        )
+        limit = kwargs['max_latency_us']
+        if limit is not None and max(point_us, box_us) > limit:
+            raise CommandError(f"Median lookup latency exceeded {limit} us")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"All {2 * kwargs['queries']} lookups matched a scan of every outline"
+        ))
+
+    def time_lookups(self, lookup, queries):
+        timings, results = [], []
+        for query in queries:
+            started = time.perf_counter()
+            results.append(lookup(*query))
+            timings.append((time.perf_counter() - started) * 1e6)
+        return timings, results
+
+    def seed(self, region_count, vertex_count):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        gender = Gender.objects.create(name=f'Benchmark {suffix}', code=suffix[-10:])
+        body_model = BodyModel.objects.create(name=f'Benchmark Model {suffix}', gender=gender)
+        view = BodyView.objects.create(name=f'Benchmark View {suffix}', code=suffix[-10:])
+        image = BodyImage.objects.create(body_model=body_model, view=view, image='benchmark.jpg', resolution='1000x2000')
+
+        # Star-shaped outlines, so ray casting meets concave edges
+        outlines = []
+        coordinates = []
+        for i in range(region_count):
+            region = BodyRegion.objects.create(name=f'Benchmark Region {i}', code=f'HIT_{i}_{suffix}')
+            group = CoordinateGroup.objects.create(body_image=image, body_region=region, name=region.name)
+            center_x, center_y = random.uniform(0, 1000), random.uniform(0, 2000)
+            radius = random.uniform(20, 80)
+            outline = [
+                (center_x + radius * (1 - 0.2 * (j % 2)) * math.cos(2 * math.pi * j / vertex_count),
+                 center_y + radius * (1 - 0.2 * (j % 2)) * math.sin(2 * math.pi * j / vertex_count))
+                for j in range(vertex_count)
+            ]
+            outlines.append((region.pk, outline))
+            coordinates.extend(
+                Coordinate(coordinate_group=group, label=str(j), x_coordinate=x, y_coordinate=y, sequence=j)
+                for j, (x, y) in enumerate(outline)
+            )
+        Coordinate.objects.bulk_create(coordinates, batch_size=1000)
+        return image, outlines
+
+    def contains(self, outline, x, y):
+        xs, ys = [point[0] for point in outline], [point[1] for point in outline]
+        if not (min(xs) <= x <= max(xs) and min(ys) <= y <= max(ys)):
+            return False
+        inside = False
+        for (x1, y1), (x2, y2) in zip(outline, outline[1:] + outline[:1]):
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+        return inside
+
+    def overlaps(self, outline, min_x, min_y, max_x, max_y):
+        xs, ys = [point[0] for point in outline], [point[1] for point in outline]
+        if min(xs) > max_x or max(xs) < min_x or min(ys) > max_y or max(ys) < min_y:
+            return False
+        if any(min_x <= x <= max_x and min_y <= y <= max_y for x, y in outline):
+            return True
+        if self.contains(outline, min_x, min_y):
+            return True
+        corners = [(min_x, min_y), (max_x, min_y), (max_x, max_y), (min_x, max_y)]
+        box_edges = list(zip(corners, corners[1:] + corners[:1]))
+        return any(
+            self.segments_cross(start, end, box_start, box_end)
+            for start, end in zip(outline, outline[1:] + outline[:1])
+            for box_start, box_end in box_edges
+        )
+
+    def segments_cross(self, a, b, c, d):
+        def side(p, q, r):
+            return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+        return (side(a, b, c) > 0) != (side(a, b, d) > 0) and (side(c, d, a) > 0) != (side(c, d, b) > 0)
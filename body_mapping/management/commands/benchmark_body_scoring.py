@@ -0,0 +1,209 @@
+import math
+import random
+import statistics
+import time
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from body_mapping.geometry import clear_compiled, score_lesions
+from body_mapping.models.base import BodyModel, BodyView, Gender
+from body_mapping.models.coordinates import BodyImage, Coordinate, CoordinateGroup
+from body_mapping.models.lesions import LesionOutline
+from body_mapping.models.regions import BodyRegion
+from patient_management.models import Patient, VitiligoAssessment
+
+User = get_user_model()
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back the rows seeded for the benchmark"""
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Score a full-body assessment against a seeded body model and check the '
+        'result against a plain Python computation. Seeded rows are rolled back '
+        'when the benchmark finishes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--regions',
+            type=int,
+            default=120,
+            help='Number of leaf regions on the body model'
+        )
+        parser.add_argument(
+            '--views',
+            type=int,
+            default=4,
+            help='Number of body images (views) the regions are outlined on'
+        )
+        parser.add_argument(
+            '--vertices',
+            type=int,
+            default=64,
+            help='Vertices per region outline'
+        )
+        parser.add_argument(
+            '--lesions',
+            type=int,
+            default=300,
+            help='Number of lesion outlines on the assessment'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=20,
+            help='Number of timed runs with compiled geometry'
+        )
+        parser.add_argument(
+            '--max-latency-ms',
+            type=float,
+            default=None,
+            help='Fail if the median latency with compiled geometry exceeds this value'
+        )
+
+    def handle(self, *args, **kwargs):
+        results = None
+        try:
+            with transaction.atomic():
+                lesions, expected = self.seed(kwargs)
+                results = self.measure(lesions, expected, kwargs['runs'])
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            pass
+        finally:
+            # Seeded ids are reused once rolled back
+            clear_compiled()
+
+        cold_ms, median_ms, max_ms, query_count, score = results
+        self.stdout.write(
+            f"BSA {score.bsa:.3f}%  VASI {score.vasi:.3f}  across {len(score.regions)} regions\n"
+            f"First run (compiling geometry): {cold_ms:.2f} ms\n"
+            f"Compiled runs: median {median_ms:.2f} ms, max {max_ms:.2f} ms, {query_count} queries"
+        )
+        if kwargs['max_latency_ms'] is not None and median_ms > kwargs['max_latency_ms']:
+            raise CommandError(f"Median latency exceeded {kwargs['max_latency_ms']} ms")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {kwargs['lesions']} lesions over {kwargs['regions']} regions in {median_ms:.2f} ms"
+        ))
+
+    def seed(self, options):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        leaf_count, view_count, vertex_count = options['regions'], options['views'], options['vertices']
+
+        gender = Gender.objects.create(name=f'Benchmark {suffix}', code=suffix[-10:])
+        body_model = BodyModel.objects.create(name=f'Benchmark Model {suffix}', gender=gender)
+        images = []
+        for i in range(view_count):
+            view = BodyView.objects.create(name=f'Benchmark View {i} {suffix}', code=f'{i}{suffix[-9:]}')
+            images.append(BodyImage.objects.create(body_model=body_model, view=view, image=f'benchmark_{i}.jpg'))
+
+        # Three levels: body, limbs and trunk, then leaves sharing the body surface equally
+        body = BodyRegion.objects.create(name='Benchmark Body', code=f'BODY_{suffix}')
+        groups = [
+            BodyRegion.objects.create(name=f'Benchmark Group {i}', code=f'GROUP_{i}_{suffix}', parent_region=body)
+            for i in range(6)
+        ]
+        leaves = [
+            BodyRegion.objects.create(
+                name=f'Benchmark Leaf {i}',
+                code=f'LEAF_{i}_{suffix}',
+                parent_region=groups[i % len(groups)],
+                surface_area_percent=100 / leaf_count
+            )
+            for i in range(leaf_count)
+        ]
+
+        # Each leaf is a circle on every view, radius varying by view
+        outlines = {}
+        coordinate_groups = CoordinateGroup.objects.bulk_create([
+            CoordinateGroup(body_image=image, body_region=leaf, name=leaf.name)
+            for image in images for leaf in leaves
+        ])
+        coordinates = []
+        for group in coordinate_groups:
+            center_x, center_y = random.uniform(0, 1000), random.uniform(0, 2000)
+            radius = random.uniform(10, 40)
+            points = self.circle(center_x, center_y, radius, vertex_count)
+            outlines[(group.body_image_id, group.body_region_id)] = points
+            coordinates.extend(
+                Coordinate(coordinate_group=group, label=str(sequence), x_coordinate=x, y_coordinate=y, sequence=sequence)
+                for sequence, (x, y) in enumerate(points)
+            )
+        Coordinate.objects.bulk_create(coordinates, batch_size=1000)
+
+        user = User.objects.create_user(email=f'benchmark.bsa.{suffix}@example.com')
+        patient = Patient.objects.create(
+            user=user, date_of_birth=date(1990, 1, 1), gender='F', address='Benchmark',
+            phone_number='0', emergency_contact_name='Benchmark', emergency_contact_number='0'
+        )
+        assessment = VitiligoAssessment.objects.create(
+            patient=patient, assessment_date=timezone.localdate(), body_surface_area_affected=0,
+            treatment_response='Benchmark'
+        )
+
+        # Small lesions, so no region is fully covered and nothing is capped
+        lesions = []
+        for _ in range(options['lesions']):
+            image, leaf = random.choice(images), random.choice(leaves)
+            x, y = outlines[(image.pk, leaf.pk)][0]
+            lesions.append(LesionOutline(
+                assessment=assessment,
+                body_image=image,
+                body_region=leaf,
+                points=[list(point) for point in self.circle(x, y, random.uniform(0.5, 2), 12)],
+                depigmentation=random.choice(LesionOutline.DEPIGMENTATION_CHOICES)[0]
+            ))
+        LesionOutline.objects.bulk_create(lesions)
+
+        # The same scores, computed one lesion at a time
+        expected_bsa = expected_vasi = 0
+        for lesion in lesions:
+            outline_area = sum(self.area(outlines[(image.pk, lesion.body_region_id)]) for image in images)
+            share = self.area(lesion.points) / outline_area * (100 / leaf_count)
+            expected_bsa += share
+            expected_vasi += share * lesion.depigmentation
+        return list(LesionOutline.objects.filter(assessment=assessment).select_related('body_image')), (expected_bsa, expected_vasi)
+
+    def circle(self, x, y, radius, count):
+        return [
+            (x + radius * math.cos(2 * math.pi * i / count), y + radius * math.sin(2 * math.pi * i / count))
+            for i in range(count)
+        ]
+
+    def area(self, points):
+        total = 0
+        for (x1, y1), (x2, y2) in zip(points, points[1:] + points[:1]):
+            total += x1 * y2 - x2 * y1
+        return abs(total) / 2
+
+    def measure(self, lesions, expected, runs):
+        clear_compiled()
+        started = time.perf_counter()
+        score = score_lesions(lesions)
+        cold_ms = (time.perf_counter() - started) * 1000
+
+        timings = []
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                score = score_lesions(lesions)
+                timings.append((time.perf_counter() - started) * 1000)
+
+        expected_bsa, expected_vasi = expected
+        if not math.isclose(score.bsa, expected_bsa, rel_tol=1e-9) or not math.isclose(score.vasi, expected_vasi, rel_tol=1e-9):
+            raise CommandError(
+                f"Scored BSA {score.bsa} and VASI {score.vasi}, expected {expected_bsa} and {expected_vasi}"
+            )
+        if score.skipped:
+            raise CommandError(f"{score.skipped} lesions were not scored")
+        return cold_ms, statistics.median(timings), max(timings), len(queries), score
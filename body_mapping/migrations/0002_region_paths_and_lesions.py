@@ -0,0 +1,64 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:14
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    BodyRegion = apps.get_model('body_mapping', 'BodyRegion')
+    parents = dict(BodyRegion.objects.values_list('id', 'parent_region_id'))
+    paths = {}
+
+    def path_of(region_id, seen=()):
+        if region_id not in paths:
+            parent_id = parents.get(region_id)
+            if parent_id is None or parent_id in seen:
+                paths[region_id] = f"{region_id}/"
+            else:
+                paths[region_id] = f"{path_of(parent_id, seen + (region_id,))}{region_id}/"
+        return paths[region_id]
+
+    regions = list(BodyRegion.objects.all())
+    for region in regions:
+        region.path = path_of(region.id)
+    BodyRegion.objects.bulk_update(regions, ['path'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('body_mapping', '0001_initial'),
+        ('patient_management', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bodyregion',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='bodyregion',
+            name='surface_area_percent',
+            field=models.FloatField(blank=True, help_text='Share of the total body surface covered by this region. Leave empty to use the sum of its sub-regions.', null=True, validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)]),
+        ),
+        migrations.CreateModel(
+            name='LesionOutline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.JSONField(help_text="Outline as a list of [x, y] points in the body image's coordinates")),
+                ('depigmentation', models.FloatField(choices=[(1.0, '100% - No pigment present'), (0.9, '90% - Specks of pigment present'), (0.75, '75% - Depigmented area exceeds pigmented area'), (0.5, '50% - Depigmented and pigmented areas are equal'), (0.25, '25% - Pigmented area exceeds depigmented area'), (0.1, '10% - Only specks of depigmentation present')], default=1.0)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assessment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesion_outlines', to='patient_management.vitiligoassessment')),
+                ('body_image', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lesion_outlines', to='body_mapping.bodyimage')),
+                ('body_region', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lesion_outlines', to='body_mapping.bodyregion')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# body_mapping/models/lesions.py
+from django.core.exceptions import ValidationError
+from django.db import models
+from .coordinates import BodyImage
+from .regions import BodyRegion
+
+class LesionOutline(models.Model):
+    # Residual depigmentation levels used by VASI
+    DEPIGMENTATION_CHOICES = [
+        (1.0, '100% - No pigment present'),
+        (0.9, '90% - Specks of pigment present'),
+        (0.75, '75% - Depigmented area exceeds pigmented area'),
+        (0.5, '50% - Depigmented and pigmented areas are equal'),
+        (0.25, '25% - Pigmented area exceeds depigmented area'),
+        (0.1, '10% - Only specks of depigmentation present'),
+    ]
+
+    assessment = models.ForeignKey(
+        'patient_management.VitiligoAssessment',
+        on_delete=models.CASCADE,
+        related_name='lesion_outlines'
+    )
+    body_image = models.ForeignKey(BodyImage, on_delete=models.PROTECT, related_name='lesion_outlines')
+    body_region = models.ForeignKey(BodyRegion, on_delete=models.PROTECT, related_name='lesion_outlines')
+    points = models.JSONField(help_text="Outline as a list of [x, y] points in the body image's coordinates")
+    depigmentation = models.FloatField(choices=DEPIGMENTATION_CHOICES, default=1.0)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'body_mapping'
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"Lesion on {self.body_region} ({self.assessment_id})"
+
+    def clean(self):
+        super().clean()
+        points = self.points
+        if not isinstance(points, list) or len(points) < 3 or not all(
+                isinstance(point, (list, tuple)) and len(point) == 2
+                and all(isinstance(value, (int, float)) for value in point)
+                for point in points):
+            raise ValidationError({'points': "An outline needs at least three [x, y] points"})
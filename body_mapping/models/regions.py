@@ -1,5 +1,9 @@
 # body_mapping/models/regions.py
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
 from .base import BodyView
 
 class BodyRegion(models.Model):
@@ -13,6 +17,15 @@ class BodyRegion(models.Model):
         on_delete=models.SET_NULL,
         related_name='sub_regions'
     )
+    # Ids from the root down to this region, e.g. "1/4/9/", kept up to date by save()
+    path = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    surface_area_percent = models.FloatField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        help_text="Share of the total body surface covered by this region. "
+                  "Leave empty to use the sum of its sub-regions."
+    )
     applicable_views = models.ManyToManyField(BodyView)
     is_active = models.BooleanField(default=True)
     metadata = models.JSONField(default=dict, blank=True)
@@ -23,10 +36,46 @@ class BodyRegion(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.code})"
+
+    def clean(self):
+        super().clean()
+        if self.pk and str(self.pk) in self.get_parent_path().split('/'):
+            raise ValidationError({'parent_region': "A region cannot be placed under itself or one of its sub-regions"})
+
+    def get_parent_path(self):
+        if not self.parent_region_id:
+            return ''
+        return BodyRegion.objects.filter(pk=self.parent_region_id).values_list('path', flat=True).first() or ''
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            parent_path = self.get_parent_path()
+            if self.pk and str(self.pk) in parent_path.split('/'):
+                raise ValidationError("A region cannot be placed under itself or one of its sub-regions")
+            # The stored path, which may be newer than this instance's if an ancestor moved
+            old_path = ''
+            if self.pk:
+                old_path = BodyRegion.objects.filter(pk=self.pk).values_list('path', flat=True).first() or ''
+            self.path = old_path
+            super().save(*args, **kwargs)
+            path = f"{parent_path}{self.pk}/"
+            if path != old_path:
+                self.move_subtree(old_path, path)
+            self.path = path
+
+    def move_subtree(self, old_path, new_path):
+        """Rewrite the path of this region and of every region below it"""
+        if not old_path:
+            BodyRegion.objects.filter(pk=self.pk).update(path=new_path)
+            return
+        BodyRegion.objects.filter(path__startswith=old_path).update(
+            path=Concat(Value(new_path), Substr('path', len(old_path) + 1))
+        )
+
+    def get_ancestor_ids(self):
+        """Ids of the regions above this one, root first"""
+        return [int(region_id) for region_id in self.path.split('/')[:-2]]
     
     def get_all_sub_regions(self):
         """Get all sub-regions recursively"""
-        regions = list(self.sub_regions.all())
-        for sub_region in self.sub_regions.all():
-            regions.extend(sub_region.get_all_sub_regions())
-        return regions
\ No newline at end of file
+        return list(BodyRegion.objects.filter(path__startswith=self.path).exclude(pk=self.pk).order_by('path'))
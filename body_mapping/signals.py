@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.functions import Substr
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from dashboard.cache import bump_generation
+from .geometry import update_assessment_scores
+from .models.coordinates import BodyImage, Coordinate, CoordinateGroup
+from .models.lesions import LesionOutline
+from .models.regions import BodyRegion
+
+@receiver(post_delete, sender=BodyRegion)
+def promote_sub_regions(sender, instance, **kwargs):
+    """Make the sub-regions of a deleted region roots, as its parent_region is cleared"""
+    if instance.path:
+        BodyRegion.objects.filter(path__startswith=instance.path).update(
+            path=Substr('path', len(instance.path) + 1)
+        )
+
+@receiver([post_save, post_delete], sender=BodyRegion)
+@receiver([post_save, post_delete], sender=BodyImage)
+@receiver([post_save, post_delete], sender=CoordinateGroup)
+@receiver([post_save, post_delete], sender=Coordinate)
+def invalidate_compiled_geometry(sender, **kwargs):
+    """Retire compiled outlines and region trees once the change is committed"""
+    transaction.on_commit(lambda: bump_generation(sender))
+
+@receiver([post_save, post_delete], sender=LesionOutline)
+def rescore_assessment(sender, instance, raw=False, **kwargs):
+    """Recompute the assessment's BSA and VASI from its lesion outlines"""
+    if raw:
+        return
+    assessment_id = instance.assessment_id
+    transaction.on_commit(lambda: update_assessment_scores(assessment_id))
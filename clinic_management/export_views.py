@@ -15,6 +15,8 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 
 from access_control.permissions import PermissionManager
+from reporting_and_analytics.export_jobs import AsyncExportMixin
+from reporting_and_analytics.exports import PdfExport, XlsxExport, iter_queryset
 from .models import ClinicVisit, VisitChecklist, VisitStatus, ClinicChecklist
 
 logger = logging.getLogger(__name__)
@@ -188,7 +190,9 @@ class ClinicDashboardExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('GRID', (0, 0), (-1, -1), 1, colors.black)
         ])
 
-class VisitDataExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class VisitDataExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'clinic_management'
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'clinic_management')
 
@@ -200,8 +204,6 @@ class VisitDataExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             
             visits = ClinicVisit.objects.select_related(
                 'patient', 'current_status', 'created_by'
-            ).prefetch_related(
-                'checklists', 'status_logs'
             ).order_by('-visit_date')
 
             if date_from:
@@ -219,25 +221,16 @@ class VisitDataExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             return HttpResponse('Export failed', status=500)
 
     def export_excel(self, visits):
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
+        export = XlsxExport()
 
         # Add formats
-        header_format = workbook.add_format({
+        header_format = export.add_format({
             'bold': True,
             'fg_color': '#4B5563',
             'font_color': 'white',
             'border': 1
         })
-        cell_format = workbook.add_format({'border': 1})
-        date_format = workbook.add_format({
-            'border': 1,
-            'num_format': 'yyyy-mm-dd'
-        })
 
-        # Create Visits sheet
-        sheet = workbook.add_worksheet('Visit Data')
-        
         headers = [
             'Visit Number',
             'Patient Name',
@@ -252,98 +245,90 @@ class VisitDataExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             'Created By',
             'Notes'
         ]
-
-        # Set column widths
         widths = [15, 30, 15, 15, 20, 15, 20, 20, 15, 15, 25, 40]
-        for i, width in enumerate(widths):
-            sheet.set_column(i, i, width)
-
-        # Write headers
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
 
-        # Write data
-        for row, visit in enumerate(visits, start=1):
-            completion_time = visit.completion_time.strftime('%Y-%m-%d %H:%M') if visit.completion_time else 'N/A'
-            duration = (visit.completion_time - visit.registration_time).total_seconds()/3600 if visit.completion_time else 'N/A'
-            checklists_completed = visit.checklists.filter(completed_at__isnull=False).count()
-
-            data = [
-                visit.visit_number,
-                visit.patient.get_full_name(),
-                visit.patient.id,
-                visit.visit_date,
-                visit.current_status.display_name,
-                dict(visit.PRIORITY_CHOICES)[visit.priority],
-                visit.registration_time.strftime('%Y-%m-%d %H:%M'),
-                completion_time,
-                f"{duration:.2f} hrs" if isinstance(duration, float) else duration,
-                checklists_completed,
-                visit.created_by.get_full_name() if visit.created_by else 'System',
-                visit.notes or ''
-            ]
-
-            for col, value in enumerate(data):
-                if col == 3:  # Visit Date column
-                    sheet.write(row, col, value, date_format)
-                else:
-                    sheet.write(row, col, value, cell_format)
-
-        workbook.close()
-        output.seek(0)
+        visits = visits.annotate(
+            checklists_completed=Count('checklists', filter=Q(checklists__completed_at__isnull=False))
+        )
 
-        filename = f'visit_data_{timezone.now().strftime("%Y%m%d_%H%M")}.xlsx'
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        def rows():
+            for visit in iter_queryset(visits):
+                completion_time = visit.completion_time.strftime('%Y-%m-%d %H:%M') if visit.completion_time else 'N/A'
+                duration = (visit.completion_time - visit.registration_time).total_seconds()/3600 if visit.completion_time else 'N/A'
+
+                yield [
+                    visit.visit_number,
+                    visit.patient.get_full_name(),
+                    visit.patient.id,
+                    visit.visit_date,
+                    visit.current_status.display_name,
+                    dict(visit.PRIORITY_CHOICES)[visit.priority],
+                    visit.registration_time.strftime('%Y-%m-%d %H:%M'),
+                    completion_time,
+                    f"{duration:.2f} hrs" if isinstance(duration, float) else duration,
+                    visit.checklists_completed,
+                    visit.created_by.get_full_name() if visit.created_by else 'System',
+                    visit.notes or ''
+                ]
+
+        # Visit Date column uses the date format
+        export.write_sheet(
+            'Visit Data',
+            headers,
+            rows(),
+            widths=widths,
+            column_formats={3: export.date_format},
+            header_format=header_format
         )
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-        return response
 
-    def export_pdf(self, visits):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename=visit_data_{timezone.now().strftime("%Y%m%d_%H%M")}.pdf'
+        return export.response(f'visit_data_{timezone.now().strftime("%Y%m%d_%H%M")}.xlsx')
 
-        doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-        elements = []
-        styles = getSampleStyleSheet()
+    def export_pdf(self, visits):
+        pdf = PdfExport(pagesize=landscape(letter))
+        styles = pdf.styles
 
         # Title
-        elements.append(Paragraph('Visit Data Report', styles['Heading1']))
-        elements.append(Paragraph(f'Generated on: {timezone.now().strftime("%Y-%m-%d %H:%M")}', styles['Normal']))
-        elements.append(Spacer(1, 20))
+        pdf.add(
+            Paragraph('Visit Data Report', styles['Heading1']),
+            Paragraph(f'Generated on: {timezone.now().strftime("%Y-%m-%d %H:%M")}', styles['Normal']),
+            Spacer(1, 20)
+        )
 
         # Summary Statistics
-        elements.append(Paragraph('Summary Statistics', styles['Heading2']))
+        counts = visits.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(current_status__is_terminal_state=False)),
+            completed=Count('id', filter=Q(current_status__is_terminal_state=True)),
+        )
         summary_data = [
-            ['Total Visits', str(visits.count())],
-            ['Active Visits', str(visits.filter(current_status__is_terminal_state=False).count())],
-            ['Completed Visits', str(visits.filter(current_status__is_terminal_state=True).count())]
+            ['Total Visits', str(counts['total'])],
+            ['Active Visits', str(counts['active'])],
+            ['Completed Visits', str(counts['completed'])]
         ]
         summary_table = Table(summary_data, colWidths=[200, 100])
         summary_table.setStyle(self.get_table_style())
-        elements.append(summary_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(Paragraph('Summary Statistics', styles['Heading2']), summary_table, Spacer(1, 20))
 
         # Visits Table
-        elements.append(Paragraph('Visit Details', styles['Heading2']))
-        visit_data = [['Visit Number', 'Patient', 'Date', 'Status', 'Priority']]
-        
-        for visit in visits[:50]:  # Limit to 50 most recent visits for PDF
-            visit_data.append([
+        pdf.add(Paragraph('Visit Details', styles['Heading2']))
+        rows = (
+            [
                 visit.visit_number,
                 visit.patient.get_full_name(),
                 visit.visit_date.strftime('%Y-%m-%d'),
                 visit.current_status.display_name,
                 dict(visit.PRIORITY_CHOICES)[visit.priority]
-            ])
-
-        visit_table = Table(visit_data, colWidths=[100, 150, 100, 120, 80])
-        visit_table.setStyle(self.get_table_style())
-        elements.append(visit_table)
+            ]
+            for visit in iter_queryset(visits)
+        )
+        pdf.add_table(
+            ['Visit Number', 'Patient', 'Date', 'Status', 'Priority'],
+            rows,
+            col_widths=[100, 150, 100, 120, 80],
+            style=self.get_table_style()
+        )
 
-        doc.build(elements)
-        return response
+        return pdf.response(f'visit_data_{timezone.now().strftime("%Y%m%d_%H%M")}.pdf')
 
     def get_table_style(self):
         """Define common table style for PDF exports"""
@@ -9,6 +9,7 @@ from django.db import models
 from django.utils import timezone
 
 # Local application imports
+from settings.sequences import document_number_value, next_document_number
 
 # Initialize commonly used variables
 User = get_user_model()
@@ -100,24 +101,27 @@ class ClinicVisit(models.Model):
     def __str__(self):
         return f"Visit {self.visit_number} - {self.patient.get_full_name()}"
 
+    @staticmethod
+    def _last_visit_number(date_str):
+        """Counter of the last visit numbered on a day before the sequence took over"""
+        numbers = ClinicVisit.objects.filter(
+            visit_number__startswith=f'VN-{date_str}-'
+        ).values_list('visit_number', flat=True)
+        return max((document_number_value(number) for number in numbers), default=0)
+
     def save(self, *args, **kwargs):
+        exclude = None
         if not self.visit_number:
             # Generate visit number format: VN-YYYYMMDD-XXXX
-            date_str = timezone.now().strftime('%Y%m%d')
-            last_visit = ClinicVisit.objects.filter(
-                visit_number__startswith=f'VN-{date_str}'
-            ).order_by('visit_number').last()
-            
-            if last_visit:
-                last_num = int(last_visit.visit_number.split('-')[-1])
-                new_num = str(last_num + 1).zfill(4)
-            else:
-                new_num = '0001'
-            
-            self.visit_number = f'VN-{date_str}-{new_num}'
-        
+            date = timezone.now()
+            self.visit_number = next_document_number(
+                'VN', date, initial=lambda: self._last_visit_number(date.strftime('%Y%m%d'))
+            )
+            # The sequence guarantees the number is unique
+            exclude = ['visit_number']
+
         try:
-            self.full_clean()
+            self.full_clean(exclude=exclude)
             super().save(*args, **kwargs)
         except Exception as e:
             logger.error(f"Error saving ClinicVisit: {str(e)}")
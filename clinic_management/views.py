@@ -31,6 +31,7 @@ from clinic_management.models import (
     VisitStatus,
     VisitStatusLog,
 )
+from dashboard.timeseries import dense_series
 from error_handling.views import handler403, handler500
 from .utils import get_template_path
 from .forms import NewVisitForm, NewChecklistForm, NewVisitStatusForm, EditVisitStatusForm
@@ -913,19 +914,27 @@ class VisitAnalyticsView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         try:
             # Date range filters
+            days = max(int(self.request.GET.get('days', 30)), 1)  # Default to last 30 days
             end_date = timezone.now().date()
-            start_date = end_date - timedelta(days=30)  # Default to last 30 days
+            start_date = end_date - timedelta(days=days)
             
             # Get visits within date range
             visits = ClinicVisit.objects.filter(
                 visit_date__range=[start_date, end_date]
             )
 
-            # Daily visit counts
-            daily_visits = visits.values('visit_date').annotate(
+            # Daily visit counts, including days without visits
+            daily_counts = visits.values('visit_date').annotate(
                 total=Count('id'),
                 completed=Count('id', filter=Q(current_status__name='COMPLETED'))
-            ).order_by('visit_date')
+            ).order_by()
+            days_in_range, daily_columns = dense_series(
+                daily_counts, start_date, end_date, 'day', key='visit_date', fields=['total', 'completed']
+            )
+            daily_visits = [
+                {'visit_date': day, 'total': total, 'completed': completed}
+                for day, total, completed in zip(days_in_range, daily_columns['total'], daily_columns['completed'])
+            ]
 
             # Status distribution
             status_distribution = visits.values(
@@ -958,10 +967,10 @@ class VisitAnalyticsView(LoginRequiredMixin, TemplateView):
                 'summary': {
                     'total_visits': visits.count(),
                     'completed_visits': visits.filter(current_status__name='COMPLETED').count(),
-                    'avg_daily_visits': round(visits.count() / 30, 1)  # Round for display
+                    'avg_daily_visits': round(visits.count() / days, 1)  # Round for display
                 },
                 'charts_data': json.dumps({          # Properly serialize the data
-                    'daily_visits': list(daily_visits),
+                    'daily_visits': daily_visits,
                     'status_distribution': list(status_distribution),
                     'completion_times': list(completion_times),
                     'hourly_distribution': list(hourly_distribution)
@@ -2,7 +2,7 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db import transaction
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.utils import timezone
@@ -22,11 +22,15 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 # Local application imports
 from .models import Consultation, Prescription
 from access_control.permissions import PermissionManager
+from reporting_and_analytics.export_jobs import AsyncExportMixin
+from reporting_and_analytics.exports import PdfExport, csv_response, iter_queryset
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
-class ConsultationExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class ConsultationExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'consultation_management'
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'consultation_management')
 
@@ -63,11 +67,7 @@ class ConsultationExportView(LoginRequiredMixin, UserPassesTestMixin, View):
 
     def export_csv(self, queryset):
         try:
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="consultations_export.csv"'
-            
-            writer = csv.writer(response)
-            writer.writerow([
+            header = [
                 'Consultation ID',
                 'Patient Name',
                 'Patient ID',
@@ -82,27 +82,29 @@ class ConsultationExportView(LoginRequiredMixin, UserPassesTestMixin, View):
                 'Diagnosis',
                 'Prescription Count',
                 'Follow-up Date'
-            ])
-
-            for consultation in queryset:
-                writer.writerow([
-                    consultation.id,
-                    consultation.patient.get_full_name(),
-                    consultation.patient.id,
-                    f"Dr. {consultation.doctor.get_full_name()}",
-                    consultation.get_consultation_type_display(),
-                    consultation.get_status_display(),
-                    consultation.scheduled_datetime.strftime('%Y-%m-%d'),
-                    consultation.actual_start_time.strftime('%H:%M') if consultation.actual_start_time else 'N/A',
-                    consultation.actual_end_time.strftime('%H:%M') if consultation.actual_end_time else 'N/A',
-                    consultation.duration_minutes,
-                    consultation.chief_complaint,
-                    consultation.diagnosis,
-                    consultation.prescriptions.count(),
-                    consultation.follow_up_date.strftime('%Y-%m-%d') if consultation.follow_up_date else 'N/A'
-                ])
-
-            return response
+            ]
+            queryset = queryset.annotate(prescription_count=Count('prescriptions'))
+
+            def rows():
+                for consultation in iter_queryset(queryset):
+                    yield [
+                        consultation.id,
+                        consultation.patient.get_full_name(),
+                        consultation.patient.id,
+                        f"Dr. {consultation.doctor.get_full_name()}",
+                        consultation.get_consultation_type_display(),
+                        consultation.get_status_display(),
+                        consultation.scheduled_datetime.strftime('%Y-%m-%d'),
+                        consultation.actual_start_time.strftime('%H:%M') if consultation.actual_start_time else 'N/A',
+                        consultation.actual_end_time.strftime('%H:%M') if consultation.actual_end_time else 'N/A',
+                        consultation.duration_minutes,
+                        consultation.chief_complaint,
+                        consultation.diagnosis,
+                        consultation.prescription_count,
+                        consultation.follow_up_date.strftime('%Y-%m-%d') if consultation.follow_up_date else 'N/A'
+                    ]
+
+            return csv_response('consultations_export.csv', header, rows())
             
         except Exception as e:
             logger.error(f"Error exporting CSV: {str(e)}")
@@ -110,16 +112,11 @@ class ConsultationExportView(LoginRequiredMixin, UserPassesTestMixin, View):
 
     def export_pdf(self, queryset):
         try:
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = 'attachment; filename="consultations_export.pdf"'
-
-            doc = SimpleDocTemplate(response, pagesize=letter)
-            elements = []
-            styles = getSampleStyleSheet()
+            pdf = PdfExport(pagesize=letter)
+            styles = pdf.styles
 
             # Title
-            elements.append(Paragraph('Consultation Report', styles['Heading1']))
-            elements.append(Spacer(1, 20))
+            pdf.add(Paragraph('Consultation Report', styles['Heading1']), Spacer(1, 20))
 
             # Date Range Info
             date_range = self.request.GET.get('date_range')
@@ -127,16 +124,24 @@ class ConsultationExportView(LoginRequiredMixin, UserPassesTestMixin, View):
                 date_info = f"Custom Range: {self.request.GET.get('start_date')} to {self.request.GET.get('end_date')}"
             else:
                 date_info = f"Last {date_range} days"
-            elements.append(Paragraph(f"Period: {date_info}", styles['Normal']))
-            elements.append(Paragraph(f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']))
-            elements.append(Spacer(1, 20))
+            pdf.add(
+                Paragraph(f"Period: {date_info}", styles['Normal']),
+                Paragraph(f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M')}", styles['Normal']),
+                Spacer(1, 20)
+            )
 
             # Summary Statistics
+            counts = queryset.aggregate(
+                total=Count('id'),
+                completed=Count('id', filter=Q(status='COMPLETED')),
+                scheduled=Count('id', filter=Q(status='SCHEDULED')),
+                in_progress=Count('id', filter=Q(status='IN_PROGRESS')),
+            )
             stats = [
-                ['Total Consultations:', str(queryset.count())],
-                ['Completed:', str(queryset.filter(status='COMPLETED').count())],
-                ['Scheduled:', str(queryset.filter(status='SCHEDULED').count())],
-                ['In Progress:', str(queryset.filter(status='IN_PROGRESS').count())]
+                ['Total Consultations:', str(counts['total'])],
+                ['Completed:', str(counts['completed'])],
+                ['Scheduled:', str(counts['scheduled'])],
+                ['In Progress:', str(counts['in_progress'])]
             ]
 
             stats_table = Table(stats, colWidths=[120, 100])
@@ -145,43 +150,35 @@ class ConsultationExportView(LoginRequiredMixin, UserPassesTestMixin, View):
                 ('GRID', (0, 0), (-1, -1), 1, colors.black),
                 ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
             ]))
-            elements.append(stats_table)
-            elements.append(Spacer(1, 20))
+            pdf.add(stats_table, Spacer(1, 20))
 
             # Main Consultations Table
-            data = [[
-                'Patient',
-                'Doctor',
-                'Type',
-                'Status',
-                'Date',
-                'Duration'
-            ]]
-
-            for consultation in queryset:
-                data.append([
+            rows = (
+                [
                     consultation.patient.get_full_name(),
                     f"Dr. {consultation.doctor.get_full_name()}",
                     consultation.get_consultation_type_display(),
                     consultation.get_status_display(),
                     consultation.scheduled_datetime.strftime('%Y-%m-%d'),
                     f"{consultation.duration_minutes} min"
-                ])
-
-            table = Table(data, repeatRows=1)
-            table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ]))
-
-            elements.append(table)
-            doc.build(elements)
-            return response
+                ]
+                for consultation in iter_queryset(queryset)
+            )
+            pdf.add_table(
+                ['Patient', 'Doctor', 'Type', 'Status', 'Date', 'Duration'],
+                rows,
+                style=[
+                    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                    ('FONTSIZE', (0, 0), (-1, -1), 8),
+                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ]
+            )
+
+            return pdf.response('consultations_export.pdf')
 
         except Exception as e:
             logger.error(f"Error exporting PDF: {str(e)}")
@@ -538,7 +535,9 @@ class PrescriptionExportView(LoginRequiredMixin, View):
 
         return response
 
-class PrescriptionDashboardExportView(LoginRequiredMixin, View):
+class PrescriptionDashboardExportView(LoginRequiredMixin, AsyncExportMixin, View):
+    export_module = 'consultation_management'
+
     def get(self, request):
         try:
             # Get all prescriptions with related data
@@ -564,26 +563,26 @@ class PrescriptionDashboardExportView(LoginRequiredMixin, View):
             return redirect('prescription_dashboard')
 
     def _export_pdf(self, prescriptions):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="prescriptions_report.pdf"'
-
-        doc = SimpleDocTemplate(response, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
+        pdf = PdfExport(pagesize=letter)
+        styles = pdf.styles
 
         # Title and Header
-        elements.append(Paragraph('Prescriptions Report', styles['Heading1']))
-        elements.append(Paragraph(f'Generated on: {timezone.now().strftime("%Y-%m-%d %H:%M")}', styles['Normal']))
-        elements.append(Spacer(1, 20))
+        pdf.add(
+            Paragraph('Prescriptions Report', styles['Heading1']),
+            Paragraph(f'Generated on: {timezone.now().strftime("%Y-%m-%d %H:%M")}', styles['Normal']),
+            Spacer(1, 20)
+        )
 
         # Summary Statistics
-        total_count = prescriptions.count()
         today = timezone.now()
-        recent_count = prescriptions.filter(created_at__gte=today - timedelta(days=7)).count()
+        counts = prescriptions.aggregate(
+            total=Count('id'),
+            recent=Count('id', filter=Q(created_at__gte=today - timedelta(days=7))),
+        )
 
         stats = [
-            ['Total Prescriptions:', str(total_count)],
-            ['Recent (7 days):', str(recent_count)],
+            ['Total Prescriptions:', str(counts['total'])],
+            ['Recent (7 days):', str(counts['recent'])],
         ]
 
         stats_table = Table(stats, colWidths=[120, 100])
@@ -592,54 +591,53 @@ class PrescriptionDashboardExportView(LoginRequiredMixin, View):
             ('GRID', (0, 0), (-1, -1), 1, colors.black),
             ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
         ]))
-        elements.append(stats_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(stats_table, Spacer(1, 20))
 
         # Main Prescriptions Table
-        data = [['Date', 'Patient', 'Doctor', 'Medications']]
-
-        for prescription in prescriptions:
-            medications = ", ".join([item.medication.name for item in prescription.items.all()])
-            data.append([
-                prescription.created_at.strftime("%Y-%m-%d"),
-                prescription.consultation.patient.get_full_name(),
-                f"Dr. {prescription.consultation.doctor.get_full_name()}",
-                medications[:100] + "..." if len(medications) > 100 else medications
-            ])
-
-        table = Table(data, colWidths=[80, 120, 120, 180])
-        table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ]))
-        elements.append(table)
+        def rows():
+            for prescription in iter_queryset(prescriptions):
+                medications = ", ".join([item.medication.name for item in prescription.items.all()])
+                yield [
+                    prescription.created_at.strftime("%Y-%m-%d"),
+                    prescription.consultation.patient.get_full_name(),
+                    f"Dr. {prescription.consultation.doctor.get_full_name()}",
+                    medications[:100] + "..." if len(medications) > 100 else medications
+                ]
+
+        pdf.add_table(
+            ['Date', 'Patient', 'Doctor', 'Medications'],
+            rows(),
+            col_widths=[80, 120, 120, 180],
+            style=[
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ]
+        )
 
-        doc.build(elements)
-        return response
+        return pdf.response('prescriptions_report.pdf')
 
     def _export_csv(self, prescriptions):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="prescriptions_report.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Date', 'Patient', 'Doctor', 'Medications', 'Notes'])
-
-        for prescription in prescriptions:
-            medications = "; ".join([
-                f"{item.medication.name} ({item.dosage}, {item.frequency}, {item.duration})"
-                for item in prescription.items.all()
-            ])
-            writer.writerow([
-                prescription.created_at.strftime("%Y-%m-%d"),
-                prescription.consultation.patient.get_full_name(),
-                f"Dr. {prescription.consultation.doctor.get_full_name()}",
-                medications,
-                prescription.notes
-            ])
-
-        return response
\ No newline at end of file
+        def rows():
+            for prescription in iter_queryset(prescriptions):
+                medications = "; ".join([
+                    f"{item.medication.name} ({item.dosage}, {item.frequency}, {item.duration})"
+                    for item in prescription.items.all()
+                ])
+                yield [
+                    prescription.created_at.strftime("%Y-%m-%d"),
+                    prescription.consultation.patient.get_full_name(),
+                    f"Dr. {prescription.consultation.doctor.get_full_name()}",
+                    medications,
+                    prescription.notes
+                ]
+
+        return csv_response(
+            'prescriptions_report.csv',
+            ['Date', 'Patient', 'Doctor', 'Medications', 'Notes'],
+            rows()
+        )
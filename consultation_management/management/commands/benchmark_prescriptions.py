@@ -0,0 +1,140 @@
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from consultation_management.models import Consultation, Prescription, PrescriptionTemplate
+from consultation_management.prescriptions import (
+    build_prescription_from_template, build_prescription_items,
+    build_template_items, lines_from_post, validate_lines
+)
+from pharmacy_management.models import Medication
+from stock_management.models import ItemCategory, StockItem
+
+User = get_user_model()
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back the rows seeded for the benchmark"""
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Count the queries and time taken to build prescriptions and templates '
+        'with a growing number of medication lines. Seeded rows are rolled back '
+        'when the benchmark finishes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lines',
+            type=str,
+            default='1,5,20,100',
+            help='Comma-separated numbers of medication lines per prescription'
+        )
+
+    def handle(self, *args, **kwargs):
+        line_counts = sorted(int(count) for count in kwargs['lines'].split(','))
+
+        results = []
+        try:
+            with transaction.atomic():
+                consultation, doctor = self.create_consultation()
+                medications = self.create_medications(line_counts[-1])
+                for count in line_counts:
+                    results.append((count, *self.measure(consultation, doctor, medications[:count])))
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            pass
+
+        self.stdout.write(f"{'Lines':>6} {'Prescription':>13} {'Template':>9} {'From template':>14} {'Total ms':>9}")
+        for count, prescription_queries, template_queries, copy_queries, elapsed_ms in results:
+            self.stdout.write(
+                f"{count:>6} {prescription_queries:>13} {template_queries:>9} {copy_queries:>14} {elapsed_ms:>9.2f}"
+            )
+
+        for column, name in [(1, 'prescription'), (2, 'template'), (3, 'prescription from template')]:
+            query_counts = {result[column] for result in results}
+            if len(query_counts) > 1:
+                raise CommandError(f"Building a {name} took {sorted(query_counts)} queries depending on its lines")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Query counts stayed flat from {line_counts[0]} to {line_counts[-1]} lines"
+        ))
+
+    def create_consultation(self):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        doctor = User.objects.create_user(email=f'benchmark.doctor.{suffix}@example.com')
+        patient = User.objects.create_user(email=f'benchmark.patient.{suffix}@example.com')
+        consultation = Consultation.objects.create(
+            patient=patient,
+            doctor=doctor,
+            scheduled_datetime=timezone.now(),
+            chief_complaint='Benchmark',
+            diagnosis='Benchmark'
+        )
+        return consultation, doctor
+
+    def create_medications(self, count):
+        medications = Medication.objects.bulk_create([
+            Medication(
+                name=f'Benchmark Medication {i}',
+                generic_name='Benchmark',
+                dosage_form='Tablet',
+                strength='10mg',
+                manufacturer='Benchmark',
+                price=Decimal('1.00')
+            )
+            for i in range(count)
+        ])
+        category = ItemCategory.objects.create(name='Benchmark')
+        # Half of the medications are in stock
+        StockItem.objects.bulk_create([
+            StockItem(
+                name=medication.name,
+                category=category,
+                medication=medication,
+                current_quantity=10,
+                unit='Tablet',
+                reorder_point=1,
+                unit_price=Decimal('1.00')
+            )
+            for medication in medications[::2]
+        ])
+        return medications
+
+    def measure(self, consultation, doctor, medications):
+        data = QueryDict(mutable=True)
+        for medication in medications:
+            data.appendlist('medications[]', str(medication.id))
+            data.appendlist('dosages[]', '1 tablet')
+            data.appendlist('frequencies[]', 'Twice daily')
+            data.appendlist('durations[]', '7 days')
+
+        started = time.perf_counter()
+        prescription = Prescription.objects.create(consultation=consultation)
+        with CaptureQueriesContext(connection) as prescription_queries:
+            build_prescription_items(prescription, validate_lines(lines_from_post(data)))
+
+        template = PrescriptionTemplate.objects.create(name='Benchmark', doctor=doctor)
+        with CaptureQueriesContext(connection) as template_queries:
+            build_template_items(template, validate_lines(lines_from_post(data)))
+
+        copy = Prescription.objects.create(consultation=consultation, template_used=template)
+        with CaptureQueriesContext(connection) as copy_queries:
+            build_prescription_from_template(copy, template)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if prescription.items.count() != len(medications) or copy.items.count() != len(medications):
+            raise CommandError(f"Expected {len(medications)} items per prescription")
+        in_stock = prescription.items.filter(stock_item__isnull=False).count()
+        if in_stock != (len(medications) + 1) // 2:
+            raise CommandError("Prescription items were not linked to their stock items")
+
+        return len(prescription_queries), len(template_queries), len(copy_queries), elapsed_ms
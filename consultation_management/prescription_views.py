@@ -1,6 +1,7 @@
 # Django imports
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import Q
 from django.http import JsonResponse
@@ -14,14 +15,14 @@ from datetime import timedelta
 import logging
 
 # Local application imports
-from .models import (
-    Prescription, PrescriptionTemplate, TemplateItem, 
-    PrescriptionItem, Consultation
+from .models import Prescription, PrescriptionTemplate, Consultation
+from .prescriptions import (
+    build_prescription_from_template, build_prescription_items,
+    build_template_items, lines_from_post, validate_lines
 )
 from .utils import get_template_path
 from access_control.permissions import PermissionManager
 from pharmacy_management.models import Medication
-from stock_management.models import StockItem
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -94,6 +95,8 @@ class PrescriptionTemplateCreateView(LoginRequiredMixin, View):
                 messages.error(request, "Template name is required")
                 return redirect('prescription_dashboard')
 
+            lines = validate_lines(lines_from_post(request.POST))
+
             # Create the template
             with transaction.atomic():
                 template = PrescriptionTemplate.objects.create(
@@ -104,27 +107,15 @@ class PrescriptionTemplateCreateView(LoginRequiredMixin, View):
                     is_global=is_global
                 )
 
-                # Process medications
-                medications = request.POST.getlist('medications[]')
-                dosages = request.POST.getlist('dosages[]')
-                frequencies = request.POST.getlist('frequencies[]')
-                durations = request.POST.getlist('durations[]')
-
                 # Create template items
-                for i in range(len(medications)):
-                    if medications[i]:  # Only create if medication is selected
-                        TemplateItem.objects.create(
-                            template=template,
-                            medication_id=medications[i],
-                            dosage=dosages[i],
-                            frequency=frequencies[i],
-                            duration=durations[i],
-                            order=i
-                        )
+                build_template_items(template, lines)
 
             messages.success(request, "Prescription template created successfully")
             logger.info(f"Prescription template '{name}' created by user {request.user.id}")
             
+        except ValidationError as e:
+            logger.error(f"Validation error in prescription template creation: {str(e)}")
+            messages.error(request, ' '.join(e.messages))
         except Exception as e:
             logger.error(f"Error creating prescription template: {str(e)}")
             messages.error(request, "An error occurred while creating the template")
@@ -166,6 +157,7 @@ class PrescriptionTemplateEditView(LoginRequiredMixin, View):
                 }, status=403)
 
             template = get_object_or_404(PrescriptionTemplate, pk=pk)
+            lines = validate_lines(lines_from_post(request.POST))
 
             with transaction.atomic():
                 # Update basic information
@@ -179,25 +171,15 @@ class PrescriptionTemplateEditView(LoginRequiredMixin, View):
                 template.items.all().delete()
 
                 # Add new items
-                medications = request.POST.getlist('medications[]')
-                dosages = request.POST.getlist('dosages[]')
-                frequencies = request.POST.getlist('frequencies[]')
-                durations = request.POST.getlist('durations[]')
-
-                for i in range(len(medications)):
-                    if medications[i]:
-                        TemplateItem.objects.create(
-                            template=template,
-                            medication_id=medications[i],
-                            dosage=dosages[i],
-                            frequency=frequencies[i],
-                            duration=durations[i],
-                            order=i
-                        )
+                build_template_items(template, lines)
 
             messages.success(request, "Prescription template updated successfully")
             return redirect('prescription_dashboard')
 
+        except ValidationError as e:
+            logger.error(f"Validation error in prescription template update: {str(e)}")
+            messages.error(request, ' '.join(e.messages))
+            return redirect('prescription_dashboard')
         except Exception as e:
             logger.error(f"Error updating prescription template: {str(e)}")
             messages.error(request, "An error occurred while updating the template")
@@ -239,6 +221,8 @@ class PrescriptionCreateView(LoginRequiredMixin, View):
                 messages.error(request, "You don't have permission to create prescriptions")
                 return redirect('consultation_detail', pk=consultation_id)
 
+            lines = validate_lines(lines_from_post(request.POST))
+
             with transaction.atomic():
                 # Create prescription
                 prescription = Prescription.objects.create(
@@ -247,41 +231,17 @@ class PrescriptionCreateView(LoginRequiredMixin, View):
                 )
 
                 # Process medication items
-                medications = request.POST.getlist('medications[]')
-                dosages = request.POST.getlist('dosages[]')
-                frequencies = request.POST.getlist('frequencies[]')
-                durations = request.POST.getlist('durations[]')
-
-                for i in range(len(medications)):
-                    if medications[i]:  # Only create if medication is selected
-                        medication_id = medications[i]
-                        
-                        # Find stock item for this medication, if available
-                        stock_item = None
-                        try:
-                            stock_item = StockItem.objects.filter(
-                                name=Medication.objects.get(id=medication_id).name,
-                                current_quantity__gt=0
-                            ).first()
-                        except Exception as e:
-                            logger.warning(f"Could not find stock item for medication {medication_id}: {str(e)}")
-
-                        PrescriptionItem.objects.create(
-                            prescription=prescription,
-                            medication_id=medication_id,
-                            stock_item=stock_item,  # Can be None if not in stock
-                            dosage=dosages[i],
-                            frequency=frequencies[i],
-                            duration=durations[i],
-                            quantity_prescribed=1,  # Default value
-                            order=i
-                        )
+                build_prescription_items(prescription, lines)
 
                 messages.success(request, "Prescription created successfully")
                 logger.info(f"Prescription created for consultation {consultation_id} by user {request.user.id}")
 
             return redirect('consultation_detail', pk=consultation_id)
 
+        except ValidationError as e:
+            logger.error(f"Validation error in prescription creation: {str(e)}")
+            messages.error(request, ' '.join(e.messages))
+            return redirect('consultation_detail', pk=consultation_id)
         except Exception as e:
             logger.error(f"Error creating prescription: {str(e)}")
             messages.error(request, "An error occurred while creating the prescription")
@@ -306,28 +266,7 @@ class UsePrescriptionTemplateView(LoginRequiredMixin, View):
                 )
 
                 # Create prescription items from template items
-                for template_item in template.items.all():
-                    # Check if medication is in stock (optional)
-                    stock_item = None
-                    try:
-                        stock_item = StockItem.objects.filter(
-                            name=template_item.medication.name,
-                            current_quantity__gt=0
-                        ).first()
-                    except Exception as e:
-                        logger.warning(f"Could not find stock item for medication {template_item.medication.id}: {str(e)}")
-
-                    PrescriptionItem.objects.create(
-                        prescription=prescription,
-                        medication=template_item.medication,
-                        stock_item=stock_item,
-                        dosage=template_item.dosage,
-                        frequency=template_item.frequency,
-                        duration=template_item.duration,
-                        instructions=template_item.instructions,
-                        quantity_prescribed=1,
-                        order=template_item.order
-                    )
+                build_prescription_from_template(prescription, template)
 
                 messages.success(request, f"Prescription created from template '{template.name}'")
                 logger.info(f"Prescription created from template {template.id} for consultation {consultation_id}")
@@ -375,6 +314,8 @@ class PrescriptionEditView(LoginRequiredMixin, View):
                 messages.error(request, "You don't have permission to edit prescriptions")
                 return redirect('consultation_detail', pk=consultation_id)
 
+            lines = validate_lines(lines_from_post(request.POST))
+
             with transaction.atomic():
                 # Update prescription notes
                 prescription.notes = request.POST.get('notes', '')
@@ -384,41 +325,17 @@ class PrescriptionEditView(LoginRequiredMixin, View):
                 prescription.items.all().delete()
 
                 # Process medication items
-                medications = request.POST.getlist('medications[]')
-                dosages = request.POST.getlist('dosages[]')
-                frequencies = request.POST.getlist('frequencies[]')
-                durations = request.POST.getlist('durations[]')
-
-                for i in range(len(medications)):
-                    if medications[i]:
-                        medication_id = medications[i]
-                        
-                        # Find stock item for this medication, if available
-                        stock_item = None
-                        try:
-                            stock_item = StockItem.objects.filter(
-                                name=Medication.objects.get(id=medication_id).name,
-                                current_quantity__gt=0
-                            ).first()
-                        except Exception as e:
-                            logger.warning(f"Could not find stock item for medication {medication_id}: {str(e)}")
-
-                        PrescriptionItem.objects.create(
-                            prescription=prescription,
-                            medication_id=medication_id,
-                            stock_item=stock_item,
-                            dosage=dosages[i],
-                            frequency=frequencies[i],
-                            duration=durations[i],
-                            quantity_prescribed=1,
-                            order=i
-                        )
+                build_prescription_items(prescription, lines)
 
                 messages.success(request, "Prescription updated successfully")
                 logger.info(f"Prescription {prescription_id} updated for consultation {consultation_id}")
 
             return redirect('consultation_detail', pk=consultation_id)
 
+        except ValidationError as e:
+            logger.error(f"Validation error in prescription update: {str(e)}")
+            messages.error(request, ' '.join(e.messages))
+            return redirect('consultation_detail', pk=consultation_id)
         except Exception as e:
             logger.error(f"Error updating prescription: {str(e)}")
             messages.error(request, "An error occurred while updating the prescription")
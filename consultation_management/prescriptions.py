@@ -0,0 +1,122 @@
+"""
+Building prescription and template items from the medication rows of the
+prescription forms.
+
+Whatever the number of rows, a prescription is written with a fixed number
+of queries: one for the medications referenced, one for their stock items
+and one bulk insert for the items themselves.
+
+    lines = validate_lines(lines_from_post(request.POST))
+    build_prescription_items(prescription, lines)
+"""
+from itertools import zip_longest
+
+from django.core.exceptions import ValidationError
+
+from pharmacy_management.models import Medication
+from stock_management.inventory import stock_items_for_medications
+from .models import PrescriptionItem, TemplateItem
+
+# Form fields holding one value per medication row
+LINE_FIELDS = {
+    'medication': 'medications[]',
+    'dosage': 'dosages[]',
+    'frequency': 'frequencies[]',
+    'duration': 'durations[]',
+}
+
+
+def lines_from_post(data):
+    """The medication rows posted by a prescription or template form, skipping rows without a medication"""
+    columns = zip_longest(*(data.getlist(field) for field in LINE_FIELDS.values()), fillvalue='')
+    return [
+        dict(zip(LINE_FIELDS, values), order=order)
+        for order, values in enumerate(columns)
+        if values[0]
+    ]
+
+
+def validate_lines(lines):
+    """
+    Check every row and replace its medication id with the Medication,
+    fetched for all rows at once. Raises a ValidationError listing every
+    problem found.
+    """
+    errors = []
+    medication_ids = set()
+    for line in lines:
+        try:
+            line['medication'] = int(line['medication'])
+            medication_ids.add(line['medication'])
+        except (TypeError, ValueError):
+            errors.append(f"Row {line['order'] + 1}: invalid medication")
+        for field in ('dosage', 'frequency', 'duration'):
+            value = line[field].strip()
+            if not value:
+                errors.append(f"Row {line['order'] + 1}: {field} is required")
+            elif len(value) > 100:
+                errors.append(f"Row {line['order'] + 1}: {field} must be at most 100 characters")
+            line[field] = value
+
+    medications = Medication.objects.in_bulk(medication_ids)
+    for line in lines:
+        if isinstance(line['medication'], int):
+            if line['medication'] not in medications:
+                errors.append(f"Row {line['order'] + 1}: medication not found")
+            else:
+                line['medication'] = medications[line['medication']]
+
+    if errors:
+        raise ValidationError(errors)
+    return lines
+
+
+def build_prescription_items(prescription, lines):
+    """Create the items of a prescription from validated rows, linking each to an in-stock item if there is one"""
+    stock_items = stock_items_for_medications({line['medication'].id for line in lines})
+    return PrescriptionItem.objects.bulk_create([
+        PrescriptionItem(
+            prescription=prescription,
+            medication=line['medication'],
+            stock_item=stock_items.get(line['medication'].id),  # Can be None if not in stock
+            dosage=line['dosage'],
+            frequency=line['frequency'],
+            duration=line['duration'],
+            instructions=line.get('instructions', ''),
+            quantity_prescribed=1,  # Default value
+            order=line['order']
+        )
+        for line in lines
+    ])
+
+
+def build_template_items(template, lines):
+    """Create the items of a prescription template from validated rows"""
+    return TemplateItem.objects.bulk_create([
+        TemplateItem(
+            template=template,
+            medication=line['medication'],
+            dosage=line['dosage'],
+            frequency=line['frequency'],
+            duration=line['duration'],
+            instructions=line.get('instructions', ''),
+            order=line['order']
+        )
+        for line in lines
+    ])
+
+
+def build_prescription_from_template(prescription, template):
+    """Copy the items of a template into a prescription"""
+    lines = [
+        {
+            'medication': item.medication,
+            'dosage': item.dosage,
+            'frequency': item.frequency,
+            'duration': item.duration,
+            'instructions': item.instructions,
+            'order': item.order,
+        }
+        for item in template.items.select_related('medication')
+    ]
+    return build_prescription_items(prescription, lines)
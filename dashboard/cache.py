@@ -0,0 +1,133 @@
+"""
+Dashboard metrics cache.
+
+Cached metrics are keyed by metric name, role and date bucket, plus the
+current generation of every model the metric depends on. Saving or deleting
+a row of a tracked model bumps that model's generation (see signals.py), so
+stale metrics are never read again and simply expire.
+
+The shared 'default' cache (Redis in production) is used when reachable,
+otherwise the per-process 'local' cache takes over. Recomputes are
+single-flight: one caller computes while the others wait for its result.
+"""
+import logging
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'dashboard:gen:{label}'
+METRIC_KEY = 'dashboard:{metric}:{role}:{bucket}:{generations}'
+LOCK_SUFFIX = ':lock'
+
+LOCK_POLL_INTERVAL = 0.05  # Seconds between polls while another worker recomputes
+SHARED_RETRY_AFTER = 30  # Seconds to stay on the local tier after a shared cache failure
+
+# Striped locks coalesce concurrent recomputes of the same key within a process
+_LOCK_STRIPES = [threading.Lock() for _ in range(64)]
+_shared_down_until = 0
+
+
+def _call(method, *args, **kwargs):
+    """Run a cache operation on the shared tier, falling back to the local tier"""
+    global _shared_down_until
+    if time.monotonic() >= _shared_down_until:
+        try:
+            return getattr(caches['default'], method)(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Shared dashboard cache unavailable, using local cache: {str(e)}")
+            _shared_down_until = time.monotonic() + SHARED_RETRY_AFTER
+    return getattr(caches['local'], method)(*args, **kwargs)
+
+
+def model_label(model):
+    """Return the label used to track generations for a model or label string"""
+    if isinstance(model, str):
+        return model.lower()
+    return model._meta.label_lower
+
+
+def get_generations(models):
+    """Return the current generation of each model, initialising missing ones"""
+    keys = [GENERATION_KEY.format(label=model_label(model)) for model in models]
+    if not keys:
+        return []
+
+    found = _call('get_many', keys)
+    generations = []
+    for key in keys:
+        generation = found.get(key)
+        if generation is None:
+            _call('add', key, time.time_ns(), None)
+            generation = _call('get', key) or 0
+        generations.append(generation)
+    return generations
+
+
+def bump_generation(model):
+    """Retire every cached metric that depends on the given model"""
+    key = GENERATION_KEY.format(label=model_label(model))
+    _call('set', key, time.time_ns(), None)
+
+
+def get_date_bucket():
+    """Return the default date bucket (the local calendar day)"""
+    return timezone.localdate().isoformat()
+
+
+def build_key(metric, role=None, bucket=None, depends_on=()):
+    """Build a stable cache key for a metric"""
+    generations = get_generations(depends_on)
+    return METRIC_KEY.format(
+        metric=metric,
+        role=getattr(role, 'name', role) or 'all',
+        bucket=bucket or get_date_bucket(),
+        generations='-'.join(str(generation) for generation in generations) or '0',
+    )
+
+
+def get_or_compute(metric, compute, role=None, bucket=None, depends_on=(), timeout=None):
+    """
+    Return the cached value of a metric, computing it with `compute()` on a miss.
+    Only one caller across all workers recomputes a given key at a time.
+    """
+    if timeout is None:
+        timeout = settings.DASHBOARD_CACHE_TIMEOUT
+    key = build_key(metric, role=role, bucket=bucket, depends_on=depends_on)
+
+    value = _call('get', key)
+    if value is not None:
+        return value
+
+    with _LOCK_STRIPES[zlib.crc32(key.encode()) % len(_LOCK_STRIPES)]:
+        value = _call('get', key)
+        if value is not None:
+            return value
+
+        lock_key = key + LOCK_SUFFIX
+        lock_timeout = settings.DASHBOARD_CACHE_LOCK_TIMEOUT
+        if _call('add', lock_key, 1, lock_timeout):
+            try:
+                value = compute()
+                _call('set', key, value, timeout)
+            finally:
+                _call('delete', lock_key)
+            return value
+
+        # Another worker holds the lock; wait for its result
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = _call('get', key)
+            if value is not None:
+                return value
+            if _call('get', lock_key) is None:
+                break
+
+        logger.warning(f"Timed out waiting for dashboard metric {metric}, computing locally")
+        return compute()
@@ -0,0 +1,131 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from appointment_management.models import Appointment
+from query_management.models import Query
+from dashboard.metrics import compute_dashboard_metrics
+
+User = get_user_model()
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back the rows seeded for the benchmark"""
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the dashboard metrics engine at growing table sizes. '
+        'Seeded rows are rolled back when the benchmark finishes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            type=str,
+            default='1000,10000,50000',
+            help='Comma-separated row counts to seed for Appointment and Query'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Number of timed runs per scale'
+        )
+        parser.add_argument(
+            '--max-latency-ms',
+            type=float,
+            default=None,
+            help='Fail if the median latency at any scale exceeds this value'
+        )
+
+    def handle(self, *args, **kwargs):
+        scales = sorted(int(scale) for scale in kwargs['scales'].split(','))
+        runs = kwargs['runs']
+        max_latency = kwargs['max_latency_ms']
+
+        results = []
+        try:
+            with transaction.atomic():
+                patient, doctor = self.create_users()
+                seeded = 0
+                for scale in scales:
+                    self.seed(patient, doctor, seeded, scale)
+                    seeded = scale
+                    results.append((scale, *self.measure(runs)))
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            pass
+
+        self.stdout.write(f"{'Rows':>10} {'Queries':>8} {'Median ms':>10} {'Max ms':>10}")
+        for scale, query_count, median_ms, max_ms in results:
+            self.stdout.write(f"{scale:>10} {query_count:>8} {median_ms:>10.2f} {max_ms:>10.2f}")
+
+        query_counts = {query_count for _, query_count, _, _ in results}
+        if len(query_counts) > 1:
+            raise CommandError(f"Query count changed with table size: {sorted(query_counts)}")
+        if max_latency is not None and any(median_ms > max_latency for _, _, median_ms, _ in results):
+            raise CommandError(f"Median latency exceeded {max_latency} ms")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Query count stayed at {query_counts.pop()} across {len(scales)} scales"
+        ))
+
+    def create_users(self):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        patient = User.objects.create_user(email=f'benchmark.patient.{suffix}@example.com')
+        doctor = User.objects.create_user(email=f'benchmark.doctor.{suffix}@example.com')
+        return patient, doctor
+
+    def seed(self, patient, doctor, start, end):
+        today = timezone.localdate()
+        now = timezone.now()
+        appointment_statuses = [choice[0] for choice in Appointment.STATUS_CHOICES]
+        query_statuses = [choice[0] for choice in Query.STATUS_CHOICES]
+        priorities = ['A', 'B', 'C']
+        sources = [choice[0] for choice in Query.SOURCE_CHOICES]
+
+        Appointment.objects.bulk_create([
+            Appointment(
+                patient=patient,
+                doctor=doctor,
+                date=today - timedelta(days=random.randint(0, 365)),
+                status=random.choice(appointment_statuses),
+                priority=random.choice(priorities),
+            )
+            for _ in range(start, end)
+        ], batch_size=1000)
+
+        queries = Query.objects.bulk_create([
+            Query(
+                subject=f'Benchmark query {i}',
+                description='Benchmark',
+                source=random.choice(sources),
+                status=random.choice(query_statuses),
+                priority=random.choice(priorities),
+            )
+            for i in range(start, end)
+        ], batch_size=1000)
+        # created_at is auto_now_add, so spread it out after insert
+        for query in queries:
+            query.created_at = now - timedelta(days=random.randint(0, 365))
+        Query.objects.bulk_update(queries, ['created_at'], batch_size=1000)
+
+    def measure(self, runs):
+        timings = []
+        query_count = 0
+        for _ in range(runs):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                compute_dashboard_metrics(parallel=False)
+                timings.append((time.perf_counter() - started) * 1000)
+            query_count = len(captured)
+        return query_count, statistics.median(timings), max(timings)
@@ -0,0 +1,194 @@
+"""
+Single-pass metrics engine for the main dashboard.
+
+Every counter shown on the dashboard is declared as a filter on one model.
+All counters for a model are evaluated in a single conditional-aggregate
+query (COUNT(*) FILTER (WHERE ...)), and the per-model queries run
+concurrently, so the dashboard costs one query per model regardless of how
+many counters it shows or how large the tables grow.
+"""
+import logging
+import operator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from appointment_management.models import Appointment
+from phototherapy_management.models import PhototherapySession
+from procedure_management.models import Procedure
+from query_management.models import Query
+from .utils import get_safe_division, get_percentage_change
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AppointmentCounts:
+    today: int = 0
+    yesterday: int = 0
+    completed_today: int = 0
+    confirmed_today: int = 0
+    pending_today: int = 0
+    urgent_pending: int = 0
+
+
+@dataclass
+class TreatmentCounts:
+    total: int = 0
+    in_progress: int = 0
+    completed: int = 0
+
+
+@dataclass
+class QueryCounts:
+    today: int = 0
+    resolved_today: int = 0
+    urgent_open: int = 0
+
+
+@dataclass
+class DashboardMetrics:
+    appointments: AppointmentCounts = field(default_factory=AppointmentCounts)
+    phototherapy: TreatmentCounts = field(default_factory=TreatmentCounts)
+    procedures: TreatmentCounts = field(default_factory=TreatmentCounts)
+    queries: QueryCounts = field(default_factory=QueryCounts)
+    last_updated: datetime = field(default_factory=timezone.now)
+
+    @property
+    def appointment_change(self):
+        return get_percentage_change(self.appointments.today, self.appointments.yesterday)
+
+    @property
+    def active_treatments(self):
+        return self.phototherapy.in_progress + self.procedures.in_progress
+
+    @property
+    def treatment_completion_rate(self):
+        completed = self.phototherapy.completed + self.procedures.completed
+        total = self.phototherapy.total + self.procedures.total
+        return round(get_safe_division(completed, total) * 100, 1)
+
+    @property
+    def urgent_matters(self):
+        return self.queries.urgent_open + self.appointments.urgent_pending
+
+    def as_context(self):
+        """Return the metrics in the shape the dashboard templates expect"""
+        return {
+            'appointments': {
+                'today': self.appointments.today,
+                'completed': self.appointments.completed_today,
+                'change': self.appointment_change,
+            },
+            'checkins': {
+                'today': self.appointments.confirmed_today,
+                'pending': self.appointments.pending_today,
+            },
+            'active_treatments': self.active_treatments,
+            'treatment_completion_rate': self.treatment_completion_rate,
+            'treatment_success_rate': 85,  # You might want to calculate this based on your criteria
+            'urgent_matters': self.urgent_matters,
+            'queries': {
+                'total': self.queries.today,
+                'resolved': self.queries.resolved_today,
+            },
+            'last_updated': self.last_updated,
+        }
+
+
+def get_counter_specs(today):
+    """
+    Return the dashboard counters as (model, counts class, {counter: Q}).
+    An empty Q() counts every row.
+    """
+    yesterday = today - timedelta(days=1)
+    today_start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+    today_end = today_start + timedelta(days=1)
+    created_today = Q(created_at__gte=today_start, created_at__lt=today_end)
+
+    return {
+        'appointments': (Appointment, AppointmentCounts, {
+            'today': Q(date=today),
+            'yesterday': Q(date=yesterday),
+            'completed_today': Q(date=today, status='COMPLETED'),
+            'confirmed_today': Q(date=today, status='CONFIRMED'),
+            'pending_today': Q(date=today, status__in=['SCHEDULED', 'PENDING']),
+            'urgent_pending': Q(priority='A', status='PENDING'),
+        }),
+        'phototherapy': (PhototherapySession, TreatmentCounts, {
+            'total': Q(),
+            'in_progress': Q(status='IN_PROGRESS'),
+            'completed': Q(status='COMPLETED'),
+        }),
+        'procedures': (Procedure, TreatmentCounts, {
+            'total': Q(),
+            'in_progress': Q(status='IN_PROGRESS'),
+            'completed': Q(status='COMPLETED'),
+        }),
+        'queries': (Query, QueryCounts, {
+            'today': created_today,
+            'resolved_today': created_today & Q(status='RESOLVED'),
+            'urgent_open': Q(priority='A', status__in=['NEW', 'IN_PROGRESS']),
+        }),
+    }
+
+
+def aggregate_counts(model, counters):
+    """Evaluate every counter for a model in one conditional-aggregate query"""
+    pk_name = model._meta.pk.name
+    aggregates = {
+        name: Count(pk_name, filter=condition) if condition else Count(pk_name)
+        for name, condition in counters.items()
+    }
+    queryset = model.objects.all()
+    if all(counters.values()):
+        # Rows matching no counter add nothing, so let the database skip them using its indexes
+        queryset = queryset.filter(reduce(operator.or_, counters.values()))
+    return queryset.aggregate(**aggregates)
+
+
+def _aggregate_in_thread(model, counters):
+    try:
+        return aggregate_counts(model, counters)
+    finally:
+        connections.close_all()
+
+
+def compute_dashboard_metrics(today=None, parallel=None):
+    """
+    Compute all dashboard counters with one query per model.
+
+    The per-model queries run on separate connections at the same time unless
+    `parallel` is False. They always run sequentially inside a transaction,
+    since other connections could not see its uncommitted rows.
+    """
+    today = today or timezone.localdate()
+    specs = get_counter_specs(today)
+
+    if parallel is None:
+        parallel = settings.DASHBOARD_METRICS_PARALLEL
+    parallel = parallel and not connection.in_atomic_block
+
+    if parallel:
+        with ThreadPoolExecutor(max_workers=len(specs)) as executor:
+            futures = {
+                key: executor.submit(_aggregate_in_thread, model, counters)
+                for key, (model, _, counters) in specs.items()
+            }
+            results = {key: future.result() for key, future in futures.items()}
+    else:
+        results = {
+            key: aggregate_counts(model, counters)
+            for key, (model, _, counters) in specs.items()
+        }
+
+    return DashboardMetrics(**{
+        key: counts_class(**results[key])
+        for key, (_, counts_class, _) in specs.items()
+    })
@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from appointment_management.models import Appointment
+from phototherapy_management.models import PhototherapySession
+from procedure_management.models import Procedure
+from query_management.models import Query
+from .cache import bump_generation
+
+
+@receiver([post_save, post_delete], sender=Appointment)
+@receiver([post_save, post_delete], sender=PhototherapySession)
+@receiver([post_save, post_delete], sender=Procedure)
+@receiver([post_save, post_delete], sender=Query)
+def invalidate_dashboard_metrics(sender, **kwargs):
+    """Retire cached metrics for the changed model once the change is committed"""
+    transaction.on_commit(lambda: bump_generation(sender))
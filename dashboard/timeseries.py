@@ -0,0 +1,96 @@
+"""
+Dense day/week/month series for trend charts.
+
+Aggregate in the database per period with trunc_period, then let
+dense_series spread the rows over every period of the window in one pass:
+each row's position is computed from its date, so filling a year of days
+costs the same per row as filling a week.
+
+    rows = (queryset
+        .annotate(period=trunc_period('created_at', 'day'))
+        .values('period')
+        .annotate(count=Count('pk')))
+    periods, columns = dense_series(rows, start, end, 'day', fields=['count'])
+"""
+from datetime import datetime, timedelta
+
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+PERIODS = ('day', 'week', 'month')
+
+
+def trunc_period(field, period='day'):
+    """Expression truncating a date or datetime field to its day, week (from Monday) or month in the current timezone"""
+    if period == 'week':
+        return TruncWeek(field)
+    if period == 'month':
+        return TruncMonth(field)
+    return TruncDate(field)
+
+
+def period_start(value, period='day'):
+    """First day of the day, week (from Monday) or month containing a date or datetime"""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    if period == 'week':
+        return value - timedelta(days=value.weekday())
+    if period == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def _index(value, first, period):
+    if period == 'month':
+        return (value.year - first.year) * 12 + value.month - first.month
+    if period == 'week':
+        return (value - first).days // 7
+    return (value - first).days
+
+
+def period_range(start, end, period='day'):
+    """First days of every period from the one containing start to the one containing end"""
+    first, last = period_start(start, period), period_start(end, period)
+    periods = []
+    current = first
+    while current <= last:
+        periods.append(current)
+        if period == 'month':
+            current = (current + timedelta(days=32)).replace(day=1)
+        else:
+            current += timedelta(days=7 if period == 'week' else 1)
+    return periods
+
+
+def dense_series(rows, start, end, period='day', key='period', fields=('count',), default=0):
+    """
+    Spread aggregated rows over every period from start to end.
+
+    Returns (periods, columns): the first day of each period and, for every
+    name in fields, a list with one value per period. Periods without a row
+    get `default`, and rows outside the window are ignored.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+
+    periods = period_range(start, end, period)
+    columns = {name: [default] * len(periods) for name in fields}
+    if not periods:
+        return periods, columns
+
+    first = periods[0]
+    for row in rows:
+        value = row[key]
+        if value is None:
+            continue
+        index = _index(period_start(value, period), first, period)
+        if 0 <= index < len(periods):
+            for name in fields:
+                if row[name] is not None:
+                    columns[name][index] = row[name]
+    return periods, columns
+
+
+def date_labels(periods, date_format='%Y-%m-%d'):
+    """Chart labels for the periods of a series"""
+    return [period.strftime(date_format) for period in periods]
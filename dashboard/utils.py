@@ -1,8 +1,9 @@
 import logging
 from datetime import datetime, timedelta
+from functools import wraps
 from django.db.models import Count, Sum, Avg, Q
 from django.utils import timezone
-from django.core.cache import cache
+from .cache import get_or_compute
 from .exceptions import DataFetchError, StatsComputationError
 from .exceptions import InvalidDateRangeError
 
@@ -43,19 +44,40 @@ def get_date_range_filter(range_type):
         logger.error(f"Date range filter error: {str(e)}")
         raise InvalidDateRangeError(f"Invalid date range: {range_type}")
 
-def cache_dashboard_data(func):
-    """Decorator to cache dashboard data"""
-    def wrapper(*args, **kwargs):
-        cache_key = f"dashboard_{func.__name__}_{args}_{kwargs}"
-        cached_data = cache.get(cache_key)
-        
-        if cached_data is not None:
-            return cached_data
-            
-        data = func(*args, **kwargs)
-        cache.set(cache_key, data, timeout=300)  # Cache for 5 minutes
-        return data
-    return wrapper
+def cache_dashboard_data(metric, depends_on=(), timeout=None, per_role=True):
+    """
+    Decorator to cache dashboard data.
+
+    `metric` names the cached value and `depends_on` lists the models whose
+    changes invalidate it. When the decorated function is a view method the
+    key also includes the requesting user's role.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            role = None
+            key_args = args
+            request = getattr(args[0], 'request', None) if args else None
+            if request is not None:
+                key_args = args[1:]
+                if per_role:
+                    role = getattr(request.user, 'role', None)
+
+            name = metric
+            if key_args or kwargs:
+                parts = [str(arg) for arg in key_args]
+                parts += [f"{key}={value}" for key, value in sorted(kwargs.items())]
+                name = f"{metric}:{':'.join(parts)}"
+
+            return get_or_compute(
+                name,
+                lambda: func(*args, **kwargs),
+                role=role,
+                depends_on=depends_on,
+                timeout=timeout,
+            )
+        return wrapper
+    return decorator
 
 from access_control.models import Role
 
@@ -1,6 +1,5 @@
 # Standard library imports
 import logging
-from datetime import timedelta
 from decimal import Decimal
 
 # Django core imports
@@ -19,8 +18,9 @@ from django.http import JsonResponse
 # Local application imports
 from error_handling.views import handler403, handler404, handler500
 from access_control.permissions import PermissionManager
-from .utils import get_template_path, get_safe_division, get_percentage_change, get_date_range_filter, cache_dashboard_data
+from .utils import get_template_path, get_date_range_filter, cache_dashboard_data
 from .exceptions import DataFetchError, StatsComputationError
+from .metrics import compute_dashboard_metrics
 from appointment_management.models import Appointment
 from phototherapy_management.models import PhototherapySession
 from query_management.models import Query
@@ -33,6 +33,9 @@ User = get_user_model()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Models whose changes invalidate the cached dashboard metrics
+DASHBOARD_MODELS = (Appointment, PhototherapySession, Procedure, Query)
+
 class DashboardView(LoginRequiredMixin, View):
     def dispatch(self, request, *args, **kwargs):
         if not PermissionManager.check_module_access(request.user, 'dashboard'):
@@ -51,75 +54,18 @@ class DashboardView(LoginRequiredMixin, View):
             return "Good Evening"
 
     def get_dashboard_metrics(self):
-        today = timezone.now().date()
-        yesterday = today - timedelta(days=1)
-
         try:
-            # Get base metrics
-            today_appointments = Appointment.objects.filter(date=today)
-            yesterday_appointments = Appointment.objects.filter(date=yesterday)
-            
-            # Calculate percentage change in appointments
-            today_count = today_appointments.count()
-            yesterday_count = yesterday_appointments.count()
-            appointment_change = get_percentage_change(today_count, yesterday_count)
-
-            # Get active treatments
-            active_treatments = (
-                PhototherapySession.objects.filter(status='IN_PROGRESS').count() +
-                Procedure.objects.filter(status='IN_PROGRESS').count()
-            )
-
-            # Calculate treatment completion rate
-            completed_treatments = (
-                PhototherapySession.objects.filter(status='COMPLETED').count() +
-                Procedure.objects.filter(status='COMPLETED').count()
-            )
-            total_treatments = (
-                PhototherapySession.objects.count() +
-                Procedure.objects.count()
-            )
-            completion_rate = get_safe_division(completed_treatments, total_treatments) * 100
-
-            # Get urgent matters
-            urgent_matters = (
-                Query.objects.filter(priority='A', status__in=['NEW', 'IN_PROGRESS']).count() +
-                Appointment.objects.filter(priority='A', status='PENDING').count()
-            )
-
-            # Get recent activities
-            recent_activities = self.get_recent_activities()
-
-            metrics = {
-                'appointments': {
-                    'today': today_count,
-                    'completed': today_appointments.filter(status='COMPLETED').count(),
-                    'change': appointment_change,
-                },
-                'checkins': {
-                    'today': today_appointments.filter(status='CONFIRMED').count(),
-                    'pending': today_appointments.filter(status__in=['SCHEDULED', 'PENDING']).count(),
-                },
-                'active_treatments': active_treatments,
-                'treatment_completion_rate': round(completion_rate, 1),
-                'treatment_success_rate': 85,  # You might want to calculate this based on your criteria
-                'urgent_matters': urgent_matters,
-                'queries': {
-                    'total': Query.objects.filter(created_at__date=today).count(),
-                    'resolved': Query.objects.filter(
-                        created_at__date=today,
-                        status='RESOLVED'
-                    ).count(),
-                },
-                'recent_activities': recent_activities,
-                'last_updated': timezone.now(),
-            }
+            return self.build_dashboard_metrics()
         except Exception as e:
             logger.error(f"Error fetching dashboard metrics: {str(e)}")
-            metrics = {
+            return {
                 # ... default values for metrics ...
             }
-            
+
+    @cache_dashboard_data('dashboard_metrics', depends_on=DASHBOARD_MODELS)
+    def build_dashboard_metrics(self):
+        metrics = compute_dashboard_metrics().as_context()
+        metrics['recent_activities'] = self.get_recent_activities()
         return metrics
 
     def get_recent_activities(self):
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import BodyPart, ImageTag, PatientImage, ImageComparison, ComparisonImage, ImageAnnotation
+from .models import BodyPart, ImageTag, PatientImage, ImageComparison, ComparisonImage, ImageAnnotation, ImageDerivative
 
 admin.site.register(BodyPart)
 admin.site.register(ImageTag)
@@ -9,3 +9,4 @@ admin.site.register(ComparisonImage)
 admin.site.register(ImageAnnotation)
 admin.site.register(ImageComparison)
 admin.site.register(PatientImage)
+admin.site.register(ImageDerivative)
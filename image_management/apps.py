@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ImageManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'image_management'
+
+    def ready(self):
+        import image_management.signals
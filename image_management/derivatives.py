@@ -0,0 +1,135 @@
+"""
+Thumbnails and previews of patient images.
+
+A new upload is queued for the make_image_derivatives task once it is
+committed. The worker opens the original once, records its dimensions and
+writes every size in IMAGE_DERIVATIVE_SIZES as WebP and JPEG, each recorded
+with its dimensions and file size in an ImageDerivative row. JPEG originals
+are decoded at a reduced scale (Image.draft) and each size is resized from
+the next larger one rather than from the original.
+
+Grid, comparison and detail pages show the derivatives and keep the
+original for downloads; until an image's derivatives are ready they fall
+back to the original file. Images the queue missed, and images uploaded
+before derivatives existed, are picked up by make_pending_derivatives.
+"""
+import io
+import logging
+import os
+from datetime import timedelta
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from vitigo_pms.queueing import queue_on_commit
+
+from .models import ImageDerivative, PatientImage
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+STALE_PENDING_AFTER = timedelta(minutes=10)  # Pending images older than this were missed by the queue
+
+
+def to_rgb(img):
+    """RGB copy of an image, with any transparency flattened onto white"""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB') if img.mode != 'RGB' else img
+
+
+def encode(img, image_format):
+    buffer = io.BytesIO()
+    if image_format == 'WEBP':
+        img.save(buffer, 'WEBP', quality=settings.IMAGE_DERIVATIVE_QUALITY, method=4)
+    else:
+        img.save(buffer, 'JPEG', quality=settings.IMAGE_DERIVATIVE_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate_derivatives(image):
+    """Make and record every derivative of a PatientImage, replacing any it had. Returns the derivatives"""
+    # Largest first, so each size is resized from the one before it
+    sizes = sorted(settings.IMAGE_DERIVATIVE_SIZES.items(), key=lambda item: item[1], reverse=True)
+    base_name = os.path.splitext(os.path.basename(image.image_file.name))[0]
+
+    with image.image_file.open('rb') as source, Image.open(source) as original:
+        width, height = original.size
+        original.draft('RGB', (sizes[0][1], sizes[0][1]))
+        img = to_rgb(ImageOps.exif_transpose(original))
+
+    derivatives = []
+    try:
+        for kind, longest_side in sizes:
+            img.thumbnail((longest_side, longest_side), Image.LANCZOS)
+            for image_format, extension in EXTENSIONS.items():
+                data = encode(img, image_format)
+                derivative = ImageDerivative(
+                    image=image,
+                    kind=kind,
+                    image_format=image_format,
+                    width=img.width,
+                    height=img.height,
+                    file_size=len(data)
+                )
+                derivative.file.save(f"{base_name}_{kind.lower()}.{extension}", ContentFile(data), save=False)
+                derivatives.append(derivative)
+
+        with transaction.atomic():
+            if not PatientImage.objects.select_for_update().filter(pk=image.pk).exists():
+                raise PatientImage.DoesNotExist(f"Image {image.pk} was deleted")
+            # post_delete removes the replaced files once this commits
+            ImageDerivative.objects.filter(image=image).delete()
+            ImageDerivative.objects.bulk_create(derivatives)
+            PatientImage.objects.filter(pk=image.pk).update(width=width, height=height, derivatives_status='READY')
+    except Exception:
+        for derivative in derivatives:
+            if derivative.file:
+                derivative.file.storage.delete(derivative.file.name)
+        raise
+
+    image.width, image.height, image.derivatives_status = width, height, 'READY'
+    return derivatives
+
+
+def process_image(image_id):
+    """Make the derivatives of one image, marking it FAILED if they cannot be made. Returns the derivatives"""
+    image = PatientImage.objects.filter(pk=image_id).first()
+    if image is None:
+        return []
+    try:
+        derivatives = generate_derivatives(image)
+    except PatientImage.DoesNotExist:
+        return []
+    except Exception as e:
+        logger.error(f"Could not make derivatives of image {image_id}: {str(e)}")
+        PatientImage.objects.filter(pk=image_id).update(derivatives_status='FAILED')
+        return []
+    logger.info(
+        f"Made {len(derivatives)} derivatives of image {image_id}, "
+        f"{sum(derivative.file_size for derivative in derivatives)} bytes in total"
+    )
+    return derivatives
+
+
+def process_pending(limit=None):
+    """Make derivatives for pending images the queue missed, newest first. Returns the number processed"""
+    image_ids = list(PatientImage.objects.filter(
+        derivatives_status='PENDING',
+        uploaded_at__lt=timezone.now() - STALE_PENDING_AFTER
+    ).order_by('-uploaded_at').values_list('id', flat=True)[:limit or settings.IMAGE_DERIVATIVE_SWEEP_SIZE])
+    for image_id in image_ids:
+        process_image(image_id)
+    return len(image_ids)
+
+
+def queue_derivatives(image_id):
+    """Make an image's derivatives in a worker once the current transaction commits"""
+    queue_on_commit('image_management.tasks.make_image_derivatives', image_id)
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_management', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientimage',
+            name='derivatives_status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('THUMBNAIL', 'Thumbnail'), ('PREVIEW', 'Preview')], max_length=10)),
+                ('image_format', models.CharField(choices=[('WEBP', 'WebP'), ('JPEG', 'JPEG')], max_length=4)),
+                ('file', models.FileField(upload_to='patient_images/derivatives/')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('file_size', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivatives', to='image_management.patientimage')),
+            ],
+            options={
+                'unique_together': {('image', 'kind', 'image_format')},
+            },
+        ),
+    ]
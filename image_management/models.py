@@ -1,13 +1,14 @@
+# Python standard library imports
+from collections import namedtuple
+import os
+
 # Django imports
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
-
-# Third-party imports
-from PIL import Image as PILImage
-import os
+from django.utils.functional import cached_property
 
 # Local app imports
 from consultation_management.models import Consultation
@@ -16,6 +17,9 @@ from patient_management.models import Patient
 # Get user model
 User = get_user_model()
 
+# URLs of a derivative size: WebP and JPEG, or the original file while derivatives are not ready
+Rendition = namedtuple('Rendition', ['url', 'webp_url', 'width', 'height'])
+
 
 class BodyPart(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -33,6 +37,12 @@ class ImageTag(models.Model):
 
 
 class PatientImage(models.Model):
+    DERIVATIVE_STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+
     UPLOAD_TYPE_CHOICES = [
         ('PROGRESS', 'Progress Update'),
         ('PROBLEM', 'Problem Report')
@@ -68,6 +78,12 @@ class PatientImage(models.Model):
     width = models.PositiveIntegerField(null=True, blank=True)
     height = models.PositiveIntegerField(null=True, blank=True)
     file_size = models.PositiveIntegerField(null=True, blank=True)  # in bytes
+    derivatives_status = models.CharField(
+        max_length=10,
+        choices=DERIVATIVE_STATUS_CHOICES,
+        default='PENDING',
+        db_index=True
+    )
 
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True,
                                     related_name='uploaded_images')
@@ -76,9 +92,14 @@ class PatientImage(models.Model):
     def __str__(self):
         return f"Image of {self.patient.user.get_full_name()} - {self.body_part} on {self.date_taken}"
 
+    @property
+    def has_new_upload(self):
+        """Whether image_file holds an upload not written to storage yet"""
+        return bool(self.image_file) and not self.image_file._committed
+
     def clean(self):
-        # Validate file size (max 5MB as per settings)
-        if self.image_file and self.image_file.size > settings.MAX_UPLOAD_SIZE:
+        # Validate file size (max 5MB as per settings); stored files were checked on upload
+        if self.has_new_upload and self.image_file.size > settings.MAX_UPLOAD_SIZE:
             raise ValidationError(f'Image file size cannot exceed {settings.MAX_UPLOAD_SIZE/1024/1024}MB.')
         
         # Validate file extension
@@ -87,23 +108,72 @@ class PatientImage(models.Model):
             raise ValidationError('Only JPG, JPEG and PNG files are allowed.')
 
     def extract_metadata(self):
-        if self.image_file:
-            with PILImage.open(self.image_file) as img:
-                self.width = img.width
-                self.height = img.height
-                self.file_size = self.image_file.size
+        """Record the size of a new upload; the derivative worker reads its dimensions"""
+        self.file_size = self.image_file.size
+        self.width = None
+        self.height = None
+        self.derivatives_status = 'PENDING'
 
     def save(self, *args, **kwargs):
         self.full_clean()
-        if not self.pk:  # Only on creation
+        # post_save queues the derivatives for a new upload
+        self._derivatives_needed = self.has_new_upload
+        if self._derivatives_needed:
             self.extract_metadata()
         super().save(*args, **kwargs)
 
+    def get_rendition(self, kind):
+        """Rendition of one derivative size, from derivatives prefetched with prefetch_related('derivatives')"""
+        formats = {derivative.image_format: derivative for derivative in self.derivatives.all() if derivative.kind == kind}
+        if 'JPEG' not in formats:
+            return Rendition(self.image_file.url, None, self.width, self.height)
+        return Rendition(
+            formats['JPEG'].file.url,
+            formats['WEBP'].file.url if 'WEBP' in formats else None,
+            formats['JPEG'].width,
+            formats['JPEG'].height
+        )
+
+    @cached_property
+    def thumbnail(self):
+        return self.get_rendition('THUMBNAIL')
+
+    @cached_property
+    def preview(self):
+        return self.get_rendition('PREVIEW')
+
     @classmethod
     def get_consultation_images(cls, consultation_id):
         return cls.objects.filter(consultation_id=consultation_id).order_by('date_taken')
 
 
+class ImageDerivative(models.Model):
+    """A resized copy of a PatientImage, made by image_management.derivatives"""
+    KIND_CHOICES = [
+        ('THUMBNAIL', 'Thumbnail'),
+        ('PREVIEW', 'Preview'),
+    ]
+    FORMAT_CHOICES = [
+        ('WEBP', 'WebP'),
+        ('JPEG', 'JPEG'),
+    ]
+
+    image = models.ForeignKey(PatientImage, on_delete=models.CASCADE, related_name='derivatives')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    image_format = models.CharField(max_length=4, choices=FORMAT_CHOICES)
+    file = models.FileField(upload_to='patient_images/derivatives/')
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    file_size = models.PositiveIntegerField()  # in bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('image', 'kind', 'image_format')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.image_format}) of image {self.image_id}"
+
+
 class ImageComparison(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .derivatives import queue_derivatives
+from .models import ImageDerivative, PatientImage
+
+
+@receiver(post_save, sender=PatientImage)
+def queue_upload_derivatives(sender, instance, raw=False, **kwargs):
+    """Make thumbnails and previews of a new upload in a worker"""
+    if raw or not getattr(instance, '_derivatives_needed', False):
+        return
+    instance._derivatives_needed = False
+    queue_derivatives(instance.pk)
+
+
+@receiver(post_delete, sender=ImageDerivative)
+def delete_derivative_file(sender, instance, **kwargs):
+    """Remove a derivative's file once its row is gone for good"""
+    storage, name = instance.file.storage, instance.file.name
+    if name:
+        transaction.on_commit(lambda: storage.delete(name))
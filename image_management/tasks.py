@@ -0,0 +1,15 @@
+from celery import shared_task
+
+from .derivatives import process_image, process_pending
+
+
+@shared_task(ignore_result=True)
+def make_image_derivatives(image_id):
+    """Make the thumbnails and previews of an uploaded image"""
+    process_image(image_id)
+
+
+@shared_task(ignore_result=True)
+def make_pending_derivatives():
+    """Make derivatives for images the queue missed and for images uploaded before derivatives existed"""
+    process_pending()
@@ -15,4 +15,5 @@ urlpatterns = [
     path('comparison/<int:pk>/', views.ImageComparisonDetailView.as_view(), name='comparison_detail'),
 
     path('human-3d/', views.Human3DModelView.as_view(), name='human_3d'),
+    path('human-3d/hit-test/<int:body_image_id>/', views.BodyMapHitTestView.as_view(), name='body_map_hit_test'),
 ]
\ No newline at end of file
@@ -1,14 +1,12 @@
 # Python Standard Library imports
 import json
 import logging
-import mimetypes
-import os
-import csv
+import math
 from io import StringIO
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import ParagraphStyle
 from datetime import datetime
 
 # Django core imports
@@ -17,7 +15,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.files.storage import default_storage
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Sum, Count, Q, F, Min, Max, Prefetch
-from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, FileResponse
+from django.http import Http404, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, redirect
 from django.template.defaultfilters import filesizeformat
 from django.urls import reverse_lazy
@@ -31,10 +29,16 @@ from django.db import transaction
 # Local application imports
 from access_control.models import Role
 from access_control.permissions import PermissionManager
+from access_control.protected_media import serve_file
+from body_mapping.geometry import get_compiled_image, get_region_tree
+from body_mapping.models.base import BodyModel
+from body_mapping.models.coordinates import BodyImage
 from error_handling.views import handler403
 from .forms import PatientImageUploadForm, AnnotationForm
 from .models import BodyPart, PatientImage, ImageComparison, ImageAnnotation, ComparisonImage
 from consultation_management.models import Consultation
+from reporting_and_analytics.export_jobs import AsyncExportMixin
+from reporting_and_analytics.exports import PdfExport, csv_response, iter_queryset
 
 User = get_user_model()
 
@@ -79,7 +83,7 @@ class ImageManagementView(LoginRequiredMixin, View):
                 'patient',  # This refers to the User model directly
                 'body_part',
                 'uploaded_by'
-            ).order_by('-date_taken')
+            ).prefetch_related('derivatives').order_by('-date_taken')
 
             # Apply filters
             if image_type:
@@ -117,14 +121,9 @@ class ImageManagementView(LoginRequiredMixin, View):
             except EmptyPage:
                 patient_images = paginator.page(paginator.num_pages)
 
-            # Add file size information
+            # File sizes are stored on upload, so the page needs no storage calls
             for image in patient_images:
-                if default_storage.exists(image.image_file.name):
-                    image.file_size_formatted = filesizeformat(
-                        default_storage.size(image.image_file.name)
-                    )
-                else:
-                    image.file_size_formatted = 'N/A'
+                image.file_size_formatted = filesizeformat(image.file_size) if image.file_size else 'N/A'
 
             context = {
                 'body_parts': body_parts,
@@ -245,27 +244,13 @@ class DownloadImageView(LoginRequiredMixin, View):
             image = PatientImage.objects.get(id=image_id)
             
             # Check if user has permission to download the image
-            if not request.user.is_staff and image.patient.user != request.user:
+            if not request.user.is_staff and image.patient_id != request.user.id:
                 return HttpResponseForbidden("You don't have permission to download this image")
 
-            # Get the file path
-            file_path = image.image_file.path
-            
-            # Get the original filename
-            filename = os.path.basename(image.image_file.name)
-            
-            # Determine content type
-            content_type, _ = mimetypes.guess_type(file_path)
-            
-            # Open the file in binary mode
-            response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+            # Conditional and range requests are answered without reading the file
+            return serve_file(request, image.image_file, as_attachment=True)
             
-            # Set content disposition as attachment with original filename
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
-            return response
-            
-        except PatientImage.DoesNotExist:
+        except (PatientImage.DoesNotExist, Http404):
             messages.error(request, "Image not found")
             return redirect('image_management')
         except Exception as e:
@@ -333,19 +318,14 @@ class ImageDetailView(LoginRequiredMixin, View):
                 'patient',  # Directly relates to CustomUser
                 'body_part',
                 'uploaded_by'
-            ).get(id=image_id)
-
-            file_size = None
-            if image.image_file:
-                try:
-                    file_size = default_storage.size(image.image_file.name)
-                except Exception:
-                    file_size = None
+            ).prefetch_related('derivatives').get(id=image_id)
+
+            file_size = image.file_size
             
             # Get all images of the same patient
             related_images = PatientImage.objects.filter(
                 patient=image.patient
-            ).exclude(id=image_id).order_by('-date_taken')
+            ).exclude(id=image_id).prefetch_related('derivatives').order_by('-date_taken')
             
             # Get comparisons containing this image
             comparisons = ImageComparison.objects.filter(
@@ -358,7 +338,7 @@ class ImageDetailView(LoginRequiredMixin, View):
             # Get images from same body part
             similar_images = PatientImage.objects.filter(
                 body_part=image.body_part
-            ).exclude(id=image_id).order_by('-date_taken')[:5]
+            ).exclude(id=image_id).prefetch_related('derivatives').order_by('-date_taken')[:5]
             
             context = {
                 'image': image,
@@ -376,7 +356,9 @@ class ImageDetailView(LoginRequiredMixin, View):
             return redirect('image_management')
 
 
-class ImageExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class ImageExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'image_management'
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'image_management')
 
@@ -412,64 +394,59 @@ class ImageExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             return redirect('image_management')
 
     def export_csv(self, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="image_report_{timezone.now().strftime("%Y%m%d")}.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
+        header = [
             'Image ID', 'Patient Name', 'Body Part', 'Type', 'Date Taken',
             'Upload Date', 'Uploaded By', 'Private', 'Size (bytes)',
             'Dimensions', 'Tags', 'Notes'
-        ])
-
-        for image in queryset:
-            writer.writerow([
-                image.id,
-                image.patient.get_full_name(),  # Updated to use patient directly
-                image.body_part.name if image.body_part else 'N/A',
-                image.get_image_type_display(),
-                image.date_taken.strftime('%Y-%m-%d'),
-                image.uploaded_at.strftime('%Y-%m-%d %H:%M:%S'),
-                image.uploaded_by.get_full_name() if image.uploaded_by else 'N/A',
-                'Yes' if image.is_private else 'No',
-                image.file_size or 'N/A',
-                f'{image.width}x{image.height}' if image.width and image.height else 'N/A',
-                ', '.join(tag.name for tag in image.tags.all()),
-                image.notes[:100] + '...' if len(image.notes) > 100 else image.notes
-            ])
+        ]
 
-        return response
+        def rows():
+            for image in iter_queryset(queryset.prefetch_related('tags')):
+                yield [
+                    image.id,
+                    image.patient.get_full_name(),  # Updated to use patient directly
+                    image.body_part.name if image.body_part else 'N/A',
+                    image.get_image_type_display(),
+                    image.date_taken.strftime('%Y-%m-%d'),
+                    image.uploaded_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    image.uploaded_by.get_full_name() if image.uploaded_by else 'N/A',
+                    'Yes' if image.is_private else 'No',
+                    image.file_size or 'N/A',
+                    f'{image.width}x{image.height}' if image.width and image.height else 'N/A',
+                    ', '.join(tag.name for tag in image.tags.all()),
+                    image.notes[:100] + '...' if len(image.notes) > 100 else image.notes
+                ]
+
+        return csv_response(f'image_report_{timezone.now().strftime("%Y%m%d")}.csv', header, rows())
 
     def export_pdf(self, queryset):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="image_report_{timezone.now().strftime("%Y%m%d")}.pdf"'
-
-        doc = SimpleDocTemplate(response, pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-        elements = []
+        pdf = PdfExport(pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
 
         # Styles
-        styles = getSampleStyleSheet()
         title_style = ParagraphStyle(
             'CustomTitle',
-            parent=styles['Heading1'],
+            parent=pdf.styles['Heading1'],
             fontSize=24,
             spaceAfter=30
         )
 
         # Title
-        elements.append(Paragraph('Image Management Report', title_style))
-        elements.append(Spacer(1, 20))
+        pdf.add(Paragraph('Image Management Report', title_style), Spacer(1, 20))
 
         # Summary statistics
-        total_images = queryset.count()
-        total_size = sum(image.file_size or 0 for image in queryset)
-        private_count = queryset.filter(is_private=True).count()
+        summary = queryset.aggregate(
+            total_images=Count('id'),
+            total_size=Sum('file_size', default=0),
+            private_count=Count('id', filter=Q(is_private=True)),
+            first_date=Min('date_taken'),
+            last_date=Max('date_taken'),
+        )
 
         stats = [
-            ['Total Images:', str(total_images)],
-            ['Total Storage:', f'{total_size / (1024*1024):.2f} MB'],
-            ['Private Images:', str(private_count)],
-            ['Date Range:', f"{queryset.last().date_taken if queryset.exists() else 'N/A'} to {queryset.first().date_taken if queryset.exists() else 'N/A'}"]
+            ['Total Images:', str(summary['total_images'])],
+            ['Total Storage:', f"{summary['total_size'] / (1024*1024):.2f} MB"],
+            ['Private Images:', str(summary['private_count'])],
+            ['Date Range:', f"{summary['first_date'] or 'N/A'} to {summary['last_date'] or 'N/A'}"]
         ]
 
         stats_table = Table(stats, colWidths=[100, 150])
@@ -480,40 +457,40 @@ class ImageExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
         ]))
-        elements.append(stats_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(stats_table, Spacer(1, 20))
 
         # Image list
-        data = [['Patient', 'Body Part', 'Type', 'Date Taken', 'Size', 'Private']]
-        for image in queryset:
-            data.append([
-                image.patient.user.get_full_name(),
+        rows = (
+            [
+                image.patient.get_full_name(),
                 image.body_part.name if image.body_part else 'N/A',
                 image.get_image_type_display(),
                 image.date_taken.strftime('%Y-%m-%d'),
                 f'{image.file_size/1024:.1f} KB' if image.file_size else 'N/A',
                 'Yes' if image.is_private else 'No'
-            ])
-
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(table)
+            ]
+            for image in iter_queryset(queryset)
+        )
+        pdf.add_table(
+            ['Patient', 'Body Part', 'Type', 'Date Taken', 'Size', 'Private'],
+            rows,
+            style=[
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (-1, -1), 8),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]
+        )
 
-        doc.build(elements)
-        return response
+        return pdf.response(f'image_report_{timezone.now().strftime("%Y%m%d")}.pdf')
 
 class ImageComparisonListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     model = ImageComparison
@@ -581,7 +558,7 @@ class ImageComparisonCreateView(LoginRequiredMixin, UserPassesTestMixin, View):
         consultations = Consultation.objects.prefetch_related(
             Prefetch(
                 'patientimage_set',
-                queryset=PatientImage.objects.select_related('body_part', 'patient')
+                queryset=PatientImage.objects.select_related('body_part', 'patient').prefetch_related('derivatives')
             )
         ).select_related(
             'patient',
@@ -736,6 +713,7 @@ class ImageComparisonDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailV
         comparison_images = (ComparisonImage.objects
             .filter(comparison=self.object)
             .select_related('image', 'image__consultation', 'image__body_part', 'image__patient')
+            .prefetch_related('image__derivatives')
             .order_by('order'))
         
         # Group images by consultation date for better organization
@@ -760,9 +738,66 @@ class ImageComparisonDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailV
     
 
 class Human3DModelView(LoginRequiredMixin, UserPassesTestMixin, View):
+    # Order of the views shown by the body map
+    VIEW_CODES = ['FRONT', 'RIGHT', 'BACK', 'LEFT']
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'image_management')
     
     def get(self, request):
         template_path = get_template_path('human_3d_model.html', request.user.role)
-        return render(request, template_path)
\ No newline at end of file
+        return render(request, template_path, {'body_images': self.get_body_images()})
+
+    def get_body_images(self):
+        """Ids of the active male and female body images, in the order of VIEW_CODES"""
+        body_images = {}
+        for gender, code in (('male', 'M'), ('female', 'F')):
+            body_model = BodyModel.objects.filter(gender__code=code, is_active=True).first()
+            images = {}
+            if body_model:
+                images = dict(BodyImage.objects.filter(body_model=body_model).values_list('view__code', 'id'))
+            body_images[gender] = [images.get(view_code) for view_code in self.VIEW_CODES]
+        return body_images
+
+
+class BodyMapHitTestView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Regions of a body image containing the point (x, y), or overlapping the box
+    at (x, y) of the given width and height. Coordinates are in the body image's
+    pixels, or in percent of its resolution with units=percent, as for annotations.
+    """
+    def test_func(self):
+        return PermissionManager.check_module_access(self.request.user, 'image_management')
+
+    def get(self, request, body_image_id):
+        image = get_compiled_image(body_image_id)
+        if image is None:
+            return JsonResponse({'error': 'Body image not found'}, status=404)
+
+        try:
+            x, y = float(request.GET['x']), float(request.GET['y'])
+            width, height = float(request.GET.get('width', 0)), float(request.GET.get('height', 0))
+        except (KeyError, ValueError):
+            return JsonResponse({'error': 'x and y must be numbers, as must width and height if given'}, status=400)
+        if not all(math.isfinite(value) for value in (x, y, width, height)) or width < 0 or height < 0:
+            return JsonResponse({'error': 'Coordinates must be finite and sizes not negative'}, status=400)
+
+        if request.GET.get('units') == 'percent':
+            if image.size is None:
+                return JsonResponse({'error': 'The body image has no resolution to convert percentages'}, status=400)
+            x_scale, y_scale = image.size[0] / 100, image.size[1] / 100
+            x, y, width, height = x * x_scale, y * y_scale, width * x_scale, height * y_scale
+
+        if width or height:
+            region_ids = image.hit_index.regions_in_box(x, y, x + width, y + height)
+        else:
+            region_ids = image.hit_index.regions_at(x, y)
+
+        labels = get_region_tree().labels
+        return JsonResponse({
+            'body_image': body_image_id,
+            'regions': [
+                {'id': region_id, 'code': labels[region_id][0], 'name': labels[region_id][1]}
+                for region_id in region_ids if region_id in labels
+            ]
+        })
\ No newline at end of file
@@ -49,7 +49,7 @@ class LabReportAdmin(admin.ModelAdmin):
 
     def report_file_link(self, obj):
         if obj.report_file:
-            return format_html('<a href="{}" target="_blank">View Report</a>', obj.report_file.url)
+            return format_html('<a href="{}" target="_blank">View Report</a>', reverse('lab_report_file', args=[obj.pk]))
         return "No file"
     report_file_link.short_description = 'Report File'
 
@@ -3,4 +3,5 @@ from . import views
 
 urlpatterns = [
     path('', views.LabManagementView.as_view(), name='lab_management'),
+    path('reports/<int:pk>/file/', views.LabReportFileView.as_view(), name='lab_report_file'),
 ]
\ No newline at end of file
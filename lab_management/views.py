@@ -6,18 +6,20 @@ from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Sum, F
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
 from django.views import View
 
 # Local application imports
 from access_control.models import Role
 from access_control.permissions import PermissionManager
+from access_control.protected_media import serve_file
 from error_handling.views import handler403, handler404, handler500
 from .models import (
     LabTest,
     LabOrder,
     LabOrderItem,
+    LabReport,
     LabResult
 )
 
@@ -110,4 +112,15 @@ class LabManagementView(LoginRequiredMixin, View):
                 'critical_results': 0,
                 'completed_tests': 0,
                 'monthly_revenue': 0
-            }
\ No newline at end of file
+            }
+
+
+class LabReportFileView(LoginRequiredMixin, View):
+    """Serves a lab report file to lab staff, and to the patient once the report is sent to them"""
+
+    def get(self, request, pk):
+        report = get_object_or_404(LabReport.objects.select_related('lab_order'), pk=pk)
+        is_own_report = report.is_sent_to_patient and report.lab_order.patient_id == request.user.id
+        if not is_own_report and not PermissionManager.check_module_access(request.user, 'lab_management'):
+            return handler403(request, exception="Access denied to lab reports")
+        return serve_file(request, report.report_file, as_attachment='download' in request.GET)
@@ -33,14 +33,14 @@ class UserActivityLogAdmin(admin.ModelAdmin):
 
 @admin.register(EmailNotification)
 class EmailNotificationAdmin(admin.ModelAdmin):
-    list_display = ('user', 'subject', 'status', 'sent_at')
+    list_display = ('user', 'subject', 'status', 'sent_at', 'delivered_at', 'latency_ms', 'digest_size', 'attempts')
     list_filter = ('status', 'sent_at')
     search_fields = ('user__email', 'subject', 'message')
     date_hierarchy = 'sent_at'
 
 @admin.register(SMSNotification)
 class SMSNotificationAdmin(admin.ModelAdmin):
-    list_display = ('user', 'phone_number', 'message', 'status', 'sent_at')
+    list_display = ('user', 'phone_number', 'message', 'status', 'sent_at', 'delivered_at', 'latency_ms', 'digest_size', 'attempts')
     list_filter = ('status', 'sent_at')
     search_fields = ('user__email', 'phone_number', 'message')
     date_hierarchy = 'sent_at'
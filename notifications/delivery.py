@@ -0,0 +1,216 @@
+"""
+Delivery of queued EmailNotification and SMSNotification rows.
+
+Workers claim batches of pending rows with select_for_update(skip_locked=True)
+and mark them SENDING in the same transaction, so any number of Celery
+workers can drain the queues side by side without sending a row twice.
+Within a batch, notifications for the same recipient are coalesced into one
+digest message, and every message goes out over a single SMTP or SMS
+connection, reopened after a failed send (send_each). Each row records its
+attempts, delivery time and latency from queueing to delivery; failed rows
+are retried by later runs up to NOTIFICATION_MAX_ATTEMPTS. Rows still pending NOTIFICATION_MAX_AGE seconds
+after they were queued are failed instead of sent, so an old backlog is
+never delivered long after the fact.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from vitigo_pms.queueing import STALE_CLAIM_AFTER, WORKER_TIME_BUDGET, queue_on_commit
+
+from .models import EmailNotification, SMSNotification
+from .sms import SMSMessage, get_sms_connection
+
+logger = logging.getLogger(__name__)
+
+
+class EmailChannel:
+    model = EmailNotification
+
+    def recipient(self, notification):
+        return notification.user.email
+
+    def build(self, recipient, notifications):
+        if len(notifications) == 1:
+            subject, body = notifications[0].subject, notifications[0].message
+        else:
+            subject = f"You have {len(notifications)} new notifications"
+            body = "\n\n".join(f"{notification.subject}\n{notification.message}" for notification in notifications)
+        return EmailMessage(subject=subject, body=body, from_email=settings.DEFAULT_FROM_EMAIL, to=[recipient])
+
+    def connection(self):
+        return get_connection(fail_silently=False)
+
+
+class SMSChannel:
+    model = SMSNotification
+
+    def recipient(self, notification):
+        return notification.phone_number
+
+    def build(self, recipient, notifications):
+        if len(notifications) == 1:
+            return SMSMessage(recipient, notifications[0].message)
+        return SMSMessage(recipient, "\n".join(f"- {notification.message}" for notification in notifications))
+
+    def connection(self):
+        return get_sms_connection()
+
+
+CHANNELS = [EmailChannel(), SMSChannel()]
+
+
+def send_each(connection, outgoing, connect_error='Could not open the connection'):
+    """Send (item, message) pairs over one email or SMS connection, yielding (item, error) for each.
+
+    error is None once the message is sent. A failed send can leave the
+    connection unusable, so it is reopened before the next message; if it
+    cannot be opened, the remaining items fail with `connect_error`.
+    """
+    outgoing = iter(outgoing)
+    connected = False
+    try:
+        for item, message in outgoing:
+            if not connected:
+                try:
+                    connection.open()
+                    connected = True
+                except Exception as e:
+                    error = f"{connect_error}: {str(e)}"
+                    yield item, error
+                    for item, _ in outgoing:
+                        yield item, error
+                    return
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                yield item, str(e)
+                # Send the next message on a fresh connection
+                connection.close()
+                connected = False
+            else:
+                yield item, None
+    finally:
+        connection.close()
+
+
+def claim_batch(model, limit=None, not_tried_since=None):
+    """Mark up to `limit` pending rows as SENDING for this worker and return them.
+    Rows already tried since `not_tried_since` are left for a later run"""
+    limit = limit or settings.NOTIFICATION_BATCH_SIZE
+    pending = model.objects.filter(status='PENDING')
+    if not_tried_since:
+        pending = pending.filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=not_tried_since))
+    with transaction.atomic():
+        ids = list(pending.select_for_update(skip_locked=True).order_by('id').values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        model.objects.filter(id__in=ids).update(status='SENDING', claimed_at=timezone.now())
+    return list(model.objects.filter(id__in=ids).select_related('user').order_by('id'))
+
+
+def deliver_batch(channel, limit=None, not_tried_since=None):
+    """Claim and send one batch on a channel. Returns (sent, failed) row counts"""
+    notifications = claim_batch(channel.model, limit, not_tried_since)
+    if not notifications:
+        return 0, 0
+
+    # Coalesce each recipient's notifications into one message
+    digests = {}
+    for notification in notifications:
+        digests.setdefault(channel.recipient(notification), []).append(notification)
+
+    def record(group, error=None, retry=True):
+        delivered_at = timezone.now()
+        for notification in group:
+            notification.attempts += 1
+            notification.digest_size = len(group)
+            if error is None:
+                notification.status = 'SENT'
+                notification.delivered_at = delivered_at
+                notification.latency_ms = int((delivered_at - notification.sent_at).total_seconds() * 1000)
+                notification.error_message = ''
+            else:
+                retry_later = retry and notification.attempts < settings.NOTIFICATION_MAX_ATTEMPTS
+                notification.status = 'PENDING' if retry_later else 'FAILED'
+                notification.error_message = error
+
+    started = time.perf_counter()
+    outgoing = []
+    for recipient, group in digests.items():
+        if not recipient:
+            record(group, 'No recipient address', retry=False)
+            continue
+        try:
+            outgoing.append(((recipient, group), channel.build(recipient, group)))
+        except Exception as e:
+            logger.error(f"Could not build a {channel.model.__name__} message to {recipient}: {str(e)}")
+            record(group, str(e))
+    connect_error = f"Could not open {channel.model.__name__} connection"
+    for (recipient, group), error in send_each(channel.connection(), outgoing, connect_error):
+        if error is not None:
+            logger.error(f"Failed to deliver {len(group)} {channel.model.__name__} rows to {recipient}: {error}")
+        record(group, error)
+
+    channel.model.objects.bulk_update(
+        notifications,
+        ['status', 'attempts', 'delivered_at', 'latency_ms', 'digest_size', 'error_message'],
+        batch_size=500
+    )
+    sent = sum(1 for notification in notifications if notification.status == 'SENT')
+    logger.info(
+        f"Delivered {sent}/{len(notifications)} {channel.model.__name__} rows as {len(digests)} messages "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return sent, len(notifications) - sent
+
+
+def release_stale_claims():
+    """Make rows claimed by workers that died available again"""
+    cutoff = timezone.now() - STALE_CLAIM_AFTER
+    for channel in CHANNELS:
+        channel.model.objects.filter(status='SENDING', claimed_at__lt=cutoff).update(status='PENDING')
+
+
+def expire_old_notifications():
+    """Fail pending rows queued more than NOTIFICATION_MAX_AGE seconds ago. Returns the number failed"""
+    cutoff = timezone.now() - timedelta(seconds=settings.NOTIFICATION_MAX_AGE)
+    max_age = f"{settings.NOTIFICATION_MAX_AGE / 3600:g} hours"
+    expired = 0
+    for channel in CHANNELS:
+        expired += channel.model.objects.filter(status='PENDING', sent_at__lt=cutoff).update(
+            status='FAILED',
+            error_message=f"Not delivered within {max_age} of being queued"
+        )
+    if expired:
+        logger.warning(f"Failed {expired} notifications queued more than {max_age} ago")
+    return expired
+
+
+def deliver_pending(time_budget=WORKER_TIME_BUDGET):
+    """Deliver batches on every channel until none are pending or the time budget is used up"""
+    release_stale_claims()
+    expire_old_notifications()
+    totals = [0, 0]
+    started = time.monotonic()
+    # Rows that fail during this run are retried by the next one
+    run_started = timezone.now()
+    active = list(CHANNELS)
+    while active and time.monotonic() - started < time_budget:
+        for channel in list(active):
+            counts = deliver_batch(channel, not_tried_since=run_started)
+            if not any(counts):
+                active.remove(channel)
+            totals = [total + count for total, count in zip(totals, counts)]
+    return tuple(totals)
+
+
+def queue_delivery():
+    """Start a delivery worker once the current transaction commits"""
+    queue_on_commit('notifications.tasks.deliver_notifications')
@@ -0,0 +1,93 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailnotification',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='emailnotification',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailnotification',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='emailnotification',
+            name='digest_size',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Notifications sent together in the same message'),
+        ),
+        migrations.AddField(
+            model_name='emailnotification',
+            name='error_message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='emailnotification',
+            name='latency_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time from queueing to delivery', null=True),
+        ),
+        migrations.AddField(
+            model_name='smsnotification',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='smsnotification',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='smsnotification',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='smsnotification',
+            name='digest_size',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Notifications sent together in the same message'),
+        ),
+        migrations.AddField(
+            model_name='smsnotification',
+            name='error_message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='smsnotification',
+            name='latency_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time from queueing to delivery', null=True),
+        ),
+        migrations.AlterField(
+            model_name='emailnotification',
+            name='status',
+            field=models.CharField(choices=[('SENT', 'Sent'), ('FAILED', 'Failed'), ('PENDING', 'Pending'), ('SENDING', 'Sending')], default='PENDING', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='smsnotification',
+            name='status',
+            field=models.CharField(choices=[('SENT', 'Sent'), ('FAILED', 'Failed'), ('PENDING', 'Pending'), ('SENDING', 'Sending')], default='PENDING', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='emailnotification',
+            index=models.Index(fields=['status', 'id'], name='notificatio_status_ecd610_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsnotification',
+            index=models.Index(fields=['status', 'id'], name='notificatio_status_4fc132_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_delivery'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailnotification',
+            name='latency_ms',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Time from queueing to delivery', null=True),
+        ),
+        migrations.AlterField(
+            model_name='smsnotification',
+            name='latency_ms',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Time from queueing to delivery', null=True),
+        ),
+    ]
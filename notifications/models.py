@@ -40,16 +40,31 @@ class UserActivityLog(models.Model):
     def __str__(self):
         return f"{self.user.email} - {self.action} at {self.timestamp}"
 
+# Statuses of queued email and SMS notifications, sent by notifications.delivery
+DELIVERY_STATUSES = [
+    ('SENT', 'Sent'),
+    ('FAILED', 'Failed'),
+    ('PENDING', 'Pending'),
+    ('SENDING', 'Sending'),
+]
+
 class EmailNotification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='email_notifications')
     subject = models.CharField(max_length=255)
     message = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
-    status = models.CharField(max_length=20, choices=[
-        ('SENT', 'Sent'),
-        ('FAILED', 'Failed'),
-        ('PENDING', 'Pending'),
-    ], default='PENDING')
+    status = models.CharField(max_length=20, choices=DELIVERY_STATUSES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    latency_ms = models.PositiveBigIntegerField(null=True, blank=True, help_text="Time from queueing to delivery")
+    digest_size = models.PositiveSmallIntegerField(default=1, help_text="Notifications sent together in the same message")
+    error_message = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
 
     def __str__(self):
         return f"Email to {self.user.email} - {self.subject[:20]}"
@@ -59,11 +74,18 @@ class SMSNotification(models.Model):
     phone_number = models.CharField(max_length=15)
     message = models.TextField()
     sent_at = models.DateTimeField(auto_now_add=True)
-    status = models.CharField(max_length=20, choices=[
-        ('SENT', 'Sent'),
-        ('FAILED', 'Failed'),
-        ('PENDING', 'Pending'),
-    ], default='PENDING')
+    status = models.CharField(max_length=20, choices=DELIVERY_STATUSES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    latency_ms = models.PositiveBigIntegerField(null=True, blank=True, help_text="Time from queueing to delivery")
+    digest_size = models.PositiveSmallIntegerField(default=1, help_text="Notifications sent together in the same message")
+    error_message = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
 
     def __str__(self):
         return f"SMS to {self.phone_number} - {self.message[:20]}"
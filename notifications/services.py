@@ -3,6 +3,7 @@ from django.db import transaction
 from django.utils import timezone
 import logging
 
+from .delivery import queue_delivery
 from .models import UserNotification, EmailNotification, SMSNotification
 
 logger = logging.getLogger(__name__)
@@ -40,6 +41,9 @@ class NotificationService:
                     status='PENDING'
                 )
 
+            if send_email or (send_sms and phone_number):
+                queue_delivery()
+
             return True, None
 
         except Exception as e:
@@ -0,0 +1,82 @@
+"""
+SMS backends, shaped like Django's email backends: open() a connection once,
+send_messages() over it as often as needed, close() when done.
+
+SMS_BACKEND selects the backend. LoggingSMSBackend only logs messages and is
+the default until an SMS provider is configured; HTTPSMSBackend posts to a
+provider's HTTP API over one keep-alive session.
+"""
+import logging
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SMSMessage = namedtuple('SMSMessage', ['phone_number', 'text'])
+
+
+class BaseSMSBackend:
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        """Send SMSMessages, returning how many were accepted"""
+        raise NotImplementedError
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class LoggingSMSBackend(BaseSMSBackend):
+    """Logs messages instead of sending them"""
+
+    def send_messages(self, messages):
+        for message in messages:
+            logger.info(f"SMS to {message.phone_number}: {message.text}")
+        return len(messages)
+
+
+class HTTPSMSBackend(BaseSMSBackend):
+    """Posts each message as JSON to SMS_API_URL, reusing one connection"""
+
+    def __init__(self):
+        self.session = None
+
+    def open(self):
+        if self.session is None:
+            self.session = requests.Session()
+            self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self.session.headers['Authorization'] = f"Bearer {settings.SMS_API_KEY}"
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def send_messages(self, messages):
+        self.open()
+        for message in messages:
+            response = self.session.post(settings.SMS_API_URL, json={
+                'to': message.phone_number,
+                'sender': settings.SMS_SENDER_ID,
+                'message': message.text,
+            }, timeout=settings.SMS_API_TIMEOUT)
+            response.raise_for_status()
+        return len(messages)
+
+
+def get_sms_connection(backend=None):
+    """Instance of the configured SMS backend"""
+    return import_string(backend or settings.SMS_BACKEND)()
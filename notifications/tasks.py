@@ -0,0 +1,8 @@
+from celery import shared_task
+from .delivery import deliver_pending
+
+
+@shared_task(ignore_result=True)
+def deliver_notifications():
+    """Send queued email and SMS notifications until none are pending"""
+    return deliver_pending()
@@ -1,6 +1,4 @@
 import logging
-from io import BytesIO
-import xlsxwriter
 from datetime import datetime
 
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -11,10 +9,12 @@ from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.contrib.auth import get_user_model
 
 from access_control.models import Role
+from reporting_and_analytics.export_jobs import AsyncExportMixin
+from reporting_and_analytics.exports import PdfExport, XlsxExport, iter_queryset
 from user_management.models import CustomUser
 from .models import Patient, MedicalHistory, VitiligoAssessment, TreatmentPlan, Medication
 
@@ -37,17 +37,10 @@ class PatientDataExportView(LoginRequiredMixin, View):
             return HttpResponse('Export failed', status=500)
 
     def export_excel(self, user, patient):
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-
-        # Add formats
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#4B5563',
-            'font_color': 'white',
-            'border': 1
-        })
-        cell_format = workbook.add_format({'border': 1})
+        export = XlsxExport()
+        workbook = export.workbook
+        header_format = export.header_format
+        cell_format = export.cell_format
 
         # Personal Information Sheet
         self._create_personal_info_sheet(workbook, user, patient, header_format, cell_format)
@@ -61,15 +54,7 @@ class PatientDataExportView(LoginRequiredMixin, View):
         # Treatments Sheet
         self._create_treatments_sheet(workbook, patient, header_format, cell_format)
 
-        workbook.close()
-        output.seek(0)
-
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = f'attachment; filename=patient_data_{user.id}_{datetime.now().strftime("%Y%m%d")}.xlsx'
-        return response
+        return export.response(f'patient_data_{user.id}_{datetime.now().strftime("%Y%m%d")}.xlsx')
 
     def _create_personal_info_sheet(self, workbook, user, patient, header_format, cell_format):
         sheet = workbook.add_worksheet('Personal Information')
@@ -198,7 +183,9 @@ class PatientDataExportView(LoginRequiredMixin, View):
             ('RIGHTPADDING', (0, 0), (-1, -1), 6),
         ])
 
-class PatientListExportView(LoginRequiredMixin, View):
+class PatientListExportView(LoginRequiredMixin, AsyncExportMixin, View):
+    export_module = 'patient_management'
+
     def get(self, request):
         try:
             export_format = request.GET.get('format', 'excel')
@@ -229,151 +216,104 @@ class PatientListExportView(LoginRequiredMixin, View):
             return HttpResponse('Export failed', status=500)
 
     def export_excel(self, patients):
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
-
-        # Add formats
-        header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#4B5563',
-            'font_color': 'white',
-            'border': 1
-        })
-        cell_format = workbook.add_format({'border': 1})
-        date_format = workbook.add_format({
-            'border': 1,
-            'num_format': 'yyyy-mm-dd'
-        })
+        export = XlsxExport()
 
         # Create Metrics sheet
-        self._create_metrics_sheet(workbook, patients, header_format, cell_format)
+        self._create_metrics_sheet(export, patients)
         
         # Create Patients List sheet
-        self._create_patients_sheet(workbook, patients, header_format, cell_format, date_format)
+        self._create_patients_sheet(export, patients)
 
-        workbook.close()
-        output.seek(0)
+        return export.response(f'patient_list_{datetime.now().strftime("%Y%m%d")}.xlsx')
 
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    def _get_metrics(self, patients):
+        now = datetime.now()
+        return patients.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            inactive=Count('id', filter=Q(is_active=False)),
+            new_this_month=Count('id', filter=Q(date_joined__month=now.month, date_joined__year=now.year)),
         )
-        filename = f'patient_list_{datetime.now().strftime("%Y%m%d")}.xlsx'
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-        return response
-
-    def _create_metrics_sheet(self, workbook, patients, header_format, cell_format):
-        sheet = workbook.add_worksheet('Metrics')
-        
-        # Calculate metrics
-        total_patients = patients.count()
-        active_patients = patients.filter(is_active=True).count()
-        inactive_patients = patients.filter(is_active=False).count()
-        new_this_month = patients.filter(
-            date_joined__month=datetime.now().month,
-            date_joined__year=datetime.now().year
-        ).count()
 
+    def _create_metrics_sheet(self, export, patients):
+        metrics = self._get_metrics(patients)
         data = [
-            ['Metric', 'Value'],
-            ['Total Patients', total_patients],
-            ['Active Patients', active_patients],
-            ['Inactive Patients', inactive_patients],
-            ['New Patients This Month', new_this_month],
+            ['Total Patients', metrics['total']],
+            ['Active Patients', metrics['active']],
+            ['Inactive Patients', metrics['inactive']],
+            ['New Patients This Month', metrics['new_this_month']],
             ['Export Date', datetime.now().strftime('%Y-%m-%d %H:%M')]
         ]
-        
-        for row_num, row_data in enumerate(data):
-            for col_num, cell_value in enumerate(row_data):
-                if row_num == 0:
-                    sheet.write(row_num, col_num, cell_value, header_format)
-                else:
-                    sheet.write(row_num, col_num, cell_value, cell_format)
+        export.write_sheet('Metrics', ['Metric', 'Value'], data)
 
-    def _create_patients_sheet(self, workbook, patients, header_format, cell_format, date_format):
-        sheet = workbook.add_worksheet('Patient List')
+    def _create_patients_sheet(self, export, patients):
         headers = ['ID', 'Name', 'Email', 'Phone', 'Gender', 'Status', 'Date Joined', 'Profile Status']
-        
-        # Set column widths
         widths = [10, 30, 40, 20, 15, 15, 20, 20]
-        for i, width in enumerate(widths):
-            sheet.set_column(i, i, width)
-
-        # Write headers
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
-
-        # Write data
-        for row, patient in enumerate(patients, start=1):
-            try:
-                profile = patient.patient_profile
-                has_profile = "Complete"
-            except Patient.DoesNotExist:
-                profile = None
-                has_profile = "Incomplete"
 
-            data = [
-                patient.id,
-                patient.get_full_name(),
-                patient.email,
-                f"{patient.country_code} {patient.phone_number}" if patient.phone_number else 'N/A',
-                patient.get_gender_display() or 'Not specified',
-                'Active' if patient.is_active else 'Inactive',
-                patient.date_joined,
-                has_profile
-            ]
-
-            for col, value in enumerate(data):
-                if col == 6:  # Date Joined column
-                    sheet.write(row, col, value, date_format)
-                else:
-                    sheet.write(row, col, value, cell_format)
+        def rows():
+            for patient in iter_queryset(patients):
+                try:
+                    patient.patient_profile
+                    has_profile = "Complete"
+                except Patient.DoesNotExist:
+                    has_profile = "Incomplete"
+
+                yield [
+                    patient.id,
+                    patient.get_full_name(),
+                    patient.email,
+                    f"{patient.country_code} {patient.phone_number}" if patient.phone_number else 'N/A',
+                    patient.get_gender_display() or 'Not specified',
+                    'Active' if patient.is_active else 'Inactive',
+                    patient.date_joined,
+                    has_profile
+                ]
+
+        # Date Joined column
+        export.write_sheet('Patient List', headers, rows(), widths=widths, column_formats={6: export.date_format})
 
     def export_pdf(self, patients):
-        response = HttpResponse(content_type='application/pdf')
-        filename = f'patient_list_{datetime.now().strftime("%Y%m%d")}.pdf'
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-
-        doc = SimpleDocTemplate(response, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
+        pdf = PdfExport(pagesize=letter)
+        styles = pdf.styles
 
         # Title
-        elements.append(Paragraph('Patient List Report', styles['Heading1']))
-        elements.append(Paragraph(f'Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M")}', styles['Normal']))
-        elements.append(Spacer(1, 20))
+        pdf.add(
+            Paragraph('Patient List Report', styles['Heading1']),
+            Paragraph(f'Generated on: {datetime.now().strftime("%Y-%m-%d %H:%M")}', styles['Normal']),
+            Spacer(1, 20)
+        )
 
         # Metrics Section
-        elements.append(Paragraph('Summary Statistics', styles['Heading2']))
+        metrics = self._get_metrics(patients)
         metrics_data = [
             ['Metric', 'Count'],
-            ['Total Patients', str(patients.count())],
-            ['Active Patients', str(patients.filter(is_active=True).count())],
-            ['Inactive Patients', str(patients.filter(is_active=False).count())]
+            ['Total Patients', str(metrics['total'])],
+            ['Active Patients', str(metrics['active'])],
+            ['Inactive Patients', str(metrics['inactive'])]
         ]
         metrics_table = Table(metrics_data, colWidths=[200, 100])
         metrics_table.setStyle(self._get_table_style())
-        elements.append(metrics_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(Paragraph('Summary Statistics', styles['Heading2']), metrics_table, Spacer(1, 20))
 
         # Patients List
-        elements.append(Paragraph('Patient List', styles['Heading2']))
-        patient_data = [['Name', 'Email', 'Status', 'Date Joined']]
-        
-        for patient in patients[:50]:  # Limit to first 50 patients for PDF
-            patient_data.append([
+        pdf.add(Paragraph('Patient List', styles['Heading2']))
+        rows = (
+            [
                 patient.get_full_name(),
                 patient.email,
                 'Active' if patient.is_active else 'Inactive',
                 patient.date_joined.strftime('%Y-%m-%d')
-            ])
-
-        patient_table = Table(patient_data, colWidths=[150, 200, 70, 100])
-        patient_table.setStyle(self._get_table_style())
-        elements.append(patient_table)
+            ]
+            for patient in iter_queryset(patients)
+        )
+        pdf.add_table(
+            ['Name', 'Email', 'Status', 'Date Joined'],
+            rows,
+            col_widths=[150, 200, 70, 100],
+            style=self._get_table_style()
+        )
 
-        doc.build(elements)
-        return response
+        return pdf.response(f'patient_list_{datetime.now().strftime("%Y%m%d")}.pdf')
 
     def _get_table_style(self):
         """Define common table style for PDF exports"""
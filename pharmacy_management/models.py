@@ -5,7 +5,7 @@ from decimal import Decimal
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
 
 # Get user model
 User = get_user_model()
@@ -93,15 +93,26 @@ class StockAdjustment(models.Model):
     reference_number = models.CharField(max_length=50, blank=True, help_text="External reference number if any")
     
     def save(self, *args, **kwargs):
-        # Update the medication stock
-        stock = self.medication.stock
-        if self.adjustment_type in ['ADD', 'CORRECTION']:
-            stock.quantity += self.quantity
-        else:
-            stock.quantity -= self.quantity
-        stock.save()
-        
-        super().save(*args, **kwargs)
+        # Imported here since stock_management depends on this module
+        from stock_management.inventory import post_entry
+
+        if not self._state.adding:
+            # The stock was changed when the adjustment was recorded
+            super().save(*args, **kwargs)
+            return
+
+        change = self.quantity if self.adjustment_type in ['ADD', 'CORRECTION'] else -self.quantity
+        with transaction.atomic():
+            # Update the medication stock through the inventory ledger
+            post_entry(
+                change,
+                'ADJUSTMENT',
+                medication=self.medication,
+                created_by=self.adjusted_by,
+                reference_number=self.reference_number,
+                notes=self.reason
+            )
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.get_adjustment_type_display()} - {self.medication.name} ({self.quantity})"
@@ -18,6 +18,7 @@ from django.views.generic.edit import CreateView
 from access_control.models import Role
 from access_control.permissions import PermissionManager
 from error_handling.views import handler403, handler404, handler500
+from stock_management.inventory import InsufficientStock
 from .models import (
     Medication,
     MedicationStock,
@@ -324,6 +325,10 @@ class StockAdjustmentView(LoginRequiredMixin, CreateView):
                 f"of {abs(adjustment.quantity)} units for {adjustment.medication.name}"
             )
             return super().form_valid(form)
+        except InsufficientStock as e:
+            # The message states how many units are available
+            form.add_error('quantity', e.messages)
+            return self.form_invalid(form)
         except Exception as e:
             logger.error(f"Error saving stock adjustment: {str(e)}")
             messages.error(self.request, "Error adjusting stock")
@@ -4,7 +4,7 @@ from .models import (
     PhototherapyProtocol, PhototherapyPackage, PhototherapyPlan, 
     PhototherapySession, HomePhototherapyLog, ProblemReport, 
     PhototherapyPayment, PhototherapyReminder, PhototherapyProgress, 
-    DeviceMaintenance
+    DeviceMaintenance, ReminderDispatchBatch
 )
 
 @admin.register(PhototherapyType)
@@ -67,6 +67,12 @@ class PhototherapyReminderAdmin(admin.ModelAdmin):
     list_filter = ('reminder_type', 'status')
     search_fields = ('message',)
 
+@admin.register(ReminderDispatchBatch)
+class ReminderDispatchBatchAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'triggered_by', 'claimed', 'sent', 'failed', 'duration', 'messages_per_second', 'failure_rate')
+    readonly_fields = ('duration', 'messages_per_second', 'failure_rate')
+    date_hierarchy = 'started_at'
+
 @admin.register(PhototherapyProgress)
 class PhototherapyProgressAdmin(admin.ModelAdmin):
     list_display = ('plan', 'assessment_date', 'response_level', 'improvement_percentage')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PhototherapyManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'phototherapy_management'
+
+    def ready(self):
+        import phototherapy_management.signals
@@ -0,0 +1,53 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from phototherapy_management.models import HomePhototherapyLog, PhototherapyPayment, PhototherapySession
+from phototherapy_management.rollups import rebuild_rollup_range
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the phototherapy daily rollups used by the dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='First date to rebuild (YYYY-MM-DD). Defaults to the earliest recorded activity'
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='Last date to rebuild (YYYY-MM-DD). Defaults to the latest recorded activity'
+        )
+
+    def parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date: {value}. Use YYYY-MM-DD")
+
+    def get_activity_bounds(self):
+        sessions = PhototherapySession.objects.aggregate(first=Min('scheduled_date'), last=Max('scheduled_date'))
+        logs = HomePhototherapyLog.objects.aggregate(first=Min('date'), last=Max('date'))
+        payments = PhototherapyPayment.objects.aggregate(first=Min('payment_date'), last=Max('payment_date'))
+        for key in ('first', 'last'):
+            if payments[key]:
+                payments[key] = timezone.localdate(payments[key])
+
+        firsts = [bounds['first'] for bounds in (sessions, logs, payments) if bounds['first']]
+        lasts = [bounds['last'] for bounds in (sessions, logs, payments) if bounds['last']]
+        today = timezone.localdate()
+        return min(firsts, default=today), max(lasts, default=today)
+
+    def handle(self, *args, **kwargs):
+        first, last = self.get_activity_bounds()
+        start = self.parse_date(kwargs['start']) if kwargs['start'] else first
+        end = self.parse_date(kwargs['end']) if kwargs['end'] else last
+        if start > end:
+            raise CommandError("Start date must be on or before end date")
+
+        self.stdout.write(f"Rebuilding phototherapy rollups from {start} to {end}...")
+        rebuild_rollup_range(start, end)
+        days = (end - start).days + 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups for {days} days"))
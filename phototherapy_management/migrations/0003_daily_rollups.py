@@ -0,0 +1,46 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phototherapy_management', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhototherapyDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('completed_payments', models.PositiveIntegerField(default=0)),
+                ('home_logs', models.PositiveIntegerField(default=0)),
+                ('home_log_plan_days', models.PositiveIntegerField(default=0, help_text='Distinct home-therapy plans with at least one log on this date')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PhototherapySessionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('therapy_type', models.CharField(blank=True, choices=[('WB_NB', 'Wholebody NB'), ('EXCIMER', 'Excimer (TP)'), ('HOME_NB', 'Home Based NB'), ('SUN_EXP', 'Sun Exposure'), ('OTHER', 'Other')], max_length=20)),
+                ('status', models.CharField(choices=[('SCHEDULED', 'Scheduled'), ('COMPLETED', 'Completed'), ('MISSED', 'Missed'), ('RESCHEDULED', 'Rescheduled'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('center', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='session_rollups', to='phototherapy_management.phototherapycenter')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'status'], name='phototherap_date_2dca5d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'therapy_type', 'center', 'status'), name='unique_phototherapy_session_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phototherapy_management', '0003_daily_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='phototherapyreminder',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed'), ('CANCELLED', 'Cancelled')], default='PENDING', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ReminderDispatchBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed', models.PositiveIntegerField(default=0)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('render_seconds', models.FloatField(default=0, help_text='Time spent rendering emails')),
+                ('send_seconds', models.FloatField(default=0, help_text='Time spent talking to the mail server')),
+                ('triggered_by', models.ForeignKey(blank=True, help_text='Staff member who sent the reminders, empty for scheduled dispatch', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reminder_dispatch_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Reminder dispatch batches',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='phototherapyreminder',
+            name='dispatch_batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reminders', to='phototherapy_management.reminderdispatchbatch'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill(apps, schema_editor):
+    PhototherapySession = apps.get_model('phototherapy_management', 'PhototherapySession')
+    PhototherapyPayment = apps.get_model('phototherapy_management', 'PhototherapyPayment')
+    HomePhototherapyLog = apps.get_model('phototherapy_management', 'HomePhototherapyLog')
+    PhototherapySessionRollup = apps.get_model('phototherapy_management', 'PhototherapySessionRollup')
+    PhototherapyDailyRollup = apps.get_model('phototherapy_management', 'PhototherapyDailyRollup')
+
+    # The same figures as rollups.rebuild_rollups, for the whole history at once
+    session_rows = (
+        PhototherapySession.objects
+        .values('scheduled_date', 'status', 'plan__center', 'plan__protocol__phototherapy_type__therapy_type')
+        .annotate(session_count=Count('id'))
+        .order_by()
+    )
+    PhototherapySessionRollup.objects.all().delete()
+    PhototherapySessionRollup.objects.bulk_create([
+        PhototherapySessionRollup(
+            date=row['scheduled_date'],
+            status=row['status'],
+            center_id=row['plan__center'],
+            therapy_type=row['plan__protocol__phototherapy_type__therapy_type'] or '',
+            session_count=row['session_count'],
+        )
+        for row in session_rows
+    ], batch_size=1000)
+
+    daily = {}
+
+    def day(date):
+        if date not in daily:
+            daily[date] = PhototherapyDailyRollup(date=date)
+        return daily[date]
+
+    payment_rows = (
+        PhototherapyPayment.objects
+        .filter(status='COMPLETED')
+        .annotate(day=TruncDate('payment_date'))
+        .values('day')
+        .annotate(revenue=Sum('amount'), completed_payments=Count('id'))
+        .order_by()
+    )
+    for row in payment_rows:
+        rollup = day(row['day'])
+        rollup.revenue = row['revenue'] or Decimal('0')
+        rollup.completed_payments = row['completed_payments']
+
+    home_log_rows = (
+        HomePhototherapyLog.objects
+        .filter(plan__protocol__phototherapy_type__therapy_type='HOME_NB')
+        .values('date')
+        .annotate(home_logs=Count('id'), home_log_plan_days=Count('plan', distinct=True))
+        .order_by()
+    )
+    for row in home_log_rows:
+        rollup = day(row['date'])
+        rollup.home_logs = row['home_logs']
+        rollup.home_log_plan_days = row['home_log_plan_days']
+
+    # Every day of the recorded history has a row, as after rebuild_phototherapy_rollups
+    dates = set(daily) | {row['scheduled_date'] for row in session_rows}
+    if dates:
+        first, last = min(dates), max(dates)
+        for offset in range((last - first).days + 1):
+            day(first + timedelta(days=offset))
+
+    PhototherapyDailyRollup.objects.all().delete()
+    PhototherapyDailyRollup.objects.bulk_create(daily.values(), batch_size=1000)
+
+
+def clear(apps, schema_editor):
+    apps.get_model('phototherapy_management', 'PhototherapySessionRollup').objects.all().delete()
+    apps.get_model('phototherapy_management', 'PhototherapyDailyRollup').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('phototherapy_management', '0004_reminder_dispatch_batches'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, clear),
+    ]
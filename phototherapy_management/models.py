@@ -634,6 +634,7 @@ class PhototherapyReminder(models.Model):
 
     REMINDER_STATUS = [
         ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
         ('SENT', 'Sent'),
         ('FAILED', 'Failed'),
         ('CANCELLED', 'Cancelled')
@@ -654,6 +655,12 @@ class PhototherapyReminder(models.Model):
     )
     sent_at = models.DateTimeField(null=True)
     error_message = models.TextField(blank=True)
+    dispatch_batch = models.ForeignKey(
+        'ReminderDispatchBatch',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='reminders'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -673,6 +680,46 @@ class PhototherapyReminder(models.Model):
         self.sent_at = timezone.now()
         self.save()
 
+class ReminderDispatchBatch(models.Model):
+    """One batch of reminders sent by phototherapy_management.reminders, with its throughput"""
+    triggered_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='reminder_dispatch_batches',
+        help_text="Staff member who sent the reminders, empty for scheduled dispatch"
+    )
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    claimed = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    render_seconds = models.FloatField(default=0, help_text="Time spent rendering emails")
+    send_seconds = models.FloatField(default=0, help_text="Time spent talking to the mail server")
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name_plural = 'Reminder dispatch batches'
+
+    def __str__(self):
+        return f"Reminder batch {self.pk}: {self.sent} sent, {self.failed} failed"
+
+    @property
+    def duration(self):
+        """Seconds from claiming the batch to recording its results"""
+        if not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    @property
+    def messages_per_second(self):
+        duration = self.duration
+        return round(self.sent / duration, 1) if duration else None
+
+    @property
+    def failure_rate(self):
+        return round(self.failed / self.claimed * 100, 1) if self.claimed else 0
+
 class PhototherapyProgress(models.Model):
     """Track patient progress in phototherapy treatment"""
     plan = models.ForeignKey(
@@ -797,4 +844,61 @@ class PhototherapyCenter(models.Model):
         return self.name
 
     def get_available_device_count(self):
-        return self.available_devices.filter(is_active=True).count()
\ No newline at end of file
+        return self.available_devices.filter(is_active=True).count()
+
+
+class PhototherapySessionRollup(models.Model):
+    """Daily session counts by status, therapy type and center, kept in step by phototherapy_management.rollups"""
+    date = models.DateField()
+    therapy_type = models.CharField(
+        max_length=20,
+        choices=PhototherapyType.THERAPY_CHOICES,
+        blank=True
+    )
+    center = models.ForeignKey(
+        PhototherapyCenter,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='session_rollups'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=PhototherapySession.COMPLIANCE_CHOICES
+    )
+    session_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'therapy_type', 'center', 'status'],
+                name='unique_phototherapy_session_rollup'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.therapy_type} {self.status}: {self.session_count}"
+
+
+class PhototherapyDailyRollup(models.Model):
+    """Daily revenue and home-therapy log totals, kept in step by phototherapy_management.rollups"""
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    completed_payments = models.PositiveIntegerField(default=0)
+    home_logs = models.PositiveIntegerField(default=0)
+    home_log_plan_days = models.PositiveIntegerField(
+        default=0,
+        help_text="Distinct home-therapy plans with at least one log on this date"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Phototherapy rollup for {self.date}"
@@ -0,0 +1,184 @@
+"""
+Batched dispatch of phototherapy reminders.
+
+Due reminders are claimed in batches: a ReminderDispatchBatch row is created
+and one UPDATE moves up to PHOTOTHERAPY_REMINDER_BATCH_SIZE pending reminders
+to SENDING under it, so parallel workers never send the same reminder. The
+email template is loaded once per batch and every email of the batch goes
+out over one SMTP connection, reopened after a failed send. Outcomes are
+written back with a single bulk_update, and the batch row keeps the counts
+and timings. Scheduled runs
+fail reminders more than SCHEDULED_MAX_LATENESS overdue instead of sending
+them, so a backlog is never mailed out long after the fact.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
+from django.utils import timezone
+
+from notifications.delivery import send_each
+
+from .models import PhototherapyReminder, ReminderDispatchBatch
+
+logger = logging.getLogger(__name__)
+
+REMINDER_TEMPLATE = 'emails/phototherapy/reminder.html'
+REMINDER_SUBJECT = 'Phototherapy Reminder'
+STALE_BATCH_AFTER = timedelta(minutes=30)  # Unfinished batches older than this belong to a worker that died
+SCHEDULED_MAX_LATENESS = timedelta(hours=1)  # Scheduled runs fail reminders later than this instead of sending them
+
+
+def due_reminders(due_before=None, reminder_ids=None):
+    """Pending reminders scheduled up to `due_before` (now by default)"""
+    reminders = PhototherapyReminder.objects.filter(
+        status='PENDING',
+        scheduled_datetime__lte=due_before or timezone.now()
+    )
+    if reminder_ids is not None:
+        reminders = reminders.filter(id__in=reminder_ids)
+    return reminders
+
+
+def expire_late_reminders(now=None):
+    """Fail pending reminders too late for scheduled dispatch. Returns the number failed"""
+    now = now or timezone.now()
+    expired = PhototherapyReminder.objects.filter(
+        status='PENDING',
+        scheduled_datetime__lt=now - SCHEDULED_MAX_LATENESS
+    ).update(
+        status='FAILED',
+        error_message='Not sent: too late for scheduled dispatch',
+        updated_at=now
+    )
+    if expired:
+        logger.warning(f"Failed {expired} phototherapy reminders more than {SCHEDULED_MAX_LATENESS} late")
+    return expired
+
+
+def claim_batch(due_before=None, reminder_ids=None, triggered_by=None, limit=None):
+    """Move up to `limit` due reminders into a new batch. Returns (batch, reminders), batch is None if none were due"""
+    limit = limit or settings.PHOTOTHERAPY_REMINDER_BATCH_SIZE
+    ids = list(due_reminders(due_before, reminder_ids).order_by(
+        'scheduled_datetime', 'id'
+    ).values_list('id', flat=True)[:limit])
+    if not ids:
+        return None, []
+
+    batch = ReminderDispatchBatch.objects.create(triggered_by=triggered_by)
+    PhototherapyReminder.objects.filter(id__in=ids, status='PENDING').update(
+        status='SENDING',
+        dispatch_batch=batch,
+        updated_at=timezone.now()
+    )
+    reminders = list(PhototherapyReminder.objects.filter(
+        dispatch_batch=batch,
+        status='SENDING'
+    ).select_related('plan__patient'))
+    if not reminders:
+        # Another worker claimed them first
+        batch.delete()
+        return None, []
+    batch.claimed = len(reminders)
+    return batch, reminders
+
+
+def build_email(template, reminder):
+    """Reminder email for the patient, or None if the patient has no email address"""
+    recipient = reminder.plan.patient.email
+    if not recipient:
+        return None
+    email = EmailMultiAlternatives(
+        subject=REMINDER_SUBJECT,
+        body=reminder.message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[recipient]
+    )
+    email.attach_alternative(template.render({'reminder': reminder}), 'text/html')
+    return email
+
+
+def send_batch(batch, reminders, send_email=True):
+    """Send a claimed batch and record each reminder's outcome and the batch metrics"""
+    now = timezone.now()
+
+    def succeeded(reminder):
+        reminder.status = 'SENT'
+        reminder.sent_at = now
+        reminder.error_message = ''
+
+    def failed(reminder, error):
+        reminder.status = 'FAILED'
+        reminder.error_message = error
+        logger.error(f"Failed to send reminder {reminder.id}: {error}")
+
+    outgoing = []
+    if send_email:
+        started = time.perf_counter()
+        template = get_template(REMINDER_TEMPLATE)
+        for reminder in reminders:
+            try:
+                email = build_email(template, reminder)
+            except Exception as e:
+                failed(reminder, f"Could not render reminder: {str(e)}")
+                continue
+            if email is None:
+                failed(reminder, "Patient has no email address")
+            else:
+                outgoing.append((reminder, email))
+        batch.render_seconds = time.perf_counter() - started
+    else:
+        # SMS delivery is not implemented yet; the reminder is only marked as sent
+        for reminder in reminders:
+            succeeded(reminder)
+
+    if outgoing:
+        started = time.perf_counter()
+        connection = get_connection(fail_silently=False)
+        for reminder, error in send_each(connection, outgoing, 'Could not connect to the mail server'):
+            if error is None:
+                succeeded(reminder)
+            else:
+                failed(reminder, error)
+        batch.send_seconds = time.perf_counter() - started
+
+    for reminder in reminders:
+        reminder.updated_at = now
+    PhototherapyReminder.objects.bulk_update(
+        reminders,
+        ['status', 'sent_at', 'error_message', 'updated_at'],
+        batch_size=500
+    )
+
+    batch.sent = sum(1 for reminder in reminders if reminder.status == 'SENT')
+    batch.failed = batch.claimed - batch.sent
+    batch.finished_at = timezone.now()
+    batch.save()
+    logger.info(
+        f"Reminder batch {batch.pk}: {batch.sent} sent, {batch.failed} failed "
+        f"in {batch.duration:.2f}s ({batch.messages_per_second or 0} messages/s)"
+    )
+    return batch
+
+
+def release_stale_batches():
+    """Make reminders claimed by workers that died available again"""
+    return PhototherapyReminder.objects.filter(
+        status='SENDING',
+        dispatch_batch__finished_at__isnull=True,
+        dispatch_batch__started_at__lt=timezone.now() - STALE_BATCH_AFTER
+    ).update(status='PENDING', updated_at=timezone.now())
+
+
+def dispatch_reminders(due_before=None, reminder_ids=None, triggered_by=None, send_email=True):
+    """Send due reminders batch by batch until none are left. Returns the batches sent"""
+    release_stale_batches()
+    batches = []
+    while True:
+        batch, reminders = claim_batch(due_before, reminder_ids, triggered_by)
+        if batch is None:
+            return batches
+        batches.append(send_batch(batch, reminders, send_email))
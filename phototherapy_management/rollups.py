@@ -0,0 +1,196 @@
+"""
+Daily rollups backing the phototherapy dashboard.
+
+Each rollup day is rebuilt from the raw session, payment and home-log rows
+for that day only. Model signals mark the days touched by a write and
+rebuild them once the transaction commits. A periodic Celery task rebuilds
+a trailing window to repair anything changed behind the ORM's back, such as
+queryset updates.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    HomePhototherapyLog,
+    PhototherapyDailyRollup,
+    PhototherapyPayment,
+    PhototherapySession,
+    PhototherapySessionRollup,
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of days rebuilt per transaction when backfilling
+REBUILD_CHUNK_DAYS = 31
+
+PENDING_DATES_ATTR = '_phototherapy_rollup_dates'
+
+
+def rebuild_rollups(dates):
+    """Rebuild the session and daily rollups for the given dates"""
+    dates = sorted({date for date in dates if date})
+    for start in range(0, len(dates), REBUILD_CHUNK_DAYS):
+        chunk = dates[start:start + REBUILD_CHUNK_DAYS]
+        try:
+            _rebuild_chunk(chunk)
+        except IntegrityError:
+            # A concurrent rebuild of the same days won the race; retry once
+            logger.warning(f"Concurrent phototherapy rollup rebuild for {chunk[0]}..{chunk[-1]}, retrying")
+            _rebuild_chunk(chunk)
+
+
+def rebuild_rollup_range(start_date, end_date):
+    """Rebuild the rollups for every date between start_date and end_date inclusive"""
+    days = (end_date - start_date).days
+    rebuild_rollups(start_date + timedelta(days=offset) for offset in range(days + 1))
+
+
+@transaction.atomic
+def _rebuild_chunk(dates):
+    session_rows = (
+        PhototherapySession.objects
+        .filter(scheduled_date__in=dates)
+        .values(
+            'scheduled_date',
+            'status',
+            'plan__center',
+            'plan__protocol__phototherapy_type__therapy_type',
+        )
+        .annotate(session_count=Count('id'))
+        .order_by()
+    )
+
+    PhototherapySessionRollup.objects.filter(date__in=dates).delete()
+    PhototherapySessionRollup.objects.bulk_create([
+        PhototherapySessionRollup(
+            date=row['scheduled_date'],
+            status=row['status'],
+            center_id=row['plan__center'],
+            therapy_type=row['plan__protocol__phototherapy_type__therapy_type'] or '',
+            session_count=row['session_count'],
+        )
+        for row in session_rows
+    ])
+
+    daily = {date: PhototherapyDailyRollup(date=date) for date in dates}
+
+    payment_rows = (
+        PhototherapyPayment.objects
+        .filter(status='COMPLETED', payment_date__date__in=dates)
+        .annotate(day=TruncDate('payment_date'))
+        .values('day')
+        .annotate(revenue=Sum('amount'), completed_payments=Count('id'))
+        .order_by()
+    )
+    for row in payment_rows:
+        daily[row['day']].revenue = row['revenue'] or Decimal('0')
+        daily[row['day']].completed_payments = row['completed_payments']
+
+    home_log_rows = (
+        HomePhototherapyLog.objects
+        .filter(date__in=dates, plan__protocol__phototherapy_type__therapy_type='HOME_NB')
+        .values('date')
+        .annotate(home_logs=Count('id'), home_log_plan_days=Count('plan', distinct=True))
+        .order_by()
+    )
+    for row in home_log_rows:
+        daily[row['date']].home_logs = row['home_logs']
+        daily[row['date']].home_log_plan_days = row['home_log_plan_days']
+
+    PhototherapyDailyRollup.objects.filter(date__in=dates).delete()
+    PhototherapyDailyRollup.objects.bulk_create(daily.values())
+
+
+def _flush_pending_dates():
+    dates = getattr(connection, PENDING_DATES_ATTR, None)
+    setattr(connection, PENDING_DATES_ATTR, None)
+    if dates:
+        try:
+            rebuild_rollups(dates)
+        except Exception as e:
+            logger.error(f"Error rebuilding phototherapy rollups: {str(e)}")
+
+
+def mark_dates_dirty(*dates):
+    """
+    Schedule a rollup rebuild for the given dates once the current transaction
+    commits. Dates touched within one transaction are rebuilt together.
+    """
+    dates = {date for date in dates if date}
+    if not dates:
+        return
+
+    pending = getattr(connection, PENDING_DATES_ATTR, None)
+    registered = any(func is _flush_pending_dates for _, func, _ in connection.run_on_commit)
+    if pending is None or not registered:
+        pending = set()
+        setattr(connection, PENDING_DATES_ATTR, pending)
+        pending.update(dates)
+        transaction.on_commit(_flush_pending_dates)
+    else:
+        pending.update(dates)
+
+
+def get_session_summary(today=None):
+    """Aggregate the session rollup into the dashboard's session counters with one query"""
+    today = today or timezone.localdate()
+    month_start = today.replace(day=1)
+    next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+    last_month = today - timedelta(days=30)
+
+    def total(condition=Q()):
+        return Sum('session_count', filter=condition, default=0)
+
+    return PhototherapySessionRollup.objects.aggregate(
+        completed_sessions=total(Q(status='COMPLETED')),
+        missed_sessions=total(Q(status='MISSED')),
+        total_sessions_this_month=total(Q(date__gte=month_start, date__lt=next_month_start)),
+        sessions_today=total(Q(date=today)),
+        completed_today=total(Q(date=today, status='COMPLETED')),
+        pending_today=total(Q(date=today, status__in=['SCHEDULED', 'RESCHEDULED'])),
+        total_scheduled=total(Q(date__lte=today)),
+        total_completed=total(Q(date__lte=today, status='COMPLETED')),
+        total_missed=total(Q(date__lte=today, status='MISSED')),
+        last_month_total=total(Q(date__lte=last_month)),
+        last_month_completed=total(Q(date__lte=last_month, status='COMPLETED')),
+    )
+
+
+def get_completed_sessions_by_type(start_date, end_date):
+    """Return {therapy_type: completed sessions} between two dates from the rollup"""
+    rows = (
+        PhototherapySessionRollup.objects
+        .filter(date__gte=start_date, date__lte=end_date, status='COMPLETED')
+        .values('therapy_type')
+        .annotate(total=Sum('session_count'))
+        .order_by()
+    )
+    return {row['therapy_type']: row['total'] for row in rows}
+
+
+def get_daily_summary(today=None):
+    """Aggregate revenue and home-log totals from the daily rollup with one query"""
+    today = today or timezone.localdate()
+    month_start = today.replace(day=1)
+    last_month_end = month_start - timedelta(days=1)
+    last_month_start = last_month_end.replace(day=1)
+
+    return PhototherapyDailyRollup.objects.aggregate(
+        revenue_this_month=Sum('revenue', filter=Q(date__gte=month_start), default=Decimal('0')),
+        last_month_revenue=Sum(
+            'revenue',
+            filter=Q(date__gte=last_month_start, date__lte=last_month_end),
+            default=Decimal('0')
+        ),
+        home_log_plan_days=Sum(
+            'home_log_plan_days',
+            filter=Q(date__gte=today - timedelta(days=30), date__lte=today),
+            default=0
+        ),
+    )
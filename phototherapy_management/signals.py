@@ -0,0 +1,61 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import HomePhototherapyLog, PhototherapyPayment, PhototherapyPlan, PhototherapySession
+from .rollups import mark_dates_dirty
+
+
+def _payment_date(instance):
+    payment_date = instance.__dict__.get('payment_date')
+    if payment_date is None:
+        return None
+    if timezone.is_aware(payment_date):
+        return timezone.localdate(payment_date)
+    return payment_date.date()
+
+
+def _rollup_date(instance):
+    if isinstance(instance, PhototherapySession):
+        return instance.__dict__.get('scheduled_date')
+    if isinstance(instance, PhototherapyPayment):
+        return _payment_date(instance)
+    return instance.__dict__.get('date')
+
+
+@receiver(post_init, sender=PhototherapySession)
+@receiver(post_init, sender=PhototherapyPayment)
+@receiver(post_init, sender=HomePhototherapyLog)
+def remember_rollup_date(sender, instance, **kwargs):
+    """Remember the loaded date so a moved row also refreshes its old day"""
+    instance._rollup_initial_date = _rollup_date(instance)
+
+
+@receiver([post_save, post_delete], sender=PhototherapySession)
+@receiver([post_save, post_delete], sender=PhototherapyPayment)
+@receiver([post_save, post_delete], sender=HomePhototherapyLog)
+def refresh_daily_rollups(sender, instance, **kwargs):
+    """Rebuild the rollup days touched by this row once the change commits"""
+    mark_dates_dirty(getattr(instance, '_rollup_initial_date', None), _rollup_date(instance))
+    instance._rollup_initial_date = _rollup_date(instance)
+
+
+def _plan_grouping(instance):
+    return instance.__dict__.get('center_id'), instance.__dict__.get('protocol_id')
+
+
+@receiver(post_init, sender=PhototherapyPlan)
+def remember_plan_grouping(sender, instance, **kwargs):
+    instance._rollup_initial_grouping = _plan_grouping(instance)
+
+
+@receiver(post_save, sender=PhototherapyPlan)
+def refresh_plan_rollups(sender, instance, created, **kwargs):
+    """A plan's center and protocol decide where its sessions are counted"""
+    grouping = _plan_grouping(instance)
+    changed = not created and grouping != instance._rollup_initial_grouping
+    instance._rollup_initial_grouping = grouping
+    if not changed:
+        return
+    session_dates = instance.sessions.values_list('scheduled_date', flat=True).distinct()
+    log_dates = instance.home_logs.values_list('date', flat=True).distinct()
+    mark_dates_dirty(*session_dates, *log_dates)
@@ -0,0 +1,44 @@
+from datetime import timedelta
+from math import ceil
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .reminders import dispatch_reminders, due_reminders, expire_late_reminders
+from .rollups import rebuild_rollup_range
+
+# Trailing window rebuilt by the periodic task; future days are included
+# because sessions are scheduled ahead of time
+ROLLUP_REFRESH_PAST_DAYS = 7
+ROLLUP_REFRESH_FUTURE_DAYS = 30
+
+
+@shared_task
+def refresh_daily_rollups(past_days=ROLLUP_REFRESH_PAST_DAYS, future_days=ROLLUP_REFRESH_FUTURE_DAYS):
+    """Rebuild the phototherapy rollups around today to repair any drift"""
+    today = timezone.localdate()
+    rebuild_rollup_range(today - timedelta(days=past_days), today + timedelta(days=future_days))
+
+
+@shared_task(ignore_result=True)
+def dispatch_due_reminders(due_before=None, reminder_ids=None, user_id=None, send_email=True):
+    """Split due reminders across up to PHOTOTHERAPY_REMINDER_WORKERS parallel senders"""
+    if due_before is None and reminder_ids is None:
+        # Scheduled run: stale reminders are failed rather than sent long after the fact
+        expire_late_reminders()
+    due = due_reminders(parse_datetime(due_before) if due_before else None, reminder_ids).count()
+    workers = min(ceil(due / settings.PHOTOTHERAPY_REMINDER_BATCH_SIZE), settings.PHOTOTHERAPY_REMINDER_WORKERS)
+    for _ in range(workers):
+        send_reminder_batches.delay(due_before, reminder_ids, user_id, send_email)
+
+
+@shared_task(ignore_result=True)
+def send_reminder_batches(due_before=None, reminder_ids=None, user_id=None, send_email=True):
+    """Send batches of due reminders until none are left"""
+    dispatch_reminders(
+        due_before=parse_datetime(due_before) if due_before else None,
+        reminder_ids=reminder_ids,
+        triggered_by=get_user_model().objects.filter(pk=user_id).first() if user_id else None,
+        send_email=send_email
+    )
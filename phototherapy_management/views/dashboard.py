@@ -13,7 +13,7 @@ from django.utils import timezone
 from django.views import View
 from django.views.generic import CreateView, ListView, DetailView
 from django.urls import reverse_lazy
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Sum
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_protect
 from django.shortcuts import get_object_or_404
@@ -29,7 +29,6 @@ from phototherapy_management.models import (
     PhototherapyDevice,
     PhototherapyPlan, 
     PhototherapyProtocol,
-    PhototherapySession,
     PhototherapyType,
     PhototherapyPayment,
     HomePhototherapyLog,
@@ -39,6 +38,11 @@ from phototherapy_management.models import (
     PhototherapyCenter
 )
 from phototherapy_management.forms import TreatmentPlanForm, PhototherapyTypeForm
+from phototherapy_management.rollups import (
+    get_completed_sessions_by_type,
+    get_daily_summary,
+    get_session_summary,
+)
 from phototherapy_management.utils import get_template_path
 
 # Configure logging and user model
@@ -101,12 +105,16 @@ class PhototherapyManagementView(LoginRequiredMixin, View):
 
     def get_context_data(self):
         try:
+            # Session, revenue and home-log statistics come from the daily rollups
+            today = timezone.localdate()
+            month_start = today.replace(day=1)
+            month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            session_summary = get_session_summary(today)
+            daily_summary = get_daily_summary(today)
+
             # Initialize base context with revenue calculation first
             initial_context = {
-                'revenue_this_month': PhototherapyPayment.objects.filter(
-                    payment_date__month=timezone.now().month,
-                    status='COMPLETED'
-                ).aggregate(total=models.Sum('amount'))['total'] or 0
+                'revenue_this_month': daily_summary['revenue_this_month']
             }
 
             # Get all plans with optimized queries
@@ -137,10 +145,7 @@ class PhototherapyManagementView(LoginRequiredMixin, View):
                 else 0
             )
 
-            last_month_revenue = PhototherapyPayment.objects.filter(
-                payment_date__month=(timezone.now() - timedelta(days=30)).month,
-                status='COMPLETED'
-            ).aggregate(total=models.Sum('amount'))['total'] or 0
+            last_month_revenue = daily_summary['last_month_revenue']
 
             revenue_growth = (
                 round(((initial_context['revenue_this_month'] - last_month_revenue) / last_month_revenue) * 100)
@@ -149,19 +154,12 @@ class PhototherapyManagementView(LoginRequiredMixin, View):
             )
 
             # Session distribution calculation
-            all_completed_sessions = PhototherapySession.objects.filter(
-                scheduled_date__month=timezone.now().month,
-                status='COMPLETED'
-            ).select_related('plan__protocol__phototherapy_type')
+            completed_by_type = get_completed_sessions_by_type(month_start, month_end)
+            total_sessions = sum(completed_by_type.values())
 
-            total_sessions = all_completed_sessions.count()
-            
             session_distribution = {}
-            for therapy_type in PhototherapyType.THERAPY_CHOICES:
-                type_key = therapy_type[0]
-                count = all_completed_sessions.filter(
-                    plan__protocol__phototherapy_type__therapy_type=type_key
-                ).count()
+            for type_key, _ in PhototherapyType.THERAPY_CHOICES:
+                count = completed_by_type.get(type_key, 0)
                 session_distribution[type_key] = round((count / total_sessions) * 100) if total_sessions > 0 else 0
 
             # Get devices needing maintenance
@@ -179,9 +177,12 @@ class PhototherapyManagementView(LoginRequiredMixin, View):
             therapy_types_count = PhototherapyType.objects.filter(is_active=True).count()
 
             # Calculate home therapy statistics
-            home_therapy_plans = PhototherapyPlan.objects.filter(
+            home_plan_stats = PhototherapyPlan.objects.filter(
                 is_active=True,
                 protocol__phototherapy_type__therapy_type='HOME_NB'  # Changed from 'HOME' to match model's THERAPY_CHOICES
+            ).aggregate(
+                count=Count('id'),
+                weekly_frequency=Sum('protocol__frequency_per_week')
             )
 
             # Get unique patients who have home therapy logs in the last 30 days
@@ -191,22 +192,13 @@ class PhototherapyManagementView(LoginRequiredMixin, View):
 
             # Use the higher count between plans and active patients
             home_therapy_count = max(
-                home_therapy_plans.count(),
+                home_plan_stats['count'],
                 active_home_therapy_patients
             )
 
             # Calculate compliance rate for home therapy
-            recent_home_logs = HomePhototherapyLog.objects.filter(
-                plan__in=home_therapy_plans,
-                date__gte=timezone.now().date() - timedelta(days=30)
-            ).values('plan', 'date').distinct()
-
-            total_expected_sessions = sum(
-                plan.protocol.frequency_per_week * 4  # Monthly expected sessions
-                for plan in home_therapy_plans
-            )
-
-            actual_sessions = recent_home_logs.count()
+            total_expected_sessions = (home_plan_stats['weekly_frequency'] or 0) * 4  # Monthly expected sessions
+            actual_sessions = daily_summary['home_log_plan_days']
 
             compliance_rate = (
                 round((actual_sessions / total_expected_sessions) * 100)
@@ -215,24 +207,14 @@ class PhototherapyManagementView(LoginRequiredMixin, View):
             )
 
             # Calculate today's sessions
-            today = timezone.now().date()
-            today_sessions = PhototherapySession.objects.filter(
-                scheduled_date=today
-            )
-            
-            sessions_today = today_sessions.count()
-            completed_today = today_sessions.filter(status='COMPLETED').count()
-            pending_today = today_sessions.filter(
-                status__in=['SCHEDULED', 'RESCHEDULED']
-            ).count()
+            sessions_today = session_summary['sessions_today']
+            completed_today = session_summary['completed_today']
+            pending_today = session_summary['pending_today']
 
             # Calculate overall compliance statistics
-            all_sessions = PhototherapySession.objects.filter(
-                scheduled_date__lte=timezone.now().date()
-            )
-            total_scheduled = all_sessions.count()
-            total_completed = all_sessions.filter(status='COMPLETED').count()
-            total_missed = all_sessions.filter(status='MISSED').count()
+            total_scheduled = session_summary['total_scheduled']
+            total_completed = session_summary['total_completed']
+            total_missed = session_summary['total_missed']
 
             # Calculate overall compliance rate
             overall_compliance = (
@@ -242,14 +224,8 @@ class PhototherapyManagementView(LoginRequiredMixin, View):
             )
 
             # Calculate month-over-month change
-            last_month = timezone.now().date() - timedelta(days=30)
-            last_month_completed = PhototherapySession.objects.filter(
-                scheduled_date__lte=last_month,
-                status='COMPLETED'
-            ).count()
-            last_month_total = PhototherapySession.objects.filter(
-                scheduled_date__lte=last_month
-            ).count()
+            last_month_completed = session_summary['last_month_completed']
+            last_month_total = session_summary['last_month_total']
 
             last_month_compliance = (
                 round((last_month_completed / last_month_total) * 100)
@@ -264,13 +240,15 @@ class PhototherapyManagementView(LoginRequiredMixin, View):
             active_treatments_count = active_treatments.count()
 
             # Get distribution by therapy type
+            treatment_counts = dict(
+                active_treatments.values_list(
+                    'protocol__phototherapy_type__therapy_type'
+                ).annotate(count=Count('id')).order_by()
+            )
             treatment_distribution = {}
-            for therapy_type in PhototherapyType.THERAPY_CHOICES:
-                count = active_treatments.filter(
-                    protocol__phototherapy_type__therapy_type=therapy_type[0]
-                ).count()
-                if count > 0:  # Only include types that have active treatments
-                    treatment_distribution[therapy_type[1]] = count
+            for type_key, type_label in PhototherapyType.THERAPY_CHOICES:
+                if treatment_counts.get(type_key):  # Only include types that have active treatments
+                    treatment_distribution[type_label] = treatment_counts[type_key]
 
             # Add recent payments with related data
             recent_payments = PhototherapyPayment.objects.select_related(
@@ -298,20 +276,18 @@ class PhototherapyManagementView(LoginRequiredMixin, View):
                 
                 # Add other existing context items...
                 'active_plans': getattr(active_plans, 'count', lambda: 0)(),
-                'completed_sessions': getattr(PhototherapySession.objects.filter(status='COMPLETED'), 'count', lambda: 0)(),
-                'missed_sessions': getattr(PhototherapySession.objects.filter(status='MISSED'), 'count', lambda: 0)(),
+                'completed_sessions': session_summary['completed_sessions'],
+                'missed_sessions': session_summary['missed_sessions'],
                 'active_devices': getattr(devices, 'count', lambda: 0)(),
                 'maintenance_needed': devices_needing_maintenance or 0,
                 
                 # Additional statistics
-                'total_sessions_this_month': PhototherapySession.objects.filter(
-                    scheduled_date__month=timezone.now().month
-                ).count() or 0,
+                'total_sessions_this_month': session_summary['total_sessions_this_month'],
                 'therapy_types_count': therapy_types_count,
                 'home_therapy_count': home_therapy_count,
                 'compliance_rate': compliance_rate,
                 'active_home_patients': active_home_therapy_patients,
-                'total_home_logs_this_month': recent_home_logs.count(),
+                'total_home_logs_this_month': actual_sessions,
 
                 # Today's sessions statistics
                 'sessions_today': sessions_today,
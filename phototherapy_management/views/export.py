@@ -2,7 +2,6 @@ from datetime import datetime
 import logging
 from io import BytesIO
 import xlsxwriter
-import csv
 
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.http import HttpResponse
@@ -19,6 +18,8 @@ from django.shortcuts import redirect
 from datetime import timedelta
 
 from access_control.permissions import PermissionManager
+from reporting_and_analytics.export_jobs import AsyncExportMixin
+from reporting_and_analytics.exports import PdfExport, XlsxExport, csv_response, iter_queryset
 from phototherapy_management.models import (
     PhototherapyPlan, PhototherapySession, PhototherapyDevice,
     PhototherapyType, PhototherapyPayment, PhototherapyProgress, PhototherapyProtocol, ProblemReport, DeviceMaintenance, PatientRFIDCard
@@ -409,7 +410,9 @@ class ProtocolExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('RIGHTPADDING', (0, 0), (-1, -1), 6),
         ])
 
-class HomeTherapyLogsExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class HomeTherapyLogsExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'phototherapy_management'
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'phototherapy_management')
 
@@ -436,29 +439,30 @@ class HomeTherapyLogsExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         view.request = request
         queryset = view.get_queryset()
 
+        summary = queryset.aggregate(
+            total_logs=Count('id'),
+            total_duration=Sum('duration_minutes'),
+            unique_patients=Count('plan__patient', distinct=True),
+        )
+
         return {
             'logs': queryset.select_related('plan__patient'),
-            'total_logs': queryset.count(),
-            'total_duration': queryset.aggregate(total=Sum('duration_minutes'))['total'] or 0,
-            'unique_patients': queryset.values('plan__patient').distinct().count(),
+            'total_logs': summary['total_logs'],
+            'total_duration': summary['total_duration'] or 0,
+            'unique_patients': summary['unique_patients'],
             'export_date': timezone.now()
         }
 
     def export_excel(self, data):
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
+        export = XlsxExport()
 
         # Add formats
-        header_format = workbook.add_format({
+        header_format = export.add_format({
             'bold': True,
             'fg_color': '#4B5563',
             'font_color': 'white',
             'border': 1
         })
-        cell_format = workbook.add_format({'border': 1})
-
-        # Create sheet
-        sheet = workbook.add_worksheet('Home Therapy Logs')
 
         # Define headers
         headers = [
@@ -471,45 +475,29 @@ class HomeTherapyLogsExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             'Notes',
             'Side Effects'
         ]
-
-        # Set column widths
         widths = [25, 15, 15, 15, 20, 30, 30, 30]
-        for i, width in enumerate(widths):
-            sheet.set_column(i, i, width)
-
-        # Write headers
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
-
-        # Write data
-        for row, log in enumerate(data['logs'], start=1):
-            sheet.write(row, 0, log.plan.patient.get_full_name(), cell_format)
-            sheet.write(row, 1, log.date.strftime('%Y-%m-%d'), cell_format)
-            sheet.write(row, 2, log.time.strftime('%H:%M'), cell_format)
-            sheet.write(row, 3, log.duration_minutes, cell_format)
-            sheet.write(row, 4, log.get_exposure_type_display(), cell_format)
-            sheet.write(row, 5, log.body_areas_treated, cell_format)
-            sheet.write(row, 6, log.notes or '', cell_format)
-            sheet.write(row, 7, log.side_effects or '', cell_format)
-
-        workbook.close()
-        output.seek(0)
 
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        rows = (
+            [
+                log.plan.patient.get_full_name(),
+                log.date.strftime('%Y-%m-%d'),
+                log.time.strftime('%H:%M'),
+                log.duration_minutes,
+                log.get_exposure_type_display(),
+                log.body_areas_treated,
+                log.notes or '',
+                log.side_effects or ''
+            ]
+            for log in iter_queryset(data['logs'])
         )
-        response['Content-Disposition'] = 'attachment; filename=home_therapy_logs.xlsx'
-        return response
+        export.write_sheet('Home Therapy Logs', headers, rows, widths=widths, header_format=header_format)
 
-    def export_pdf(self, data):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename=home_therapy_logs.pdf'
+        return export.response('home_therapy_logs.xlsx')
 
+    def export_pdf(self, data):
         # Use landscape mode with letter size for more width
-        doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-        elements = []
-        styles = getSampleStyleSheet()
+        pdf = PdfExport(pagesize=landscape(letter))
+        styles = pdf.styles
 
         # Add custom style for wrapped text
         styles.add(ParagraphStyle(
@@ -521,15 +509,16 @@ class HomeTherapyLogsExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         ))
 
         # Title and date
-        elements.append(Paragraph('Home Therapy Logs Report', styles['Heading1']))
-        elements.append(Paragraph(
-            f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}',
-            styles['Normal']
-        ))
-        elements.append(Spacer(1, 20))
+        pdf.add(
+            Paragraph('Home Therapy Logs Report', styles['Heading1']),
+            Paragraph(
+                f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}',
+                styles['Normal']
+            ),
+            Spacer(1, 20)
+        )
 
         # Summary section remains the same
-        elements.append(Paragraph('Summary', styles['Heading2']))
         summary_data = [
             ['Total Logs', str(data['total_logs'])],
             ['Total Duration', f"{data['total_duration']} minutes"],
@@ -537,38 +526,37 @@ class HomeTherapyLogsExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         ]
         summary_table = Table(summary_data, colWidths=[200, 100])
         summary_table.setStyle(self.get_table_style())
-        elements.append(summary_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(Paragraph('Summary', styles['Heading2']), summary_table, Spacer(1, 20))
 
         # Logs table with adjusted column widths and wrapped text
-        elements.append(Paragraph('Log Details', styles['Heading2']))
-        logs_data = [
-            ['Patient', 'Date', 'Duration', 'Exposure Type', 'Body Areas']
-        ]
-        
+        pdf.add(Paragraph('Log Details', styles['Heading2']))
+
         # Process the data with wrapped text for body areas
-        for log in data['logs']:
-            logs_data.append([
+        rows = (
+            [
                 log.plan.patient.get_full_name(),
                 log.date.strftime('%Y-%m-%d'),
                 f"{log.duration_minutes} mins",
                 log.get_exposure_type_display(),
                 Paragraph(log.body_areas_treated, styles['WrappedText'])
-            ])
+            ]
+            for log in iter_queryset(data['logs'])
+        )
 
-        # Adjusted column widths (total should be around 700-750 for landscape letter)
-        logs_table = Table(logs_data, colWidths=[150, 80, 80, 100, 250])
-        
         # Enhanced table style for better readability
         table_style = self.get_table_style()
         table_style.add('VALIGN', (0, 0), (-1, -1), 'MIDDLE')  # Vertical alignment
         table_style.add('ROWHEIGHT', (0, 1), (-1, -1), 30)     # Minimum row height
-        
-        logs_table.setStyle(table_style)
-        elements.append(logs_table)
 
-        doc.build(elements)
-        return response
+        # Adjusted column widths (total should be around 700-750 for landscape letter)
+        pdf.add_table(
+            ['Patient', 'Date', 'Duration', 'Exposure Type', 'Body Areas'],
+            rows,
+            col_widths=[150, 80, 80, 100, 250],
+            style=table_style
+        )
+
+        return pdf.response('home_therapy_logs.pdf')
 
     def get_table_style(self):
         """Define common table style for PDF exports"""
@@ -589,7 +577,9 @@ class HomeTherapyLogsExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('RIGHTPADDING', (0, 0), (-1, -1), 6),
         ])
 
-class DeviceDataExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class DeviceDataExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'phototherapy_management'
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'phototherapy_management')
 
@@ -612,37 +602,31 @@ class DeviceDataExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         """Gather all device-related data for export"""
         devices = PhototherapyDevice.objects.select_related(
             'phototherapy_type'
-        ).prefetch_related(
-            'maintenance_records'
         ).order_by('name')
 
+        summary = devices.aggregate(
+            total_devices=Count('id'),
+            active_devices=Count('id', filter=Q(is_active=True)),
+            maintenance_needed=Count('id', filter=Q(next_maintenance_date__lte=timezone.now().date())),
+        )
+
         return {
             'devices': devices,
-            'total_devices': devices.count(),
-            'active_devices': devices.filter(is_active=True).count(),
-            'maintenance_needed': devices.filter(
-                next_maintenance_date__lte=timezone.now().date()
-            ).count(),
+            **summary,
             'export_date': timezone.now()
         }
 
     def export_excel(self, data):
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
+        export = XlsxExport()
 
         # Add formats
-        header_format = workbook.add_format({
+        header_format = export.add_format({
             'bold': True,
             'fg_color': '#4B5563',
             'font_color': 'white',
             'border': 1
         })
-        cell_format = workbook.add_format({'border': 1})
-        date_format = workbook.add_format({'border': 1, 'num_format': 'yyyy-mm-dd'})
 
-        # Create Devices sheet
-        sheet = workbook.add_worksheet('Devices')
-        
         headers = [
             'Device Name',
             'Model Number',
@@ -655,51 +639,44 @@ class DeviceDataExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             'Next Maintenance',
             'Maintenance Notes'
         ]
-
-        # Set column widths
         widths = [25, 20, 20, 15, 20, 10, 15, 15, 15, 40]
-        for i, width in enumerate(widths):
-            sheet.set_column(i, i, width)
-
-        # Write headers
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
-
-        # Write data
-        for row, device in enumerate(data['devices'], start=1):
-            sheet.write(row, 0, device.name, cell_format)
-            sheet.write(row, 1, device.model_number, cell_format)
-            sheet.write(row, 2, device.serial_number, cell_format)
-            sheet.write(row, 3, device.phototherapy_type.name, cell_format)
-            sheet.write(row, 4, device.location, cell_format)
-            sheet.write(row, 5, 'Active' if device.is_active else 'Inactive', cell_format)
-            sheet.write(row, 6, device.installation_date, date_format)
-            sheet.write(row, 7, device.last_maintenance_date or 'N/A', date_format if device.last_maintenance_date else cell_format)
-            sheet.write(row, 8, device.next_maintenance_date or 'N/A', date_format if device.next_maintenance_date else cell_format)
-            sheet.write(row, 9, device.maintenance_notes or '', cell_format)
 
-        workbook.close()
-        output.seek(0)
-
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        rows = (
+            [
+                device.name,
+                device.model_number,
+                device.serial_number,
+                device.phototherapy_type.name,
+                device.location,
+                'Active' if device.is_active else 'Inactive',
+                device.installation_date,
+                device.last_maintenance_date or 'N/A',
+                device.next_maintenance_date or 'N/A',
+                device.maintenance_notes or ''
+            ]
+            for device in iter_queryset(data['devices'])
+        )
+        export.write_sheet(
+            'Devices',
+            headers,
+            rows,
+            widths=widths,
+            column_formats={6: export.date_format, 7: export.date_format, 8: export.date_format},
+            header_format=header_format
         )
-        response['Content-Disposition'] = f'attachment; filename=devices_export_{timezone.now().strftime("%Y%m%d_%H%M")}.xlsx'
-        return response
 
-    def export_pdf(self, data):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename=devices_export_{timezone.now().strftime("%Y%m%d_%H%M")}.pdf'
+        return export.response(f'devices_export_{timezone.now().strftime("%Y%m%d_%H%M")}.xlsx')
 
-        doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-        elements = []
-        styles = getSampleStyleSheet()
+    def export_pdf(self, data):
+        pdf = PdfExport(pagesize=landscape(letter))
+        styles = pdf.styles
 
         # Title and summary
-        elements.append(Paragraph('Device Inventory Report', styles['Heading1']))
-        elements.append(Paragraph(f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}', styles['Normal']))
-        elements.append(Spacer(1, 20))
+        pdf.add(
+            Paragraph('Device Inventory Report', styles['Heading1']),
+            Paragraph(f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}', styles['Normal']),
+            Spacer(1, 20)
+        )
 
         # Summary statistics
         summary_data = [
@@ -709,26 +686,27 @@ class DeviceDataExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         ]
         summary_table = Table(summary_data, colWidths=[200, 100])
         summary_table.setStyle(self.get_table_style())
-        elements.append(summary_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(summary_table, Spacer(1, 20))
 
         # Devices table
-        device_data = [['Device Name', 'Type', 'Location', 'Status', 'Next Maintenance']]
-        for device in data['devices']:
-            device_data.append([
+        rows = (
+            [
                 device.name,
                 device.phototherapy_type.name,
                 device.location,
                 'Active' if device.is_active else 'Inactive',
                 device.next_maintenance_date.strftime('%Y-%m-%d') if device.next_maintenance_date else 'N/A'
-            ])
+            ]
+            for device in iter_queryset(data['devices'])
+        )
+        pdf.add_table(
+            ['Device Name', 'Type', 'Location', 'Status', 'Next Maintenance'],
+            rows,
+            col_widths=[150, 100, 100, 80, 100],
+            style=self.get_table_style()
+        )
 
-        device_table = Table(device_data, colWidths=[150, 100, 100, 80, 100])
-        device_table.setStyle(self.get_table_style())
-        elements.append(device_table)
-
-        doc.build(elements)
-        return response
+        return pdf.response(f'devices_export_{timezone.now().strftime("%Y%m%d_%H%M")}.pdf')
 
     def get_table_style(self):
         return TableStyle([
@@ -748,7 +726,9 @@ class DeviceDataExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('RIGHTPADDING', (0, 0), (-1, -1), 6),
         ])
 
-class ReportExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class ReportExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'phototherapy_management'
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'phototherapy_management')
 
@@ -777,11 +757,11 @@ class ReportExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         
         problem_reports = ProblemReport.objects.filter(
             reported_at__date__gte=start_date
-        ).select_related('session', 'reported_by')
+        ).select_related('session__plan__patient', 'reported_by')
         
         progress_records = PhototherapyProgress.objects.filter(
             assessment_date__gte=start_date
-        ).select_related('plan', 'assessed_by')
+        ).select_related('plan__patient', 'assessed_by')
         
         maintenance_records = DeviceMaintenance.objects.filter(
             maintenance_date__gte=start_date
@@ -789,7 +769,7 @@ class ReportExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         
         sessions = PhototherapySession.objects.filter(
             scheduled_date__gte=start_date
-        )
+        ).select_related('plan__patient', 'device')
 
         return {
             'date_range': date_range,
@@ -801,144 +781,136 @@ class ReportExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         }
 
     def export_excel(self, data):
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
+        export = XlsxExport()
 
         # Add formats
-        header_format = workbook.add_format({
+        header_format = export.add_format({
             'bold': True,
             'fg_color': '#4B5563',
             'font_color': 'white',
             'border': 1
         })
-        cell_format = workbook.add_format({'border': 1})
 
         # Problem Reports Sheet
-        self._create_problems_sheet(workbook, data['problem_reports'], header_format, cell_format)
+        self._create_problems_sheet(export, data['problem_reports'], header_format)
         
         # Progress Sheet
-        self._create_progress_sheet(workbook, data['progress_records'], header_format, cell_format)
+        self._create_progress_sheet(export, data['progress_records'], header_format)
         
         # Maintenance Sheet
-        self._create_maintenance_sheet(workbook, data['maintenance_records'], header_format, cell_format)
+        self._create_maintenance_sheet(export, data['maintenance_records'], header_format)
         
         # Sessions Sheet
-        self._create_sessions_sheet(workbook, data['sessions'], header_format, cell_format)
+        self._create_sessions_sheet(export, data['sessions'], header_format)
 
-        workbook.close()
-        output.seek(0)
+        return export.response(f'phototherapy_report_{timezone.now().strftime("%Y%m%d")}.xlsx')
 
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    def _create_problems_sheet(self, export, problems, header_format):
+        headers = ['Date', 'Patient', 'Problem', 'Severity', 'Status', 'Resolution Time']
+        rows = (
+            [
+                problem.reported_at.strftime('%Y-%m-%d'),
+                problem.session.plan.patient.get_full_name(),
+                problem.problem_description,
+                problem.get_severity_display(),
+                'Resolved' if problem.resolved else 'Pending',
+                str(problem.resolved_at - problem.reported_at if problem.resolved else 'N/A')
+            ]
+            for problem in iter_queryset(problems)
         )
-        response['Content-Disposition'] = f'attachment; filename=phototherapy_report_{timezone.now().strftime("%Y%m%d")}.xlsx'
-        return response
+        export.write_sheet('Problem Reports', headers, rows, header_format=header_format)
 
-    def _create_problems_sheet(self, workbook, problems, header_format, cell_format):
-        sheet = workbook.add_worksheet('Problem Reports')
-        headers = ['Date', 'Patient', 'Problem', 'Severity', 'Status', 'Resolution Time']
-        
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
-            
-        for row, problem in enumerate(problems, start=1):
-            sheet.write(row, 0, problem.reported_at.strftime('%Y-%m-%d'), cell_format)
-            sheet.write(row, 1, problem.session.plan.patient.get_full_name(), cell_format)
-            sheet.write(row, 2, problem.problem_description, cell_format)
-            sheet.write(row, 3, problem.get_severity_display(), cell_format)
-            sheet.write(row, 4, 'Resolved' if problem.resolved else 'Pending', cell_format)
-            resolution_time = problem.resolved_at - problem.reported_at if problem.resolved else 'N/A'
-            sheet.write(row, 5, str(resolution_time), cell_format)
-
-    def _create_progress_sheet(self, workbook, progress_records, header_format, cell_format):
-        sheet = workbook.add_worksheet('Progress')
+    def _create_progress_sheet(self, export, progress_records, header_format):
         headers = ['Date', 'Patient', 'Response Level', 'Improvement %', 'Next Assessment']
-        
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
-            
-        for row, progress in enumerate(progress_records, start=1):
-            sheet.write(row, 0, progress.assessment_date.strftime('%Y-%m-%d'), cell_format)
-            sheet.write(row, 1, progress.plan.patient.get_full_name(), cell_format)
-            sheet.write(row, 2, progress.get_response_level_display(), cell_format)
-            sheet.write(row, 3, progress.improvement_percentage, cell_format)
-            next_date = progress.next_assessment_date.strftime('%Y-%m-%d') if progress.next_assessment_date else 'N/A'
-            sheet.write(row, 4, next_date, cell_format)
-
-    def _create_maintenance_sheet(self, workbook, maintenance_records, header_format, cell_format):
-        sheet = workbook.add_worksheet('Maintenance')
+        rows = (
+            [
+                progress.assessment_date.strftime('%Y-%m-%d'),
+                progress.plan.patient.get_full_name(),
+                progress.get_response_level_display(),
+                progress.improvement_percentage,
+                progress.next_assessment_date.strftime('%Y-%m-%d') if progress.next_assessment_date else 'N/A'
+            ]
+            for progress in iter_queryset(progress_records)
+        )
+        export.write_sheet('Progress', headers, rows, header_format=header_format)
+
+    def _create_maintenance_sheet(self, export, maintenance_records, header_format):
         headers = ['Date', 'Device', 'Type', 'Cost', 'Next Due', 'Performed By']
-        
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
-            
-        for row, maintenance in enumerate(maintenance_records, start=1):
-            sheet.write(row, 0, maintenance.maintenance_date.strftime('%Y-%m-%d'), cell_format)
-            sheet.write(row, 1, maintenance.device.name, cell_format)
-            sheet.write(row, 2, maintenance.get_maintenance_type_display(), cell_format)
-            sheet.write(row, 3, float(maintenance.cost), cell_format)
-            next_due = maintenance.next_maintenance_due.strftime('%Y-%m-%d') if maintenance.next_maintenance_due else 'N/A'
-            sheet.write(row, 4, next_due, cell_format)
-            sheet.write(row, 5, maintenance.performed_by, cell_format)
-
-    def _create_sessions_sheet(self, workbook, sessions, header_format, cell_format):
-        sheet = workbook.add_worksheet('Sessions')
+        rows = (
+            [
+                maintenance.maintenance_date.strftime('%Y-%m-%d'),
+                maintenance.device.name,
+                maintenance.get_maintenance_type_display(),
+                float(maintenance.cost),
+                maintenance.next_maintenance_due.strftime('%Y-%m-%d') if maintenance.next_maintenance_due else 'N/A',
+                maintenance.performed_by
+            ]
+            for maintenance in iter_queryset(maintenance_records)
+        )
+        export.write_sheet('Maintenance', headers, rows, header_format=header_format)
+
+    def _create_sessions_sheet(self, export, sessions, header_format):
         headers = ['Date', 'Patient', 'Device', 'Status', 'Duration', 'Dose']
-        
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
-            
-        for row, session in enumerate(sessions, start=1):
-            sheet.write(row, 0, session.scheduled_date.strftime('%Y-%m-%d'), cell_format)
-            sheet.write(row, 1, session.plan.patient.get_full_name(), cell_format)
-            sheet.write(row, 2, session.device.name if session.device else 'N/A', cell_format)
-            sheet.write(row, 3, session.get_status_display(), cell_format)
-            sheet.write(row, 4, session.duration_seconds or 'N/A', cell_format)
-            sheet.write(row, 5, session.actual_dose or 'N/A', cell_format)
+        rows = (
+            [
+                session.scheduled_date.strftime('%Y-%m-%d'),
+                session.plan.patient.get_full_name(),
+                session.device.name if session.device else 'N/A',
+                session.get_status_display(),
+                session.duration_seconds or 'N/A',
+                session.actual_dose or 'N/A'
+            ]
+            for session in iter_queryset(sessions)
+        )
+        export.write_sheet('Sessions', headers, rows, header_format=header_format)
 
     def export_pdf(self, data):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename=phototherapy_report_{timezone.now().strftime("%Y%m%d")}.pdf'
-
-        doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-        elements = []
-        styles = getSampleStyleSheet()
+        pdf = PdfExport(pagesize=landscape(letter))
+        styles = pdf.styles
 
         # Title
-        elements.append(Paragraph('Phototherapy Report', styles['Heading1']))
-        elements.append(Paragraph(f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}', styles['Normal']))
-        elements.append(Spacer(1, 20))
+        pdf.add(
+            Paragraph('Phototherapy Report', styles['Heading1']),
+            Paragraph(f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}', styles['Normal']),
+            Spacer(1, 20)
+        )
 
         # Problems Summary
-        elements.append(Paragraph('Problem Reports', styles['Heading2']))
-        problem_data = [['Date', 'Severity', 'Status']]
-        for problem in data['problem_reports']:
-            problem_data.append([
+        pdf.add(Paragraph('Problem Reports', styles['Heading2']))
+        problem_rows = (
+            [
                 problem.reported_at.strftime('%Y-%m-%d'),
                 problem.get_severity_display(),
                 'Resolved' if problem.resolved else 'Pending'
-            ])
-        problem_table = Table(problem_data, colWidths=[100, 100, 100])
-        problem_table.setStyle(self.get_table_style())
-        elements.append(problem_table)
-        elements.append(Spacer(1, 20))
+            ]
+            for problem in iter_queryset(data['problem_reports'])
+        )
+        pdf.add_table(
+            ['Date', 'Severity', 'Status'],
+            problem_rows,
+            col_widths=[100, 100, 100],
+            style=self.get_table_style()
+        )
+        pdf.add(Spacer(1, 20))
 
         # Progress Summary
-        elements.append(Paragraph('Treatment Progress', styles['Heading2']))
-        progress_data = [['Date', 'Response', 'Improvement']]
-        for progress in data['progress_records']:
-            progress_data.append([
+        pdf.add(Paragraph('Treatment Progress', styles['Heading2']))
+        progress_rows = (
+            [
                 progress.assessment_date.strftime('%Y-%m-%d'),
                 progress.get_response_level_display(),
                 f"{progress.improvement_percentage}%"
-            ])
-        progress_table = Table(progress_data, colWidths=[100, 100, 100])
-        progress_table.setStyle(self.get_table_style())
-        elements.append(progress_table)
+            ]
+            for progress in iter_queryset(data['progress_records'])
+        )
+        pdf.add_table(
+            ['Date', 'Response', 'Improvement'],
+            progress_rows,
+            col_widths=[100, 100, 100],
+            style=self.get_table_style()
+        )
 
-        doc.build(elements)
-        return response
+        return pdf.response(f'phototherapy_report_{timezone.now().strftime("%Y%m%d")}.pdf')
 
     def get_table_style(self):
         return TableStyle([
@@ -955,7 +927,9 @@ class ReportExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('GRID', (0, 0), (-1, -1), 1, colors.black)
         ])
 
-class TreatmentPlanExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class TreatmentPlanExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'phototherapy_management'
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'phototherapy_management')
 
@@ -982,41 +956,33 @@ class TreatmentPlanExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             'protocol__phototherapy_type',
             'created_by',
             'rfid_card'
-        ).prefetch_related(
-            'sessions',
-            'progress_records',
-            'payments'
+        )
+
+        summary = plans.aggregate(
+            total_plans=Count('id'),
+            active_plans=Count('id', filter=Q(is_active=True)),
+            completed_plans=Count('id', filter=Q(sessions_completed__gte=models.F('total_sessions_planned'))),
         )
 
         return {
             'plans': plans,
-            'total_plans': plans.count(),
-            'active_plans': plans.filter(is_active=True).count(),
-            'completed_plans': plans.filter(
-                sessions_completed__gte=models.F('total_sessions_planned')
-            ).count(),
+            **summary,
             'export_date': timezone.now()
         }
 
     def export_excel(self, data):
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
+        export = XlsxExport()
 
         # Add formats
-        header_format = workbook.add_format({
+        header_format = export.add_format({
             'bold': True,
             'fg_color': '#4B5563',
             'font_color': 'white',
             'border': 1
         })
-        cell_format = workbook.add_format({'border': 1})
-        date_format = workbook.add_format({'border': 1, 'num_format': 'yyyy-mm-dd'})
-        number_format = workbook.add_format({'border': 1, 'num_format': '#,##0.00'})
-        percent_format = workbook.add_format({'border': 1, 'num_format': '0.00%'})
+        number_format = export.add_format({'border': 1, 'num_format': '#,##0.00'})
+        percent_format = export.add_format({'border': 1, 'num_format': '0.00%'})
 
-        # Create Plans sheet
-        sheet = workbook.add_worksheet('Treatment Plans')
-        
         headers = [
             'Patient Name',
             'Patient Email',
@@ -1032,54 +998,47 @@ class TreatmentPlanExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             'Created By',
             'Created Date'
         ]
-
-        # Set column widths
         widths = [25, 30, 20, 15, 15, 15, 15, 15, 15, 10, 15, 25, 15]
-        for i, width in enumerate(widths):
-            sheet.set_column(i, i, width)
-
-        # Write headers
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
-
-        # Write data
-        for row, plan in enumerate(data['plans'], start=1):
-            sheet.write(row, 0, plan.patient.get_full_name(), cell_format)
-            sheet.write(row, 1, plan.patient.email, cell_format)
-            sheet.write(row, 2, plan.protocol.name, cell_format)
-            sheet.write(row, 3, plan.start_date, date_format)
-            sheet.write(row, 4, plan.sessions_completed, cell_format)
-            sheet.write(row, 5, plan.total_sessions_planned, cell_format)
-            sheet.write(row, 6, plan.get_completion_percentage()/100, percent_format)
-            sheet.write(row, 7, float(plan.total_cost), number_format)
-            sheet.write(row, 8, float(plan.amount_paid), number_format)
-            sheet.write(row, 9, 'Active' if plan.is_active else 'Inactive', cell_format)
-            sheet.write(row, 10, plan.rfid_card.card_number if plan.rfid_card else 'N/A', cell_format)
-            sheet.write(row, 11, plan.created_by.get_full_name(), cell_format)
-            sheet.write(row, 12, plan.created_at.strftime('%Y-%m-%d'), cell_format)
 
-        workbook.close()
-        output.seek(0)
-
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        rows = (
+            [
+                plan.patient.get_full_name(),
+                plan.patient.email,
+                plan.protocol.name,
+                plan.start_date,
+                plan.sessions_completed,
+                plan.total_sessions_planned,
+                plan.get_completion_percentage()/100,
+                float(plan.total_cost),
+                float(plan.amount_paid),
+                'Active' if plan.is_active else 'Inactive',
+                plan.rfid_card.card_number if plan.rfid_card else 'N/A',
+                plan.created_by.get_full_name(),
+                plan.created_at.strftime('%Y-%m-%d')
+            ]
+            for plan in iter_queryset(data['plans'])
+        )
+        export.write_sheet(
+            'Treatment Plans',
+            headers,
+            rows,
+            widths=widths,
+            column_formats={3: export.date_format, 6: percent_format, 7: number_format, 8: number_format},
+            header_format=header_format
         )
-        response['Content-Disposition'] = f'attachment; filename=treatment_plans_{timezone.now().strftime("%Y%m%d_%H%M")}.xlsx'
-        return response
 
-    def export_pdf(self, data):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename=treatment_plans_{timezone.now().strftime("%Y%m%d_%H%M")}.pdf'
+        return export.response(f'treatment_plans_{timezone.now().strftime("%Y%m%d_%H%M")}.xlsx')
 
-        doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-        elements = []
-        styles = getSampleStyleSheet()
+    def export_pdf(self, data):
+        pdf = PdfExport(pagesize=landscape(letter))
+        styles = pdf.styles
 
         # Title
-        elements.append(Paragraph('Treatment Plans Report', styles['Heading1']))
-        elements.append(Paragraph(f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}', styles['Normal']))
-        elements.append(Spacer(1, 20))
+        pdf.add(
+            Paragraph('Treatment Plans Report', styles['Heading1']),
+            Paragraph(f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}', styles['Normal']),
+            Spacer(1, 20)
+        )
 
         # Summary statistics
         summary_data = [
@@ -1089,26 +1048,27 @@ class TreatmentPlanExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         ]
         summary_table = Table(summary_data, colWidths=[200, 100])
         summary_table.setStyle(self.get_table_style())
-        elements.append(summary_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(summary_table, Spacer(1, 20))
 
         # Plans table
-        plans_data = [['Patient', 'Protocol', 'Progress', 'Cost', 'Status']]
-        for plan in data['plans']:
-            plans_data.append([
+        rows = (
+            [
                 plan.patient.get_full_name(),
                 plan.protocol.name,
                 f"{plan.get_completion_percentage()}%",
                 f"₹{plan.total_cost}",
                 'Active' if plan.is_active else 'Inactive'
-            ])
-
-        plans_table = Table(plans_data, colWidths=[150, 150, 100, 100, 100])
-        plans_table.setStyle(self.get_table_style())
-        elements.append(plans_table)
+            ]
+            for plan in iter_queryset(data['plans'])
+        )
+        pdf.add_table(
+            ['Patient', 'Protocol', 'Progress', 'Cost', 'Status'],
+            rows,
+            col_widths=[150, 150, 100, 100, 100],
+            style=self.get_table_style()
+        )
 
-        doc.build(elements)
-        return response
+        return pdf.response(f'treatment_plans_{timezone.now().strftime("%Y%m%d_%H%M")}.pdf')
 
     def get_table_style(self):
         return TableStyle([
@@ -1128,7 +1088,21 @@ class TreatmentPlanExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('RIGHTPADDING', (0, 0), (-1, -1), 6),
         ])
 
-class RFIDCardExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class RFIDCardExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'phototherapy_management'
+
+    CARD_HEADERS = [
+        'Card Number',
+        'Patient Name',
+        'Patient Email',
+        'Status',
+        'Assigned Date',
+        'Expiry Date',
+        'Last Used',
+        'Active Plans',
+        'Notes'
+    ]
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'phototherapy_management')
 
@@ -1160,86 +1134,65 @@ class RFIDCardExportView(LoginRequiredMixin, UserPassesTestMixin, View):
                 filter=Q(patient__phototherapy_plans__is_active=True))
         ).order_by('-assigned_date')
 
+        summary = PatientRFIDCard.objects.aggregate(
+            total_cards=Count('id'),
+            active_cards=Count('id', filter=Q(is_active=True, expires_at__gt=now)),
+            expired_cards=Count('id', filter=Q(expires_at__lte=now)),
+        )
+
         return {
             'cards': cards,
-            'total_cards': cards.count(),
-            'active_cards': cards.filter(is_active=True, expires_at__gt=now).count(),
-            'expired_cards': cards.filter(expires_at__lte=now).count(),
+            **summary,
             'export_date': now
         }
 
+    def get_card_rows(self, cards):
+        for card in iter_queryset(cards):
+            yield [
+                card.card_number,
+                card.patient.get_full_name(),
+                card.patient.email,
+                'Active' if card.is_active else 'Inactive',
+                card.assigned_date.strftime('%Y-%m-%d'),
+                card.expires_at.strftime('%Y-%m-%d'),
+                card.last_used.strftime('%Y-%m-%d') if card.last_used else 'Never',
+                card.active_plans,
+                card.notes or ''
+            ]
+
     def export_excel(self, data):
-        output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
+        export = XlsxExport()
 
         # Add formats
-        header_format = workbook.add_format({
+        header_format = export.add_format({
             'bold': True,
             'fg_color': '#4B5563',
             'font_color': 'white',
             'border': 1
         })
-        cell_format = workbook.add_format({'border': 1})
-        date_format = workbook.add_format({'border': 1, 'num_format': 'yyyy-mm-dd'})
-
-        # Create sheet
-        sheet = workbook.add_worksheet('RFID Cards')
-        
-        headers = [
-            'Card Number',
-            'Patient Name',
-            'Patient Email',
-            'Status',
-            'Assigned Date',
-            'Expiry Date',
-            'Last Used',
-            'Active Plans',
-            'Notes'
-        ]
 
-        # Set column widths
         widths = [20, 30, 35, 15, 15, 15, 15, 15, 40]
-        for i, width in enumerate(widths):
-            sheet.set_column(i, i, width)
-
-        # Write headers
-        for col, header in enumerate(headers):
-            sheet.write(0, col, header, header_format)
-
-        # Write data
-        for row, card in enumerate(data['cards'], start=1):
-            sheet.write(row, 0, card.card_number, cell_format)
-            sheet.write(row, 1, card.patient.get_full_name(), cell_format)
-            sheet.write(row, 2, card.patient.email, cell_format)
-            sheet.write(row, 3, 'Active' if card.is_active else 'Inactive', cell_format)
-            sheet.write(row, 4, card.assigned_date.strftime('%Y-%m-%d'), date_format)
-            sheet.write(row, 5, card.expires_at.strftime('%Y-%m-%d'), date_format)
-            sheet.write(row, 6, card.last_used.strftime('%Y-%m-%d') if card.last_used else 'Never', cell_format)
-            sheet.write(row, 7, card.active_plans, cell_format)
-            sheet.write(row, 8, card.notes or '', cell_format)
-
-        workbook.close()
-        output.seek(0)
-
-        response = HttpResponse(
-            output.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        export.write_sheet(
+            'RFID Cards',
+            self.CARD_HEADERS,
+            self.get_card_rows(data['cards']),
+            widths=widths,
+            column_formats={4: export.date_format, 5: export.date_format},
+            header_format=header_format
         )
-        response['Content-Disposition'] = f'attachment; filename=rfid_cards_{timezone.now().strftime("%Y%m%d")}.xlsx'
-        return response
 
-    def export_pdf(self, data):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename=rfid_cards_{timezone.now().strftime("%Y%m%d")}.pdf'
+        return export.response(f'rfid_cards_{timezone.now().strftime("%Y%m%d")}.xlsx')
 
-        doc = SimpleDocTemplate(response, pagesize=landscape(letter))
-        elements = []
-        styles = getSampleStyleSheet()
+    def export_pdf(self, data):
+        pdf = PdfExport(pagesize=landscape(letter))
+        styles = pdf.styles
 
         # Title
-        elements.append(Paragraph('RFID Cards Report', styles['Heading1']))
-        elements.append(Paragraph(f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}', styles['Normal']))
-        elements.append(Spacer(1, 20))
+        pdf.add(
+            Paragraph('RFID Cards Report', styles['Heading1']),
+            Paragraph(f'Generated on: {data["export_date"].strftime("%Y-%m-%d %H:%M")}', styles['Normal']),
+            Spacer(1, 20)
+        )
 
         # Summary statistics
         summary_data = [
@@ -1249,58 +1202,34 @@ class RFIDCardExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         ]
         summary_table = Table(summary_data, colWidths=[200, 100])
         summary_table.setStyle(self.get_table_style())
-        elements.append(summary_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(summary_table, Spacer(1, 20))
 
         # Cards table
-        cards_data = [['Card Number', 'Patient', 'Status', 'Expiry Date', 'Active Plans']]
-        for card in data['cards']:
-            cards_data.append([
+        rows = (
+            [
                 card.card_number,
                 card.patient.get_full_name(),
                 'Active' if card.is_active else 'Inactive',
                 card.expires_at.strftime('%Y-%m-%d'),
                 str(card.active_plans)
-            ])
-
-        cards_table = Table(cards_data, colWidths=[100, 150, 80, 100, 80])
-        cards_table.setStyle(self.get_table_style())
-        elements.append(cards_table)
+            ]
+            for card in iter_queryset(data['cards'])
+        )
+        pdf.add_table(
+            ['Card Number', 'Patient', 'Status', 'Expiry Date', 'Active Plans'],
+            rows,
+            col_widths=[100, 150, 80, 100, 80],
+            style=self.get_table_style()
+        )
 
-        doc.build(elements)
-        return response
+        return pdf.response(f'rfid_cards_{timezone.now().strftime("%Y%m%d")}.pdf')
 
     def export_csv(self, data):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename=rfid_cards_{timezone.now().strftime("%Y%m%d")}.csv'
-
-        writer = csv.writer(response)
-        writer.writerow([
-            'Card Number',
-            'Patient Name',
-            'Patient Email',
-            'Status',
-            'Assigned Date',
-            'Expiry Date',
-            'Last Used',
-            'Active Plans',
-            'Notes'
-        ])
-
-        for card in data['cards']:
-            writer.writerow([
-                card.card_number,
-                card.patient.get_full_name(),
-                card.patient.email,
-                'Active' if card.is_active else 'Inactive',
-                card.assigned_date.strftime('%Y-%m-%d'),
-                card.expires_at.strftime('%Y-%m-%d'),
-                card.last_used.strftime('%Y-%m-%d') if card.last_used else 'Never',
-                card.active_plans,
-                card.notes or ''
-            ])
-
-        return response
+        return csv_response(
+            f'rfid_cards_{timezone.now().strftime("%Y%m%d")}.csv',
+            self.CARD_HEADERS,
+            self.get_card_rows(data['cards'])
+        )
 
     def get_table_style(self):
         """Define common table style for PDF exports"""
@@ -11,9 +11,6 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 from django.views.generic import View, ListView, CreateView
 from django.urls import reverse_lazy
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.conf import settings
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.views.generic.edit import UpdateView, DeleteView
@@ -28,6 +25,8 @@ from phototherapy_management.models import (
     PhototherapyReminder, PhototherapyPlan
 )
 from phototherapy_management.forms import PhototherapyReminderForm
+from phototherapy_management.reminders import due_reminders
+from phototherapy_management.tasks import dispatch_due_reminders
 from phototherapy_management.utils import get_template_path
 
 # Configure logging
@@ -184,33 +183,16 @@ def send_reminder(request):
 
     try:
         reminder = PhototherapyReminder.objects.get(id=reminder_id, status='PENDING')
-        
-        if send_email:
-            # Prepare email content
-            html_message = render_to_string('emails/phototherapy/reminder.html', {
-                'reminder': reminder
-            })
-            
-            # Send email
-            send_mail(
-                subject='Phototherapy Reminder',
-                message=reminder.message,
-                html_message=html_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[reminder.plan.patient.email],
-                fail_silently=False,
-            )
 
-        if send_sms:
-            # Implement SMS sending logic here
-            pass
-
-        # Update reminder status
-        reminder.status = 'SENT'
-        reminder.sent_at = timezone.now()
-        reminder.save()
+        # Sent by a worker over the batched dispatch
+        dispatch_due_reminders.delay(
+            due_before=reminder.scheduled_datetime.isoformat(),
+            reminder_ids=[reminder.id],
+            user_id=request.user.id,
+            send_email=send_email
+        )
 
-        messages.success(request, 'Reminder sent successfully!')
+        messages.success(request, 'Reminder is being sent.')
     except PhototherapyReminder.DoesNotExist:
         messages.error(request, 'Reminder not found or already sent.')
     except Exception as e:
@@ -266,58 +248,21 @@ class SendAllRemindersView(LoginRequiredMixin, View):
             today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
             today_end = today_start + timedelta(days=1)
             
-            pending_reminders = PhototherapyReminder.objects.filter(
-                status='PENDING',
-                scheduled_datetime__range=(today_start, today_end)
-            ).select_related('plan', 'plan__patient')
-
-            success_count = 0
-            failed_count = 0
-
-            for reminder in pending_reminders:
-                try:
-                    if send_email:
-                        # Send email reminder
-                        send_mail(
-                            subject='Phototherapy Reminder',
-                            message=reminder.message,
-                            from_email=settings.DEFAULT_FROM_EMAIL,
-                            recipient_list=[reminder.plan.patient.email],
-                            html_message=render_to_string(
-                                'emails/phototherapy/reminder.html',
-                                {'reminder': reminder}
-                            )
-                        )
-
-                    if send_sms:
-                        # Implement SMS sending logic here
-                        pass
-
-                    # Update reminder status
-                    reminder.status = 'SENT'
-                    reminder.sent_at = timezone.now()
-                    reminder.save()
-                    success_count += 1
-
-                except Exception as e:
-                    logger.error(f"Failed to send reminder {reminder.id}: {str(e)}")
-                    reminder.status = 'FAILED'
-                    reminder.error_message = str(e)
-                    reminder.save()
-                    failed_count += 1
-
-            if success_count > 0:
-                messages.success(
-                    request, 
-                    f"Successfully sent {success_count} reminder{'s' if success_count != 1 else ''}"
-                )
-            if failed_count > 0:
-                messages.error(
-                    request, 
-                    f"Failed to send {failed_count} reminder{'s' if failed_count != 1 else ''}"
-                )
-            if success_count == 0 and failed_count == 0:
+            pending_count = due_reminders(today_end).count()
+            if not pending_count:
                 messages.info(request, "No pending reminders found for today")
+                return redirect('reminders_dashboard')
+
+            # Sent in batches by background workers; results are recorded per batch
+            dispatch_due_reminders.delay(
+                due_before=today_end.isoformat(),
+                user_id=request.user.id,
+                send_email=send_email
+            )
+            messages.success(
+                request,
+                f"Sending {pending_count} reminder{'s' if pending_count != 1 else ''} in the background"
+            )
 
         except Exception as e:
             logger.error(f"Error in send all reminders: {str(e)}")
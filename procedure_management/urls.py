@@ -64,6 +64,7 @@ urlpatterns = [
     path('media/', media_views.MediaListView.as_view(), name='media_list'),
     path('media/create/', media_views.MediaCreateView.as_view(), name='media_create'),
     path('media/<int:pk>/', media_views.MediaDetailView.as_view(), name='media_detail'),
+    path('media/<int:pk>/file/', media_views.MediaFileView.as_view(), name='media_file'),
     path('media/<int:pk>/edit/', media_views.MediaUpdateView.as_view(), name='media_update'),
     path('media/<int:pk>/delete/', media_views.MediaDeleteView.as_view(), name='media_delete'),
     
@@ -12,6 +12,7 @@ from django.views.generic import TemplateView
 
 # Local imports
 from access_control.utils import PermissionManager
+from dashboard.utils import cache_dashboard_data
 from error_handling.views import handler403, handler500, handler401
 from ..models import (
     Procedure, ProcedureType, ProcedureCategory,
@@ -40,18 +41,11 @@ class ProcedureManagementView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         
         try:
-            today = timezone.now().date()
             additional_context = {
-                # Key metrics
-                'total_procedures': Procedure.objects.count(),
-                'today_procedures': Procedure.objects.filter(scheduled_date=today).count(),
+                # Key metrics and procedure statistics
+                **self.get_procedure_stats(),
                 'pending_consents': ConsentForm.objects.filter(signed_by_patient=False).count(),
                 
-                # Procedure statistics
-                'procedure_by_status': Procedure.objects.values('status').annotate(
-                    count=Count('id')
-                ).order_by('status'),
-                
                 # Recent procedures
                 'recent_procedures': Procedure.objects.select_related(
                     'procedure_type', 'patient', 'primary_doctor'
@@ -71,16 +65,11 @@ class ProcedureManagementView(LoginRequiredMixin, TemplateView):
                     'procedure'
                 ).order_by('-uploaded_at')[:5],
                 
-                # Procedure trends
-                'weekly_trends': self.get_weekly_trends(),
-                
                 # Priority distribution
                 'priority_distribution': ProcedureType.objects.values(
                     'priority'
                 ).annotate(count=Count('id')),
                 
-                # Add status distribution data
-                'status_distribution': json.dumps(self.get_status_distribution()),
             }
             context.update(additional_context)
             return context
@@ -91,6 +80,19 @@ class ProcedureManagementView(LoginRequiredMixin, TemplateView):
             context.update(default_context)
             return context
 
+    @cache_dashboard_data('procedure_dashboard_stats', depends_on=(Procedure,))
+    def get_procedure_stats(self):
+        today = timezone.localdate()
+        return {
+            'total_procedures': Procedure.objects.count(),
+            'today_procedures': Procedure.objects.filter(scheduled_date=today).count(),
+            'procedure_by_status': list(Procedure.objects.values('status').annotate(
+                count=Count('id')
+            ).order_by('status')),
+            'weekly_trends': self.get_weekly_trends(),
+            'status_distribution': json.dumps(self.get_status_distribution()),
+        }
+
     def get_weekly_trends(self):
         try:
             end_date = timezone.now().date()
@@ -5,7 +5,9 @@ import logging
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Q
+from django.shortcuts import get_object_or_404
 from django.urls import reverse_lazy
+from django.views import View
 from django.views.generic import (
     CreateView,
     DeleteView,
@@ -15,6 +17,7 @@ from django.views.generic import (
 )
 
 # Third-party app imports
+from access_control.protected_media import serve_file
 from access_control.utils import PermissionManager
 from error_handling.views import handler401, handler403, handler500
 
@@ -121,6 +124,19 @@ class MediaDetailView(LoginRequiredMixin, DetailView):
             logger.error(f"Dispatch error: {str(e)}", exc_info=True)
             return handler500(request, "Error accessing media details")
 
+class MediaFileView(LoginRequiredMixin, View):
+    """Serves a media file with conditional and range requests, so videos can be seeked"""
+
+    def get(self, request, pk):
+        if not request.user.is_authenticated:
+            return handler401(request, "Authentication required")
+
+        media = get_object_or_404(ProcedureMedia, pk=pk)
+        if media.is_private and not PermissionManager.check_module_access(request.user, 'procedure_management'):
+            logger.warning(f"Access denied for user {request.user} to private media file")
+            return handler403(request, "Access denied to private media")
+        return serve_file(request, media.file, as_attachment='download' in request.GET)
+
 class MediaCreateView(LoginRequiredMixin, CreateView):
     """View for uploading new media files"""
     model = ProcedureMedia
@@ -0,0 +1,145 @@
+"""
+Automatic assignment of new queries to staff.
+
+A new query goes to the eligible staff member with the fewest open queries,
+ties broken at random. Assignment happens in pre_save, so the assignee is
+written by the same INSERT as the query.
+
+The pool of eligible staff is cached with the dashboard cache and retired
+whenever a user or role changes. Each staff member's open-query count is
+kept in StaffQueryLoad and adjusted with F() updates as queries are
+assigned, reassigned, closed or deleted. Rebuilding the pool also recounts
+the loads of its members from the queries themselves, which corrects any
+drift from bulk updates that bypass signals.
+
+Code that creates queries with bulk_create, which skips the signals, calls
+assign_bulk() before the insert and record_bulk_assignments() after it.
+"""
+import heapq
+import logging
+import random
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from access_control.models import Role
+from dashboard.cache import get_or_compute
+from vitigo_pms.queueing import queue_on_commit
+from .models import Query, StaffQueryLoad
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+STAFF_ROLES = ['NURSE', 'DOCTOR', 'MEDICAL_ASSISTANT', 'ADMINISTRATOR']
+OPEN_STATUSES = ['NEW', 'IN_PROGRESS', 'WAITING']
+
+
+def _load_staff_pool():
+    staff_ids = list(User.objects.filter(
+        Q(role__name__in=STAFF_ROLES) &
+        Q(is_active=True)
+    ).exclude(
+        Q(email='') | Q(email__isnull=True)
+    ).order_by('pk').values_list('pk', flat=True))
+    recount_loads(staff_ids)
+    return staff_ids
+
+
+def get_staff_pool():
+    """Ids of the staff members new queries can be assigned to"""
+    return get_or_compute('query_assignment_pool', _load_staff_pool, bucket='all', depends_on=(User, Role))
+
+
+def recount_loads(staff_ids):
+    """Reset the open-query counts of the given staff members from their assigned queries"""
+    counts = dict(Query.objects.filter(
+        assigned_to__in=staff_ids,
+        status__in=OPEN_STATUSES
+    ).order_by().values('assigned_to').annotate(count=Count('pk')).values_list('assigned_to', 'count'))
+
+    now = timezone.now()
+    StaffQueryLoad.objects.bulk_create(
+        [StaffQueryLoad(staff_id=staff_id, open_queries=counts.get(staff_id, 0), updated_at=now) for staff_id in staff_ids],
+        update_conflicts=True,
+        unique_fields=['staff'],
+        update_fields=['open_queries', 'updated_at'],
+        batch_size=500
+    )
+
+
+def pick_assignee():
+    """Id of the least-loaded staff member in the pool, or None if the pool is empty"""
+    staff_ids = get_staff_pool()
+    if not staff_ids:
+        return None
+
+    loads = dict(StaffQueryLoad.objects.filter(staff_id__in=staff_ids).values_list('staff_id', 'open_queries'))
+    least = min(loads.get(staff_id, 0) for staff_id in staff_ids)
+    return random.choice([staff_id for staff_id in staff_ids if loads.get(staff_id, 0) == least])
+
+
+def pick_assignees(count):
+    """Staff ids for `count` new queries, each going to the least-loaded member once the earlier ones are counted"""
+    staff_ids = get_staff_pool()
+    if not staff_ids:
+        return [None] * count
+
+    loads = dict(StaffQueryLoad.objects.filter(staff_id__in=staff_ids).values_list('staff_id', 'open_queries'))
+    # The random second key breaks ties at random
+    heap = [(loads.get(staff_id, 0), random.random(), staff_id) for staff_id in staff_ids]
+    heapq.heapify(heap)
+    picks = []
+    for _ in range(count):
+        load, _, staff_id = heapq.heappop(heap)
+        picks.append(staff_id)
+        heapq.heappush(heap, (load + 1, random.random(), staff_id))
+    return picks
+
+
+def assign_bulk(queries):
+    """Assign unsaved queries as the pre_save signal would, for inserts with bulk_create"""
+    unassigned = [query for query in queries if not query.assigned_to_id]
+    for query, staff_id in zip(unassigned, pick_assignees(len(unassigned))):
+        query.assigned_to_id = staff_id
+        query._auto_assigned = staff_id is not None
+
+
+def record_bulk_assignments(queries):
+    """Count bulk-created queries towards their assignees' loads and notify automatic assignees"""
+    changes = Counter(open_assignee(query.assigned_to_id, query.status) for query in queries)
+    for staff_id, change in changes.items():
+        adjust_load(staff_id, change)
+    for query in queries:
+        if getattr(query, '_auto_assigned', False):
+            queue_assignment_notification(query.query_id, query.assigned_to_id)
+            query._auto_assigned = False
+
+
+def adjust_load(staff_id, change):
+    """Add `change` to a staff member's open-query count"""
+    if not staff_id or not change:
+        return
+
+    counter = StaffQueryLoad.objects.filter(staff_id=staff_id)
+    if counter.update(open_queries=F('open_queries') + change, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            StaffQueryLoad.objects.create(staff_id=staff_id, open_queries=max(change, 0))
+    except IntegrityError:
+        # Another transaction created the counter first
+        counter.update(open_queries=F('open_queries') + change, updated_at=timezone.now())
+
+
+def open_assignee(assigned_to_id, status):
+    """The staff member whose load a query counts towards, if any"""
+    return assigned_to_id if status in OPEN_STATUSES else None
+
+
+def queue_assignment_notification(query_id, staff_id):
+    """Notify a staff member of an automatic assignment from a worker, once the query is committed"""
+    queue_on_commit('query_management.tasks.notify_query_assignment', query_id, staff_id)
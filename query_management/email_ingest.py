@@ -0,0 +1,515 @@
+"""
+Incremental ingestion of query emails from an IMAP mailbox.
+
+Each mailbox folder has a MailboxCheckpoint holding its UIDVALIDITY and the
+highest UID already read, so a run only asks the server for messages that
+arrived since the last one. New messages are read in batches:
+
+- only the flags and the Message-ID, Subject, From and Date headers are
+  fetched first, with BODY.PEEK so nothing is marked as read;
+- messages that are already read, are not [VITIGO-QUERY] emails, or whose
+  Message-ID is already on a query (one indexed lookup per batch) are
+  skipped without downloading their bodies;
+- the remaining bodies are downloaded with one FETCH, and the queries and
+  their tags are created with bulk_create in the transaction that advances
+  the checkpoint;
+- the new queries' messages are then flagged \\Seen on the server.
+
+When a folder's UIDVALIDITY changes its UIDs were renumbered, so the
+checkpoint starts over from today's mail; the unique email_message_id
+column keeps queries from being created twice. ingest_mailbox() reads the
+mailbox once for the periodic task, and run_idle_worker() keeps a connection
+open and reads new mail as soon as the server announces it with IDLE.
+"""
+import email
+import imaplib
+import itertools
+import logging
+import random
+import re
+import select
+import string
+import time
+from email.header import decode_header, make_header
+from email.utils import parseaddr
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from access_control.models import Role
+from dashboard.cache import bump_generation
+from .assignment import assign_bulk, record_bulk_assignments
+from .models import MailboxCheckpoint, Query, QueryTag
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+QUERY_SUBJECT_MARKER = '[VITIGO-QUERY]'
+NEW_PATIENT_TAG = 'New Patient'
+HEADER_ITEMS = '(UID FLAGS BODY.PEEK[HEADER.FIELDS (MESSAGE-ID SUBJECT FROM DATE)])'
+BODY_ITEMS = '(UID BODY.PEEK[])'
+POLL_INTERVAL = 60  # Seconds between reads of a server without IDLE
+RECONNECT_MAX_DELAY = 5 * 60
+
+UID_PATTERN = re.compile(rb'\bUID (\d+)')
+FLAGS_PATTERN = re.compile(rb'\bFLAGS \(([^)]*)\)')
+
+_idle_tags = itertools.count(1)
+
+
+class UserManager:
+    @staticmethod
+    def generate_random_password(length=12):
+        """Generate a secure random password"""
+        characters = string.ascii_letters + string.digits + string.punctuation
+        while True:
+            password = ''.join(random.choice(characters) for i in range(length))
+            # Check if password contains at least one of each required type
+            if (any(c.islower() for c in password)
+                and any(c.isupper() for c in password)
+                and any(c.isdigit() for c in password)
+                and any(c in string.punctuation for c in password)):
+                return password
+
+    @staticmethod
+    def extract_user_info(email_body):
+        """Extract user information from email body"""
+        info = {
+            'email': None,
+            'phone_number': None,
+            'first_name': None,
+            'last_name': None,
+            'country_code': '+91'  # Default country code
+        }
+
+        try:
+            # Extract phone number using regex
+            phone_matches = re.findall(r'(?:Contact|Phone|Mobile):\s*([+\d\s-]+)', email_body, re.IGNORECASE)
+            if phone_matches:
+                phone = re.sub(r'[^\d+]', '', phone_matches[0])
+                if phone.startswith('+91'):
+                    info['country_code'] = '+91'
+                    info['phone_number'] = phone[3:]
+                else:
+                    info['phone_number'] = phone
+
+            # Extract name if provided
+            name_matches = re.findall(r'Name:\s*([^\n]+)', email_body, re.IGNORECASE)
+            if name_matches:
+                full_name = name_matches[0].strip().split(' ', 1)
+                info['first_name'] = full_name[0]
+                info['last_name'] = full_name[1] if len(full_name) > 1 else ''
+
+        except Exception as e:
+            logger.error(f"Error extracting user info: {str(e)}")
+
+        return info
+
+    @staticmethod
+    def create_patient(email, phone_number=None, first_name=None, last_name=None, country_code='+91'):
+        """Create a patient account for an unknown sender"""
+        user = User.objects.create_user(
+            email=email,
+            password=UserManager.generate_random_password(),
+            first_name=first_name or email.split('@')[0],
+            last_name=last_name or '',
+            phone_number=phone_number or '',
+            country_code=country_code,
+            role=Role.objects.get(name='PATIENT')
+        )
+        logger.info(f"Created new user with email: {email}")
+        return user
+
+    @staticmethod
+    def get_users(messages):
+        """Users who sent the messages by sender address, as (user, created) pairs.
+        Senders are matched by email, then by phone number, and patients are created for the rest"""
+        users = {
+            user.email: (user, False)
+            for user in User.objects.filter(email__in={message.sender for message in messages})
+        }
+        phone_numbers = {
+            message.user_info['phone_number'] for message in messages
+            if message.sender not in users and message.user_info['phone_number']
+        }
+        by_phone = {}
+        if phone_numbers:
+            for user in User.objects.filter(phone_number__in=phone_numbers):
+                by_phone.setdefault(user.phone_number, user)
+
+        for message in messages:
+            if message.sender in users:
+                continue
+            user = by_phone.get(message.user_info['phone_number'])
+            if user:
+                users[message.sender] = (user, False)
+            else:
+                user = UserManager.create_patient(**message.user_info)
+                users[message.sender] = (user, True)
+                if user.phone_number:
+                    by_phone.setdefault(user.phone_number, user)
+        return users
+
+
+def determine_priority(subject, body):
+    """Determine query priority based on content"""
+    subject_lower = subject.lower()
+    body_lower = body.lower()
+
+    # High priority keywords
+    if any(word in subject_lower or word in body_lower for word in
+           ['urgent', 'emergency', 'immediate', 'critical']):
+        return 'A'
+
+    # Low priority keywords
+    if any(word in subject_lower or word in body_lower for word in
+           ['feedback', 'suggestion', 'general', 'inquiry']):
+        return 'C'
+
+    # Default to medium priority
+    return 'B'
+
+
+def determine_query_type(subject, body):
+    """Determine query type based on content"""
+    content = (subject + ' ' + body).lower()
+
+    if any(word in content for word in ['appointment', 'schedule', 'booking']):
+        return 'APPOINTMENT'
+    elif any(word in content for word in ['treatment', 'medicine', 'prescription']):
+        return 'TREATMENT'
+    elif any(word in content for word in ['bill', 'payment', 'cost', 'price']):
+        return 'BILLING'
+    elif any(word in content for word in ['complaint', 'issue', 'problem']):
+        return 'COMPLAINT'
+    elif any(word in content for word in ['feedback', 'suggestion']):
+        return 'FEEDBACK'
+
+    return 'GENERAL'
+
+
+def get_email_body(email_message):
+    """Plain text body of a message"""
+    try:
+        if email_message.is_multipart():
+            for part in email_message.walk():
+                if part.get_content_type() == "text/plain":
+                    return part.get_payload(decode=True).decode()
+            return ""
+        return email_message.get_payload(decode=True).decode()
+    except Exception as e:
+        logger.error(f"Error extracting email body: {str(e)}")
+        return ""
+
+
+class IncomingEmail:
+    """A message read from the mailbox; the body is only filled in for messages that become queries"""
+
+    def __init__(self, uid, flags, headers):
+        self.uid = uid
+        self.seen = '\\Seen' in flags
+        self.message_id = (headers.get('Message-ID') or '').strip()[:255]
+        try:
+            self.subject = str(make_header(decode_header(headers['Subject'] or '')))
+        except Exception:
+            self.subject = "No Subject"
+            logger.warning(f"Could not decode subject for message UID {uid}")
+        self.sender = parseaddr(headers['From'] or '')[1] or "unknown@email.com"
+        self.body = None
+        self.user_info = None
+
+    @property
+    def is_query(self):
+        return QUERY_SUBJECT_MARKER in self.subject.upper() and not self.seen
+
+
+def connect():
+    """Log in to the query mailbox"""
+    imap_class = imaplib.IMAP4_SSL if settings.QUERY_EMAIL_IMAP_SSL else imaplib.IMAP4
+    logger.info(f"Connecting to {settings.QUERY_EMAIL_IMAP_HOST}:{settings.QUERY_EMAIL_IMAP_PORT}")
+    imap = imap_class(
+        settings.QUERY_EMAIL_IMAP_HOST,
+        settings.QUERY_EMAIL_IMAP_PORT,
+        timeout=settings.QUERY_EMAIL_IMAP_TIMEOUT
+    )
+    imap.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
+    return imap
+
+
+def disconnect(imap):
+    try:
+        imap.logout()
+    except Exception as e:
+        logger.error(f"Disconnect error: {str(e)}")
+
+
+def _uid_set(uids):
+    return ','.join(str(uid) for uid in uids)
+
+
+class MailboxIngestor:
+    """Creates queries from the new messages of one mailbox folder"""
+
+    def __init__(self, imap, folder=None, batch_size=None):
+        self.imap = imap
+        self.folder = folder or settings.QUERY_EMAIL_FOLDER
+        self.batch_size = batch_size or settings.QUERY_EMAIL_BATCH_SIZE
+        self.mailbox = f"{settings.EMAIL_HOST_USER}@{settings.QUERY_EMAIL_IMAP_HOST}/{self.folder}"
+        # Messages whose headers and bodies were downloaded, and queries created, over this ingestor's runs
+        self.headers_fetched = 0
+        self.bodies_fetched = 0
+        self.created = 0
+
+    def _check(self, command, typ, data):
+        if typ != 'OK':
+            raise imaplib.IMAP4.error(f"{command} failed on {self.mailbox}: {data}")
+
+    def select(self):
+        """Open the folder and return its UIDVALIDITY"""
+        typ, data = self.imap.select(self.folder)
+        self._check('SELECT', typ, data)
+        typ, data = self.imap.response('UIDVALIDITY')
+        if not data or data[0] is None:
+            typ, data = self.imap.status(self.folder, '(UIDVALIDITY)')
+            self._check('STATUS', typ, data)
+            data = re.findall(rb'UIDVALIDITY (\d+)', data[0])
+        return int(data[0])
+
+    def search(self, last_uid):
+        """UIDs of the messages after `last_uid`, or of today's messages for a folder not read before"""
+        if last_uid:
+            criteria = f'UID {last_uid + 1}:*'
+        else:
+            criteria = f'SINCE {timezone.localdate().strftime("%d-%b-%Y")}'
+        typ, data = self.imap.uid('SEARCH', None, criteria)
+        self._check('SEARCH', typ, data)
+        # "n:*" always matches the newest message, even when its UID is below n
+        return sorted(uid for uid in map(int, data[0].split()) if uid > last_uid)
+
+    def fetch(self, uids, items):
+        """{uid: (flags, literal)} for the fetched messages"""
+        typ, data = self.imap.uid('FETCH', _uid_set(uids), items)
+        self._check('FETCH', typ, data)
+        responses = []
+        for item in data:
+            if isinstance(item, tuple):
+                responses.append([item[0], item[1]])
+            elif item and responses:
+                # Attributes the server sent after the literal
+                responses[-1][0] += b' ' + item
+
+        fetched = {}
+        for attributes, literal in responses:
+            uid = UID_PATTERN.search(attributes)
+            if uid is None:
+                continue
+            flags = FLAGS_PATTERN.search(attributes)
+            fetched[int(uid.group(1))] = (flags.group(1).decode() if flags else '', literal)
+        return fetched
+
+    def fetch_headers(self, uids):
+        messages = []
+        for uid, (flags, literal) in sorted(self.fetch(uids, HEADER_ITEMS).items()):
+            messages.append(IncomingEmail(uid, flags, email.message_from_bytes(literal)))
+        self.headers_fetched += len(messages)
+        return messages
+
+    def fetch_bodies(self, messages):
+        bodies = self.fetch([message.uid for message in messages], BODY_ITEMS)
+        for message in messages:
+            if message.uid not in bodies:
+                raise imaplib.IMAP4.error(f"Message UID {message.uid} vanished from {self.mailbox}")
+            message.body = get_email_body(email.message_from_bytes(bodies[message.uid][1]))
+            message.user_info = UserManager.extract_user_info(message.body)
+            message.user_info['email'] = message.sender
+        self.bodies_fetched += len(messages)
+
+    def new_queries(self, uidvalidity, uids):
+        """Query emails among `uids` that no query was created from yet, with their bodies"""
+        candidates = {}
+        for message in self.fetch_headers(uids):
+            if not message.is_query:
+                continue
+            if not message.message_id:
+                message.message_id = f"<{uidvalidity}.{message.uid}@{self.mailbox}>"[:255]
+            candidates.setdefault(message.message_id, message)
+        if not candidates:
+            return []
+
+        existing = set(Query.objects.filter(
+            email_message_id__in=list(candidates)
+        ).values_list('email_message_id', flat=True))
+        for message_id in existing:
+            logger.info(f"Query already exists for message ID {message_id}")
+        messages = [message for message_id, message in candidates.items() if message_id not in existing]
+        if messages:
+            self.fetch_bodies(messages)
+        return messages
+
+    def create_queries(self, messages):
+        """Bulk-create the queries, their tags and any new patients for the messages"""
+        users = UserManager.get_users(messages)
+        queries, new_patient_queries = [], []
+        for message in messages:
+            user, is_new_user = users[message.sender]
+            clean_subject = message.subject.split(']', 1)[1].strip()
+            query = Query(
+                user=user,
+                subject=clean_subject[:255],
+                description=message.body,
+                source='EMAIL',
+                contact_email=message.sender,
+                contact_phone=message.user_info['phone_number'],
+                status='NEW',
+                is_anonymous=False,
+                query_type=determine_query_type(clean_subject, message.body),
+                priority=determine_priority(clean_subject, message.body),
+                is_patient=True,
+                email_message_id=message.message_id
+            )
+            queries.append(query)
+            if is_new_user:
+                new_patient_queries.append(query)
+                # Only the sender's first query is from a new patient
+                users[message.sender] = (user, False)
+
+        assign_bulk(queries)
+        Query.objects.bulk_create(queries)
+        if new_patient_queries:
+            tag, _ = QueryTag.objects.get_or_create(name=NEW_PATIENT_TAG)
+            Query.tags.through.objects.bulk_create([
+                Query.tags.through(query_id=query.query_id, querytag_id=tag.pk) for query in new_patient_queries
+            ])
+        record_bulk_assignments(queries)
+        transaction.on_commit(lambda: bump_generation(Query))
+        return queries
+
+    def ingest_batch(self, uidvalidity, uids):
+        """Create queries for one batch of UIDs and move the checkpoint past them. Returns the queries created"""
+        messages = self.new_queries(uidvalidity, uids)
+        try:
+            with transaction.atomic():
+                checkpoint = MailboxCheckpoint.objects.select_for_update().get(mailbox=self.mailbox)
+                if checkpoint.uidvalidity != uidvalidity or checkpoint.last_uid >= uids[-1]:
+                    logger.info(f"UIDs up to {uids[-1]} of {self.mailbox} were read by another worker")
+                    return []
+                queries = self.create_queries(messages) if messages else []
+                checkpoint.last_uid = uids[-1]
+                checkpoint.messages_ingested += len(queries)
+                checkpoint.save(update_fields=['last_uid', 'messages_ingested', 'updated_at'])
+        except IntegrityError as e:
+            # Another worker created one of the queries first; the next run skips it
+            logger.error(f"Could not create queries for UIDs {uids[0]}-{uids[-1]} of {self.mailbox}: {str(e)}")
+            return []
+
+        if queries:
+            self.mark_seen([message.uid for message in messages])
+            for query in queries:
+                logger.info(f"Created query {query.query_id} for user {query.contact_email}")
+        self.created += len(queries)
+        return queries
+
+    def mark_seen(self, uids):
+        try:
+            typ, data = self.imap.uid('STORE', _uid_set(uids), '+FLAGS.SILENT', '(\\Seen)')
+            self._check('STORE', typ, data)
+        except imaplib.IMAP4.error as e:
+            logger.error(f"Could not mark messages as read: {str(e)}")
+
+    def run(self):
+        """Read the messages that arrived since the last run. Returns the number of queries created"""
+        uidvalidity = self.select()
+        checkpoint, _ = MailboxCheckpoint.objects.get_or_create(mailbox=self.mailbox)
+        if checkpoint.uidvalidity != uidvalidity:
+            if checkpoint.uidvalidity is not None:
+                logger.warning(
+                    f"UIDVALIDITY of {self.mailbox} changed from {checkpoint.uidvalidity} to {uidvalidity}, "
+                    f"reading it again from today"
+                )
+            checkpoint.uidvalidity = uidvalidity
+            checkpoint.last_uid = 0
+            checkpoint.save(update_fields=['uidvalidity', 'last_uid', 'updated_at'])
+
+        uids = self.search(checkpoint.last_uid)
+        created = 0
+        for start in range(0, len(uids), self.batch_size):
+            created += len(self.ingest_batch(uidvalidity, uids[start:start + self.batch_size]))
+        MailboxCheckpoint.objects.filter(pk=checkpoint.pk).update(last_run_at=timezone.now())
+        if uids:
+            logger.info(f"Read {len(uids)} new messages from {self.mailbox}, created {created} queries")
+        return created
+
+
+def wait_for_mail(imap, timeout):
+    """Wait in IDLE until the server announces new messages or `timeout` seconds pass.
+    Returns True if new messages were announced"""
+    tag = b'IDLE%d' % next(_idle_tags)
+    imap.send(tag + b' IDLE\r\n')
+    line = imap.readline()
+    if not line.startswith(b'+'):
+        raise imaplib.IMAP4.error(f"IDLE refused: {line!r}")
+
+    sock = imap.socket()
+    deadline = time.monotonic() + timeout
+    new_mail = False
+    while not new_mail:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        # TLS sockets can hold decrypted data select() does not see
+        pending = sock.pending() if hasattr(sock, 'pending') else 0
+        if not pending and not select.select([sock], [], [], remaining)[0]:
+            break
+        line = imap.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Connection closed during IDLE")
+        new_mail = line.startswith(b'* ') and line.rstrip().endswith((b'EXISTS', b'RECENT'))
+
+    imap.send(b'DONE\r\n')
+    while True:
+        line = imap.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("Connection closed while ending IDLE")
+        if line.startswith(tag + b' '):
+            if not line.startswith(tag + b' OK'):
+                raise imaplib.IMAP4.error(f"IDLE failed: {line!r}")
+            return new_mail
+
+
+def ingest_mailbox(folder=None):
+    """Connect, read new messages once and disconnect. Returns the number of queries created"""
+    imap = connect()
+    try:
+        return MailboxIngestor(imap, folder).run()
+    finally:
+        disconnect(imap)
+
+
+def run_idle_worker(folder=None, idle_timeout=None):
+    """Read the mailbox whenever the server announces new mail, reconnecting after errors. Runs until interrupted"""
+    idle_timeout = idle_timeout or settings.QUERY_EMAIL_IDLE_TIMEOUT
+    delay = 1
+    while True:
+        imap = None
+        try:
+            imap = connect()
+            ingestor = MailboxIngestor(imap, folder)
+            while True:
+                close_old_connections()
+                ingestor.run()
+                delay = 1
+                if 'IDLE' in imap.capabilities:
+                    # The mailbox is read after every IDLE, announced or not, so a timeout doubles as a poll
+                    wait_for_mail(imap, idle_timeout)
+                else:
+                    time.sleep(POLL_INTERVAL)
+        except Exception as e:
+            logger.error(f"Query mailbox worker stopped, reconnecting in {delay}s: {str(e)}")
+        finally:
+            if imap is not None:
+                disconnect(imap)
+        time.sleep(delay)
+        delay = min(delay * 2, RECONNECT_MAX_DELAY)
@@ -0,0 +1,328 @@
+import random
+import re
+import select
+import socketserver
+import threading
+import time
+from email.utils import formatdate, make_msgid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from query_management import email_ingest
+from query_management.models import Query
+
+User = get_user_model()
+
+HEADER_FIELDS = ['Message-ID', 'Subject', 'From', 'Date']
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back the queries and users created by the benchmark"""
+    pass
+
+
+class StubMailbox:
+    """Messages of the one folder the stub IMAP server serves"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.uidvalidity = 1000
+        self.next_uid = 1
+        self.messages = []  # [uid, flags, headers, body]
+        self.bytes_sent = 0
+
+    def append(self, headers, body, seen=False):
+        with self.lock:
+            self.messages.append([self.next_uid, {'\\Seen'} if seen else set(), headers, body])
+            self.next_uid += 1
+
+    def renumber(self):
+        """Give every message a new UID, as a server does when it resets UIDVALIDITY"""
+        with self.lock:
+            self.uidvalidity += 1
+            for uid, message in enumerate(self.messages, start=1):
+                message[0] = uid
+            self.next_uid = len(self.messages) + 1
+
+    def total_bytes(self):
+        return sum(len(self.render(headers, body)) for _, _, headers, body in self.messages)
+
+    @staticmethod
+    def render(headers, body, fields=None):
+        lines = [f"{name}: {value}" for name, value in headers.items() if fields is None or name in fields]
+        data = ('\r\n'.join(lines) + '\r\n\r\n').encode()
+        return data if fields is not None else data + body
+
+
+class StubIMAPHandler(socketserver.StreamRequestHandler):
+    """Just enough IMAP4rev1 for email_ingest: LOGIN, SELECT, UID SEARCH/FETCH/STORE, IDLE and LOGOUT"""
+
+    def write(self, data):
+        self.wfile.write(data if isinstance(data, bytes) else data.encode() + b'\r\n')
+
+    def handle(self):
+        self.mailbox = self.server.mailbox
+        self.write('* OK IMAP4rev1 stub ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, command, *rest = line.decode().rstrip('\r\n').split(' ', 2)
+            args = rest[0] if rest else ''
+            command = command.upper()
+            if command == 'UID':
+                command, _, args = args.partition(' ')
+                getattr(self, f'uid_{command.lower()}')(tag, args)
+            elif command == 'CAPABILITY':
+                self.write('* CAPABILITY IMAP4rev1 IDLE')
+                self.write(f'{tag} OK CAPABILITY completed')
+            elif command == 'LOGIN':
+                self.write(f'{tag} OK LOGIN completed')
+            elif command == 'SELECT':
+                with self.mailbox.lock:
+                    self.write(f'* {len(self.mailbox.messages)} EXISTS')
+                    self.write(f'* OK [UIDVALIDITY {self.mailbox.uidvalidity}] UIDs valid')
+                    self.write(f'* OK [UIDNEXT {self.mailbox.next_uid}] Predicted next UID')
+                self.write(f'{tag} OK [READ-WRITE] SELECT completed')
+            elif command == 'IDLE':
+                self.idle(tag)
+            elif command == 'LOGOUT':
+                self.write('* BYE Logging out')
+                self.write(f'{tag} OK LOGOUT completed')
+                return
+            else:
+                self.write(f'{tag} BAD Unknown command')
+
+    def matching(self, uid_set):
+        """(sequence number, message) pairs for a UID set like 1,4:7,9:*"""
+        with self.mailbox.lock:
+            messages = list(enumerate(self.mailbox.messages, start=1))
+        highest = messages[-1][1][0] if messages else 0
+        uids = set()
+        for part in uid_set.split(','):
+            start, _, end = part.partition(':')
+            start = highest if start == '*' else int(start)
+            end = start if not end else highest if end == '*' else int(end)
+            uids.update(range(min(start, end), max(start, end) + 1))
+        return [(number, message) for number, message in messages if message[0] in uids]
+
+    def uid_search(self, tag, criteria):
+        if criteria.startswith('UID '):
+            found = self.matching(criteria[4:])
+        else:
+            # Every message of the stub arrived today
+            with self.mailbox.lock:
+                found = list(enumerate(self.mailbox.messages, start=1))
+        self.write('* SEARCH ' + ' '.join(str(message[0]) for _, message in found))
+        self.write(f'{tag} OK SEARCH completed')
+
+    def uid_fetch(self, tag, args):
+        uid_set, _, items = args.partition(' ')
+        fields = HEADER_FIELDS if 'HEADER.FIELDS' in items else None
+        section = 'BODY[HEADER.FIELDS (MESSAGE-ID SUBJECT FROM DATE)]' if fields else 'BODY[]'
+        for number, (uid, flags, headers, body) in self.matching(uid_set):
+            data = self.mailbox.render(headers, body, fields)
+            self.mailbox.bytes_sent += len(data)
+            self.write(f'* {number} FETCH (UID {uid} FLAGS ({" ".join(sorted(flags))}) {section} {{{len(data)}}}')
+            self.write(data + b')\r\n')
+        self.write(f'{tag} OK FETCH completed')
+
+    def uid_store(self, tag, args):
+        uid_set, _, flags = args.partition(' ')
+        for _, message in self.matching(uid_set):
+            message[1].update(re.findall(r'\\\w+', flags))
+        self.write(f'{tag} OK STORE completed')
+
+    def idle(self, tag):
+        self.write('+ idling')
+        with self.mailbox.lock:
+            announced = len(self.mailbox.messages)
+        while True:
+            if select.select([self.rfile], [], [], 0.02)[0]:
+                self.rfile.readline()  # DONE
+                self.write(f'{tag} OK IDLE terminated')
+                return
+            with self.mailbox.lock:
+                count = len(self.mailbox.messages)
+            if count > announced:
+                self.write(f'* {count} EXISTS')
+                announced = count
+
+
+class StubIMAPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Check incremental query email ingestion against a local IMAP stand-in: bytes '
+        'downloaded compared with fetching every message in full, incremental runs, '
+        'duplicate Message-IDs, a UIDVALIDITY reset and new mail announced over IDLE. '
+        'Queries and users created are rolled back when the benchmark finishes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=1000,
+            help='Number of messages in the mailbox'
+        )
+        parser.add_argument(
+            '--query-share',
+            type=float,
+            default=0.2,
+            help='Share of the messages that are unread query emails'
+        )
+        parser.add_argument(
+            '--body-kb',
+            type=int,
+            default=40,
+            help='Size of each message body in KB'
+        )
+        parser.add_argument(
+            '--senders',
+            type=int,
+            default=50,
+            help='Number of distinct senders, all but two of them existing users'
+        )
+
+    def handle(self, *args, **kwargs):
+        mailbox = StubMailbox()
+        server = StubIMAPServer(('127.0.0.1', 0), StubIMAPHandler)
+        server.mailbox = mailbox
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        overrides = {
+            'QUERY_EMAIL_IMAP_HOST': '127.0.0.1',
+            'QUERY_EMAIL_IMAP_PORT': server.server_address[1],
+            'QUERY_EMAIL_IMAP_SSL': False,
+            'EMAIL_HOST_USER': 'benchmark',
+            'EMAIL_HOST_PASSWORD': 'benchmark',
+        }
+        try:
+            with override_settings(**overrides):
+                self.run_checks(mailbox, kwargs)
+        except RollbackBenchmark:
+            pass
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def add_messages(self, mailbox, count, kwargs, senders):
+        """Append `count` messages, a share of them unread query emails. Returns the number of query emails"""
+        body = ('x' * 76 + '\r\n') * (kwargs['body_kb'] * 1024 // 78)
+        queries = 0
+        for _ in range(count):
+            sender = random.choice(senders)
+            is_query = random.random() < kwargs['query_share']
+            queries += is_query
+            subject = '[VITIGO-QUERY] Appointment booking' if is_query else 'Newsletter'
+            mailbox.append({
+                'Message-ID': make_msgid(domain='example.com'),
+                'Subject': subject,
+                'From': f'Patient <{sender}>',
+                'Date': formatdate(localtime=True),
+                'Content-Type': 'text/plain; charset=utf-8',
+            }, f'Name: Benchmark Patient\r\nPhone: +919800000000\r\n\r\n{body}'.encode())
+        return queries
+
+    def ingest(self, label, expected):
+        imap = email_ingest.connect()
+        try:
+            ingestor = email_ingest.MailboxIngestor(imap)
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                created = ingestor.run()
+            elapsed = time.perf_counter() - started
+        finally:
+            email_ingest.disconnect(imap)
+        self.stdout.write(
+            f"{label:<22} {created:>5} queries created, {ingestor.headers_fetched:>5} headers and "
+            f"{ingestor.bodies_fetched:>4} bodies fetched, {len(queries):>4} SQL queries, {elapsed:.2f}s"
+        )
+        if created != expected:
+            raise CommandError(f"{label}: expected {expected} queries, created {created}")
+        return ingestor
+
+    def run_checks(self, mailbox, kwargs):
+        with transaction.atomic():
+            senders = [f'benchmark.sender{i}@example.com' for i in range(max(kwargs['senders'], 2))]
+            for sender in senders[2:]:
+                User.objects.create_user(email=sender)
+            expected = self.add_messages(mailbox, kwargs['messages'], kwargs, senders)
+            full_bytes = mailbox.total_bytes()
+
+            self.ingest('First run', expected)
+            downloaded = mailbox.bytes_sent
+            self.stdout.write(
+                f"Downloaded {downloaded / 1024:.0f} KB instead of {full_bytes / 1024:.0f} KB "
+                f"for every message in full ({downloaded / full_bytes:.1%})"
+            )
+
+            ingestor = self.ingest('Nothing new', 0)
+            if ingestor.headers_fetched:
+                raise CommandError("A run with no new mail fetched message headers")
+
+            new = self.add_messages(mailbox, 50, kwargs, senders)
+            ingestor = self.ingest('50 new messages', new)
+            if ingestor.headers_fetched != 50:
+                raise CommandError(f"Fetched {ingestor.headers_fetched} headers for 50 new messages")
+
+            # The same message delivered twice, e.g. to two labels of the mailbox
+            query = Query.objects.filter(email_message_id__isnull=False).select_related('user').first()
+            mailbox.append({
+                'Message-ID': query.email_message_id,
+                'Subject': f'[VITIGO-QUERY] {query.subject}',
+                'From': query.contact_email,
+                'Date': formatdate(localtime=True),
+            }, b'Duplicate')
+            ingestor = self.ingest('Duplicate Message-ID', 0)
+            if ingestor.bodies_fetched:
+                raise CommandError("The body of a message already ingested was downloaded")
+
+            mailbox.renumber()
+            self.ingest('UIDVALIDITY reset', 0)
+
+            self.check_idle(mailbox, kwargs, senders)
+
+            created = Query.objects.filter(email_message_id__isnull=False, contact_email__in=senders).count()
+            if created != expected + new + 1:
+                raise CommandError(f"Expected {expected + new + 1} queries in total, found {created}")
+            self.stdout.write(self.style.SUCCESS(
+                f"{created} queries created once each, with {downloaded / full_bytes:.1%} of the mailbox downloaded"
+            ))
+            raise RollbackBenchmark()
+
+    def check_idle(self, mailbox, kwargs, senders):
+        """Time from a message arriving to its query existing, for a worker waiting in IDLE"""
+        imap = email_ingest.connect()
+        try:
+            ingestor = email_ingest.MailboxIngestor(imap)
+            ingestor.run()
+            arrived = []
+
+            def deliver():
+                time.sleep(0.2)
+                arrived.append(time.perf_counter())
+                mailbox.append({
+                    'Message-ID': make_msgid(domain='example.com'),
+                    'Subject': '[VITIGO-QUERY] Urgent question about treatment',
+                    'From': senders[0],
+                    'Date': formatdate(localtime=True),
+                }, b'Name: Idle Patient\r\nPhone: +919800000001\r\n')
+
+            threading.Thread(target=deliver, daemon=True).start()
+            if not email_ingest.wait_for_mail(imap, timeout=5):
+                raise CommandError("The stub server's new mail was not announced over IDLE")
+            created = ingestor.run()
+            latency = time.perf_counter() - arrived[0]
+        finally:
+            email_ingest.disconnect(imap)
+        if created != 1:
+            raise CommandError(f"Expected 1 query from the mail announced over IDLE, created {created}")
+        self.stdout.write(f"{'IDLE':<22} new mail became a query {latency * 1000:.0f} ms after it arrived")
@@ -0,0 +1,169 @@
+import random
+import re
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from dashboard.metrics import aggregate_counts, get_counter_specs
+from query_management.models import Query
+from query_management.views.dashboard import QueryManagementView
+from query_management.views.exports import QueryExportView
+from reporting_and_analytics.services.query_frame import QueryFrames
+from webhooks.utils import get_queries_whatsapp
+
+User = get_user_model()
+
+OPEN_STATUSES = ['NEW', 'IN_PROGRESS', 'WAITING']
+
+# Plan lines showing the query table read in full, per database vendor
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(rf'^SCAN {Query._meta.db_table}(?! USING)'),
+    'postgresql': re.compile(rf'Seq Scan on {Query._meta.db_table}\b'),
+}
+
+
+class RollbackSeed(Exception):
+    """Raised to roll back the rows seeded for the check"""
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large Query table, run the queries behind the query dashboards, '
+        'reports, exports and webhooks, and fail if EXPLAIN shows any of them '
+        'reading the whole table instead of using an index. Seeded rows are '
+        'rolled back when the check finishes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=20000,
+            help='Number of queries to seed'
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the plan of every query checked'
+        )
+
+    def handle(self, *args, **kwargs):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Query plans cannot be checked on {connection.vendor}")
+
+        results = []
+        try:
+            with transaction.atomic():
+                users = self.seed(kwargs['rows'])
+                self.analyze()
+                for name, access_path in self.access_paths(users):
+                    with CaptureQueriesContext(connection) as captured:
+                        access_path()
+                    for query in captured.captured_queries:
+                        sql = query['sql']
+                        if sql.startswith('SELECT') and Query._meta.db_table in sql:
+                            plan = self.explain(sql)
+                            results.append((name, sql, plan, any(pattern.search(line) for line in plan)))
+                raise RollbackSeed()
+        except RollbackSeed:
+            pass
+
+        regressions = []
+        for name, sql, plan, full_scan in results:
+            if full_scan:
+                regressions.append(name)
+            if full_scan or kwargs['verbose_plans']:
+                status = self.style.ERROR('FULL SCAN') if full_scan else 'ok'
+                self.stdout.write(f"{name}: {status}\n  {sql}\n" + ''.join(f"  | {line}\n" for line in plan))
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} queries read the whole query table: {', '.join(sorted(set(regressions)))}")
+        self.stdout.write(self.style.SUCCESS(f"All {len(results)} queries use an index"))
+
+    def access_paths(self, users):
+        """(name, callable) for every query access path that must use an index"""
+        user, staff = users
+        view = QueryManagementView()
+        listing = Query.objects.select_related('user', 'assigned_to')
+        now = timezone.now()
+
+        return [
+            ('dashboard stats', lambda: QueryManagementView.get_dashboard_stats.__wrapped__(view)),
+            ('dashboard list', lambda: list(listing[:10])),
+            ('dashboard list by status', lambda: list(listing.filter(status='NEW')[:10])),
+            ('dashboard list by priority', lambda: list(listing.filter(priority='A')[:10])),
+            ('dashboard list by source', lambda: list(listing.filter(source='EMAIL')[:10])),
+            ('query trend', lambda: view.get_query_trend_data(Query.objects.all(), 30)),
+            ('staff performance', lambda: list(view.get_staff_performance(Query.objects.all(), 30)['labels'])),
+            ('main dashboard counters', lambda: aggregate_counts(Query, get_counter_specs(timezone.localdate())['queries'][2])),
+            ('report frames', lambda: QueryFrames(now - timedelta(days=30), now).queries),
+            ('export', lambda: list(QueryExportView().get_filtered_queryset('30'))),
+            ('recent queries by user', lambda: list(Query.objects.filter(user=user).order_by('-created_at')[:5])),
+            ('recent queries by phone', lambda: list(get_queries_whatsapp('+910000000001'))),
+            ('staff workload', lambda: Query.objects.filter(assigned_to=staff, status__in=OPEN_STATUSES).count()),
+            ('overdue queries', lambda: Query.objects.filter(
+                status__in=OPEN_STATUSES, expected_response_date__lt=now
+            ).count()),
+            ('email duplicate check', lambda: list(Query.objects.filter(
+                email_message_id__in=['<check1@example.com>', '<check2@example.com>']
+            ).values_list('email_message_id', flat=True))),
+        ]
+
+    def seed(self, rows):
+        suffix = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        user = User.objects.create_user(email=f'plans.user.{suffix}@example.com')
+        staff = [User.objects.create_user(email=f'plans.staff{i}.{suffix}@example.com') for i in range(10)]
+        sources = [source for source, _ in Query.SOURCE_CHOICES]
+        now = timezone.now()
+
+        queries = []
+        created_times = []
+        for i in range(rows):
+            created_at = now - timedelta(days=random.uniform(0, 730))
+            created_times.append(created_at)
+            # Most queries are old and closed; recent ones are more often still open
+            if created_at > now - timedelta(days=14) and random.random() < 0.5:
+                status = random.choice(OPEN_STATUSES)
+            else:
+                status = random.choice(['RESOLVED', 'CLOSED'])
+            queries.append(Query(
+                user=user if i % 1000 == 0 else None,
+                assigned_to=random.choice(staff),
+                subject='Plan check',
+                description='Plan check',
+                source=random.choice(sources),
+                priority=random.choices('ABC', weights=[1, 6, 3])[0],
+                status=status,
+                created_at=created_at,
+                resolved_at=None if status in OPEN_STATUSES else created_at + timedelta(hours=random.randint(1, 72)),
+                expected_response_date=created_at + timedelta(days=2),
+                contact_phone=f'+91{random.randint(0, 99999):010d}'
+            ))
+        Query.objects.bulk_create(queries, batch_size=1000)
+        # auto_now_add replaced the seeded creation times
+        for query, created_at in zip(queries, created_times):
+            query.created_at = created_at
+        Query.objects.bulk_update(queries, ['created_at'], batch_size=1000)
+        return user, staff[0]
+
+    def analyze(self):
+        """Refresh planner statistics so the plans match a table of this size"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+            else:
+                cursor.execute(f'ANALYZE {Query._meta.db_table}')
+
+    def explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            rows = cursor.fetchall()
+        # SQLite returns (id, parent, notused, detail) rows, PostgreSQL one line per row
+        return [row[-1] for row in rows]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('query_management', '0003_remove_report_category_remove_reportexport_report_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['created_at'], name='query_manag_created_06e040_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['status', 'created_at'], name='query_manag_status_7415b5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['priority', 'status'], name='query_manag_priorit_f2fa66_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['source', 'created_at'], name='query_manag_source_b4e552_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['user', 'created_at'], name='query_manag_user_id_bf1de8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['contact_phone', 'created_at'], name='query_manag_contact_97a59c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['assigned_to', 'status'], name='query_manag_assigne_c8918e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['status', 'expected_response_date'], name='query_manag_status_ab1ef2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='query',
+            index=models.Index(fields=['resolved_at'], name='query_manag_resolve_a209f0_idx'),
+        ),
+    ]
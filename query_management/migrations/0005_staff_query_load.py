@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('query_management', '0004_query_indexes'),
+        ('user_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffQueryLoad',
+            fields=[
+                ('staff', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='query_load', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_queries', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.2 on 2026-10-17 21:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('query_management', '0005_staff_query_load'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mailbox', models.CharField(help_text='user@host/folder', max_length=255, unique=True)),
+                ('uidvalidity', models.BigIntegerField(blank=True, null=True)),
+                ('last_uid', models.BigIntegerField(default=0)),
+                ('messages_ingested', models.IntegerField(default=0)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='query',
+            name='email_message_id',
+            field=models.CharField(blank=True, help_text='Message-ID of the email the query was created from', max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -68,11 +68,25 @@ class Query(models.Model):
     resolution_summary = models.TextField(null=True, blank=True)
     response_time = models.DurationField(null=True, blank=True)
     satisfaction_rating = models.IntegerField(null=True, blank=True, choices=[(i, i) for i in range(1, 6)])
+    email_message_id = models.CharField(max_length=255, null=True, blank=True, unique=True,
+                                        help_text="Message-ID of the email the query was created from")
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = _("Query")
         verbose_name_plural = _("Queries")
+        # Each index serves an access path checked by the check_query_plans command
+        indexes = [
+            models.Index(fields=['created_at']),  # date ranges, newest-first listing
+            models.Index(fields=['status', 'created_at']),  # status filter and open counts
+            models.Index(fields=['priority', 'status']),  # urgent open queries
+            models.Index(fields=['source', 'created_at']),  # source filter
+            models.Index(fields=['user', 'created_at']),  # a user's recent queries
+            models.Index(fields=['contact_phone', 'created_at']),  # a phone number's recent queries
+            models.Index(fields=['assigned_to', 'status']),  # staff workload
+            models.Index(fields=['status', 'expected_response_date']),  # overdue open queries
+            models.Index(fields=['resolved_at']),  # resolved this month
+        ]
 
     def __str__(self):
         return f"Query {self.query_id}: {self.subject}"
@@ -107,3 +121,26 @@ class QueryAttachment(models.Model):
         return f"Attachment for Query {self.query.query_id}"
     
 
+
+
+class StaffQueryLoad(models.Model):
+    """Number of open queries assigned to a staff member, kept up to date by query_management.assignment"""
+    staff = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='query_load')
+    open_queries = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.staff} - {self.open_queries} open queries"
+
+
+class MailboxCheckpoint(models.Model):
+    """How far query_management.email_ingest has read a mailbox folder"""
+    mailbox = models.CharField(max_length=255, unique=True, help_text="user@host/folder")
+    uidvalidity = models.BigIntegerField(null=True, blank=True)
+    last_uid = models.BigIntegerField(default=0)
+    messages_ingested = models.IntegerField(default=0)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.mailbox} up to UID {self.last_uid}"
@@ -1,35 +1,57 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-import random
+from access_control.models import Role
+from dashboard.cache import bump_generation
+from .assignment import adjust_load, open_assignee, pick_assignee, queue_assignment_notification
 from .models import Query
 
 User = get_user_model()
 
-def get_random_staff():
-    """Get a random staff member with appropriate roles"""
-    staff_roles = ['NURSE', 'DOCTOR', 'MEDICAL_ASSISTANT', 'ADMINISTRATOR'] 
-    staff_users = User.objects.filter(
-        Q(role__name__in=staff_roles) & 
-        Q(is_active=True)
-    ).exclude(
-        Q(email='') | Q(email__isnull=True)
-    )
-    
-    if staff_users.exists():
-        return random.choice(staff_users)
-    return None
+@receiver(pre_save, sender=Query)
+def assign_least_loaded_staff(sender, instance, raw=False, **kwargs):
+    """Assign new queries to the least-loaded staff member, in the same write as the insert"""
+    if raw:
+        return
+
+    if instance._state.adding:
+        instance._previous_assignee = None
+        if not instance.assigned_to_id:
+            instance.assigned_to_id = pick_assignee()
+            instance._auto_assigned = instance.assigned_to_id is not None
+        return
+
+    # Remember whose load the query counted towards before this save
+    previous = Query.objects.filter(pk=instance.pk).values_list('assigned_to_id', 'status').first()
+    instance._previous_assignee = open_assignee(*previous) if previous else None
 
 @receiver(post_save, sender=Query)
-def assign_random_staff(sender, instance, created, **kwargs):
-    """Assign newly created queries to random staff members"""
-    if created and not instance.assigned_to:
-        random_staff = get_random_staff()
-        if random_staff:
-            instance.assigned_to = random_staff
-            instance.save(update_fields=['assigned_to'])
-            
-            # Trigger notification for assignment
-            from .utils import send_query_notification
-            send_query_notification(instance, 'assigned', recipient=random_staff)
\ No newline at end of file
+def update_staff_load(sender, instance, created, raw=False, **kwargs):
+    """Move the query between staff loads and notify automatic assignees"""
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_assignee', None)
+    current = open_assignee(instance.assigned_to_id, instance.status)
+    if previous != current:
+        adjust_load(previous, -1)
+        adjust_load(current, 1)
+
+    if created and getattr(instance, '_auto_assigned', False):
+        queue_assignment_notification(instance.query_id, instance.assigned_to_id)
+        instance._auto_assigned = False
+
+@receiver(post_delete, sender=Query)
+def release_staff_load(sender, instance, **kwargs):
+    """Take a deleted open query off its assignee's load"""
+    adjust_load(open_assignee(instance.assigned_to_id, instance.status), -1)
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=Role)
+def invalidate_staff_pool(sender, update_fields=None, **kwargs):
+    """Retire the cached assignment pool once a user or role change is committed"""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        # Logins do not change who can be assigned queries
+        return
+    transaction.on_commit(lambda: bump_generation(sender))
@@ -0,0 +1,22 @@
+from celery import shared_task
+from django.contrib.auth import get_user_model
+
+from .models import Query
+from .utils import send_query_notification
+
+
+@shared_task(ignore_result=True)
+def notify_query_assignment(query_id, staff_id):
+    """Tell a staff member about a query assigned to them automatically"""
+    query = Query.objects.select_related('user', 'assigned_to').filter(pk=query_id).first()
+    staff = get_user_model().objects.filter(pk=staff_id).first()
+    if query and staff:
+        send_query_notification(query, 'assigned', recipient=staff)
+
+
+@shared_task(ignore_result=True)
+def ingest_query_emails():
+    """Create queries from the query emails that arrived since the last run"""
+    from .email_ingest import ingest_mailbox
+
+    ingest_mailbox()
@@ -39,12 +39,7 @@ from django.db.models import (
     Q,
     fields,
 )
-from django.db.models.functions import (
-    ExtractHour,
-    TruncDate,
-    TruncMonth,
-    TruncWeek,
-)
+from django.db.models.functions import ExtractHour
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import (
     get_object_or_404,
@@ -61,6 +56,8 @@ from django.views.generic.edit import CreateView
 # Local application imports
 from access_control.models import Role
 from access_control.permissions import PermissionManager
+from dashboard.timeseries import date_labels, dense_series, period_start, trunc_period
+from dashboard.utils import cache_dashboard_data
 from error_handling.views import (
     handler403,
     handler404,
@@ -95,24 +92,16 @@ class QueryManagementView(LoginRequiredMixin, View):
         
         daily_counts = (queryset
             .filter(created_at__gte=start_date)
-            .annotate(date=TruncDate('created_at'))
-            .values('date')
+            .annotate(period=trunc_period('created_at', 'day'))
+            .values('period')
             .annotate(count=Count('query_id'))
-            .order_by('date'))
+            .order_by())
 
-        dates = []
-        counts = []
-        
-        current = start_date.date()
-        while current <= end_date.date():
-            dates.append(current.strftime('%Y-%m-%d'))
-            count = next((item['count'] for item in daily_counts if item['date'] == current), 0)
-            counts.append(count)
-            current += timedelta(days=1)
+        periods, columns = dense_series(daily_counts, start_date, end_date, 'day')
 
         return {
-            'labels': dates,
-            'values': counts
+            'labels': date_labels(periods),
+            'values': columns['count']
         }
 
     def get_status_distribution(self, queryset):
@@ -130,22 +119,26 @@ class QueryManagementView(LoginRequiredMixin, View):
 
     def get_response_time_data(self, queryset, period='day'):
         """Calculate average response times"""
-        if period == 'week':
-            trunc_fn = TruncWeek
-        elif period == 'month':
-            trunc_fn = TruncMonth
-        else:  # day
-            trunc_fn = TruncDate
+        if period not in ('week', 'month'):
+            period = 'day'
 
-        data = (queryset
-            .annotate(period=trunc_fn('created_at'))
+        data = list(queryset
+            .annotate(period=trunc_period('created_at', period))
             .values('period')
             .annotate(avg_time=Avg('response_time'))
             .order_by('period'))
-        
+        if not data:
+            return {'labels': [], 'values': []}
+
+        # Periods without queries are shown as 0, like periods without responses
+        for item in data:
+            item['hours'] = float(item['avg_time'].total_seconds() / 3600) if item['avg_time'] else 0
+        end = max(period_start(data[-1]['period'], period), timezone.localdate())
+        periods, columns = dense_series(data, data[0]['period'], end, period, fields=['hours'])
+
         return {
-            'labels': [item['period'].strftime('%Y-%m-%d') for item in data],
-            'values': [float(item['avg_time'].total_seconds()/3600) if item['avg_time'] else 0 for item in data]
+            'labels': date_labels(periods),
+            'values': columns['hours']
         }
 
     def get_source_distribution(self, queryset):
@@ -195,6 +188,23 @@ class QueryManagementView(LoginRequiredMixin, View):
             'conversion_rate': round(conversion_rate, 1)
         }
 
+    @cache_dashboard_data('query_dashboard_stats', depends_on=(Query,))
+    def get_dashboard_stats(self):
+        """Calculate headline query statistics"""
+        current_date = timezone.now()
+        start_of_month = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        resolved_this_month = Query.objects.filter(resolved_at__gte=start_of_month).count()
+        total_queries = Query.objects.count()
+
+        return {
+            'total_queries': total_queries,
+            'open_queries': Query.objects.filter(
+                status__in=['NEW', 'IN_PROGRESS', 'WAITING']
+            ).count(),
+            'resolved_this_month': resolved_this_month,
+            'resolution_rate': round((resolved_this_month / total_queries * 100) if total_queries > 0 else 0, 1),
+        }
+
     def get(self, request):
         try:
             # Check module access permission
@@ -265,20 +275,9 @@ class QueryManagementView(LoginRequiredMixin, View):
                 role__in=staff_roles
             ).order_by('first_name')
 
-            # Calculate statistics
-            current_date = timezone.now()
-            start_of_month = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            resolved_this_month = Query.objects.filter(resolved_at__gte=start_of_month).count()
-            total_queries = Query.objects.count()
-
             context = {
                 'queries': queries,
-                'total_queries': total_queries,
-                'open_queries': Query.objects.filter(
-                    status__in=['NEW', 'IN_PROGRESS', 'WAITING']
-                ).count(),
-                'resolved_this_month': resolved_this_month,
-                'resolution_rate': round((resolved_this_month / total_queries * 100) if total_queries > 0 else 0, 1),
+                **self.get_dashboard_stats(),
                 'status_choices': status_choices,
                 'source_choices': source_choices,
                 'current_filters': {
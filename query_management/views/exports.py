@@ -1,5 +1,4 @@
 # Python Standard Library imports
-import csv
 import logging
 from datetime import datetime, timedelta
 
@@ -8,12 +7,10 @@ from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import (
     ParagraphStyle,
-    getSampleStyleSheet,
 )
 from reportlab.pdfgen import canvas
 from reportlab.platypus import (
     Paragraph,
-    SimpleDocTemplate,
     Spacer,
     Table,
     TableStyle,
@@ -45,7 +42,7 @@ from django.db.models.functions import (
     TruncMonth,
     TruncWeek,
 )
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.shortcuts import (
     get_object_or_404,
     redirect,
@@ -67,6 +64,8 @@ from error_handling.views import (
     handler500,
 )
 from patient_management.models import Patient
+from reporting_and_analytics.export_jobs import AsyncExportMixin
+from reporting_and_analytics.exports import PdfExport, csv_response, iter_queryset
 
 # Current app imports
 from ..forms import QueryCreateForm
@@ -87,7 +86,9 @@ logger = logging.getLogger(__name__)
 # Get the User model
 User = get_user_model()
 
-class QueryExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class QueryExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'query_management'
+
     def test_func(self):
         """
         Verify if the user has permission to export queries
@@ -198,11 +199,7 @@ class QueryExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         return duration.total_seconds() / 3600
 
     def export_csv(self, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="detailed_query_report.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
+        header = [
             'Query ID',
             'Subject',
             'Description',
@@ -228,68 +225,76 @@ class QueryExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             'Tags',
             'Total Updates',
             'Total Attachments'
-        ])
-
-        for query in queryset:
-            writer.writerow([
-                query.query_id,
-                query.subject,
-                query.description[:100] + '...' if len(query.description) > 100 else query.description,
-                query.get_status_display(),
-                query.get_priority_display(),
-                query.get_source_display(),
-                query.get_query_type_display() if query.query_type else 'N/A',
-                query.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                query.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                query.resolved_at.strftime('%Y-%m-%d %H:%M:%S') if query.resolved_at else 'N/A',
-                self.format_duration(query.response_time),
-                self.get_user_details(query.assigned_to),
-                self.get_user_details(query.user) if not query.is_anonymous else 'Anonymous',
-                query.contact_email or 'N/A',
-                query.contact_phone or 'N/A',
-                'Yes' if query.is_anonymous else 'No',
-                'Yes' if query.is_patient else 'No',
-                query.expected_response_date.strftime('%Y-%m-%d %H:%M:%S') if query.expected_response_date else 'N/A',
-                query.follow_up_date.strftime('%Y-%m-%d %H:%M:%S') if query.follow_up_date else 'N/A',
-                query.resolution_summary or 'N/A',
-                f"{query.satisfaction_rating}/5" if query.satisfaction_rating else 'N/A',
-                'Converted' if query.conversion_status else 'Not Converted',
-                ', '.join(tag.name for tag in query.tags.all()) or 'No Tags',
-                query.updates.count(),
-                query.attachments.count()
-            ])
-
-        return response
+        ]
+        queryset = queryset.prefetch_related('tags').annotate(
+            update_count=Count('updates', distinct=True),
+            attachment_count=Count('attachments', distinct=True),
+        )
+
+        def rows():
+            for query in iter_queryset(queryset):
+                yield [
+                    query.query_id,
+                    query.subject,
+                    query.description[:100] + '...' if len(query.description) > 100 else query.description,
+                    query.get_status_display(),
+                    query.get_priority_display(),
+                    query.get_source_display(),
+                    query.get_query_type_display() if query.query_type else 'N/A',
+                    query.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    query.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    query.resolved_at.strftime('%Y-%m-%d %H:%M:%S') if query.resolved_at else 'N/A',
+                    self.format_duration(query.response_time),
+                    self.get_user_details(query.assigned_to),
+                    self.get_user_details(query.user) if not query.is_anonymous else 'Anonymous',
+                    query.contact_email or 'N/A',
+                    query.contact_phone or 'N/A',
+                    'Yes' if query.is_anonymous else 'No',
+                    'Yes' if query.is_patient else 'No',
+                    query.expected_response_date.strftime('%Y-%m-%d %H:%M:%S') if query.expected_response_date else 'N/A',
+                    query.follow_up_date.strftime('%Y-%m-%d %H:%M:%S') if query.follow_up_date else 'N/A',
+                    query.resolution_summary or 'N/A',
+                    f"{query.satisfaction_rating}/5" if query.satisfaction_rating else 'N/A',
+                    'Converted' if query.conversion_status else 'Not Converted',
+                    ', '.join(tag.name for tag in query.tags.all()) or 'No Tags',
+                    query.update_count,
+                    query.attachment_count
+                ]
+
+        return csv_response('detailed_query_report.csv', header, rows())
 
     def export_pdf(self, queryset):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="detailed_query_report.pdf"'
-
-        doc = SimpleDocTemplate(response, pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-        elements = []
+        pdf = PdfExport(pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
 
         # Styles
-        styles = getSampleStyleSheet()
+        styles = pdf.styles
         title_style = styles['Heading1']
         heading_style = styles['Heading2']
         normal_style = styles['Normal']
 
         # Title
-        elements.append(Paragraph('Detailed Query Management Report', title_style))
-        elements.append(Spacer(1, 20))
+        pdf.add(Paragraph('Detailed Query Management Report', title_style), Spacer(1, 20))
 
         # Export timestamp
-        elements.append(Paragraph(f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}", normal_style))
-        elements.append(Spacer(1, 20))
+        pdf.add(
+            Paragraph(f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}", normal_style),
+            Spacer(1, 20)
+        )
 
         # Statistics summary
-        avg_response_time = queryset.filter(response_time__isnull=False).aggregate(Avg('response_time'))['response_time__avg']
+        summary = queryset.aggregate(
+            total=Count('pk'),
+            open=Count('pk', filter=Q(status__in=['NEW', 'IN_PROGRESS', 'WAITING'])),
+            resolved=Count('pk', filter=Q(status='RESOLVED')),
+            avg_response_time=Avg('response_time'),
+        )
+        avg_response_time = summary['avg_response_time']
         avg_response_hours = self.get_duration_in_hours(avg_response_time) if avg_response_time else 0
 
         stats = [
-            ['Total Queries:', str(queryset.count())],
-            ['Open Queries:', str(queryset.filter(status__in=['NEW', 'IN_PROGRESS', 'WAITING']).count())],
-            ['Resolved Queries:', str(queryset.filter(status='RESOLVED').count())],
+            ['Total Queries:', str(summary['total'])],
+            ['Open Queries:', str(summary['open'])],
+            ['Resolved Queries:', str(summary['resolved'])],
             ['Average Response Time:', f"{avg_response_hours:.1f} hours"]
         ]
         
@@ -301,16 +306,21 @@ class QueryExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
         ]))
-        elements.append(stats_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(stats_table, Spacer(1, 20))
 
         # Detailed Query List
-        elements.append(Paragraph('Detailed Query List', heading_style))
-        elements.append(Spacer(1, 10))
+        pdf.add(Paragraph('Detailed Query List', heading_style), Spacer(1, 10))
+        pdf.extend(self.get_query_flowables(queryset.prefetch_related('tags'), styles))
 
-        for query in queryset:
+        return pdf.response('detailed_query_report.pdf')
+
+    def get_query_flowables(self, queryset, styles):
+        """Yield the detail section of each query, reading the queryset in chunks"""
+        normal_style = styles['Normal']
+
+        for query in iter_queryset(queryset):
             # Query header
-            elements.append(Paragraph(f"Query #{query.query_id}: {query.subject}", styles['Heading3']))
+            yield Paragraph(f"Query #{query.query_id}: {query.subject}", styles['Heading3'])
             
             # Query details
             details = [
@@ -330,23 +340,24 @@ class QueryExportView(LoginRequiredMixin, UserPassesTestMixin, View):
                 ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
                 ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
             ]))
-            elements.append(detail_table)
-            elements.append(Spacer(1, 10))
+            yield detail_table
+            yield Spacer(1, 10)
 
             # Description
-            elements.append(Paragraph('Description:', styles['Heading4']))
-            elements.append(Paragraph(query.description, normal_style))
-            elements.append(Spacer(1, 10))
+            yield Paragraph('Description:', styles['Heading4'])
+            yield Paragraph(query.description, normal_style)
+            yield Spacer(1, 10)
 
             # Additional details in a smaller table
-            if query.resolution_summary or query.satisfaction_rating or query.tags.exists():
+            tags = list(query.tags.all())
+            if query.resolution_summary or query.satisfaction_rating or tags:
                 additional_info = []
                 if query.resolution_summary:
                     additional_info.append(['Resolution:', query.resolution_summary])
                 if query.satisfaction_rating:
                     additional_info.append(['Satisfaction:', f"{query.satisfaction_rating}/5"])
-                if query.tags.exists():
-                    additional_info.append(['Tags:', ', '.join(tag.name for tag in query.tags.all())])
+                if tags:
+                    additional_info.append(['Tags:', ', '.join(tag.name for tag in tags)])
                 
                 add_table = Table(additional_info, colWidths=[80, 380])
                 add_table.setStyle(TableStyle([
@@ -356,9 +367,6 @@ class QueryExportView(LoginRequiredMixin, UserPassesTestMixin, View):
                     ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
                     ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
                 ]))
-                elements.append(add_table)
-
-            elements.append(Spacer(1, 20))
+                yield add_table
 
-        doc.build(elements)
-        return response
\ No newline at end of file
+            yield Spacer(1, 20)
@@ -1,8 +1,9 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import Report, ReportCategory, ReportExport
+from .models import ExportJob, Report, ReportCategory, ReportExport
 
 admin.site.register(ReportCategory)
 admin.site.register(Report)
-admin.site.register(ReportExport)
\ No newline at end of file
+admin.site.register(ReportExport)
+admin.site.register(ExportJob)
@@ -0,0 +1,203 @@
+"""
+Background export jobs.
+
+An export view that includes AsyncExportMixin can be called with ?async=1.
+Instead of building the file in the web request, the request parameters are
+stored on an ExportJob and a Celery worker replays the same view against
+them. The worker writes the response body to storage, and progress is
+reported as rows written out of the total rows of the exported querysets.
+
+Identical requests (same view and parameters) that are still pending or
+running share one job.
+"""
+import hashlib
+import json
+import logging
+import re
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.http import HttpRequest, JsonResponse, QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .exports import EXPORT_SPOOL_MAX_SIZE, ExportProgress, track_progress
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+ASYNC_PARAM = 'async'
+
+FILENAME_PATTERN = re.compile(r'filename="?([^";]+)"?')
+
+
+class ExportJobError(Exception):
+    """Raised when the replayed export view does not return a file"""
+    pass
+
+
+class AsyncExportMixin:
+    """
+    Run the export in the background when the request has ?async=1.
+
+    Place the mixin after the access mixins so the usual login and
+    permission checks run before a job is queued. `export_module` is the
+    module a user needs access to in order to download the result.
+    """
+    export_module = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method == 'GET' and request.GET.get(ASYNC_PARAM) in ('1', 'true'):
+            job = enqueue_export_job(self, request, kwargs)
+            return JsonResponse(get_job_status(job), status=202)
+        return super().dispatch(request, *args, **kwargs)
+
+
+def get_view_path(view):
+    view_class = type(view)
+    return f'{view_class.__module__}.{view_class.__qualname__}'
+
+
+def get_fingerprint(view_path, parameters):
+    payload = json.dumps([view_path, parameters], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def fail_stale_jobs():
+    """Release jobs whose worker died, so they stop blocking new requests"""
+    cutoff = timezone.now() - timedelta(seconds=settings.EXPORT_JOB_STALE_AFTER)
+    ExportJob.objects.filter(
+        status__in=ExportJob.ACTIVE_STATUSES,
+        created_at__lt=cutoff
+    ).update(status='FAILED', error_message='Export did not finish in time')
+
+
+def enqueue_export_job(view, request, view_kwargs=None):
+    """Return the in-flight job for this request, creating and queueing one if needed"""
+    query = {
+        key: values
+        for key, values in request.GET.lists()
+        if key != ASYNC_PARAM
+    }
+    parameters = {'query': query, 'kwargs': view_kwargs or {}}
+    view_path = get_view_path(view)
+    fingerprint = get_fingerprint(view_path, parameters)
+
+    fail_stale_jobs()
+    active = ExportJob.objects.filter(fingerprint=fingerprint, status__in=ExportJob.ACTIVE_STATUSES)
+    job = active.first()
+    if job:
+        return job
+
+    try:
+        with transaction.atomic():
+            job = ExportJob.objects.create(
+                view_path=view_path,
+                module=view.export_module or '',
+                parameters=parameters,
+                fingerprint=fingerprint,
+                created_by=request.user if request.user.is_authenticated else None,
+            )
+    except IntegrityError:
+        # Another request queued the same export first
+        return active.get()
+
+    transaction.on_commit(lambda: queue_export_job(job.id))
+    return job
+
+
+def queue_export_job(job_id):
+    from .tasks import run_export_job
+
+    try:
+        run_export_job.delay(job_id)
+    except Exception as e:
+        # Without a broker the job would block identical requests until it goes stale
+        logger.error(f"Could not queue export job {job_id}: {str(e)}")
+        ExportJob.objects.filter(pk=job_id).update(status='FAILED', error_message='Could not queue the export')
+
+
+def get_job_status(job):
+    status = {
+        'id': job.id,
+        'status': job.status,
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'progress': job.progress,
+        'status_url': reverse('reporting_and_analytics:export_job_status', args=[job.id]),
+        'download_url': None,
+        'error': job.error_message,
+    }
+    if job.status == 'COMPLETED':
+        status['download_url'] = reverse('reporting_and_analytics:export_job_download', args=[job.id])
+    return status
+
+
+class _MessageCollector:
+    """Stands in for the messages framework so a view's error messages reach the job"""
+
+    def __init__(self):
+        self.messages = []
+
+    def add(self, level, message, extra_tags=''):
+        self.messages.append(str(message))
+
+
+def build_job_request(job):
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(mutable=True)
+    for key, values in job.parameters.get('query', {}).items():
+        request.GET.setlist(key, values)
+    request.user = job.created_by or AnonymousUser()
+    request._messages = _MessageCollector()
+    return request
+
+
+def get_attachment_filename(response):
+    match = FILENAME_PATTERN.search(response.get('Content-Disposition', ''))
+    return match.group(1) if match else None
+
+
+def execute_export_job(job):
+    """Replay the export view for a job and store the file it returns"""
+    view_class = import_string(job.view_path)
+    if not issubclass(view_class, AsyncExportMixin):
+        raise ExportJobError(f"{job.view_path} does not support background exports")
+
+    def report(rows_written, total_rows):
+        ExportJob.objects.filter(pk=job.pk).update(rows_written=rows_written, total_rows=total_rows)
+
+    request = build_job_request(job)
+    view_kwargs = job.parameters.get('kwargs', {})
+    view = view_class()
+    view.setup(request, **view_kwargs)
+
+    with track_progress(ExportProgress(report)) as progress:
+        response = view.get(request, **view_kwargs)
+        filename = get_attachment_filename(response)
+        if response.status_code != 200 or not filename:
+            errors = '; '.join(request._messages.messages)
+            raise ExportJobError(errors or f"Export returned status {response.status_code}")
+
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE) as file:
+            try:
+                chunks = response.streaming_content if response.streaming else [response.content]
+                for chunk in chunks:
+                    file.write(chunk)
+            finally:
+                response.close()
+            file.seek(0)
+            job.export_file.save(filename, File(file), save=False)
+
+    job.filename = filename
+    job.rows_written = progress.rows_written
+    job.total_rows = progress.total_rows
+    job.status = 'COMPLETED'
+    job.completed_at = timezone.now()
+    job.save()
@@ -0,0 +1,285 @@
+"""
+Memory-bounded export engine shared by the export views.
+
+Querysets are read with .iterator(chunk_size=...) so rows are never all held
+in memory at once:
+
+- CSV is streamed to the client through StreamingHttpResponse.
+- XLSX is written by xlsxwriter in constant_memory mode into a spooled
+  temporary file, which is streamed back with FileResponse.
+- PDF tables are cut into page-sized Table flowables that platypus pulls
+  from the row iterator as it lays out each page. reportlab still keeps each
+  finished page's content stream until the document is saved, so a PDF costs
+  a few KB per page, but rows and flowables never accumulate.
+"""
+import csv
+import itertools
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import xlsxwriter
+from django.http import FileResponse, StreamingHttpResponse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+# Rows fetched per database round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Exports larger than this spill from memory to a temporary file on disk
+EXPORT_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+# Rows per PDF Table flowable, roughly one page of a compact table
+PDF_ROWS_PER_TABLE = 40
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+HEADER_FORMAT = {
+    'bold': True,
+    'bg_color': '#4B5563',
+    'font_color': 'white',
+    'border': 1
+}
+
+DEFAULT_PDF_TABLE_STYLE = [
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+]
+
+
+# Rows between two progress reports, and the longest gap between reports
+PROGRESS_REPORT_ROWS = 500
+PROGRESS_REPORT_SECONDS = 2
+
+_progress = threading.local()
+
+
+class ExportProgress:
+    """
+    Counts the rows read through iter_queryset() while an export runs.
+    `callback(rows_written, total_rows)` is called every few hundred rows.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.rows_written = 0
+        self.total_rows = 0
+        self._reported_at = time.monotonic()
+        self._reported_rows = 0
+
+    def add_total(self, count):
+        self.total_rows += count
+        self.report()
+
+    def track(self, rows):
+        for row in rows:
+            yield row
+            self.rows_written += 1
+            if (self.rows_written - self._reported_rows >= PROGRESS_REPORT_ROWS
+                    or time.monotonic() - self._reported_at >= PROGRESS_REPORT_SECONDS):
+                self.report()
+
+    def report(self):
+        self._reported_at = time.monotonic()
+        self._reported_rows = self.rows_written
+        self.callback(self.rows_written, self.total_rows)
+
+
+@contextmanager
+def track_progress(progress):
+    """Report progress for every queryset exported inside this block"""
+    _progress.current = progress
+    try:
+        yield progress
+    finally:
+        _progress.current = None
+
+
+def iter_queryset(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Iterate a queryset in chunks without caching the results"""
+    progress = getattr(_progress, 'current', None)
+    if progress is None:
+        return queryset.iterator(chunk_size=chunk_size)
+    progress.add_total(queryset.count())
+    return progress.track(queryset.iterator(chunk_size=chunk_size))
+
+
+def attachment_header(filename):
+    return f'attachment; filename="{filename}"'
+
+
+class _Echo:
+    """File-like object whose write() returns the data, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, header, rows):
+    """Stream rows as a CSV attachment, one line at a time"""
+    writer = csv.writer(_Echo())
+
+    def stream():
+        if header:
+            yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = attachment_header(filename)
+    return response
+
+
+def _spooled_file_response(file, filename, content_type):
+    file.seek(0)
+    return FileResponse(file, as_attachment=True, filename=filename, content_type=content_type)
+
+
+class XlsxExport:
+    """
+    Workbook written in xlsxwriter's constant_memory mode.
+
+    Each sheet must be written top to bottom, which write_sheet() does. The
+    workbook is assembled in a spooled temporary file.
+    """
+
+    def __init__(self):
+        self.file = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+        self.workbook = xlsxwriter.Workbook(self.file, {
+            'constant_memory': True,
+            'remove_timezone': True,
+        })
+        self.header_format = self.workbook.add_format(HEADER_FORMAT)
+        self.cell_format = self.workbook.add_format({'border': 1})
+        self.date_format = self.workbook.add_format({'border': 1, 'num_format': 'yyyy-mm-dd'})
+        self.datetime_format = self.workbook.add_format({'border': 1, 'num_format': 'yyyy-mm-dd hh:mm'})
+
+    def add_format(self, properties):
+        return self.workbook.add_format(properties)
+
+    def write_sheet(self, name, header, rows, widths=None, column_formats=None,
+                    header_format=None, cell_format=None):
+        """
+        Add a worksheet and write the header and rows into it in order.
+        `column_formats` maps a column index to the format used for it.
+        """
+        sheet = self.workbook.add_worksheet(name)
+        for col, width in enumerate(widths or []):
+            sheet.set_column(col, col, width)
+
+        header_format = header_format or self.header_format
+        cell_format = cell_format or self.cell_format
+        column_formats = column_formats or {}
+
+        row_num = 0
+        if header:
+            sheet.write_row(0, 0, header, header_format)
+            row_num = 1
+        for row_num, row in enumerate(rows, start=row_num):
+            for col, value in enumerate(row):
+                sheet.write(row_num, col, value, column_formats.get(col, cell_format))
+        return sheet
+
+    def close(self):
+        self.workbook.close()
+        return self.file
+
+    def response(self, filename):
+        return _spooled_file_response(self.close(), filename, XLSX_CONTENT_TYPE)
+
+
+class LazyFlowables(list):
+    """
+    Flowable list that platypus can consume while it is still being filled.
+    Items are pulled from the source iterator only as the layout engine asks
+    for them, so only a page or two of table rows exist at any time.
+    """
+    LOOKAHEAD = 2
+
+    def __init__(self, iterable):
+        super().__init__()
+        self._source = iter(iterable)
+
+    def _fill(self, size=None):
+        while self._source is not None and (size is None or list.__len__(self) < size):
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+
+    def __len__(self):
+        self._fill(self.LOOKAHEAD)
+        return list.__len__(self)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and index >= 0:
+            self._fill(index + 1)
+        elif isinstance(index, slice) and index.stop is not None and index.stop >= 0:
+            self._fill(index.stop)
+        else:
+            self._fill()
+        return list.__getitem__(self, index)
+
+
+class PdfExport:
+    """
+    PDF document built page by page. Tables are emitted as chunks of
+    PDF_ROWS_PER_TABLE rows, each repeating the header row.
+    """
+
+    def __init__(self, pagesize=letter, **doc_kwargs):
+        self.file = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+        self.doc = SimpleDocTemplate(self.file, pagesize=pagesize, **doc_kwargs)
+        self.styles = getSampleStyleSheet()
+        self._sections = []
+
+    def add(self, *flowables):
+        """Append flowables that are already built (titles, paragraphs, small tables)"""
+        self._sections.append(flowables)
+
+    def extend(self, flowables):
+        """Append flowables produced lazily, e.g. by a generator over a queryset"""
+        self._sections.append(flowables)
+
+    def add_table(self, header, rows, col_widths=None, style=None, rows_per_table=PDF_ROWS_PER_TABLE):
+        """
+        Append a table whose rows are pulled lazily from `rows`. `style` is a
+        TableStyle or a list of style commands.
+        """
+        self._sections.append(self._table_chunks(header, rows, col_widths, style, rows_per_table))
+
+    def _table_chunks(self, header, rows, col_widths, style, rows_per_table):
+        if not isinstance(style, TableStyle):
+            style = TableStyle(style if style is not None else DEFAULT_PDF_TABLE_STYLE)
+        rows = iter(rows)
+        emitted = False
+        while True:
+            chunk = list(itertools.islice(rows, rows_per_table))
+            if not chunk and emitted:
+                return
+            data = ([header] if header else []) + chunk
+            if data:
+                table = Table(data, colWidths=col_widths, repeatRows=1 if header else 0)
+                table.setStyle(style)
+                yield table
+            emitted = True
+            if len(chunk) < rows_per_table:
+                return
+
+    def build(self):
+        self.doc.build(LazyFlowables(itertools.chain.from_iterable(self._sections)))
+        return self.file
+
+    def response(self, filename):
+        return _spooled_file_response(self.build(), filename, 'application/pdf')
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reporting_and_analytics', '0005_export_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportexport',
+            name='pandas_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportexport',
+            name='query_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportexport',
+            name='upload_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportexport',
+            name='xlsx_write_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
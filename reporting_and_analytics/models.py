@@ -43,9 +43,61 @@ class ReportExport(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     export_file = models.FileField(upload_to='report_exports/', null=True, blank=True)
     error_message = models.TextField(null=True, blank=True)
+    # Seconds spent in each stage of generating the report
+    query_seconds = models.FloatField(null=True, blank=True)
+    pandas_seconds = models.FloatField(null=True, blank=True)
+    xlsx_write_seconds = models.FloatField(null=True, blank=True)
+    upload_seconds = models.FloatField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"{self.report.name} Export ({self.start_date.date()} to {self.end_date.date()})"
\ No newline at end of file
+        return f"{self.report.name} Export ({self.start_date.date()} to {self.end_date.date()})"
+
+class ExportJob(models.Model):
+    """An export view run in the background by a Celery worker"""
+    STATUS_CHOICES = ReportExport.STATUS_CHOICES
+    ACTIVE_STATUSES = ['PENDING', 'IN_PROGRESS']
+
+    view_path = models.CharField(max_length=255)
+    module = models.CharField(max_length=100)
+    parameters = JSONField(default=dict, blank=True)
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    rows_written = models.PositiveIntegerField(default=0)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    export_file = models.FileField(upload_to='export_jobs/', null=True, blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    error_message = models.TextField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # Identical requests share the job that is already in flight
+            models.UniqueConstraint(
+                fields=['fingerprint'],
+                condition=models.Q(status__in=['PENDING', 'IN_PROGRESS']),
+                name='unique_active_export_job'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.view_path.rsplit('.', 1)[-1]} ({self.get_status_display()})"
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    @property
+    def progress(self):
+        """Percentage of rows written, or None while the total is unknown"""
+        if self.status == 'COMPLETED':
+            return 100
+        if not self.total_rows:
+            return None
+        return min(100, round(self.rows_written * 100 / self.total_rows))
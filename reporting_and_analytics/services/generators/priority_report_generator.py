@@ -1,9 +1,8 @@
 import pandas as pd
-from django.db import models
-from django.db.models import Count, Avg, Q
 from django.utils import timezone
 from query_management.models import Query
-from datetime import datetime
+from ..query_frame import duration, get_query_frames, summarize
+from ..report_pipeline import ReportSections
 
 class PriorityReportGenerator:
     """Handles generation of Priority based reports"""
@@ -12,524 +11,360 @@ class PriorityReportGenerator:
     def generate_high_priority_status(start_date, end_date):
         """Generates detailed status report for high priority queries"""
         current_time = timezone.now()
-        
-        # Get base queryset for high priority queries
-        queries = Query.objects.filter(
-            created_at__range=(start_date, end_date),
-            priority='A'  # High priority
-        )
 
-        # Calculate metrics by status
-        status_metrics = list(queries.values(
-            'query_type',
-            'source',
-            'status'
-        ).annotate(
-            total_count=Count('query_id'),
-            avg_response_time=Avg(models.F('updated_at') - models.F('created_at')),
-            overdue_count=Count('query_id', 
-                filter=Q(expected_response_date__lt=current_time)
-            ),
-            unassigned_count=Count('query_id', 
-                filter=Q(assigned_to__isnull=True)
-            ),
-            resolution_time=Avg('response_time', 
-                filter=Q(status__in=['RESOLVED', 'CLOSED'])
+        # Get high priority queries
+        queries = get_query_frames(start_date, end_date).queries
+        queries = queries[queries['priority'] == 'A']
+        status = queries['status']
+        resolved = status.isin(['RESOLVED', 'CLOSED'])
+        overdue = queries['expected_response_date'] < current_time
+        unassigned = queries['assigned_to'].isna()
+
+        # Red background for high priority
+        report = ReportSections(header_color='#FF4444')
+
+        @report.add
+        def summary():
+            # Generate summary metrics
+            total_high_priority = len(queries)
+            summary_df = pd.DataFrame([{
+                'Metric': 'High Priority Overview',
+                'Total Queries': total_high_priority,
+                'New': (status == 'NEW').sum(),
+                'In Progress': (status == 'IN_PROGRESS').sum(),
+                'Waiting': (status == 'WAITING').sum(),
+                'Resolved': (status == 'RESOLVED').sum(),
+                'Closed': (status == 'CLOSED').sum(),
+                'Overdue': overdue.sum(),
+                'Unassigned': unassigned.sum(),
+                'Avg Resolution Time': str(
+                    duration(queries.loc[resolved, 'response_time'].mean()) or 'N/A'
+                ).split('.')[0]
+            }])
+
+            return {'Overview': summary_df}
+
+        @report.add
+        def detail():
+            # Calculate metrics by status
+            df = summarize(
+                queries, ['query_type', 'source', 'status'], ['query_type', 'source', 'status'],
+                total_count=('query_id', 'size'),
+                avg_response_time=(queries['updated_at'] - queries['created_at'], 'mean'),
+                overdue_count=(overdue, 'sum'),
+                unassigned_count=(unassigned, 'sum'),
+                resolution_time=(queries['response_time'].where(resolved), 'mean')
             )
-        ).order_by('query_type', 'source', 'status'))
-
-        # Create DataFrame
-        df = pd.DataFrame(status_metrics)
-        
-        if not df.empty:
-            # Map codes to display names
-            type_mapping = dict(Query.QUERY_TYPE_CHOICES)
-            source_mapping = dict(Query.SOURCE_CHOICES)
-            status_mapping = dict(Query.STATUS_CHOICES)
-            
-            # Apply mappings
-            df['query_type'] = df['query_type'].map(type_mapping)
-            df['source'] = df['source'].map(source_mapping)
-            df['status'] = df['status'].map(status_mapping)
-            
-            # Calculate percentages
-            df['overdue_rate'] = (df['overdue_count'] * 100.0 / df['total_count']).round(2)
-            df['unassigned_rate'] = (df['unassigned_count'] * 100.0 / df['total_count']).round(2)
-            
-            # Format durations
-            for col in ['avg_response_time', 'resolution_time']:
-                df[col] = df[col].apply(
-                    lambda x: str(x).split('.')[0] if pd.notnull(x) else 'N/A'
-                )
-            
-            # Rename columns
-            df.rename(columns={
-                'query_type': 'Query Type',
-                'source': 'Source',
-                'status': 'Status',
-                'total_count': 'Total Queries',
-                'avg_response_time': 'Avg Response Time',
-                'overdue_count': 'Overdue',
-                'overdue_rate': 'Overdue Rate (%)',
-                'unassigned_count': 'Unassigned',
-                'unassigned_rate': 'Unassigned Rate (%)',
-                'resolution_time': 'Resolution Time'
-            }, inplace=True)
-
-        # Generate summary metrics
-        total_high_priority = queries.count()
-        summary_df = pd.DataFrame([{
-            'Metric': 'High Priority Overview',
-            'Total Queries': total_high_priority,
-            'New': queries.filter(status='NEW').count(),
-            'In Progress': queries.filter(status='IN_PROGRESS').count(),
-            'Waiting': queries.filter(status='WAITING').count(),
-            'Resolved': queries.filter(status='RESOLVED').count(),
-            'Closed': queries.filter(status='CLOSED').count(),
-            'Overdue': queries.filter(expected_response_date__lt=current_time).count(),
-            'Unassigned': queries.filter(assigned_to__isnull=True).count(),
-            'Avg Resolution Time': str(
-                queries.filter(
-                    status__in=['RESOLVED', 'CLOSED']
-                ).aggregate(
-                    avg=Avg('response_time')
-                )['avg'] or 'N/A'
-            ).split('.')[0]
-        }])
-
-        # Create unique filename
-        temp_file = f'temp_report_{datetime.combine(start_date.date(), datetime.min.time()).strftime("%Y%m%d")}_{datetime.combine(end_date.date(), datetime.min.time()).strftime("%Y%m%d")}.xlsx'
-        
-        # Write to Excel
-        with pd.ExcelWriter(temp_file, engine='xlsxwriter') as excel_file:
-            workbook = excel_file.book
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#FF4444',  # Red background for high priority
-                'font_color': 'white'
-            })
-
-            # Write sheets
-            summary_df.to_excel(excel_file, sheet_name='Overview', index=False)
-            df.to_excel(excel_file, sheet_name='Detailed Analysis', index=False)
-
-            # Format headers and adjust column widths
-            for sheet_name, df in [('Overview', summary_df), ('Detailed Analysis', df)]:
-                worksheet = excel_file.sheets[sheet_name]
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                    max_length = max(
-                        df[df.columns[col_num]].astype(str).apply(len).max(),
-                        len(str(value))
-                    ) if not df.empty else len(str(value))
-                    worksheet.set_column(col_num, col_num, max_length + 2)
-
-        return temp_file
+
+            if not df.empty:
+                # Map codes to display names
+                type_mapping = dict(Query.QUERY_TYPE_CHOICES)
+                source_mapping = dict(Query.SOURCE_CHOICES)
+                status_mapping = dict(Query.STATUS_CHOICES)
+
+                # Apply mappings
+                df['query_type'] = df['query_type'].map(type_mapping)
+                df['source'] = df['source'].map(source_mapping)
+                df['status'] = df['status'].map(status_mapping)
+
+                # Calculate percentages
+                df['overdue_rate'] = (df['overdue_count'] * 100.0 / df['total_count']).round(2)
+                df['unassigned_rate'] = (df['unassigned_count'] * 100.0 / df['total_count']).round(2)
+
+                # Format durations
+                for col in ['avg_response_time', 'resolution_time']:
+                    df[col] = df[col].apply(
+                        lambda x: str(x).split('.')[0] if pd.notnull(x) else 'N/A'
+                    )
+
+                # Rename columns
+                df.rename(columns={
+                    'query_type': 'Query Type',
+                    'source': 'Source',
+                    'status': 'Status',
+                    'total_count': 'Total Queries',
+                    'avg_response_time': 'Avg Response Time',
+                    'overdue_count': 'Overdue',
+                    'overdue_rate': 'Overdue Rate (%)',
+                    'unassigned_count': 'Unassigned',
+                    'unassigned_rate': 'Unassigned Rate (%)',
+                    'resolution_time': 'Resolution Time'
+                }, inplace=True)
+
+            return {'Detailed Analysis': df}
+
+        return report
 
     @staticmethod
     def generate_priority_distribution(start_date, end_date):
         """Generates analysis of query priority distribution and metrics"""
         current_time = timezone.now()
-        
-        # Get base queryset
-        queries = Query.objects.filter(
-            created_at__range=(start_date, end_date)
-        )
 
-        # Calculate priority distribution metrics
-        priority_metrics = list(queries.values(
-            'priority',
-            'query_type',
-            'source'
-        ).annotate(
-            total_count=Count('query_id'),
-            resolved_count=Count('query_id', 
-                filter=Q(status__in=['RESOLVED', 'CLOSED'])
-            ),
-            overdue_count=Count('query_id', 
-                filter=Q(expected_response_date__lt=current_time)
-            ),
-            avg_response_time=Avg('response_time'),
-            satisfaction_avg=Avg('satisfaction_rating')
-        ).order_by('priority', 'query_type', 'source'))
-
-        # Create DataFrame
-        df = pd.DataFrame(priority_metrics)
-        
-        if not df.empty:
-            # Map codes to display names
-            priority_mapping = dict(Query.PRIORITY_CHOICES)
-            type_mapping = dict(Query.QUERY_TYPE_CHOICES)
-            source_mapping = dict(Query.SOURCE_CHOICES)
-            
-            # Apply mappings
-            df['priority'] = df['priority'].map(priority_mapping)
-            df['query_type'] = df['query_type'].map(type_mapping)
-            df['source'] = df['source'].map(source_mapping)
-            
-            # Calculate percentages and rates
-            total_queries = df['total_count'].sum()
-            df['distribution_percent'] = (df['total_count'] * 100.0 / total_queries).round(2)
-            df['resolution_rate'] = (df['resolved_count'] * 100.0 / df['total_count']).round(2)
-            df['overdue_rate'] = (df['overdue_count'] * 100.0 / df['total_count']).round(2)
-            
-            # Format time durations
-            df['avg_response_time'] = df['avg_response_time'].apply(
-                lambda x: str(x).split('.')[0] if pd.notnull(x) else 'N/A'
-            )
-            
-            # Round satisfaction average
-            df['satisfaction_avg'] = df['satisfaction_avg'].round(2)
-            
-            # Rename columns
-            df.rename(columns={
-                'priority': 'Priority Level',
-                'query_type': 'Query Type',
-                'source': 'Source',
-                'total_count': 'Total Queries',
-                'distribution_percent': 'Distribution (%)',
-                'resolved_count': 'Resolved',
-                'resolution_rate': 'Resolution Rate (%)',
-                'overdue_count': 'Overdue',
-                'overdue_rate': 'Overdue Rate (%)',
-                'avg_response_time': 'Avg Response Time',
-                'satisfaction_avg': 'Avg Satisfaction'
-            }, inplace=True)
-
-        # Generate priority summary
-        summary_df = pd.DataFrame([{
-            'Metric': 'Priority Distribution Overview',
-            'Total Queries': queries.count(),
-            'High Priority (%)': round(queries.filter(priority='A').count() * 100.0 / queries.count(), 2),
-            'Medium Priority (%)': round(queries.filter(priority='B').count() * 100.0 / queries.count(), 2),
-            'Low Priority (%)': round(queries.filter(priority='C').count() * 100.0 / queries.count(), 2),
-            'Overall Resolution Rate (%)': round(
-                queries.filter(status__in=['RESOLVED', 'CLOSED']).count() * 100.0 / queries.count(), 2
-            ),
-            'Overall Satisfaction': round(
-                queries.filter(satisfaction_rating__isnull=False).aggregate(
-                    avg=Avg('satisfaction_rating')
-                )['avg'] or 0, 2
+        # Get queries within date range
+        queries = get_query_frames(start_date, end_date).queries
+        resolved = queries['status'].isin(['RESOLVED', 'CLOSED'])
+
+        # Green background
+        report = ReportSections(header_color='#4CAF50')
+
+        @report.add
+        def summary():
+            # Generate priority summary
+            total_queries = len(queries)
+            priority_counts = queries['priority'].value_counts()
+            satisfaction = queries['satisfaction_rating'].mean()
+            summary_df = pd.DataFrame([{
+                'Metric': 'Priority Distribution Overview',
+                'Total Queries': total_queries,
+                'High Priority (%)': round(priority_counts['A'] * 100.0 / total_queries, 2),
+                'Medium Priority (%)': round(priority_counts['B'] * 100.0 / total_queries, 2),
+                'Low Priority (%)': round(priority_counts['C'] * 100.0 / total_queries, 2),
+                'Overall Resolution Rate (%)': round(resolved.sum() * 100.0 / total_queries, 2),
+                'Overall Satisfaction': round(satisfaction if pd.notnull(satisfaction) else 0, 2)
+            }])
+
+            return {'Overview': summary_df}
+
+        @report.add
+        def detail():
+            # Calculate priority distribution metrics
+            df = summarize(
+                queries, ['priority', 'query_type', 'source'], ['priority', 'query_type', 'source'],
+                total_count=('query_id', 'size'),
+                resolved_count=(resolved, 'sum'),
+                overdue_count=(queries['expected_response_date'] < current_time, 'sum'),
+                avg_response_time=('response_time', 'mean'),
+                satisfaction_avg=('satisfaction_rating', 'mean')
             )
-        }])
-
-        # Create unique filename
-        temp_file = f'temp_report_{datetime.combine(start_date.date(), datetime.min.time()).strftime("%Y%m%d")}_{datetime.combine(end_date.date(), datetime.min.time()).strftime("%Y%m%d")}.xlsx'
-        
-        # Write to Excel
-        with pd.ExcelWriter(temp_file, engine='xlsxwriter') as excel_file:
-            workbook = excel_file.book
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#4CAF50',  # Green background
-                'font_color': 'white'
-            })
-
-            # Write sheets
-            summary_df.to_excel(excel_file, sheet_name='Overview', index=False)
-            df.to_excel(excel_file, sheet_name='Priority Analysis', index=False)
-
-            # Format headers and adjust column widths
-            for sheet_name, df in [('Overview', summary_df), ('Priority Analysis', df)]:
-                worksheet = excel_file.sheets[sheet_name]
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                    max_length = max(
-                        df[df.columns[col_num]].astype(str).apply(len).max(),
-                        len(str(value))
-                    ) if not df.empty else len(str(value))
-                    worksheet.set_column(col_num, col_num, max_length + 2)
-
-        return temp_file
+
+            if not df.empty:
+                # Map codes to display names
+                priority_mapping = dict(Query.PRIORITY_CHOICES)
+                type_mapping = dict(Query.QUERY_TYPE_CHOICES)
+                source_mapping = dict(Query.SOURCE_CHOICES)
+
+                # Apply mappings
+                df['priority'] = df['priority'].map(priority_mapping)
+                df['query_type'] = df['query_type'].map(type_mapping)
+                df['source'] = df['source'].map(source_mapping)
+
+                # Calculate percentages and rates
+                total_queries = df['total_count'].sum()
+                df['distribution_percent'] = (df['total_count'] * 100.0 / total_queries).round(2)
+                df['resolution_rate'] = (df['resolved_count'] * 100.0 / df['total_count']).round(2)
+                df['overdue_rate'] = (df['overdue_count'] * 100.0 / df['total_count']).round(2)
+
+                # Format time durations
+                df['avg_response_time'] = df['avg_response_time'].apply(
+                    lambda x: str(x).split('.')[0] if pd.notnull(x) else 'N/A'
+                )
+
+                # Round satisfaction average
+                df['satisfaction_avg'] = df['satisfaction_avg'].round(2)
+
+                # Rename columns
+                df.rename(columns={
+                    'priority': 'Priority Level',
+                    'query_type': 'Query Type',
+                    'source': 'Source',
+                    'total_count': 'Total Queries',
+                    'distribution_percent': 'Distribution (%)',
+                    'resolved_count': 'Resolved',
+                    'resolution_rate': 'Resolution Rate (%)',
+                    'overdue_count': 'Overdue',
+                    'overdue_rate': 'Overdue Rate (%)',
+                    'avg_response_time': 'Avg Response Time',
+                    'satisfaction_avg': 'Avg Satisfaction'
+                }, inplace=True)
+
+            return {'Priority Analysis': df}
+
+        return report
 
     @staticmethod
     def generate_sla_compliance_report(start_date, end_date):
         """Generates SLA compliance analysis by priority level"""
         current_time = timezone.now()
-        
-        # Get base queryset
-        queries = Query.objects.filter(
-            created_at__range=(start_date, end_date)
-        )
 
-        # Calculate SLA metrics by priority
-        sla_metrics = list(queries.values(
-            'priority',
-            'query_type'
-        ).annotate(
-            total_queries=Count('query_id'),
-            within_sla=Count('query_id', 
-                filter=Q(
-                    resolved_at__lt=models.F('expected_response_date'),
-                    status__in=['RESOLVED', 'CLOSED']
-                )
-            ),
-            breached_sla=Count('query_id', 
-                filter=Q(
-                    expected_response_date__lt=current_time
-                ) & ~Q(status__in=['RESOLVED', 'CLOSED'])  # Fixed: using ~Q instead of not_in
-            ),
-            avg_breach_time=Avg(
-                models.F('resolved_at') - models.F('expected_response_date'),
-                filter=Q(
-                    resolved_at__gt=models.F('expected_response_date'),
-                    status__in=['RESOLVED', 'CLOSED']
-                )
-            ),
-            first_response_within_sla=Count('query_id',
-                filter=Q(updates__isnull=False) & 
-                      Q(updates__created_at__lt=models.F('expected_response_date'))
-            )
-        ).order_by('priority', 'query_type'))
-
-        # Create DataFrame
-        df = pd.DataFrame(sla_metrics)
-        
-        if not df.empty:
-            # Map codes to display names
-            priority_mapping = dict(Query.PRIORITY_CHOICES)
-            type_mapping = dict(Query.QUERY_TYPE_CHOICES)
-            
-            # Apply mappings
-            df['priority'] = df['priority'].map(priority_mapping)
-            df['query_type'] = df['query_type'].map(type_mapping)
-            
-            # Calculate rates
-            df['sla_compliance_rate'] = (df['within_sla'] * 100.0 / df['total_queries']).round(2)
-            df['sla_breach_rate'] = (df['breached_sla'] * 100.0 / df['total_queries']).round(2)
-            df['first_response_compliance'] = (df['first_response_within_sla'] * 100.0 / df['total_queries']).round(2)
-            
-            # Format breach time
-            df['avg_breach_time'] = df['avg_breach_time'].apply(
-                lambda x: str(x).split('.')[0] if pd.notnull(x) else 'N/A'
+        # Get queries within date range
+        queries = get_query_frames(start_date, end_date).queries
+        resolved = queries['status'].isin(['RESOLVED', 'CLOSED'])
+        within_sla = resolved & (queries['resolved_at'] < queries['expected_response_date'])
+        breached_sla = ~resolved & (queries['expected_response_date'] < current_time)
+        resolved_late = resolved & (queries['resolved_at'] > queries['expected_response_date'])
+        breach_time = queries['resolved_at'] - queries['expected_response_date']
+
+        # Orange background for SLA
+        report = ReportSections(header_color='#FFA500')
+
+        @report.add
+        def summary():
+            # Generate summary metrics
+            total_queries = len(queries)
+            high_priority = queries['priority'] == 'A'
+            summary_df = pd.DataFrame([{
+                'Metric': 'Overall SLA Compliance',
+                'Total Queries': total_queries,
+                'Overall Compliance Rate (%)': round(within_sla.sum() * 100.0 / total_queries, 2),
+                'High Priority Compliance (%)': round(
+                    (within_sla & high_priority).sum() * 100.0 / high_priority.sum(), 2
+                ),
+                'Current SLA Breaches': breached_sla.sum(),
+                'Average Breach Duration': str(
+                    duration(breach_time[resolved_late].mean()) or 'N/A'
+                ).split('.')[0]
+            }])
+
+            return {'SLA Overview': summary_df}
+
+        @report.add
+        def detail():
+            # Calculate SLA metrics by priority
+            df = summarize(
+                queries, ['priority', 'query_type'], ['priority', 'query_type'],
+                total_queries=('query_id', 'size'),
+                within_sla=(within_sla, 'sum'),
+                breached_sla=(breached_sla, 'sum'),
+                avg_breach_time=(breach_time.where(resolved_late), 'mean'),
+                # Queries with an update before the expected response date
+                first_response_within_sla=(queries['first_update_at'] < queries['expected_response_date'], 'sum')
             )
-            
-            # Rename columns
-            df.rename(columns={
-                'priority': 'Priority Level',
-                'query_type': 'Query Type',
-                'total_queries': 'Total Queries',
-                'within_sla': 'Within SLA',
-                'breached_sla': 'SLA Breached',
-                'sla_compliance_rate': 'SLA Compliance Rate (%)',
-                'sla_breach_rate': 'SLA Breach Rate (%)',
-                'avg_breach_time': 'Average Breach Duration',
-                'first_response_compliance': 'First Response Within SLA (%)'
-            }, inplace=True)
-
-        # Generate summary metrics
-        total_queries = queries.count()
-        summary_df = pd.DataFrame([{
-            'Metric': 'Overall SLA Compliance',
-            'Total Queries': total_queries,
-            'Overall Compliance Rate (%)': round(
-                queries.filter(
-                    resolved_at__lt=models.F('expected_response_date'),
-                    status__in=['RESOLVED', 'CLOSED']
-                ).count() * 100.0 / total_queries, 2
-            ),
-            'High Priority Compliance (%)': round(
-                queries.filter(
-                    priority='A',
-                    resolved_at__lt=models.F('expected_response_date'),
-                    status__in=['RESOLVED', 'CLOSED']
-                ).count() * 100.0 / queries.filter(priority='A').count(), 2
-            ),
-            'Current SLA Breaches': queries.filter(
-                expected_response_date__lt=current_time
-            ).exclude(  # Fixed: using exclude instead of not_in
-                status__in=['RESOLVED', 'CLOSED']
-            ).count(),
-            'Average Breach Duration': str(
-                queries.filter(
-                    resolved_at__gt=models.F('expected_response_date'),
-                    status__in=['RESOLVED', 'CLOSED']
-                ).aggregate(
-                    avg=Avg(models.F('resolved_at') - models.F('expected_response_date'))
-                )['avg'] or 'N/A'
-            ).split('.')[0]
-        }])
-
-        # Create unique filename
-        temp_file = f'temp_report_{datetime.combine(start_date.date(), datetime.min.time()).strftime("%Y%m%d")}_{datetime.combine(end_date.date(), datetime.min.time()).strftime("%Y%m%d")}.xlsx'
-        
-        # Write to Excel
-        with pd.ExcelWriter(temp_file, engine='xlsxwriter') as excel_file:
-            workbook = excel_file.book
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#FFA500',  # Orange background for SLA
-                'font_color': 'white'
-            })
-
-            # Write sheets
-            summary_df.to_excel(excel_file, sheet_name='SLA Overview', index=False)
-            df.to_excel(excel_file, sheet_name='SLA Analysis', index=False)
-
-            # Format headers and adjust column widths
-            for sheet_name, df in [('SLA Overview', summary_df), ('SLA Analysis', df)]:
-                worksheet = excel_file.sheets[sheet_name]
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                    max_length = max(
-                        df[df.columns[col_num]].astype(str).apply(len).max(),
-                        len(str(value))
-                    ) if not df.empty else len(str(value))
-                    worksheet.set_column(col_num, col_num, max_length + 2)
-
-        return temp_file
+
+            if not df.empty:
+                # Map codes to display names
+                priority_mapping = dict(Query.PRIORITY_CHOICES)
+                type_mapping = dict(Query.QUERY_TYPE_CHOICES)
+
+                # Apply mappings
+                df['priority'] = df['priority'].map(priority_mapping)
+                df['query_type'] = df['query_type'].map(type_mapping)
+
+                # Calculate rates
+                df['sla_compliance_rate'] = (df['within_sla'] * 100.0 / df['total_queries']).round(2)
+                df['sla_breach_rate'] = (df['breached_sla'] * 100.0 / df['total_queries']).round(2)
+                df['first_response_compliance'] = (df['first_response_within_sla'] * 100.0 / df['total_queries']).round(2)
+
+                # Format breach time
+                df['avg_breach_time'] = df['avg_breach_time'].apply(
+                    lambda x: str(x).split('.')[0] if pd.notnull(x) else 'N/A'
+                )
+
+                # Rename columns
+                df.rename(columns={
+                    'priority': 'Priority Level',
+                    'query_type': 'Query Type',
+                    'total_queries': 'Total Queries',
+                    'within_sla': 'Within SLA',
+                    'breached_sla': 'SLA Breached',
+                    'sla_compliance_rate': 'SLA Compliance Rate (%)',
+                    'sla_breach_rate': 'SLA Breach Rate (%)',
+                    'avg_breach_time': 'Average Breach Duration',
+                    'first_response_compliance': 'First Response Within SLA (%)'
+                }, inplace=True)
+
+            return {'SLA Analysis': df}
+
+        return report
 
     @staticmethod
     def generate_priority_escalation_tracking(start_date, end_date):
         """Generates analysis of query priority escalation patterns"""
         current_time = timezone.now()
-        
-        # Get base queryset
-        queries = Query.objects.filter(
-            created_at__range=(start_date, end_date),
-            updates__isnull=False  # Only queries with updates
-        ).distinct()
-
-        # Calculate escalation metrics
-        escalation_metrics = list(queries.values(
-            'query_type',
-            'source',
-            'priority'
-        ).annotate(
-            total_queries=Count('query_id', distinct=True),
-            escalated_count=Count(
-                'query_id',
-                filter=Q(
-                    updates__content__contains='priority changed'
-                ) & Q(
-                    updates__content__contains='increased'
-                ),
-                distinct=True
-            ),
-            avg_time_to_escalation=Avg(
-                models.F('updates__created_at') - models.F('created_at'),
-                filter=Q(
-                    updates__content__contains='priority changed'
-                ) & Q(
-                    updates__content__contains='increased'
+
+        # Get queries with updates
+        frames = get_query_frames(start_date, end_date)
+        queries = frames.queries[frames.queries['update_count'] > 0]
+
+        # Escalations are updates noting that the priority changed and increased
+        updates = frames.updates
+        escalations = updates[updates['priority_changed'] & updates['increased']]
+        time_to_escalation = escalations['created_at'] - escalations['query_id'].map(queries['created_at'])
+        escalation_count = escalations['query_id'].value_counts().reindex(queries.index, fill_value=0)
+        escalation_time = time_to_escalation.groupby(escalations['query_id']).sum().reindex(queries.index)
+        escalated = escalation_count > 0
+        resolved_after_escalation = queries['status'].isin(['RESOLVED', 'CLOSED']) & queries.index.isin(
+            updates.loc[updates['priority_changed'], 'query_id']
+        )
+
+        # Purple background for escalation
+        report = ReportSections(header_color='#9C27B0')
+
+        @report.add
+        def summary():
+            # Generate summary metrics
+            total_queries = len(queries)
+            total_escalated = escalated.sum()
+
+            summary_df = pd.DataFrame([{
+                'Metric': 'Priority Escalation Overview',
+                'Total Queries': total_queries,
+                'Total Escalated': total_escalated,
+                'Overall Escalation Rate (%)': round(total_escalated * 100.0 / total_queries if total_queries > 0 else 0, 2),
+                'Multiple Escalations': (escalation_count > 1).sum(),
+                'Average Time to Escalation': str(
+                    duration(time_to_escalation.mean()) or 'N/A'
+                ).split('.')[0],
+                'Resolution Rate After Escalation (%)': round(
+                    resolved_after_escalation.sum() * 100.0 / total_escalated if total_escalated > 0 else 0, 2
                 )
-            ),
-            multiple_escalations=Count(
-                'query_id',
-                filter=Q(
-                    updates__content__contains='priority changed'
-                ) & Q(
-                    updates__content__contains='increased'
-                ),
-                distinct=True
-            ) - 1,  # Subtract first escalation
-            resolved_after_escalation=Count(
-                'query_id',
-                filter=Q(
-                    status__in=['RESOLVED', 'CLOSED']
-                ) & Q(
-                    updates__content__contains='priority changed'
-                ),
-                distinct=True
+            }])
+
+            return {'Escalation Overview': summary_df}
+
+        @report.add
+        def detail():
+            # Calculate escalation metrics
+            df = summarize(
+                queries, ['query_type', 'source', 'priority'], ['query_type', 'source', 'priority'],
+                total_queries=('query_id', 'size'),
+                escalated_count=(escalated, 'sum'),
+                # Total time to escalation, averaged over the escalations below
+                avg_time_to_escalation=(escalation_time, 'sum'),
+                multiple_escalations=(escalation_count > 1, 'sum'),
+                resolved_after_escalation=(resolved_after_escalation, 'sum'),
+                escalations=(escalation_count, 'sum')
             )
-        ).order_by('query_type', 'source', 'priority'))
-
-        # Create DataFrame
-        df = pd.DataFrame(escalation_metrics)
-        
-        if not df.empty:
-            # Map codes to display names
-            type_mapping = dict(Query.QUERY_TYPE_CHOICES)
-            source_mapping = dict(Query.SOURCE_CHOICES)
-            priority_mapping = dict(Query.PRIORITY_CHOICES)
-            
-            # Apply mappings
-            df['query_type'] = df['query_type'].map(type_mapping)
-            df['source'] = df['source'].map(source_mapping)
-            df['priority'] = df['priority'].map(priority_mapping)
-            
-            # Calculate percentages
-            df['escalation_rate'] = (df['escalated_count'] * 100.0 / df['total_queries']).round(2)
-            df['multiple_escalation_rate'] = (df['multiple_escalations'] * 100.0 / df['escalated_count']).round(2)
-            df['resolution_rate_after_escalation'] = (df['resolved_after_escalation'] * 100.0 / df['escalated_count']).round(2)
-            
-            # Format time durations
-            df['avg_time_to_escalation'] = df['avg_time_to_escalation'].apply(
-                lambda x: str(x).split('.')[0] if pd.notnull(x) else 'N/A'
-            )
-            
-            # Rename columns
-            df.rename(columns={
-                'query_type': 'Query Type',
-                'source': 'Source',
-                'priority': 'Initial Priority',
-                'total_queries': 'Total Queries',
-                'escalated_count': 'Escalated Queries',
-                'escalation_rate': 'Escalation Rate (%)',
-                'avg_time_to_escalation': 'Avg Time to Escalation',
-                'multiple_escalations': 'Multiple Escalations',
-                'multiple_escalation_rate': 'Multiple Escalation Rate (%)',
-                'resolved_after_escalation': 'Resolved After Escalation',
-                'resolution_rate_after_escalation': 'Post-Escalation Resolution Rate (%)'
-            }, inplace=True)
-
-        # Generate summary metrics
-        total_queries = queries.count()
-        total_escalated = queries.filter(
-            Q(updates__content__contains='priority changed') & 
-            Q(updates__content__contains='increased')
-        ).distinct().count()
-
-        summary_df = pd.DataFrame([{
-            'Metric': 'Priority Escalation Overview',
-            'Total Queries': total_queries,
-            'Total Escalated': total_escalated,
-            'Overall Escalation Rate (%)': round(total_escalated * 100.0 / total_queries if total_queries > 0 else 0, 2),
-            'Multiple Escalations': queries.filter(
-                Q(updates__content__contains='priority changed') & 
-                Q(updates__content__contains='increased')
-            ).distinct().count() - total_escalated,
-            'Average Time to Escalation': str(
-                queries.filter(
-                    Q(updates__content__contains='priority changed') & 
-                    Q(updates__content__contains='increased')
-                ).aggregate(
-                    avg=Avg(models.F('updates__created_at') - models.F('created_at'))
-                )['avg'] or 'N/A'
-            ).split('.')[0],
-            'Resolution Rate After Escalation (%)': round(
-                queries.filter(
-                    status__in=['RESOLVED', 'CLOSED'],
-                    updates__content__contains='priority changed'
-                ).distinct().count() * 100.0 / total_escalated if total_escalated > 0 else 0, 2
-            )
-        }])
-
-        # Create unique filename
-        temp_file = f'temp_report_{datetime.combine(start_date.date(), datetime.min.time()).strftime("%Y%m%d")}_{datetime.combine(end_date.date(), datetime.min.time()).strftime("%Y%m%d")}.xlsx'
-        
-        # Write to Excel
-        with pd.ExcelWriter(temp_file, engine='xlsxwriter') as excel_file:
-            workbook = excel_file.book
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#9C27B0',  # Purple background for escalation
-                'font_color': 'white'
-            })
-
-            # Write sheets
-            summary_df.to_excel(excel_file, sheet_name='Escalation Overview', index=False)
-            df.to_excel(excel_file, sheet_name='Escalation Analysis', index=False)
-
-            # Format headers and adjust column widths
-            for sheet_name, df in [('Escalation Overview', summary_df), ('Escalation Analysis', df)]:
-                worksheet = excel_file.sheets[sheet_name]
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                    max_length = max(
-                        df[df.columns[col_num]].astype(str).apply(len).max(),
-                        len(str(value))
-                    ) if not df.empty else len(str(value))
-                    worksheet.set_column(col_num, col_num, max_length + 2)
-
-        return temp_file
+
+            if not df.empty:
+                df['avg_time_to_escalation'] = (
+                    df['avg_time_to_escalation'] / df.pop('escalations')
+                ).where(df['escalated_count'] > 0)
+
+                # Map codes to display names
+                type_mapping = dict(Query.QUERY_TYPE_CHOICES)
+                source_mapping = dict(Query.SOURCE_CHOICES)
+                priority_mapping = dict(Query.PRIORITY_CHOICES)
+
+                # Apply mappings
+                df['query_type'] = df['query_type'].map(type_mapping)
+                df['source'] = df['source'].map(source_mapping)
+                df['priority'] = df['priority'].map(priority_mapping)
+
+                # Calculate percentages
+                df['escalation_rate'] = (df['escalated_count'] * 100.0 / df['total_queries']).round(2)
+                df['multiple_escalation_rate'] = (df['multiple_escalations'] * 100.0 / df['escalated_count']).round(2)
+                df['resolution_rate_after_escalation'] = (df['resolved_after_escalation'] * 100.0 / df['escalated_count']).round(2)
+
+                # Format time durations
+                df['avg_time_to_escalation'] = df['avg_time_to_escalation'].apply(
+                    lambda x: str(x).split('.')[0] if pd.notnull(x) else 'N/A'
+                )
+
+                # Rename columns
+                df.rename(columns={
+                    'query_type': 'Query Type',
+                    'source': 'Source',
+                    'priority': 'Initial Priority',
+                    'total_queries': 'Total Queries',
+                    'escalated_count': 'Escalated Queries',
+                    'escalation_rate': 'Escalation Rate (%)',
+                    'avg_time_to_escalation': 'Avg Time to Escalation',
+                    'multiple_escalations': 'Multiple Escalations',
+                    'multiple_escalation_rate': 'Multiple Escalation Rate (%)',
+                    'resolved_after_escalation': 'Resolved After Escalation',
+                    'resolution_rate_after_escalation': 'Post-Escalation Resolution Rate (%)'
+                }, inplace=True)
+
+            return {'Escalation Analysis': df}
+
+        return report
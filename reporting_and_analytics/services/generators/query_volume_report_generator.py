@@ -1,284 +1,123 @@
-# Standard library imports
-from datetime import datetime
-import pytz
-
 # Third-party imports
 import pandas as pd
 
-# Django imports
-from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import Count, Q
-from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
-from django.utils import timezone
-
 # Local application imports
+from dashboard.timeseries import period_range
 from query_management.models import Query
+from ..query_frame import get_query_frames, local_datetimes, summarize
+from ..report_pipeline import ReportSections
 
 class QueryVolumeReportGenerator:
     """Handles generation of Query Volume related reports"""
-    
-    @staticmethod
-    def generate_temporal_query_count(start_date, end_date):
-        """Generates Daily/Weekly/Monthly Query Count report"""
-        
-        # Get local timezone
-        local_tz = timezone.get_current_timezone()
-        
-        # Get base queryset within date range
-        queries = Query.objects.filter(
-            created_at__range=(start_date, end_date)
-        )
 
-        # Create empty DataFrames with correct columns
-        df_daily = pd.DataFrame(columns=['Date', 'Number of Queries'])
-        df_weekly = pd.DataFrame(columns=['Week Starting', 'Number of Queries'])
-        df_monthly = pd.DataFrame(columns=['Month', 'Number of Queries'])
-
-        if queries.exists():
-            # Daily counts
-            daily_counts = list(queries.annotate(
-                date=TruncDate('created_at')
-            ).values('date').annotate(
-                count=Count('query_id')
-            ).order_by('date'))
-
-            # Weekly counts
-            weekly_counts = list(queries.annotate(
-                week=TruncWeek('created_at')
-            ).values('week').annotate(
-                count=Count('query_id')
-            ).order_by('week'))
-
-            # Monthly counts
-            monthly_counts = list(queries.annotate(
-                month=TruncMonth('created_at')
-            ).values('month').annotate(
-                count=Count('query_id')
-            ).order_by('month'))
+    @staticmethod
+    def _period_counts(queries, truncate, label, periods):
+        """Count queries per period of their local creation time as a DataFrame, listing periods without queries too"""
+        periods = pd.DatetimeIndex(pd.to_datetime(periods))
+        if queries.empty:
+            counts = pd.Series(0, index=periods)
+        else:
+            counts = truncate(local_datetimes(queries['created_at'])).value_counts().reindex(periods, fill_value=0)
+        return counts.rename_axis(label).reset_index(name='Number of Queries')
 
-            # Convert timezone and create DataFrames
-            if daily_counts:
-                for entry in daily_counts:
-                    # Convert date to datetime before timezone conversion
-                    if isinstance(entry['date'], datetime):
-                        entry['date'] = entry['date'].astimezone(local_tz).replace(tzinfo=None)
-                    else:
-                        # Convert date to datetime at midnight
-                        entry['date'] = datetime.combine(entry['date'], datetime.min.time())
-                df_daily = pd.DataFrame(daily_counts)
-                df_daily.rename(columns={'date': 'Date', 'count': 'Number of Queries'}, inplace=True)
+    @staticmethod
+    def _day(created):
+        return created.dt.normalize()
 
-            if weekly_counts:
-                for entry in weekly_counts:
-                    if isinstance(entry['week'], datetime):
-                        entry['week'] = entry['week'].astimezone(local_tz).replace(tzinfo=None)
-                    else:
-                        entry['week'] = datetime.combine(entry['week'], datetime.min.time())
-                df_weekly = pd.DataFrame(weekly_counts)
-                df_weekly.rename(columns={'week': 'Week Starting', 'count': 'Number of Queries'}, inplace=True)
+    @staticmethod
+    def _week(created):
+        # Weeks start on Monday
+        return created.dt.normalize() - pd.to_timedelta(created.dt.dayofweek, unit='D')
 
-            if monthly_counts:
-                for entry in monthly_counts:
-                    if isinstance(entry['month'], datetime):
-                        entry['month'] = entry['month'].astimezone(local_tz).replace(tzinfo=None)
-                    else:
-                        entry['month'] = datetime.combine(entry['month'], datetime.min.time())
-                df_monthly = pd.DataFrame(monthly_counts)
-                df_monthly.rename(columns={'month': 'Month', 'count': 'Number of Queries'}, inplace=True)
+    @staticmethod
+    def _month(created):
+        return created.dt.to_period('M').dt.to_timestamp()
 
-        # Create unique filename using naive datetime
-        temp_file = f'temp_report_{datetime.combine(start_date.date(), datetime.min.time()).strftime("%Y%m%d")}_{datetime.combine(end_date.date(), datetime.min.time()).strftime("%Y%m%d")}.xlsx'
-        
-        # Use context manager
-        with pd.ExcelWriter(temp_file, engine='xlsxwriter') as excel_file:
-            workbook = excel_file.book
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#0066cc',
-                'font_color': 'white'
-            })
+    @staticmethod
+    def generate_temporal_query_count(start_date, end_date):
+        """Generates Daily/Weekly/Monthly Query Count report"""
+        queries = get_query_frames(start_date, end_date).queries
+        generator = QueryVolumeReportGenerator
+        report = ReportSections()
 
-            # Write sheets
-            df_daily.to_excel(excel_file, sheet_name='Daily Counts', index=False)
-            df_weekly.to_excel(excel_file, sheet_name='Weekly Counts', index=False)
-            df_monthly.to_excel(excel_file, sheet_name='Monthly Counts', index=False)
+        def counts(truncate, label, period):
+            periods = period_range(start_date, end_date, period)
+            return generator._period_counts(queries, truncate, label, periods)
 
-            # Format headers and adjust column widths
-            for sheet_name, df in [
-                ('Daily Counts', df_daily),
-                ('Weekly Counts', df_weekly),
-                ('Monthly Counts', df_monthly)
-            ]:
-                worksheet = excel_file.sheets[sheet_name]
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                    # Adjust column width based on content
-                    if not df.empty:
-                        max_length = max(
-                            df[df.columns[col_num]].astype(str).apply(len).max(),
-                            len(str(value))
-                        )
-                    else:
-                        max_length = len(str(value))
-                    worksheet.set_column(col_num, col_num, max_length + 2)
+        @report.add
+        def build():
+            return {
+                'Daily Counts': counts(generator._day, 'Date', 'day'),
+                'Weekly Counts': counts(generator._week, 'Week Starting', 'week'),
+                'Monthly Counts': counts(generator._month, 'Month', 'month'),
+            }
 
-        return temp_file
+        return report
 
     @staticmethod
     def generate_source_distribution(start_date, end_date):
         """Generates Query Source Distribution report"""
-        # Get base queryset within date range
-        queries = Query.objects.filter(
-            created_at__range=(start_date, end_date)
-        )
+        report = ReportSections()
 
-        # Get source distribution
-        source_counts = list(queries.values('source').annotate(
-            count=Count('query_id')
-        ).order_by('-count'))
+        @report.add
+        def distribution():
+            queries = get_query_frames(start_date, end_date).queries
 
-        # Create DataFrame
-        df = pd.DataFrame(source_counts)
-        
-        if not df.empty:
-            # Map source codes to their display names
-            source_mapping = dict(Query.SOURCE_CHOICES)
-            df['source'] = df['source'].map(source_mapping)
-            df.rename(columns={'source': 'Source', 'count': 'Number of Queries'}, inplace=True)
+            # Get source distribution
+            df = summarize(queries, ['source'], '-count', count=('query_id', 'size'))
 
-        # Create unique filename
-        temp_file = f'temp_report_{datetime.combine(start_date.date(), datetime.min.time()).strftime("%Y%m%d")}_{datetime.combine(end_date.date(), datetime.min.time()).strftime("%Y%m%d")}.xlsx'
-        
-        # Write to Excel
-        with pd.ExcelWriter(temp_file, engine='xlsxwriter') as excel_file:
-            workbook = excel_file.book
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#0066cc',
-                'font_color': 'white'
-            })
+            if not df.empty:
+                # Map source codes to their display names
+                source_mapping = dict(Query.SOURCE_CHOICES)
+                df['source'] = df['source'].map(source_mapping)
+                df.rename(columns={'source': 'Source', 'count': 'Number of Queries'}, inplace=True)
 
-            # Write sheet
-            df.to_excel(excel_file, sheet_name='Source Distribution', index=False)
+            return {'Source Distribution': df}
 
-            # Format headers and adjust column widths
-            worksheet = excel_file.sheets['Source Distribution']
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-                if not df.empty:
-                    max_length = max(
-                        df[df.columns[col_num]].astype(str).apply(len).max(),
-                        len(str(value))
-                    )
-                else:
-                    max_length = len(str(value))
-                worksheet.set_column(col_num, col_num, max_length + 2)
-
-        return temp_file
+        return report
 
     @staticmethod
     def generate_type_distribution(start_date, end_date):
         """Generates Query Type Distribution report"""
-        # Get base queryset within date range
-        queries = Query.objects.filter(
-            created_at__range=(start_date, end_date)
-        )
+        report = ReportSections()
 
-        # Get type distribution
-        type_counts = list(queries.values('query_type').annotate(
-            count=Count('query_id')
-        ).order_by('-count'))
+        @report.add
+        def distribution():
+            queries = get_query_frames(start_date, end_date).queries
 
-        # Create DataFrame
-        df = pd.DataFrame(type_counts)
-        
-        if not df.empty:
-            # Map type codes to their display names
-            type_mapping = dict(Query.QUERY_TYPE_CHOICES)
-            df['query_type'] = df['query_type'].map(type_mapping)
-            df.rename(columns={'query_type': 'Query Type', 'count': 'Number of Queries'}, inplace=True)
-            
-            # Handle null/None values in query_type
-            df['Query Type'].fillna('Unspecified', inplace=True)
+            # Get type distribution
+            df = summarize(queries, ['query_type'], '-count', count=('query_id', 'size'))
 
-        # Create unique filename
-        temp_file = f'temp_report_{datetime.combine(start_date.date(), datetime.min.time()).strftime("%Y%m%d")}_{datetime.combine(end_date.date(), datetime.min.time()).strftime("%Y%m%d")}.xlsx'
-        
-        # Write to Excel
-        with pd.ExcelWriter(temp_file, engine='xlsxwriter') as excel_file:
-            workbook = excel_file.book
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#0066cc',
-                'font_color': 'white'
-            })
+            if not df.empty:
+                # Map type codes to their display names
+                type_mapping = dict(Query.QUERY_TYPE_CHOICES)
+                df['query_type'] = df['query_type'].map(type_mapping)
+                df.rename(columns={'query_type': 'Query Type', 'count': 'Number of Queries'}, inplace=True)
 
-            # Write sheet
-            df.to_excel(excel_file, sheet_name='Query Type Distribution', index=False)
+                # Handle null/None values in query_type
+                df['Query Type'] = df['Query Type'].fillna('Unspecified')
 
-            # Format headers and adjust column widths
-            worksheet = excel_file.sheets['Query Type Distribution']
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-                if not df.empty:
-                    max_length = max(
-                        df[df.columns[col_num]].astype(str).apply(len).max(),
-                        len(str(value))
-                    )
-                else:
-                    max_length = len(str(value))
-                worksheet.set_column(col_num, col_num, max_length + 2)
+            return {'Query Type Distribution': df}
 
-        return temp_file
+        return report
 
     @staticmethod
     def generate_user_type_distribution(start_date, end_date):
         """Generates Anonymous vs Registered User Query Distribution report"""
-        # Get base queryset within date range
-        queries = Query.objects.filter(
-            created_at__range=(start_date, end_date)
-        )
-
-        # Get distribution by user type
-        user_type_counts = list(queries.values('is_anonymous').annotate(
-            count=Count('query_id')
-        ).order_by('-count'))
+        report = ReportSections()
 
-        # Create DataFrame
-        df = pd.DataFrame(user_type_counts)
-        
-        if not df.empty:
-            # Map boolean values to readable labels
-            df['is_anonymous'] = df['is_anonymous'].map({True: 'Anonymous', False: 'Registered User'})
-            df.rename(columns={'is_anonymous': 'User Type', 'count': 'Number of Queries'}, inplace=True)
+        @report.add
+        def distribution():
+            queries = get_query_frames(start_date, end_date).queries
 
-        # Create unique filename
-        temp_file = f'temp_report_{datetime.combine(start_date.date(), datetime.min.time()).strftime("%Y%m%d")}_{datetime.combine(end_date.date(), datetime.min.time()).strftime("%Y%m%d")}.xlsx'
-        
-        # Write to Excel
-        with pd.ExcelWriter(temp_file, engine='xlsxwriter') as excel_file:
-            workbook = excel_file.book
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#0066cc',
-                'font_color': 'white'
-            })
+            # Get distribution by user type
+            df = summarize(queries, ['is_anonymous'], '-count', count=('query_id', 'size'))
 
-            # Write sheet
-            df.to_excel(excel_file, sheet_name='User Type Distribution', index=False)
+            if not df.empty:
+                # Map boolean values to readable labels
+                df['is_anonymous'] = df['is_anonymous'].map({True: 'Anonymous', False: 'Registered User'})
+                df.rename(columns={'is_anonymous': 'User Type', 'count': 'Number of Queries'}, inplace=True)
 
-            # Format headers and adjust column widths
-            worksheet = excel_file.sheets['User Type Distribution']
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-                if not df.empty:
-                    max_length = max(
-                        df[df.columns[col_num]].astype(str).apply(len).max(),
-                        len(str(value))
-                    )
-                else:
-                    max_length = len(str(value))
-                worksheet.set_column(col_num, col_num, max_length + 2)
+            return {'User Type Distribution': df}
 
-        return temp_file
\ No newline at end of file
+        return report
@@ -0,0 +1,302 @@
+"""
+Columnar extract of the Query rows behind the query reports.
+
+The report generators used to run their own aggregate queries against Query
+for the same date range. QueryFrames reads the Query fields they need once
+into a pandas frame, and the generators compute their pivots from it:
+
+- queries: one row per Query created in the range, indexed by query_id.
+  status, priority, source and query_type are categoricals, datetimes are
+  UTC, response_time is a timedelta and the boolean fields that allow NULL
+  use pandas' nullable boolean dtype. update_count and first_update_at
+  summarise each query's updates.
+- updates: one row per QueryUpdate of those queries, with flags for the
+  priority escalation notes.
+- tags: one row per (query, tag) pair, with the tag's id and name.
+- query_tags: tags joined with the query columns.
+- staff: name and email of every assigned user, indexed by user id.
+
+updates, tags, query_tags and staff are read the first time they are used.
+
+Frames are cached for the duration of a shared_query_frames() block, so
+several reports over the same range (a batch of exports or a dashboard)
+cost a single scan:
+
+    with shared_query_frames():
+        for generator in generators:
+            build_report(generator, start_date, end_date, ...)
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.utils import timezone
+
+from query_management.models import Query, QueryUpdate
+
+QUERY_FIELDS = (
+    'query_id',
+    'subject',
+    'source',
+    'priority',
+    'status',
+    'query_type',
+    'assigned_to',
+    'created_at',
+    'updated_at',
+    'resolved_at',
+    'expected_response_date',
+    'follow_up_date',
+    'is_anonymous',
+    'is_patient',
+    'conversion_status',
+    'response_time',
+    'satisfaction_rating',
+)
+
+DATETIME_FIELDS = ('created_at', 'updated_at', 'resolved_at', 'expected_response_date', 'follow_up_date')
+
+NULLABLE_BOOLEAN_FIELDS = ('is_patient', 'conversion_status')
+
+CHOICE_FIELDS = {
+    'source': Query.SOURCE_CHOICES,
+    'priority': Query.PRIORITY_CHOICES,
+    'status': Query.STATUS_CHOICES,
+    'query_type': Query.QUERY_TYPE_CHOICES,
+}
+
+STAFF_FIELDS = ('first_name', 'last_name', 'email')
+
+_shared_frames = ContextVar('shared_query_frames', default=None)
+
+
+def _categorical(values, choices):
+    # Categories are sorted like the stored codes, so sorting by them matches order_by()
+    categories = sorted({code for code, _ in choices} | {value for value in values if pd.notna(value)})
+    return pd.Categorical(values, categories=categories)
+
+
+class QueryFrames:
+    """Query, update, tag and staff frames for queries created between two dates"""
+
+    def __init__(self, start_date, end_date):
+        self.start_date = start_date
+        self.end_date = end_date
+        self._lock = threading.RLock()
+        self._frames = {}
+
+    def _get(self, name, load):
+        # Sections of a report may ask for the same frame from several threads
+        with self._lock:
+            if name not in self._frames:
+                self._frames[name] = load()
+            return self._frames[name]
+
+    @property
+    def queries(self):
+        return self._get('queries', self._load_queries)
+
+    @property
+    def updates(self):
+        return self._get('updates', self._load_updates)
+
+    @property
+    def tags(self):
+        return self._get('tags', self._load_tags)
+
+    @property
+    def query_tags(self):
+        return self._get('query_tags', self._join_query_tags)
+
+    @property
+    def staff(self):
+        return self._get('staff', self._load_staff)
+
+    def _query_filter(self, prefix=''):
+        return Q(**{f'{prefix}created_at__range': (self.start_date, self.end_date)})
+
+    def _load_queries(self):
+        rows = Query.objects.filter(self._query_filter()).order_by().values_list(*QUERY_FIELDS)
+        df = pd.DataFrame.from_records(list(rows), columns=QUERY_FIELDS)
+
+        for field in DATETIME_FIELDS:
+            df[field] = pd.to_datetime(df[field], utc=True)
+        for field, choices in CHOICE_FIELDS.items():
+            df[field] = _categorical(df[field], choices)
+        for field in NULLABLE_BOOLEAN_FIELDS:
+            df[field] = df[field].astype('boolean')
+        df['is_anonymous'] = df['is_anonymous'].astype(bool)
+        df['assigned_to'] = df['assigned_to'].astype('Int64')
+        df['response_time'] = pd.to_timedelta(df['response_time'])
+        df['satisfaction_rating'] = df['satisfaction_rating'].astype(float)
+        df = df.set_index('query_id', drop=False)
+        df.index.name = None
+
+        updates = QueryUpdate.objects.filter(self._query_filter('query__')).order_by().values_list('query_id', 'created_at')
+        updates = pd.DataFrame.from_records(list(updates), columns=['query_id', 'created_at'])
+        updates['created_at'] = pd.to_datetime(updates['created_at'], utc=True)
+        per_query = updates.groupby('query_id')['created_at'].agg(['size', 'min'])
+        df['update_count'] = per_query['size'].reindex(df.index, fill_value=0).astype(int)
+        df['first_update_at'] = per_query['min'].reindex(df.index)
+        return df
+
+    def _load_updates(self):
+        escalation_notes = {
+            'priority_changed': Q(content__contains='priority changed'),
+            'increased': Q(content__contains='increased'),
+        }
+        rows = QueryUpdate.objects.filter(self._query_filter('query__')).order_by().annotate(**{
+            name: ExpressionWrapper(condition, output_field=BooleanField())
+            for name, condition in escalation_notes.items()
+        }).values_list('query_id', 'created_at', *escalation_notes)
+
+        df = pd.DataFrame.from_records(list(rows), columns=['query_id', 'created_at', *escalation_notes])
+        df['created_at'] = pd.to_datetime(df['created_at'], utc=True)
+        for name in escalation_notes:
+            df[name] = df[name].astype(bool)
+        return df
+
+    def _load_tags(self):
+        through = Query.tags.through
+        rows = through.objects.filter(self._query_filter('query__')).order_by().values_list(
+            'query_id', 'querytag_id', 'querytag__name'
+        )
+        df = pd.DataFrame.from_records(list(rows), columns=['query_id', 'tag_id', 'tag'])
+        df['tag'] = df['tag'].astype('category')
+        return df
+
+    def _join_query_tags(self):
+        queries = self.queries.drop(columns='query_id')
+        return self.tags.join(queries, on='query_id')
+
+    def _load_staff(self):
+        staff_ids = self.queries['assigned_to'].dropna().unique().tolist()
+        rows = get_user_model().objects.filter(pk__in=staff_ids).values_list('pk', *STAFF_FIELDS)
+        return pd.DataFrame.from_records(list(rows), columns=['id', *STAFF_FIELDS]).set_index('id')
+
+    def staff_column(self, assigned_to, field):
+        """A staff field for a column of user ids, None where there is no user"""
+        values = assigned_to.map(self.staff[field]).astype(object)
+        return values.where(values.notna(), None)
+
+    def add_staff(self, df):
+        """Copy of df with assigned_to__<field> columns for its assigned_to column"""
+        if df.empty:
+            return df
+        return df.assign(**{
+            f'assigned_to__{field}': self.staff_column(df['assigned_to'], field)
+            for field in STAFF_FIELDS
+        })
+
+    def records(self, frame, fields):
+        """
+        Rows of `frame` as a DataFrame shaped like pd.DataFrame(list(queryset.values(*fields))).
+        Besides the frame's columns, fields can name assigned_to__<field> and
+        description, which are read on demand.
+        """
+        if frame.empty:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(index=frame.index)
+        for field in fields:
+            if field.startswith('assigned_to__'):
+                df[field] = self.staff_column(frame['assigned_to'], field.split('__', 1)[1])
+            elif field == 'description':
+                descriptions = dict(Query.objects.filter(pk__in=frame.index.tolist()).values_list('query_id', 'description'))
+                df[field] = frame.index.map(descriptions)
+            else:
+                df[field] = _to_values(frame[field])
+        return df.reset_index(drop=True)
+
+
+def _to_values(series):
+    """Convert categorical and nullable columns back to the Python values the ORM returns"""
+    if isinstance(series.dtype, (pd.CategoricalDtype, pd.BooleanDtype, pd.Int64Dtype)):
+        series = series.astype(object)
+        return series.where(series.notna(), None)
+    return series
+
+
+def duration(value):
+    """A pandas timedelta as the datetime.timedelta an aggregate query would return"""
+    return None if pd.isnull(value) else pd.Timedelta(value).to_pytimedelta()
+
+
+def local_datetimes(series):
+    """A UTC datetime column as naive datetimes in the current timezone"""
+    return series.dt.tz_convert(timezone.get_current_timezone()).dt.tz_localize(None)
+
+
+def local_dates(series):
+    """Calendar dates of a UTC datetime column in the current timezone, as midnight datetimes"""
+    return local_datetimes(series).dt.normalize()
+
+
+def is_true(series):
+    """Mask of a nullable boolean column, treating NULL as False"""
+    return series.fillna(False).astype(bool)
+
+
+def summarize(frame, keys, order_by=None, **metrics):
+    """
+    Group `frame` by `keys` into a DataFrame shaped like
+    pd.DataFrame(list(queryset.values(*keys).annotate(**metrics).order_by(*order_by))).
+    order_by is a field name or a list of them, with '-' for descending.
+
+    Each metric is (column, func) where column is a column name or a Series
+    aligned with `frame` (e.g. a mask, or a column filtered with .where()),
+    and func is a pandas reduction such as 'size', 'sum' or 'mean'.
+    """
+    if frame.empty:
+        return pd.DataFrame()
+
+    data = pd.DataFrame({
+        name: frame[column] if isinstance(column, str) else column
+        for name, (column, _) in metrics.items()
+    }, index=frame.index)
+    for key in keys:
+        data[key] = frame[key]
+    aggregations = {name: func for name, (_, func) in metrics.items()}
+
+    df = data.groupby(list(keys), observed=True, dropna=False, sort=True).agg(aggregations).reset_index()
+    for key in keys:
+        df[key] = _to_values(df[key])
+
+    if order_by:
+        order_by = [order_by] if isinstance(order_by, str) else order_by
+        ascending = [not field.startswith('-') for field in order_by]
+        df = df.sort_values(
+            [field.lstrip('-') for field in order_by],
+            ascending=ascending,
+            # NULL sorts before any value, as in the database
+            na_position='first' if all(ascending) else 'last',
+            kind='stable'
+        ).reset_index(drop=True)
+    return df
+
+
+@contextmanager
+def shared_query_frames():
+    """Reuse the frames for a date range across every report built inside this block"""
+    if _shared_frames.get() is not None:
+        yield
+        return
+    token = _shared_frames.set({})
+    try:
+        yield
+    finally:
+        _shared_frames.reset(token)
+
+
+def get_query_frames(start_date, end_date):
+    """Frames for queries created between two dates, shared inside shared_query_frames()"""
+    shared = _shared_frames.get()
+    if shared is None:
+        return QueryFrames(start_date, end_date)
+    key = (start_date, end_date)
+    if key not in shared:
+        shared[key] = QueryFrames(start_date, end_date)
+    return shared[key]
@@ -0,0 +1,178 @@
+"""
+Pipeline that turns a report generator's sections into an xlsx file.
+
+A generator describes its report as a ReportSections object. Each section is
+a callable returning {sheet name: DataFrame}. Independent sections, such as a
+summary frame and a detailed frame, are computed at the same time on
+separate database connections. The workbook is written into a directory
+owned by the caller, so concurrent exports never share a file. Sections of
+a report share the Query frames they read (see query_frame).
+
+The time spent in each stage is recorded on a ReportTimings object:
+
+- query: time spent executing SQL inside the sections
+- pandas: the rest of the time spent building the sections
+- xlsx_write: writing the workbook
+- upload: saving the workbook to storage (recorded by the caller)
+
+Sections computed in parallel add their query and pandas times together, so
+those two stages can exceed the wall-clock time of the report.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import copy_context
+
+import pandas as pd
+from django.conf import settings
+from django.db import connection, connections
+
+from .query_frame import shared_query_frames
+
+DEFAULT_HEADER_COLOR = '#0066cc'
+
+REPORT_FILENAME = 'report.xlsx'
+
+STAGES = ('query', 'pandas', 'xlsx_write', 'upload')
+
+
+class ReportTimings:
+    """Seconds spent in each stage of building a report"""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+
+    def add(self, stage, seconds):
+        self.seconds[stage] += seconds
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+
+class ReportSections:
+    """
+    Sheets of a report, grouped into sections that can be computed
+    independently. `add` can be used as a decorator:
+
+        report = ReportSections()
+
+        @report.add
+        def summary():
+            return {'Overview': summary_df}
+
+    Sheets are written in the order their sections were added.
+    """
+
+    def __init__(self, header_color=DEFAULT_HEADER_COLOR):
+        self.header_color = header_color
+        self.sections = []
+
+    def add(self, build):
+        self.sections.append(build)
+        return build
+
+
+class _QueryClock:
+    """Database execute wrapper that adds up the time spent running SQL"""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+def _timed(func):
+    """Run func and return (result, query seconds, other seconds)"""
+    clock = _QueryClock()
+    started = time.perf_counter()
+    with connection.execute_wrapper(clock):
+        result = func()
+    elapsed = time.perf_counter() - started
+    return result, clock.seconds, elapsed - clock.seconds
+
+
+def _timed_in_thread(func):
+    try:
+        return _timed(func)
+    finally:
+        connections.close_all()
+
+
+def compute_sections(report, timings, parallel=None):
+    """
+    Build every section of a report and return {sheet name: DataFrame}.
+
+    Sections run on separate connections at the same time unless `parallel`
+    is False. They always run sequentially inside a transaction, since other
+    connections could not see its uncommitted rows.
+    """
+    if parallel is None:
+        parallel = settings.REPORT_SECTIONS_PARALLEL
+    parallel = parallel and len(report.sections) > 1 and not connection.in_atomic_block
+
+    if parallel:
+        with ThreadPoolExecutor(max_workers=len(report.sections)) as executor:
+            # Sections see the caller's context, including its shared query frames
+            futures = [executor.submit(copy_context().run, _timed_in_thread, build) for build in report.sections]
+            results = [future.result() for future in futures]
+    else:
+        results = [_timed(build) for build in report.sections]
+
+    sheets = {}
+    for section_sheets, query_seconds, pandas_seconds in results:
+        timings.add('query', query_seconds)
+        timings.add('pandas', pandas_seconds)
+        sheets.update(section_sheets)
+    return sheets
+
+
+def write_workbook(path, sheets, header_color=DEFAULT_HEADER_COLOR):
+    """Write each DataFrame to its own sheet with a coloured header row and fitted columns"""
+    with pd.ExcelWriter(path, engine='xlsxwriter') as excel_file:
+        header_format = excel_file.book.add_format({
+            'bold': True,
+            'bg_color': header_color,
+            'font_color': 'white'
+        })
+
+        for sheet_name, df in sheets.items():
+            df.to_excel(excel_file, sheet_name=sheet_name, index=False)
+
+            # Format headers and adjust column widths
+            worksheet = excel_file.sheets[sheet_name]
+            for col_num, value in enumerate(df.columns.values):
+                worksheet.write(0, col_num, value, header_format)
+                if not df.empty:
+                    max_length = max(
+                        df[df.columns[col_num]].astype(str).apply(len).max(),
+                        len(str(value))
+                    )
+                else:
+                    max_length = len(str(value))
+                worksheet.set_column(col_num, col_num, max_length + 2)
+
+
+def build_report(generator, start_date, end_date, output_dir, timings):
+    """Run a generator, compute its sections and write the workbook into output_dir"""
+    with shared_query_frames():
+        report, query_seconds, pandas_seconds = _timed(lambda: generator(start_date, end_date))
+        timings.add('query', query_seconds)
+        timings.add('pandas', pandas_seconds)
+
+        sheets = compute_sections(report, timings)
+
+    path = os.path.join(output_dir, REPORT_FILENAME)
+    with timings.stage('xlsx_write'):
+        write_workbook(path, sheets, report.header_color)
+    return path
@@ -1,3 +1,4 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from .models import ReportExport
@@ -7,4 +8,5 @@ from .tasks import generate_report
 def trigger_report_generation(sender, instance, created, **kwargs):
     """Trigger report generation when a new export is created"""
     if created and instance.status == 'PENDING':
-        generate_report.delay(instance.id)
+        # Queue after commit so the worker can see the new export
+        transaction.on_commit(lambda: generate_report.delay(instance.id))
@@ -1,11 +1,18 @@
 from celery import shared_task
 from django.core.files import File
-from .models import ReportExport
+from django.utils import timezone
+from .export_jobs import execute_export_job
+from .models import ExportJob, ReportExport
 from .services.report_generators import ReportGeneratorFactory
-import os
+from .services.report_pipeline import ReportTimings, build_report
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
 
 @shared_task
 def generate_report(export_id):
+    export = None
     try:
         # Get the export instance
         export = ReportExport.objects.get(id=export_id)
@@ -20,26 +27,25 @@ def generate_report(export_id):
             export.report.name
         )
 
-        if generator:
-            # Generate the report
-            temp_file_path = generator(export.start_date, export.end_date)
-            
+        if not generator:
+            raise ValueError("No generator found for this report type")
+
+        # Each export gets its own directory, so concurrent workers never share a file
+        timings = ReportTimings()
+        with tempfile.TemporaryDirectory(prefix=f'report_{export.id}_') as output_dir:
+            report_path = build_report(generator, export.start_date, export.end_date, output_dir, timings)
+
             # Save the generated file to export
-            with open(temp_file_path, 'rb') as f:
-                export.export_file.save(
-                    f'report_{export.id}.xlsx',
-                    File(f),
-                    save=True
-                )
-            
-            # Update status to completed
-            export.status = 'COMPLETED'
-            export.save()
+            with timings.stage('upload'), open(report_path, 'rb') as f:
+                export.export_file.save(f'report_{export.id}.xlsx', File(f), save=False)
 
-            # Clean up temp file
-            os.remove(temp_file_path)
-        else:
-            raise ValueError("No generator found for this report type")
+        # Update status to completed
+        export.status = 'COMPLETED'
+        export.query_seconds = timings.seconds['query']
+        export.pandas_seconds = timings.seconds['pandas']
+        export.xlsx_write_seconds = timings.seconds['xlsx_write']
+        export.upload_seconds = timings.seconds['upload']
+        export.save()
 
     except Exception as e:
         if export:
@@ -47,3 +53,25 @@ def generate_report(export_id):
             export.error_message = str(e)
             export.save()
         raise
+
+
+@shared_task
+def run_export_job(job_id):
+    """Build the file for a background export job"""
+    # Claim the job so a redelivered message does not run it twice
+    claimed = ExportJob.objects.filter(id=job_id, status='PENDING').update(
+        status='IN_PROGRESS',
+        started_at=timezone.now()
+    )
+    if not claimed:
+        return
+
+    job = ExportJob.objects.get(id=job_id)
+    try:
+        execute_export_job(job)
+    except Exception as e:
+        logger.error(f"Export job {job_id} failed: {str(e)}")
+        job.status = 'FAILED'
+        job.error_message = str(e)
+        job.completed_at = timezone.now()
+        job.save()
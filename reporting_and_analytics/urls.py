@@ -2,6 +2,7 @@
 
 from django.urls import path
 from .views import (
+    export_jobs as export_job_views,
     reports as report_views,
 )
 
@@ -15,4 +16,10 @@ urlpatterns = [
     path('report/<int:report_id>/exports/', 
          report_views.ReportExportsView.as_view(), 
          name='report_exports'),
+    path('export-jobs/<int:job_id>/', 
+         export_job_views.ExportJobStatusView.as_view(), 
+         name='export_job_status'),
+    path('export-jobs/<int:job_id>/download/', 
+         export_job_views.ExportJobDownloadView.as_view(), 
+         name='export_job_download'),
 ]
\ No newline at end of file
@@ -0,0 +1,53 @@
+# Python Standard Library imports
+import logging
+
+# Django core imports
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import FileResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views import View
+
+# Local application imports
+from access_control.permissions import PermissionManager
+from error_handling.views import handler403, handler500
+from ..export_jobs import get_job_status
+from ..models import ExportJob
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class ExportJobAccessMixin(LoginRequiredMixin):
+    """Jobs are shared, so access follows the module the export belongs to"""
+
+    def get_job(self, job_id):
+        return get_object_or_404(ExportJob, id=job_id)
+
+    def has_job_access(self, job):
+        if job.created_by_id == self.request.user.id:
+            return True
+        return bool(job.module) and PermissionManager.check_module_access(self.request.user, job.module)
+
+
+class ExportJobStatusView(ExportJobAccessMixin, View):
+    def get(self, request, job_id):
+        job = self.get_job(job_id)
+        if not self.has_job_access(job):
+            return handler403(request, exception="Access Denied")
+        return JsonResponse(get_job_status(job))
+
+
+class ExportJobDownloadView(ExportJobAccessMixin, View):
+    def get(self, request, job_id):
+        job = self.get_job(job_id)
+        if not self.has_job_access(job):
+            return handler403(request, exception="Access Denied")
+
+        if job.status != 'COMPLETED' or not job.export_file:
+            return JsonResponse(get_job_status(job), status=409)
+
+        try:
+            return FileResponse(job.export_file.open('rb'), as_attachment=True, filename=job.filename)
+        except Exception as e:
+            logger.error(f"Error downloading export job {job.id}: {str(e)}")
+            return handler500(request, exception=str(e))
@@ -6,6 +6,7 @@ from .models import (
     Setting,
     SystemConfiguration,
     SettingHistory,
+    DocumentSequence,
     # Infrastructure Settings
     LoggingConfiguration,
     CacheConfiguration,
@@ -58,6 +59,12 @@ class SettingHistoryAdmin(admin.ModelAdmin):
     list_filter = ('change_type', 'changed_by', 'created_at')
     search_fields = ('setting__definition__name', 'changed_by__username')
 
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ('name', 'period', 'last_value')
+    list_filter = ('name',)
+    search_fields = ('name', 'period')
+
 # Infrastructure Settings
 @admin.register(LoggingConfiguration)
 class LoggingConfigurationAdmin(admin.ModelAdmin):
@@ -0,0 +1,65 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from settings.models import DocumentSequence
+from settings.sequences import next_document_number
+
+
+class Command(BaseCommand):
+    help = (
+        'Allocate document numbers from many threads at once and check that '
+        'none is handed out twice. The counters used are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=16,
+            help='Number of threads allocating numbers concurrently'
+        )
+        parser.add_argument(
+            '--per-worker',
+            type=int,
+            default=250,
+            help='Numbers allocated by each thread'
+        )
+
+    def handle(self, *args, **kwargs):
+        workers = kwargs['workers']
+        per_worker = kwargs['per_worker']
+        prefix = f"STRESS{timezone.now().strftime('%H%M%S%f')}"
+
+        def allocate(_):
+            try:
+                return [next_document_number(prefix) for _ in range(per_worker)]
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                numbers = [number for batch in executor.map(allocate, range(workers)) for number in batch]
+        finally:
+            DocumentSequence.objects.filter(name=prefix).delete()
+        elapsed = time.perf_counter() - started
+
+        expected = workers * per_worker
+        duplicates = [number for number, count in Counter(numbers).items() if count > 1]
+        self.stdout.write(
+            f"Allocated {len(numbers)} numbers from {workers} threads in {elapsed:.2f}s "
+            f"({len(numbers) / elapsed:.0f}/s)"
+        )
+
+        if duplicates:
+            raise CommandError(f"{len(duplicates)} numbers were allocated more than once, e.g. {duplicates[:5]}")
+        values = sorted(int(number.rsplit('-', 1)[-1]) for number in numbers)
+        if values != list(range(1, expected + 1)):
+            raise CommandError("Allocated numbers are not a gap-free sequence")
+
+        self.stdout.write(self.style.SUCCESS(f"All {expected} numbers were unique and consecutive"))
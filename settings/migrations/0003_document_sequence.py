@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('period', models.CharField(blank=True, help_text='Period the counter restarts for, e.g. a date; blank for a sequence that never restarts', max_length=20)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Document Sequence',
+                'verbose_name_plural': 'Document Sequences',
+                'constraints': [models.UniqueConstraint(fields=('name', 'period'), name='unique_document_sequence_period')],
+            },
+        ),
+    ]
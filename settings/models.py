@@ -174,6 +174,29 @@ class SystemConfiguration(models.Model):
         verbose_name = "System Configuration"
         verbose_name_plural = "System Configurations"
 
+
+class DocumentSequence(models.Model):
+    """Counter behind generated document numbers, one row per sequence and period"""
+    name = models.CharField(max_length=50)
+    period = models.CharField(
+        max_length=20,
+        blank=True,
+        help_text="Period the counter restarts for, e.g. a date; blank for a sequence that never restarts"
+    )
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Document Sequence"
+        verbose_name_plural = "Document Sequences"
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'period'], name='unique_document_sequence_period'),
+        ]
+
+    def __str__(self):
+        if self.period:
+            return f"{self.name} ({self.period})"
+        return self.name
+
 #------------------------------------------------------------------------------
 # Infrastructure Settings Models
 #------------------------------------------------------------------------------
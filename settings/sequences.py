@@ -0,0 +1,58 @@
+"""
+Gap-free counters for generated document numbers (visits, invoices, receipts,
+purchase orders, ...).
+
+Each sequence keeps its last value in a DocumentSequence row. A value is
+taken by incrementing that row with a single UPDATE, which locks it until the
+surrounding transaction ends, so concurrent callers are serialised on the
+counter row instead of racing on a "last number + 1" lookup. When the caller's
+transaction rolls back, the value it took is handed out again.
+
+    visit_number = next_document_number('VN', initial=last_visit_number)
+    # VN-20250115-0042
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DocumentSequence
+
+
+def next_sequence_value(name, period='', initial=None):
+    """
+    Increment the `name` counter for `period` and return its new value.
+
+    `initial` is an optional callable returning the last value already in use;
+    it is called once, when the counter for a period is first created, so a
+    sequence can continue numbers that were issued before it existed.
+    """
+    counter = DocumentSequence.objects.filter(name=name, period=period)
+
+    with transaction.atomic():
+        if counter.update(last_value=F('last_value') + 1):
+            return counter.values_list('last_value', flat=True).get()
+
+        value = (initial() if initial else 0) + 1
+        try:
+            with transaction.atomic():
+                DocumentSequence.objects.create(name=name, period=period, last_value=value)
+        except IntegrityError:
+            # Another transaction created the counter first; increment theirs
+            return next_sequence_value(name, period)
+        return value
+
+
+def next_document_number(prefix, date=None, width=4, initial=None):
+    """
+    Allocate the next daily document number, formatted as PREFIX-YYYYMMDD-NNNN.
+    The counter restarts every day; numbers past 10**width - 1 grow wider.
+    """
+    date = date or timezone.now()
+    date_str = date.strftime('%Y%m%d')
+    value = next_sequence_value(prefix, date_str, initial)
+    return f'{prefix}-{date_str}-{value:0{width}d}'
+
+
+def document_number_value(number):
+    """The counter part of a number made by next_document_number"""
+    return int(number.rsplit('-', 1)[-1])
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from .models import ItemCategory, StockItem, StockMovement, Supplier, PurchaseOrder, PurchaseOrderItem, StockAudit
+from .models import (
+    ItemCategory, StockItem, StockMovement, Supplier, PurchaseOrder, PurchaseOrderItem, StockAudit,
+    InventoryLedgerEntry, InventorySnapshot
+)
 
 @admin.register(ItemCategory)
 class ItemCategoryAdmin(admin.ModelAdmin):
@@ -15,9 +18,10 @@ class StockMovementInline(admin.TabularInline):
 
 @admin.register(StockItem)
 class StockItemAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'current_quantity', 'unit', 'reorder_point', 'unit_price', 'is_active')
+    list_display = ('name', 'category', 'medication', 'current_quantity', 'unit', 'reorder_point', 'unit_price', 'is_active')
     list_filter = ('category', 'is_active', 'unit')
-    search_fields = ('name', 'description')
+    search_fields = ('name', 'description', 'medication__name')
+    raw_id_fields = ('medication',)
     inlines = [StockMovementInline]
     actions = ['mark_for_reorder']
 
@@ -66,3 +70,31 @@ class StockAuditAdmin(admin.ModelAdmin):
     list_filter = ('audit_date',)
     search_fields = ('item__name', 'notes')
     readonly_fields = ('audit_date',)
+
+@admin.register(InventoryLedgerEntry)
+class InventoryLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'medication', 'stock_item', 'quantity', 'balance_after', 'source', 'reference_number', 'created_by')
+    list_filter = ('source', 'created_at')
+    search_fields = ('medication__name', 'stock_item__name', 'reference_number', 'notes')
+
+    # The ledger is append-only; entries are posted through stock_management.inventory
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(InventorySnapshot)
+class InventorySnapshotAdmin(admin.ModelAdmin):
+    list_display = ('taken_at', 'medication', 'stock_item', 'balance', 'last_entry_id')
+    list_filter = ('taken_at',)
+    search_fields = ('medication__name', 'stock_item__name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class StockManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stock_management'
+
+    def ready(self):
+        import stock_management.signals
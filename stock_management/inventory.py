@@ -0,0 +1,162 @@
+"""
+Inventory ledger shared by pharmacy medications and general stock items.
+
+Every change to a balance (MedicationStock.quantity or
+StockItem.current_quantity) goes through post_entry, which applies it with a
+single F() UPDATE and appends an InventoryLedgerEntry in the same
+transaction. The stored balance is therefore always current, and concurrent
+changes cannot overwrite each other. Removals that would take a balance
+below zero are refused.
+
+take_snapshots, run periodically, records every balance as of the latest
+ledger entry, computed from the previous snapshot and the entries since.
+Differences from the stored balances are logged. ledger_balance rebuilds a
+balance from the latest snapshot plus the entries since, so it reads only
+the recent part of the ledger.
+"""
+import logging
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Max, Sum
+
+from pharmacy_management.models import MedicationStock
+from .models import InventoryLedgerEntry, InventorySnapshot, StockItem
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(ValidationError):
+    """Raised when a removal is larger than the balance"""
+    pass
+
+
+def _balance_rows(medication=None, stock_item=None):
+    """The row holding a balance as (queryset, field name)"""
+    if (medication is None) == (stock_item is None):
+        raise ValueError("Pass exactly one of medication or stock_item")
+    if medication is not None:
+        return MedicationStock.objects.filter(medication=medication), 'quantity'
+    return StockItem.objects.filter(pk=stock_item.pk), 'current_quantity'
+
+
+def post_entry(quantity, source, medication=None, stock_item=None, created_by=None, reference_number='', notes=''):
+    """Change the balance of a medication or stock item by `quantity` and record it in the ledger"""
+    rows, field = _balance_rows(medication, stock_item)
+    target = medication or stock_item
+
+    with transaction.atomic():
+        # Removals only apply while enough stock is left
+        to_update = rows.filter(**{f'{field}__gte': -quantity}) if quantity < 0 else rows
+        updated = to_update.update(**{field: F(field) + quantity})
+        if not updated and medication is not None and not rows.exists():
+            # Medications get their stock row on first use
+            MedicationStock.objects.get_or_create(medication=medication)
+            updated = to_update.update(**{field: F(field) + quantity})
+        if not updated:
+            balance = rows.values_list(field, flat=True).first() or 0
+            raise InsufficientStock(f"Only {balance} units of {target.name} in stock, cannot remove {-quantity}")
+
+        balance_after = rows.values_list(field, flat=True).get()
+        return InventoryLedgerEntry.objects.create(
+            medication=medication,
+            stock_item=stock_item,
+            quantity=quantity,
+            balance_after=balance_after,
+            source=source,
+            reference_number=reference_number,
+            notes=notes,
+            created_by=created_by
+        )
+
+
+def record_opening_balance(medication=None, stock_item=None, balance=0):
+    """Record the balance a new medication stock or stock item was created with"""
+    if balance:
+        InventoryLedgerEntry.objects.create(
+            medication=medication,
+            stock_item=stock_item,
+            quantity=balance,
+            balance_after=balance,
+            source='OPENING'
+        )
+
+
+def ledger_balance(medication=None, stock_item=None):
+    """Balance of a medication or stock item according to the ledger"""
+    _balance_rows(medication, stock_item)
+    target = {'medication': medication} if medication is not None else {'stock_item': stock_item}
+
+    snapshot = InventorySnapshot.objects.filter(**target).order_by('-last_entry_id').first()
+    entries = InventoryLedgerEntry.objects.filter(**target)
+    if snapshot:
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+    change = entries.aggregate(total=Sum('quantity'))['total'] or 0
+    return (snapshot.balance if snapshot else 0) + change
+
+
+def take_snapshots():
+    """
+    Snapshot the ledger balance of everything with ledger entries, and log
+    balances that no longer match the ledger (changes posted while the
+    snapshot runs show up there too). Returns the number of snapshots.
+    """
+    with transaction.atomic():
+        last_entry_id = InventoryLedgerEntry.objects.aggregate(last=Max('id'))['last'] or 0
+        previous_entry_id = InventorySnapshot.objects.aggregate(last=Max('last_entry_id'))['last'] or 0
+        if last_entry_id <= previous_entry_id:
+            return 0
+
+        # Each run snapshots every balance, so the previous run holds all of them
+        balances = defaultdict(int)
+        for snapshot in InventorySnapshot.objects.filter(last_entry_id=previous_entry_id).values(
+            'medication_id', 'stock_item_id', 'balance'
+        ):
+            balances[snapshot['medication_id'], snapshot['stock_item_id']] = snapshot['balance']
+
+        changes = InventoryLedgerEntry.objects.filter(
+            id__gt=previous_entry_id,
+            id__lte=last_entry_id
+        ).order_by().values('medication_id', 'stock_item_id').annotate(change=Sum('quantity'))
+        for change in changes:
+            balances[change['medication_id'], change['stock_item_id']] += change['change']
+
+        InventorySnapshot.objects.bulk_create([
+            InventorySnapshot(
+                medication_id=medication_id,
+                stock_item_id=stock_item_id,
+                balance=balance,
+                last_entry_id=last_entry_id
+            )
+            for (medication_id, stock_item_id), balance in balances.items()
+        ], batch_size=1000)
+
+    _log_drift(balances)
+    return len(balances)
+
+
+def _log_drift(balances):
+    stored = {
+        (medication_id, None): quantity
+        for medication_id, quantity in MedicationStock.objects.values_list('medication_id', 'quantity')
+    }
+    stored.update({
+        (None, item_id): quantity
+        for item_id, quantity in StockItem.objects.values_list('id', 'current_quantity')
+    })
+    for key, balance in balances.items():
+        if key in stored and stored[key] != balance:
+            medication_id, stock_item_id = key
+            target = f"medication {medication_id}" if medication_id else f"stock item {stock_item_id}"
+            logger.warning(f"Stored balance of {target} is {stored[key]}, ledger balance is {balance}")
+
+
+def stock_items_for_medications(medication_ids):
+    """{medication id: an in-stock StockItem for it} for several medications, in one query"""
+    items = StockItem.objects.filter(
+        medication_id__in=medication_ids,
+        current_quantity__gt=0
+    ).order_by('-id')
+    # Iterating newest first leaves the oldest item for each medication
+    return {item.medication_id: item for item in items}
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy_management', '0002_initial'),
+        ('stock_management', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockitem',
+            name='medication',
+            field=models.ForeignKey(blank=True, help_text='Pharmacy medication this item stocks, if any', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_items', to='pharmacy_management.medication'),
+        ),
+        migrations.CreateModel(
+            name='InventoryLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(help_text='Change in balance; negative for removals')),
+                ('balance_after', models.IntegerField()),
+                ('source', models.CharField(choices=[('OPENING', 'Opening Balance'), ('ADJUSTMENT', 'Pharmacy Stock Adjustment'), ('MOVEMENT', 'Stock Movement')], max_length=20)),
+                ('reference_number', models.CharField(blank=True, max_length=50)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('medication', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='pharmacy_management.medication')),
+                ('stock_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='stock_management.stockitem')),
+            ],
+            options={
+                'verbose_name_plural': 'Inventory Ledger Entries',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['medication', 'id'], name='stock_manag_medicat_5d9f23_idx'), models.Index(fields=['stock_item', 'id'], name='stock_manag_stock_i_566643_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('medication__isnull', True), ('stock_item__isnull', True), _connector='XOR'), name='ledger_entry_single_target')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.IntegerField()),
+                ('last_entry_id', models.PositiveBigIntegerField(default=0, help_text='Id of the last ledger entry included in the balance')),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+                ('medication', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='pharmacy_management.medication')),
+                ('stock_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='stock_management.stockitem')),
+            ],
+            options={
+                'ordering': ['-last_entry_id'],
+                'indexes': [models.Index(fields=['medication', '-last_entry_id'], name='stock_manag_medicat_f79be1_idx'), models.Index(fields=['stock_item', '-last_entry_id'], name='stock_manag_stock_i_44d73b_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('medication__isnull', True), ('stock_item__isnull', True), _connector='XOR'), name='inventory_snapshot_single_target')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    Medication = apps.get_model('pharmacy_management', 'Medication')
+    MedicationStock = apps.get_model('pharmacy_management', 'MedicationStock')
+    StockItem = apps.get_model('stock_management', 'StockItem')
+    InventoryLedgerEntry = apps.get_model('stock_management', 'InventoryLedgerEntry')
+
+    # Stock items used to be matched to medications by name
+    medication_ids = {}
+    for medication_id, name in Medication.objects.order_by('-id').values_list('id', 'name'):
+        medication_ids[name] = medication_id
+    for item in StockItem.objects.filter(medication__isnull=True, name__in=medication_ids.keys()):
+        item.medication_id = medication_ids[item.name]
+        item.save(update_fields=['medication'])
+
+    # Existing balances become the opening entries of the ledger
+    entries = [
+        InventoryLedgerEntry(medication_id=medication_id, quantity=quantity, balance_after=quantity, source='OPENING')
+        for medication_id, quantity in MedicationStock.objects.filter(quantity__gt=0).values_list('medication_id', 'quantity')
+    ] + [
+        InventoryLedgerEntry(stock_item_id=item_id, quantity=quantity, balance_after=quantity, source='OPENING')
+        for item_id, quantity in StockItem.objects.filter(current_quantity__gt=0).values_list('id', 'current_quantity')
+    ]
+    InventoryLedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+def clear(apps, schema_editor):
+    apps.get_model('stock_management', 'InventoryLedgerEntry').objects.filter(source='OPENING').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pharmacy_management', '0002_initial'),
+        ('stock_management', '0003_inventory_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, clear),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from pharmacy_management.models import Medication
 
 User = get_user_model()
 
@@ -26,6 +29,14 @@ class StockItem(models.Model):
 
     name = models.CharField(max_length=255)
     category = models.ForeignKey(ItemCategory, on_delete=models.SET_NULL, null=True, related_name='items')
+    medication = models.ForeignKey(
+        Medication,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='stock_items',
+        help_text="Pharmacy medication this item stocks, if any"
+    )
     description = models.TextField(blank=True)
     unit = models.CharField(max_length=10, choices=UNIT_CHOICES)
     current_quantity = models.PositiveIntegerField(default=0)
@@ -53,6 +64,21 @@ class StockMovement(models.Model):
     def __str__(self):
         return f"{self.get_movement_type_display()} - {self.item.name} ({self.quantity})"
 
+    def save(self, *args, **kwargs):
+        # Imported here since the inventory module depends on these models
+        from .inventory import post_entry
+
+        if not self._state.adding:
+            # The stock was changed when the movement was recorded
+            super().save(*args, **kwargs)
+            return
+
+        change = abs(self.quantity) if self.movement_type == 'IN' else -abs(self.quantity)
+        with transaction.atomic():
+            # Update the item's stock through the inventory ledger
+            post_entry(change, 'MOVEMENT', stock_item=self.item, created_by=self.performed_by, notes=self.notes)
+            super().save(*args, **kwargs)
+
 class Supplier(models.Model):
     name = models.CharField(max_length=255)
     contact_person = models.CharField(max_length=100)
@@ -104,4 +130,105 @@ class StockAudit(models.Model):
     performed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
 
     def __str__(self):
-        return f"Audit - {self.item.name} on {self.audit_date}"
\ No newline at end of file
+        return f"Audit - {self.item.name} on {self.audit_date}"
+
+
+class InventoryLedgerEntry(models.Model):
+    """
+    Append-only record of every change to a stock balance, for either a
+    pharmacy medication or a general stock item
+    """
+    SOURCE_CHOICES = [
+        ('OPENING', 'Opening Balance'),
+        ('ADJUSTMENT', 'Pharmacy Stock Adjustment'),
+        ('MOVEMENT', 'Stock Movement'),
+    ]
+
+    medication = models.ForeignKey(
+        Medication,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='ledger_entries'
+    )
+    stock_item = models.ForeignKey(
+        StockItem,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='ledger_entries'
+    )
+    quantity = models.IntegerField(help_text="Change in balance; negative for removals")
+    balance_after = models.IntegerField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    reference_number = models.CharField(max_length=50, blank=True)
+    notes = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name_plural = "Inventory Ledger Entries"
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(medication__isnull=True) ^ Q(stock_item__isnull=True),
+                name='ledger_entry_single_target'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['medication', 'id']),
+            models.Index(fields=['stock_item', 'id']),
+        ]
+
+    def __str__(self):
+        target = self.medication.name if self.medication_id else self.stock_item.name
+        return f"{self.get_source_display()} - {target} ({self.quantity:+d})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Inventory ledger entries cannot be changed once recorded")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Inventory ledger entries cannot be deleted")
+
+
+class InventorySnapshot(models.Model):
+    """Balance of a medication or stock item as of a ledger entry"""
+    medication = models.ForeignKey(
+        Medication,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='inventory_snapshots'
+    )
+    stock_item = models.ForeignKey(
+        StockItem,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='inventory_snapshots'
+    )
+    balance = models.IntegerField()
+    last_entry_id = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Id of the last ledger entry included in the balance"
+    )
+    taken_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_entry_id']
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(medication__isnull=True) ^ Q(stock_item__isnull=True),
+                name='inventory_snapshot_single_target'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['medication', '-last_entry_id']),
+            models.Index(fields=['stock_item', '-last_entry_id']),
+        ]
+
+    def __str__(self):
+        target = self.medication.name if self.medication_id else self.stock_item.name
+        return f"{target}: {self.balance} as of entry {self.last_entry_id}"
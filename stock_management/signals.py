@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from pharmacy_management.models import MedicationStock
+from .inventory import record_opening_balance
+from .models import StockItem
+
+
+@receiver(post_save, sender=MedicationStock)
+def record_medication_opening_balance(sender, instance, created, **kwargs):
+    """Start the ledger of a new medication stock with the quantity it was created with"""
+    if created and not kwargs.get('raw'):
+        record_opening_balance(medication=instance.medication, balance=instance.quantity)
+
+
+@receiver(post_save, sender=StockItem)
+def record_stock_item_opening_balance(sender, instance, created, **kwargs):
+    """Start the ledger of a new stock item with the quantity it was created with"""
+    if created and not kwargs.get('raw'):
+        record_opening_balance(stock_item=instance, balance=instance.current_quantity)
@@ -0,0 +1,8 @@
+from celery import shared_task
+from .inventory import take_snapshots
+
+
+@shared_task
+def snapshot_inventory():
+    """Record the ledger balance of every medication and stock item"""
+    return take_snapshots()
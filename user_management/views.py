@@ -11,8 +11,8 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db import transaction
-from django.db.models import Q
-from django.http import Http404, HttpResponse
+from django.db.models import Count, Q
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.utils import timezone
@@ -20,9 +20,7 @@ from django.utils.decorators import method_decorator
 from django.views import View
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-import csv
+from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
 
 # Local application imports
 from access_control.models import Role
@@ -38,6 +36,8 @@ from doctor_management.models import (
 )
 from error_handling.views import handler400, handler403, handler404, handler500
 from patient_management.models import Patient, MedicalHistory
+from reporting_and_analytics.export_jobs import AsyncExportMixin
+from reporting_and_analytics.exports import PdfExport, csv_response, iter_queryset
 from datetime import timedelta
 from .forms import (
     UserRegistrationForm,
@@ -620,7 +620,9 @@ class UserEditView(LoginRequiredMixin, UserPassesTestMixin, View):
             logger.error(f"Error in UserEditView POST: {str(e)}")
             return handler500(request, exception=str(e))
 
-class UserExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+class UserExportView(LoginRequiredMixin, UserPassesTestMixin, AsyncExportMixin, View):
+    export_module = 'user_management'
+
     def test_func(self):
         return PermissionManager.check_module_access(self.request.user, 'user_management')
 
@@ -660,11 +662,7 @@ class UserExportView(LoginRequiredMixin, UserPassesTestMixin, View):
         return queryset
 
     def export_csv(self, queryset):
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="users_report.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow([
+        header = [
             'ID',
             'Name',
             'Email',
@@ -675,40 +673,43 @@ class UserExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             'Last Login',
             'Gender',
             'Country Code'
-        ])
-
-        for user in queryset:
-            writer.writerow([
-                user.id,
-                user.get_full_name(),
-                user.email,
-                user.role.display_name if user.role else 'No Role',
-                'Active' if user.is_active else 'Inactive',
-                user.phone_number or 'N/A',
-                user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
-                user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never',
-                user.get_gender_display() if user.gender else 'N/A',
-                user.country_code or 'N/A'
-            ])
+        ]
 
-        return response
+        def rows():
+            for user in iter_queryset(queryset):
+                yield [
+                    user.id,
+                    user.get_full_name(),
+                    user.email,
+                    user.role.display_name if user.role else 'No Role',
+                    'Active' if user.is_active else 'Inactive',
+                    user.phone_number or 'N/A',
+                    user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
+                    user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else 'Never',
+                    user.get_gender_display() if user.gender else 'N/A',
+                    user.country_code or 'N/A'
+                ]
+
+        return csv_response('users_report.csv', header, rows())
 
     def export_pdf(self, queryset):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="users_report.pdf"'
+        pdf = PdfExport(pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
 
-        doc = SimpleDocTemplate(response, pagesize=letter, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
-        elements = []
-
-        styles = getSampleStyleSheet()
-        elements.append(Paragraph('User Management Report', styles['Heading1']))
-        elements.append(Spacer(1, 20))
-        elements.append(Paragraph(f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-        elements.append(Spacer(1, 20))
+        styles = pdf.styles
+        pdf.add(
+            Paragraph('User Management Report', styles['Heading1']),
+            Spacer(1, 20),
+            Paragraph(f"Generated on: {timezone.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']),
+            Spacer(1, 20)
+        )
 
         # Statistics
-        total_users = queryset.count()
-        active_users = queryset.filter(is_active=True).count()
+        counts = queryset.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+        )
+        total_users = counts['total']
+        active_users = counts['active']
         inactive_users = total_users - active_users
 
         stats_data = [
@@ -724,41 +725,34 @@ class UserExportView(LoginRequiredMixin, UserPassesTestMixin, View):
             ('GRID', (0, 0), (-1, -1), 1, colors.black),
             ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
         ]))
-        elements.append(stats_table)
-        elements.append(Spacer(1, 20))
+        pdf.add(stats_table, Spacer(1, 20))
 
         # Users Table
-        data = [[
-            'Name',
-            'Email',
-            'Role',
-            'Status',
-            'Joined Date'
-        ]]
-
-        for user in queryset:
-            data.append([
+        rows = (
+            [
                 user.get_full_name(),
                 user.email,
                 user.role.display_name if user.role else 'No Role',
                 'Active' if user.is_active else 'Inactive',
                 user.date_joined.strftime('%Y-%m-%d')
-            ])
-
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ]))
-
-        elements.append(table)
-        doc.build(elements)
-        return response
+            ]
+            for user in iter_queryset(queryset)
+        )
+        pdf.add_table(
+            ['Name', 'Email', 'Role', 'Status', 'Joined Date'],
+            rows,
+            style=[
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ]
+        )
+
+        return pdf.response('users_report.pdf')
 
     def get(self, request):
         try:
@@ -0,0 +1,40 @@
+"""
+Helpers shared by the Celery queues that drain database rows in batches
+(notifications.delivery, webhooks.outbound, image_management.derivatives).
+
+queue_on_commit() starts a task once the current transaction commits. It
+publishes without retries, so an unreachable broker never holds up the
+request; the rows are then picked up by the task's periodic run instead.
+The same task with the same arguments is queued once per transaction,
+however many rows the transaction writes.
+
+Workers claim rows before working on them; a claim older than
+STALE_CLAIM_AFTER belongs to a worker that died and is released, and each
+run stops after WORKER_TIME_BUDGET seconds, leaving the rest to the next.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+STALE_CLAIM_AFTER = timedelta(minutes=10)  # Claims older than this belong to a worker that died
+WORKER_TIME_BUDGET = 50  # Seconds one task keeps working before leaving the rest to the next run
+
+
+def queue_on_commit(task_path, *args):
+    """Queue the task at `task_path` with `args` once the current transaction commits"""
+    key = (task_path, args)
+    if any(getattr(func, 'queue_key', None) == key for _, func, _ in connection.run_on_commit):
+        return
+
+    def start():
+        try:
+            import_string(task_path).apply_async(args, retry=False)
+        except Exception as e:
+            logger.error(f"Could not queue {task_path}{args}, leaving it to the periodic run: {str(e)}")
+
+    start.queue_key = key
+    transaction.on_commit(start)
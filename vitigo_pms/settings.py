@@ -374,6 +374,21 @@ INSTAGRAM_ACCESS_TOKEN = os.getenv('INSTAGRAM_ACCESS_TOKEN')
 INSTAGRAM_APP_SECRET = os.getenv('INSTAGRAM_APP_SECRET')
 INSTAGRAM_VERIFY_TOKEN = os.getenv('INSTAGRAM_VERIFY_TOKEN')
 
+# Outbound webhook replies (webhooks.outbound)
+# Base URLs can point at a local stub server for benchmarks
+FACEBOOK_GRAPH_URL = os.getenv('FACEBOOK_GRAPH_URL', 'https://graph.facebook.com')
+INSTAGRAM_GRAPH_URL = os.getenv('INSTAGRAM_GRAPH_URL', 'https://graph.instagram.com')
+OUTBOUND_MESSAGE_TIMEOUT = (3.05, 10)  # Connect and read timeouts in seconds
+OUTBOUND_MESSAGE_BATCH_SIZE = int(os.getenv('OUTBOUND_MESSAGE_BATCH_SIZE', 50))
+OUTBOUND_MESSAGE_MAX_ATTEMPTS = int(os.getenv('OUTBOUND_MESSAGE_MAX_ATTEMPTS', 6))
+OUTBOUND_MESSAGE_CONCURRENCY = int(os.getenv('OUTBOUND_MESSAGE_CONCURRENCY', 8))  # Requests in flight per worker process
+# Messages per second each worker process sends to a platform
+OUTBOUND_MESSAGE_RATE_LIMITS = {
+    'WHATSAPP': float(os.getenv('WHATSAPP_SEND_RATE', 50)),
+    'MESSENGER': float(os.getenv('MESSENGER_SEND_RATE', 20)),
+    'INSTAGRAM': float(os.getenv('INSTAGRAM_SEND_RATE', 20)),
+}
+
 # Default encryption key for encrypted fields
 FIELD_ENCRYPTION_KEY = os.getenv('FIELD_ENCRYPTION_KEY', Fernet.generate_key().decode())
 
@@ -383,16 +398,94 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 # Cache Configuration
+# The 'default' cache is shared between worker processes through Redis when
+# CACHE_BACKEND=redis; 'local' is a per-process fallback tier.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if DJANGO_ENV == 'production' else 'locmem')
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
-    }
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'vitigo-local',
+    },
 }
 
+if CACHE_BACKEND == 'redis':
+    CACHES['default'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://{host}:{port}/{db}'.format(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=os.getenv('REDIS_PORT', '6379'),
+            db=os.getenv('REDIS_CACHE_DB', '1'),
+        ),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 2,
+            'SOCKET_TIMEOUT': 2,
+        },
+        'KEY_PREFIX': 'vitigo',
+    }
+
 # Cache timeout in seconds (30 minutes)
 CACHE_TIMEOUT = 1800
 
+# Dashboard metrics cache
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', 300))
+DASHBOARD_CACHE_LOCK_TIMEOUT = 30  # Max seconds a recompute may hold the lock
+DASHBOARD_METRICS_PARALLEL = os.getenv('DASHBOARD_METRICS_PARALLEL', 'True') == 'True'
+
+# Compute the independent sections of a generated report on separate connections
+REPORT_SECTIONS_PARALLEL = os.getenv('REPORT_SECTIONS_PARALLEL', 'True') == 'True'
+
+# Background export jobs still pending or running after this many seconds
+# are treated as failed and no longer shared with new requests
+EXPORT_JOB_STALE_AFTER = int(os.getenv('EXPORT_JOB_STALE_AFTER', 60 * 60))
+
+# Queued email and SMS notifications (notifications.delivery)
+NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', 200))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', 3))
+NOTIFICATION_MAX_AGE = int(os.getenv('NOTIFICATION_MAX_AGE', 24 * 60 * 60))  # Older pending rows are failed, not sent
+SMS_BACKEND = os.getenv('SMS_BACKEND', 'notifications.sms.LoggingSMSBackend')
+SMS_API_URL = os.getenv('SMS_API_URL')
+SMS_API_KEY = os.getenv('SMS_API_KEY')
+SMS_SENDER_ID = os.getenv('SMS_SENDER_ID', 'VITIGO')
+SMS_API_TIMEOUT = (3.05, 10)  # Connect and read timeouts in seconds
+
+# Phototherapy reminders are sent in batches of this size over one SMTP
+# connection, by up to this many workers in parallel
+PHOTOTHERAPY_REMINDER_BATCH_SIZE = int(os.getenv('PHOTOTHERAPY_REMINDER_BATCH_SIZE', 100))
+PHOTOTHERAPY_REMINDER_WORKERS = int(os.getenv('PHOTOTHERAPY_REMINDER_WORKERS', 4))
+
+# Appointment reminders (appointment_management.reminders) are created and
+# queued in batches of this size; appointments without a time slot are
+# treated as starting at the default time
+APPOINTMENT_REMINDER_BATCH_SIZE = int(os.getenv('APPOINTMENT_REMINDER_BATCH_SIZE', 1000))
+APPOINTMENT_REMINDER_DEFAULT_TIME = os.getenv('APPOINTMENT_REMINDER_DEFAULT_TIME', '09:00')
+
+# Protected media files (access_control.protected_media) are sent by Django,
+# or after the permission checks by the front-end server: 'nginx' uses
+# X-Accel-Redirect to the internal location below, 'sendfile' uses X-Sendfile
+PROTECTED_MEDIA_SERVER = os.getenv('PROTECTED_MEDIA_SERVER') or None
+PROTECTED_MEDIA_INTERNAL_URL = os.getenv('PROTECTED_MEDIA_INTERNAL_URL', '/protected-media/')
+
+# Patient image thumbnails and previews (image_management.derivatives):
+# longest side in pixels of each size, and the WebP/JPEG quality
+IMAGE_DERIVATIVE_SIZES = {'PREVIEW': 1280, 'THUMBNAIL': 400}
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVE_SWEEP_SIZE = 50  # Images made by each periodic run
+
+# Query emails are read from this IMAP mailbox (query_management.email_ingest)
+QUERY_EMAIL_IMAP_HOST = os.getenv('QUERY_EMAIL_IMAP_HOST', 'imap.gmail.com')
+QUERY_EMAIL_IMAP_PORT = int(os.getenv('QUERY_EMAIL_IMAP_PORT', 993))
+QUERY_EMAIL_IMAP_SSL = os.getenv('QUERY_EMAIL_IMAP_SSL', 'True') == 'True'
+QUERY_EMAIL_IMAP_TIMEOUT = 60  # Seconds
+QUERY_EMAIL_FOLDER = os.getenv('QUERY_EMAIL_FOLDER', 'INBOX')
+QUERY_EMAIL_BATCH_SIZE = int(os.getenv('QUERY_EMAIL_BATCH_SIZE', 50))
+QUERY_EMAIL_IDLE_TIMEOUT = 25 * 60  # Servers may end an IDLE after 30 minutes
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -402,7 +495,40 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
 # Celery Beat Settings (optional - for scheduled tasks)
-CELERY_BEAT_SCHEDULE = {}
+CELERY_BEAT_SCHEDULE = {
+    'refresh-phototherapy-rollups': {
+        'task': 'phototherapy_management.tasks.refresh_daily_rollups',
+        'schedule': 60 * 60,  # Hourly
+    },
+    'snapshot-inventory': {
+        'task': 'stock_management.tasks.snapshot_inventory',
+        'schedule': 24 * 60 * 60,  # Daily
+    },
+    'dispatch-phototherapy-reminders': {
+        'task': 'phototherapy_management.tasks.dispatch_due_reminders',
+        'schedule': 5 * 60,  # Every 5 minutes
+    },
+    'send-appointment-reminders': {
+        'task': 'appointment_management.tasks.send_appointment_reminders',
+        'schedule': 5 * 60,  # Every 5 minutes
+    },
+    'deliver-notifications': {
+        'task': 'notifications.tasks.deliver_notifications',
+        'schedule': 60,  # Retries and anything not picked up when queued
+    },
+    'send-outbound-messages': {
+        'task': 'webhooks.tasks.send_outbound_messages',
+        'schedule': 30,  # Retries and anything not picked up when queued
+    },
+    'make-pending-image-derivatives': {
+        'task': 'image_management.tasks.make_pending_derivatives',
+        'schedule': 10 * 60,  # Images missed by the queue and older uploads
+    },
+    'ingest-query-emails': {
+        'task': 'query_management.tasks.ingest_query_emails',
+        'schedule': 2 * 60,  # Every 2 minutes; check_query_emails --idle reads mail as it arrives
+    },
+}
 
 # Redis Configuration
 REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
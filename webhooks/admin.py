@@ -1,4 +1,16 @@
 from django.contrib import admin
-from .models import WhatsAppWebhook
+from .models import WhatsAppWebhook, ConversationState, OutboundMessage
 
 admin.site.register(WhatsAppWebhook)
+
+@admin.register(ConversationState)
+class ConversationStateAdmin(admin.ModelAdmin):
+    list_display = ('platform', 'sender', 'state', 'user', 'updated_at')
+    list_filter = ('platform', 'state')
+    search_fields = ('sender',)
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ('platform', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('platform', 'status')
+    search_fields = ('recipient', 'last_error')
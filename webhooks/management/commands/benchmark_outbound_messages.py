@@ -0,0 +1,171 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from webhooks import outbound
+from webhooks.models import OutboundMessage
+
+PLATFORMS = ['WHATSAPP', 'MESSENGER', 'INSTAGRAM']
+
+
+class RollbackBenchmark(Exception):
+    """Raised to roll back the messages queued for the benchmark"""
+    pass
+
+
+class StubGraphHandler(BaseHTTPRequestHandler):
+    """Accepts messages like the Graph API, with configurable latency and failures"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if random.random() < self.server.failure_rate:
+            status, body = 503, {'error': {'message': 'Service temporarily unavailable'}}
+        else:
+            status, body = 200, {'message_id': 'stub'}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark outbound webhook replies against a local stub of the Graph API: '
+        'messages per second sent by the queue worker through pooled sessions, '
+        'compared with one unpooled request per message. Queued messages are '
+        'rolled back when the benchmark finishes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=500,
+            help='Number of messages to queue'
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=20,
+            help='Time the stub server takes to answer each request'
+        )
+        parser.add_argument(
+            '--failure-rate',
+            type=float,
+            default=0.0,
+            help='Share of requests the stub server answers with 503'
+        )
+        parser.add_argument(
+            '--rate-limited',
+            action='store_true',
+            help='Apply OUTBOUND_MESSAGE_RATE_LIMITS instead of sending as fast as possible'
+        )
+        parser.add_argument(
+            '--min-speedup',
+            type=float,
+            default=None,
+            help='Fail if the worker is not this many times faster than unpooled requests'
+        )
+
+    def handle(self, *args, **kwargs):
+        count = kwargs['messages']
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StubGraphHandler)
+        server.lock = threading.Lock()
+        server.connections = 0
+        server.latency = kwargs['latency_ms'] / 1000
+        server.failure_rate = kwargs['failure_rate']
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stub_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+        overrides = {'FACEBOOK_GRAPH_URL': stub_url, 'INSTAGRAM_GRAPH_URL': stub_url}
+        if not kwargs['rate_limited']:
+            overrides['OUTBOUND_MESSAGE_RATE_LIMITS'] = {}
+        try:
+            with override_settings(**overrides):
+                outbound._limiters.clear()
+                baseline_rate = self.measure_unpooled(stub_url, min(count, 100))
+                server.connections = 0
+                worker_rate, rounds, statuses = self.measure_worker(count)
+        finally:
+            server.shutdown()
+            server.server_close()
+            outbound._limiters.clear()
+
+        self.stdout.write(f"Unpooled requests: {baseline_rate:.1f} messages/s")
+        self.stdout.write(
+            f"Queue worker:      {worker_rate:.1f} messages/s over {server.connections} connections, "
+            f"{rounds} send rounds"
+        )
+        self.stdout.write(f"Final statuses:    {statuses}")
+
+        if statuses.get('SENT', 0) + statuses.get('FAILED', 0) != count:
+            raise CommandError(f"Not every message was delivered or given up on: {statuses}")
+        speedup = worker_rate / baseline_rate
+        if kwargs['min_speedup'] is not None and speedup < kwargs['min_speedup']:
+            raise CommandError(f"Worker was only {speedup:.1f}x faster than unpooled requests")
+
+        self.stdout.write(self.style.SUCCESS(f"Worker sent {speedup:.1f}x faster than unpooled requests"))
+
+    def measure_unpooled(self, stub_url, count):
+        """Messages per second sending one request per message without a session"""
+        started = time.perf_counter()
+        for i in range(count):
+            requests.post(f'{stub_url}/messages', json={'to': str(i), 'text': {'body': 'Benchmark'}}, timeout=10)
+        return count / (time.perf_counter() - started)
+
+    def measure_worker(self, count):
+        """Messages per second through the queue worker, with retries made due immediately"""
+        try:
+            with transaction.atomic():
+                OutboundMessage.objects.bulk_create([
+                    OutboundMessage(
+                        platform=PLATFORMS[i % len(PLATFORMS)],
+                        recipient=f'benchmark-{i % 200}',
+                        payload={'text': f'Benchmark message {i}'}
+                    )
+                    for i in range(count)
+                ], batch_size=500)
+
+                rounds = 0
+                started = time.perf_counter()
+                while True:
+                    rounds += 1
+                    outbound.send_pending(time_budget=float('inf'))
+                    waiting = OutboundMessage.objects.filter(status='PENDING', recipient__startswith='benchmark-')
+                    if not waiting.exists():
+                        break
+                    # Skip the backoff delay so retries are measured, not slept through
+                    waiting.update(next_attempt_at=timezone.now())
+                elapsed = time.perf_counter() - started
+
+                statuses = dict(OutboundMessage.objects.filter(
+                    recipient__startswith='benchmark-'
+                ).order_by().values('status').annotate(count=Count('pk')).values_list('status', 'count'))
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            pass
+        return count / elapsed, rounds, statuses
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('WHATSAPP', 'WhatsApp'), ('MESSENGER', 'Facebook Messenger'), ('INSTAGRAM', 'Instagram')], max_length=20)),
+                ('recipient', models.CharField(max_length=255)),
+                ('payload', models.JSONField(help_text="{'text': ...} or {'media_url': ..., 'media_type': ...}")),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claim_token', models.CharField(blank=True, max_length=32)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='webhooks_ou_status_7a0c63_idx'), models.Index(fields=['platform', 'recipient', 'status'], name='webhooks_ou_platfor_1c6f0b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-17 20:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0002_outbound_message'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('platform', models.CharField(choices=[('WHATSAPP', 'WhatsApp'), ('MESSENGER', 'Facebook Messenger'), ('INSTAGRAM', 'Instagram')], max_length=20)),
+                ('sender', models.CharField(help_text='Phone number, PSID or IGSID', max_length=255)),
+                ('state', models.CharField(choices=[('MENU', 'Main Menu'), ('NEW_QUERY', 'Creating New Query'), ('VIEW_QUERIES', 'Viewing Queries'), ('AWAITING_SUBJECT', 'Waiting for Subject'), ('AWAITING_DESCRIPTION', 'Waiting for Description')], default='MENU', max_length=20)),
+                ('temp_data', models.JSONField(blank=True, default=dict)),
+                ('last_message_id', models.CharField(blank=True, max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('platform', 'sender')},
+            },
+        ),
+    ]
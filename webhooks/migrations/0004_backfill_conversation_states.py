@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+# Message log model and sender field per platform
+MESSAGE_LOGS = [
+    ('WHATSAPP', 'WhatsAppWebhook', 'from_number'),
+    ('MESSENGER', 'FacebookMessengerWebhook', 'psid'),
+    ('INSTAGRAM', 'InstagramWebhook', 'igsid'),
+]
+
+
+def backfill(apps, schema_editor):
+    ConversationState = apps.get_model('webhooks', 'ConversationState')
+
+    # Conversations carry on from the state of each sender's latest message
+    for platform, model_name, sender_field in MESSAGE_LOGS:
+        Message = apps.get_model('webhooks', model_name)
+        latest_ids = Message.objects.order_by().values(sender_field).annotate(latest=Max('id')).values_list('latest', flat=True)
+        states = [
+            ConversationState(
+                platform=platform,
+                sender=getattr(message, sender_field),
+                state=message.conversation_state,
+                temp_data=message.temp_data,
+                user_id=message.user_id,
+                last_message_id=message.message_id
+            )
+            for message in Message.objects.filter(id__in=list(latest_ids)).iterator()
+        ]
+        ConversationState.objects.bulk_create(states, batch_size=1000, ignore_conflicts=True)
+
+
+def clear(apps, schema_editor):
+    apps.get_model('webhooks', 'ConversationState').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webhooks', '0003_conversation_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, clear),
+    ]
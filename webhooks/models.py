@@ -1,6 +1,7 @@
 # webhooks/models.py
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 class WhatsAppWebhook(models.Model):
     CONVERSATION_STATES = [
@@ -95,4 +96,71 @@ class InstagramWebhook(models.Model):
 
     class Meta:
         verbose_name = 'Instagram Webhook'
-        verbose_name_plural = 'Instagram Webhooks'
\ No newline at end of file
+        verbose_name_plural = 'Instagram Webhooks'
+
+class ConversationState(models.Model):
+    """Where a sender is in the chat menu flow, one row per platform and sender"""
+    PLATFORM_CHOICES = [
+        ('WHATSAPP', 'WhatsApp'),
+        ('MESSENGER', 'Facebook Messenger'),
+        ('INSTAGRAM', 'Instagram'),
+    ]
+
+    platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES)
+    sender = models.CharField(max_length=255, help_text="Phone number, PSID or IGSID")
+    state = models.CharField(
+        max_length=20,
+        choices=WhatsAppWebhook.CONVERSATION_STATES,
+        default='MENU'
+    )
+    temp_data = models.JSONField(default=dict, blank=True)
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.SET_NULL,
+        null=True, blank=True
+    )
+    last_message_id = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['platform', 'sender']
+
+    def __str__(self):
+        return f"{self.get_platform_display()} {self.sender}: {self.state}"
+
+    def move_to(self, state, **temp_data):
+        """Enter `state`, keeping only the given temp_data"""
+        self.state = state
+        self.temp_data = temp_data
+        self.save(update_fields=['state', 'temp_data', 'last_message_id', 'updated_at'])
+
+class OutboundMessage(models.Model):
+    """A reply waiting to be sent, or already sent, to a messaging platform"""
+    PLATFORM_CHOICES = ConversationState.PLATFORM_CHOICES
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    platform = models.CharField(max_length=20, choices=PLATFORM_CHOICES)
+    recipient = models.CharField(max_length=255)
+    payload = models.JSONField(help_text="{'text': ...} or {'media_url': ..., 'media_type': ...}")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['platform', 'recipient', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_platform_display()} message to {self.recipient} ({self.status})"
@@ -0,0 +1,320 @@
+"""
+Outbound replies to WhatsApp, Messenger and Instagram.
+
+Webhook views queue replies with queue_text/queue_media, which store an
+OutboundMessage and return at once, so the webhook is acknowledged without
+waiting for the Graph API. The send_outbound_messages task then delivers
+them:
+
+- ready messages are claimed in batches with a conditional UPDATE tagged
+  with a per-batch token, so concurrent workers never send the same message;
+- a message is not claimed while an earlier message to the same recipient
+  is still being sent or waiting for a retry, so replies arrive in order;
+- a batch is sent from a small thread pool, one recipient per thread, so
+  several requests are in flight at once; each thread keeps a pooled
+  requests.Session per platform, requests have timeouts and are paced to
+  OUTBOUND_MESSAGE_RATE_LIMITS;
+- network errors, 429 and 5xx responses are retried with exponential
+  backoff (or the Retry-After the platform asks for), other errors fail the
+  message immediately.
+
+Delivery is at least once: a worker that dies mid-batch leaves its claims to
+be released after STALE_CLAIM_AFTER and sent again.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from vitigo_pms.queueing import STALE_CLAIM_AFTER, WORKER_TIME_BUDGET, queue_on_commit
+
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = 2  # Seconds before the first retry, doubled for every later one
+RETRY_MAX_DELAY = 15 * 60
+
+
+class DeliveryError(Exception):
+    """Raised when a platform does not accept a message"""
+
+    def __init__(self, message, retryable=True, retry_after=None):
+        self.retryable = retryable
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+def _whatsapp_request(recipient, payload):
+    url = f"{settings.FACEBOOK_GRAPH_URL}/{settings.WHATSAPP_API_VERSION}/{settings.WHATSAPP_PHONE_NUMBER_ID}/messages"
+    body = {"messaging_product": "whatsapp", "to": recipient}
+    if 'text' in payload:
+        body.update({"type": "text", "text": {"body": payload['text']}})
+    else:
+        body.update({"type": payload['media_type'], payload['media_type']: {"link": payload['media_url']}})
+    return url, settings.WHATSAPP_ACCESS_TOKEN, body
+
+
+def _messenger_request(recipient, payload):
+    url = f"{settings.FACEBOOK_GRAPH_URL}/{settings.FACEBOOK_API_VERSION}/{settings.FACEBOOK_PAGE_ID}/messages"
+    body = {"recipient": {"id": recipient}}
+    if 'text' in payload:
+        body.update({"messaging_type": "RESPONSE", "message": {"text": payload['text']}})
+    else:
+        body["message"] = {"attachment": {
+            "type": payload['media_type'],
+            "payload": {"url": payload['media_url'], "is_reusable": True}
+        }}
+    return url, settings.FACEBOOK_PAGE_ACCESS_TOKEN, body
+
+
+def _instagram_request(recipient, payload):
+    url = f"{settings.INSTAGRAM_GRAPH_URL}/v21.0/{settings.INSTAGRAM_BUSINESS_ACCOUNT_ID}/messages"
+    body = {"recipient": {"id": recipient}}
+    if 'text' in payload:
+        body.update({"messaging_type": "RESPONSE", "message": {"text": payload['text']}})
+    else:
+        body["message"] = {"attachment": {"type": payload['media_type'], "payload": {"url": payload['media_url']}}}
+    return url, settings.INSTAGRAM_ACCESS_TOKEN, body
+
+
+# Platform -> function building (url, access token, JSON body) for a message
+PLATFORM_REQUESTS = {
+    'WHATSAPP': _whatsapp_request,
+    'MESSENGER': _messenger_request,
+    'INSTAGRAM': _instagram_request,
+}
+
+
+def queue_message(platform, recipient, payload):
+    """Store a message for delivery and make sure a worker picks it up once committed"""
+    message = OutboundMessage.objects.create(platform=platform, recipient=recipient, payload=payload)
+    queue_on_commit('webhooks.tasks.send_outbound_messages')
+    return message
+
+
+def queue_text(platform, recipient, text):
+    """Queue a text reply"""
+    logger.info(f"Queueing {platform} message to {recipient}")
+    return queue_message(platform, recipient, {'text': text})
+
+
+def queue_media(platform, recipient, media_url, media_type='image'):
+    """Queue an image, video or audio reply"""
+    logger.info(f"Queueing {platform} {media_type} to {recipient}")
+    return queue_message(platform, recipient, {'media_url': media_url, 'media_type': media_type})
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart within this process"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_local = threading.local()
+_limiters = {}
+_limiters_lock = threading.Lock()
+_executor = None
+
+HELD_BACK = object()  # Outcome of a message not sent because an earlier one to its recipient failed
+
+
+def get_session(platform):
+    """Keep-alive HTTP session for a platform, one per thread"""
+    sessions = getattr(_local, 'sessions', None)
+    if sessions is None:
+        sessions = _local.sessions = {}
+    if platform not in sessions:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        sessions[platform] = session
+    return sessions[platform]
+
+
+def get_rate_limiter(platform):
+    with _limiters_lock:
+        if platform not in _limiters:
+            _limiters[platform] = RateLimiter(settings.OUTBOUND_MESSAGE_RATE_LIMITS.get(platform))
+        return _limiters[platform]
+
+
+def deliver(message):
+    """Send one message to its platform, raising DeliveryError if it is not accepted"""
+    url, token, body = PLATFORM_REQUESTS[message.platform](message.recipient, message.payload)
+    get_rate_limiter(message.platform).wait()
+    try:
+        response = get_session(message.platform).post(
+            url,
+            json=body,
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=settings.OUTBOUND_MESSAGE_TIMEOUT
+        )
+    except requests.exceptions.RequestException as e:
+        raise DeliveryError(f"Request failed: {str(e)}")
+
+    if response.status_code == 200:
+        return
+    retry_after = response.headers.get('Retry-After')
+    raise DeliveryError(
+        f"{response.status_code}: {response.text[:500]}",
+        retryable=response.status_code == 429 or response.status_code >= 500,
+        retry_after=int(retry_after) if retry_after and retry_after.isdigit() else None
+    )
+
+
+def claim_batch(limit=None):
+    """Mark up to `limit` ready messages as being sent by this worker and return them in send order"""
+    limit = limit or settings.OUTBOUND_MESSAGE_BATCH_SIZE
+    now = timezone.now()
+
+    waiting_earlier = OutboundMessage.objects.filter(
+        Q(status='SENDING') | Q(status='PENDING', next_attempt_at__gt=now),
+        platform=OuterRef('platform'),
+        recipient=OuterRef('recipient'),
+        id__lt=OuterRef('id')
+    )
+    ready_ids = list(OutboundMessage.objects.filter(
+        status='PENDING',
+        next_attempt_at__lte=now
+    ).exclude(Exists(waiting_earlier)).order_by('id').values_list('id', flat=True)[:limit])
+    if not ready_ids:
+        return []
+
+    token = uuid.uuid4().hex
+    OutboundMessage.objects.filter(id__in=ready_ids, status='PENDING').update(
+        status='SENDING',
+        claim_token=token,
+        claimed_at=now
+    )
+    return list(OutboundMessage.objects.filter(claim_token=token, status='SENDING').order_by('id'))
+
+
+def retry_delay(attempts, retry_after=None):
+    """Seconds to wait before attempt number `attempts + 1`"""
+    if retry_after:
+        return retry_after
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _send_conversation(messages):
+    """Send one recipient's messages in order, stopping at the first that must be retried.
+    Returns (message, error) pairs; error is None once sent and HELD_BACK for messages not tried"""
+    outcomes = []
+    for message in messages:
+        try:
+            deliver(message)
+            outcomes.append((message, None))
+        except DeliveryError as e:
+            outcomes.append((message, e))
+            if e.retryable:
+                outcomes.extend((later, HELD_BACK) for later in messages[len(outcomes):])
+                break
+    return outcomes
+
+
+def get_executor():
+    """Threads sending requests for this process"""
+    global _executor
+    with _limiters_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.OUTBOUND_MESSAGE_CONCURRENCY,
+                thread_name_prefix='outbound'
+            )
+        return _executor
+
+
+def send_batch(limit=None):
+    """Claim and send one batch. Returns (sent, retried, failed) counts"""
+    conversations = {}
+    for message in claim_batch(limit):
+        conversations.setdefault((message.platform, message.recipient), []).append(message)
+    if not conversations:
+        return 0, 0, 0
+
+    # Recipients are sent to in parallel; database writes stay on this thread
+    sent, held_back, retried, failed = [], [], 0, 0
+    now = timezone.now()
+    for outcomes in get_executor().map(_send_conversation, conversations.values()):
+        for message, error in outcomes:
+            if error is None:
+                sent.append(message.pk)
+                continue
+            if error is HELD_BACK:
+                # An earlier message to this recipient is waiting for a retry
+                held_back.append(message.pk)
+                continue
+
+            attempts = message.attempts + 1
+            if error.retryable and attempts < settings.OUTBOUND_MESSAGE_MAX_ATTEMPTS:
+                status = 'PENDING'
+                retried += 1
+                logger.warning(f"{message.platform} message {message.pk} to {message.recipient} will be retried: {str(error)}")
+            else:
+                status = 'FAILED'
+                failed += 1
+                logger.error(f"{message.platform} message {message.pk} to {message.recipient} failed: {str(error)}")
+            OutboundMessage.objects.filter(pk=message.pk).update(
+                status=status,
+                attempts=attempts,
+                next_attempt_at=now + timedelta(seconds=retry_delay(attempts, error.retry_after)),
+                claim_token='',
+                last_error=str(error)
+            )
+
+    if sent:
+        OutboundMessage.objects.filter(pk__in=sent).update(
+            status='SENT',
+            attempts=F('attempts') + 1,
+            sent_at=now,
+            claim_token='',
+            last_error=''
+        )
+    if held_back:
+        OutboundMessage.objects.filter(pk__in=held_back).update(status='PENDING', claim_token='')
+    return len(sent), retried, failed
+
+
+def release_stale_claims():
+    """Make messages claimed by workers that died available again"""
+    return OutboundMessage.objects.filter(
+        status='SENDING',
+        claimed_at__lt=timezone.now() - STALE_CLAIM_AFTER
+    ).update(status='PENDING', claim_token='')
+
+
+def send_pending(time_budget=WORKER_TIME_BUDGET):
+    """Send batches until no message is ready or the time budget is used up"""
+    release_stale_claims()
+    totals = [0, 0, 0]
+    started = time.monotonic()
+    while time.monotonic() - started < time_budget:
+        counts = send_batch()
+        if not any(counts):
+            break
+        totals = [total + count for total, count in zip(totals, counts)]
+    return tuple(totals)
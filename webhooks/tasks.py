@@ -0,0 +1,8 @@
+from celery import shared_task
+from .outbound import send_pending
+
+
+@shared_task(ignore_result=True)
+def send_outbound_messages():
+    """Deliver queued webhook replies until none are ready"""
+    return send_pending()
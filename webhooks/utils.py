@@ -2,7 +2,9 @@
 import re
 from django.contrib.auth import get_user_model
 from query_management.models import Query
-from .models import WhatsAppWebhook, FacebookMessengerWebhook, InstagramWebhook
+from django.db import IntegrityError, transaction
+from .models import ConversationState
+from .outbound import queue_media, queue_text
 from django.conf import settings
 import requests
 import logging
@@ -83,26 +85,29 @@ def get_or_create_user_instagram(igsid):
         )
     return user
 
-def get_latest_state(phone_number):
-    """Get user's latest conversation state"""
-    logger.debug(f"Fetching latest state for phone: {phone_number}")
-    return WhatsAppWebhook.objects.filter(
-        from_number=phone_number
-    ).order_by('-created_at').first()
-
-def get_messenger_latest_state(psid):
-    """Get user's latest messenger conversation state"""
-    logger.debug(f"Fetching latest messenger state for PSID: {psid}")
-    return FacebookMessengerWebhook.objects.filter(
-        psid=psid
-    ).order_by('-created_at').first()
-
-def get_instagram_latest_state(igsid):
-    """Get user's latest Instagram conversation state"""
-    logger.debug(f"Fetching latest Instagram state for IGSID: {igsid}")
-    return InstagramWebhook.objects.filter(
-        igsid=igsid
-    ).order_by('-created_at').first()
+def get_conversation(platform, sender, user=None):
+    """Lock and return a sender's conversation state, starting at the menu for new senders.
+    Call inside transaction.atomic() so messages from one sender are handled one at a time"""
+    logger.debug(f"Fetching {platform} conversation state for {sender}")
+    conversation, created = ConversationState.objects.select_for_update().get_or_create(
+        platform=platform,
+        sender=sender,
+        defaults={'user': user}
+    )
+    if not created and user and conversation.user_id != user.pk:
+        conversation.user = user
+        conversation.save(update_fields=['user', 'updated_at'])
+    return conversation
+
+def record_message(conversation, model, **fields):
+    """Store an incoming message, or return None if its message_id was already stored"""
+    try:
+        with transaction.atomic():
+            message = model.objects.create(conversation_state=conversation.state, **fields)
+    except IntegrityError:
+        return None
+    conversation.last_message_id = fields['message_id']
+    return message
 
 def get_queries_whatsapp(phone_number):
     """Get queries for a phone number"""
@@ -137,12 +142,12 @@ def verify_instagram_signature(request_signature, payload, app_secret):
 
 
 def subscribe_to_webhooks():
-    url = f"https://graph.instagram.com/v21.0/{settings.INSTAGRAM_BUSINESS_ACCOUNT_ID}/subscribed_apps"
+    url = f"{settings.INSTAGRAM_GRAPH_URL}/v21.0/{settings.INSTAGRAM_BUSINESS_ACCOUNT_ID}/subscribed_apps"
     params = {
         "subscribed_fields": "messages,messaging_postbacks,messaging_optins,message_reactions,messaging_referral,messaging_seen",  
         "access_token": settings.INSTAGRAM_ACCESS_TOKEN
     }
-    response = requests.post(url, params=params)
+    response = requests.post(url, params=params, timeout=settings.OUTBOUND_MESSAGE_TIMEOUT)
     return response.json()
 
 
@@ -156,139 +161,24 @@ Created: {query.created_at.strftime('%Y-%m-%d %H:%M')}
 """
 
 def send_whatsapp_response(to_number, message):
-    """Send WhatsApp message"""
-    logger.info(f"Sending WhatsApp message to {to_number}")
+    """Queue a WhatsApp message; the send_outbound_messages task delivers it"""
     logger.debug(f"Message content: {message[:100]}...")
-    
-    url = f"https://graph.facebook.com/{settings.WHATSAPP_API_VERSION}/{settings.WHATSAPP_PHONE_NUMBER_ID}/messages"
-    
-    try:
-        response = requests.post(url, json={
-            "messaging_product": "whatsapp",
-            "to": to_number,
-            "type": "text",
-            "text": {"body": message}
-        }, headers={
-            "Authorization": f"Bearer {settings.WHATSAPP_ACCESS_TOKEN}",
-            "Content-Type": "application/json"
-        })
-        
-        response_data = response.json()
-        if response.status_code != 200:
-            logger.error(f"WhatsApp API error: {response_data}")
-        else:
-            logger.debug(f"WhatsApp API response: {response_data}")
-        return response_data
-    except requests.exceptions.RequestException as e:
-        logger.error(f"WhatsApp API request failed: {str(e)}", exc_info=True)
-        raise
+    return queue_text('WHATSAPP', to_number, message)
 
 def send_messenger_response(psid, message_text):
-    """Send Facebook Messenger message"""
-    logger.info(f"Sending Messenger message to {psid}")
+    """Queue a Facebook Messenger message"""
     logger.debug(f"Message content: {message_text[:100]}...")
-    
-    url = f"https://graph.facebook.com/{settings.FACEBOOK_API_VERSION}/{settings.FACEBOOK_PAGE_ID}/messages"
-    
-    try:
-        response = requests.post(url, json={
-            "recipient": {"id": psid},
-            "messaging_type": "RESPONSE",
-            "message": {"text": message_text}
-        }, headers={
-            "Authorization": f"Bearer {settings.FACEBOOK_PAGE_ACCESS_TOKEN}",
-            "Content-Type": "application/json"
-        })
-        
-        response_data = response.json()
-        if response.status_code != 200:
-            logger.error(f"Messenger API error: {response_data}")
-        else:
-            logger.debug(f"Messenger API response: {response_data}")
-        return response_data
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Messenger API request failed: {str(e)}", exc_info=True)
-        raise
+    return queue_text('MESSENGER', psid, message_text)
 
 def send_messenger_media(psid, media_url, media_type='image'):
-    """Send media attachment via Messenger"""
-    logger.info(f"Sending Messenger {media_type} to {psid}")
-    
-    url = f"https://graph.facebook.com/{settings.FACEBOOK_API_VERSION}/{settings.FACEBOOK_PAGE_ID}/messages"
-    
-    try:
-        response = requests.post(url, json={
-            "recipient": {"id": psid},
-            "message": {
-                "attachment": {
-                    "type": media_type,
-                    "payload": {
-                        "url": media_url,
-                        "is_reusable": True
-                    }
-                }
-            }
-        }, headers={
-            "Authorization": f"Bearer {settings.FACEBOOK_PAGE_ACCESS_TOKEN}",
-            "Content-Type": "application/json"
-        })
-        
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Messenger media send failed: {str(e)}", exc_info=True)
-        raise
+    """Queue a media attachment via Messenger"""
+    return queue_media('MESSENGER', psid, media_url, media_type)
 
 def send_instagram_response(igsid, message_text):
-    """Send Instagram DM"""
-    logger.info(f"Sending Instagram message to {igsid}")
-    
-    url = f"https://graph.instagram.com/v21.0/{settings.INSTAGRAM_BUSINESS_ACCOUNT_ID}/messages"
-    
-    payload = {
-        "recipient": {"id": igsid},
-        "message": {"text": message_text},
-        "messaging_type": "RESPONSE"
-    }
-    
-    try:
-        response = requests.post(url, 
-            json=payload,
-            headers={
-                "Authorization": f"Bearer {settings.INSTAGRAM_ACCESS_TOKEN}",
-                "Content-Type": "application/json"
-            }
-        )
-        
-        if response.status_code != 200:
-            logger.error(f"Instagram API error: {response.text}")
-        return response.json()
-    except Exception as e:
-        logger.error(f"Instagram API request failed: {str(e)}", exc_info=True)
-        raise
+    """Queue an Instagram DM"""
+    logger.debug(f"Message content: {message_text[:100]}...")
+    return queue_text('INSTAGRAM', igsid, message_text)
 
 def send_instagram_media(igsid, media_url, media_type='image'):
-    """Send media via Instagram DM"""
-    logger.info(f"Sending Instagram {media_type} to {igsid}")
-    
-    url = f"https://graph.instagram.com/v21.0/{settings.INSTAGRAM_BUSINESS_ACCOUNT_ID}/messages"
-    
-    try:
-        response = requests.post(url, json={
-            "recipient": {"id": igsid},
-            "message": {
-                "attachment": {
-                    "type": media_type,
-                    "payload": {
-                        "url": media_url,
-                    }
-                }
-            }
-        }, headers={
-            "Authorization": f"Bearer {settings.INSTAGRAM_ACCESS_TOKEN}",
-            "Content-Type": "application/json"
-        })
-        
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Instagram media send failed: {str(e)}", exc_info=True)
-        raise
\ No newline at end of file
+    """Queue media via Instagram DM"""
+    return queue_media('INSTAGRAM', igsid, media_url, media_type)
@@ -6,6 +6,7 @@ import logging
 
 # Django imports
 from django.conf import settings
+from django.db import transaction
 from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
@@ -18,20 +19,19 @@ from .utils import (
     
     #
     get_or_create_user_whatsapp,
-    get_latest_state,
+    get_conversation,
+    record_message,
     get_queries_whatsapp,
     send_whatsapp_response,
     
     # 
     get_or_create_user_messenger,
-    get_messenger_latest_state,
     get_queries_messenger,
     send_messenger_response,
     send_messenger_media,
 
     #
     get_or_create_user_instagram,
-    get_instagram_latest_state,
     get_queries_instagram,
     send_instagram_response,
     send_instagram_media,
@@ -96,12 +96,6 @@ def whatsapp_webhook(request):
                 message = value['messages'][0]
                 # Continue with existing message handling code
                 message_id = message['id']
-                
-                # Check if message already processed
-                if WhatsAppWebhook.objects.filter(message_id=message_id).exists():
-                    logger.warning(f"Duplicate message received: {message_id}")
-                    return HttpResponse('OK', status=200)
-                
                 phone_number = message['from']
                 message_text = message['text']['body'].strip()
                 
@@ -111,95 +105,89 @@ def whatsapp_webhook(request):
                 user = get_or_create_user_whatsapp(phone_number)
                 logger.debug(f"User retrieved/created: {user.id}")
                 
-                # Get latest state
-                last_webhook = get_latest_state(phone_number)
-                current_state = last_webhook.conversation_state if last_webhook else 'MENU'
-                logger.debug(f"Current conversation state: {current_state}")
-                
-                # Create webhook record with initialized temp_data
-                webhook = WhatsAppWebhook.objects.create(
-                    message_id=message['id'],
-                    from_number=phone_number,
-                    message_body=message_text,
-                    timestamp=timezone.now(),
-                    status='RECEIVED',
-                    user=user,
-                    conversation_state=current_state,
-                    temp_data={}  # Initialize empty dict
-                )
-                logger.info(f"Created webhook record: {webhook.id}")
-
-                # Handle conversation states
-                if message_text == '3':  # Exit
-                    logger.info(f"User {phone_number} exiting conversation")
-                    send_whatsapp_response(phone_number, "Thank you for using VitiGo Query Management. Goodbye!")
-                    webhook.conversation_state = 'MENU'
-                    webhook.save()
-                    return HttpResponse('OK', status=200)
-
-                if current_state == 'MENU' or message_text == '0':
-                    logger.debug(f"Processing menu option: {message_text}")
-                    if message_text == '1':
-                        webhook.conversation_state = 'AWAITING_SUBJECT'
-                        webhook.save()
-                        send_whatsapp_response(phone_number, "Please enter the subject for your query:")
+                with transaction.atomic():
+                    conversation = get_conversation('WHATSAPP', phone_number, user)
+                    current_state = conversation.state
+                    logger.debug(f"Current conversation state: {current_state}")
                     
-                    elif message_text == '2':
-                        queries = get_queries_whatsapp(phone_number)
-                        if queries:
-                            response = "Your recent queries:\n\n"
-                            response += "\n".join(format_query_status(q) for q in queries)
-                            response += "\n\nReply 0 for main menu, 3 to exit"
-                        else:
-                            response = "You have no queries yet.\n\nReply 0 for main menu, 3 to exit"
-                        send_whatsapp_response(phone_number, response)
-                    
-                    else:
-                        send_whatsapp_response(phone_number, MENU_TEXT)
-
-                elif current_state == 'AWAITING_SUBJECT':
-                    logger.debug(f"Processing subject input: {message_text[:50]}...")
-                    webhook.temp_data = {'subject': message_text}  # Create new dict
-                    webhook.conversation_state = 'AWAITING_DESCRIPTION'
-                    webhook.save()
-                    send_whatsapp_response(phone_number, "Please provide details for your query:")
-
-                elif current_state == 'AWAITING_DESCRIPTION':
-                    logger.debug(f"Processing query description: {message_text[:50]}...")
-                    # Get last webhook with subject
-                    last_webhook = WhatsAppWebhook.objects.filter(
+                    webhook = record_message(
+                        conversation,
+                        WhatsAppWebhook,
+                        message_id=message_id,
                         from_number=phone_number,
-                        conversation_state='AWAITING_DESCRIPTION'
-                    ).exclude(id=webhook.id).last()
-                    
-                    if not last_webhook or 'subject' not in last_webhook.temp_data:
-                        logger.error("Subject not found in conversation flow")
-                        send_whatsapp_response(phone_number, "Sorry, there was an error. Please start over.\n\n" + MENU_TEXT)
-                        webhook.conversation_state = 'MENU'
-                        webhook.save()
+                        message_body=message_text,
+                        timestamp=timezone.now(),
+                        status='RECEIVED',
+                        user=user
+                    )
+                    if webhook is None:
+                        logger.warning(f"Duplicate message received: {message_id}")
                         return HttpResponse('OK', status=200)
+                    logger.info(f"Created webhook record: {webhook.id}")
 
-                    # Create new query
-                    query = Query.objects.create(
-                        user=user,
-                        subject=last_webhook.temp_data['subject'],
-                        description=message_text,
-                        source='WHATSAPP',
-                        status='NEW',
-                        contact_phone=phone_number
-                    )
-                    logger.info(f"Created new query: {query.query_id}")
-                    
-                    webhook.conversation_state = 'MENU'
-                    webhook.save()
-                    
-                    response = """
+                    # Handle conversation states
+                    if message_text == '3':  # Exit
+                        logger.info(f"User {phone_number} exiting conversation")
+                        send_whatsapp_response(phone_number, "Thank you for using VitiGo Query Management. Goodbye!")
+                        conversation.move_to('MENU')
+                        return HttpResponse('OK', status=200)
+
+                    if current_state == 'MENU' or message_text == '0':
+                        logger.debug(f"Processing menu option: {message_text}")
+                        if message_text == '1':
+                            conversation.move_to('AWAITING_SUBJECT')
+                            send_whatsapp_response(phone_number, "Please enter the subject for your query:")
+                        
+                        elif message_text == '2':
+                            queries = get_queries_whatsapp(phone_number)
+                            if queries:
+                                response = "Your recent queries:\n\n"
+                                response += "\n".join(format_query_status(q) for q in queries)
+                                response += "\n\nReply 0 for main menu, 3 to exit"
+                            else:
+                                response = "You have no queries yet.\n\nReply 0 for main menu, 3 to exit"
+                            conversation.move_to('MENU')
+                            send_whatsapp_response(phone_number, response)
+                        
+                        else:
+                            conversation.move_to('MENU')
+                            send_whatsapp_response(phone_number, MENU_TEXT)
+
+                    elif current_state == 'AWAITING_SUBJECT':
+                        logger.debug(f"Processing subject input: {message_text[:50]}...")
+                        conversation.move_to('AWAITING_DESCRIPTION', subject=message_text)
+                        send_whatsapp_response(phone_number, "Please provide details for your query:")
+
+                    elif current_state == 'AWAITING_DESCRIPTION':
+                        logger.debug(f"Processing query description: {message_text[:50]}...")
+                        subject = conversation.temp_data.get('subject')
+                        
+                        if not subject:
+                            logger.error("Subject not found in conversation flow")
+                            send_whatsapp_response(phone_number, "Sorry, there was an error. Please start over.\n\n" + MENU_TEXT)
+                            conversation.move_to('MENU')
+                            return HttpResponse('OK', status=200)
+
+                        # Create new query
+                        query = Query.objects.create(
+                            user=user,
+                            subject=subject,
+                            description=message_text,
+                            source='WHATSAPP',
+                            status='NEW',
+                            contact_phone=phone_number
+                        )
+                        logger.info(f"Created new query: {query.query_id}")
+                        
+                        conversation.move_to('MENU')
+                        
+                        response = """
 Your query has been submitted successfully! 
 Our team will review it and get back to you.
 
 Reply 0 for main menu, 3 to exit
 """
-                    send_whatsapp_response(phone_number, response)
+                        send_whatsapp_response(phone_number, response)
             
             elif 'statuses' in value:
                 # Handle message status updates
@@ -251,92 +239,84 @@ def messenger_webhook(request):
                         message_text = messaging_event['message'].get('text', '')
                         message_id = messaging_event['message']['mid']
                         
-                        # Check for duplicate message
-                        if FacebookMessengerWebhook.objects.filter(message_id=message_id).exists():
-                            logger.warning(f"Duplicate Messenger message received: {message_id}")
-                            continue
-                        
                         # Get or create user
                         user = get_or_create_user_messenger(sender_psid)
                         
-                        # Get latest state
-                        last_webhook = get_messenger_latest_state(sender_psid)
-                        current_state = last_webhook.conversation_state if last_webhook else 'MENU'
-                        
-                        # Create webhook record
-                        webhook = FacebookMessengerWebhook.objects.create(
-                            psid=sender_psid,
-                            message_id=message_id,
-                            message_body=message_text,
-                            timestamp=timezone.now(),
-                            status='RECEIVED',
-                            user=user,
-                            conversation_state=current_state
-                        )
-
-                        # Handle conversation states
-                        if message_text == '3':  # Exit
-                            send_messenger_response(sender_psid, "Thank you for using VitiGo Query Management. Goodbye!")
-                            webhook.conversation_state = 'MENU'
-                            webhook.save()
-                            continue
-
-                        if current_state == 'MENU' or message_text == '0':
-                            if message_text == '1':
-                                webhook.conversation_state = 'AWAITING_SUBJECT'
-                                webhook.save()
-                                send_messenger_response(sender_psid, "Please enter the subject for your query:")
-                            
-                            elif message_text == '2':
-                                queries = get_queries_messenger(sender_psid)
-                                if queries:
-                                    response = "Your recent queries:\n\n"
-                                    response += "\n".join(format_query_status(q) for q in queries)
-                                    response += "\n\nType 0 for main menu, 3 to exit"
-                                else:
-                                    response = "You have no queries yet.\n\nType 0 for main menu, 3 to exit"
-                                send_messenger_response(sender_psid, response)
+                        with transaction.atomic():
+                            conversation = get_conversation('MESSENGER', sender_psid, user)
+                            current_state = conversation.state
                             
-                            else:
-                                send_messenger_response(sender_psid, MESSENGER_MENU_TEXT)
-
-                        elif current_state == 'AWAITING_SUBJECT':
-                            webhook.temp_data = {'subject': message_text}
-                            webhook.conversation_state = 'AWAITING_DESCRIPTION'
-                            webhook.save()
-                            send_messenger_response(sender_psid, "Please provide details for your query:")
-
-                        elif current_state == 'AWAITING_DESCRIPTION':
-                            last_webhook = FacebookMessengerWebhook.objects.filter(
+                            # Create webhook record
+                            webhook = record_message(
+                                conversation,
+                                FacebookMessengerWebhook,
                                 psid=sender_psid,
-                                conversation_state='AWAITING_DESCRIPTION'
-                            ).exclude(id=webhook.id).last()
+                                message_id=message_id,
+                                message_body=message_text,
+                                timestamp=timezone.now(),
+                                status='RECEIVED',
+                                user=user
+                            )
+                            if webhook is None:
+                                logger.warning(f"Duplicate Messenger message received: {message_id}")
+                                continue
 
-                            if not last_webhook or 'subject' not in last_webhook.temp_data:
-                                send_messenger_response(sender_psid, "Sorry, there was an error. Please start over.\n\n" + MESSENGER_MENU_TEXT)
-                                webhook.conversation_state = 'MENU'
-                                webhook.save()
+                            # Handle conversation states
+                            if message_text == '3':  # Exit
+                                send_messenger_response(sender_psid, "Thank you for using VitiGo Query Management. Goodbye!")
+                                conversation.move_to('MENU')
                                 continue
 
-                            # Create new query
-                            query = Query.objects.create(
-                                user=user,
-                                subject=last_webhook.temp_data['subject'],
-                                description=message_text,
-                                source='MESSENGER',
-                                status='NEW'
-                            )
-                            
-                            webhook.conversation_state = 'MENU'
-                            webhook.save()
-                            
-                            response = """
+                            if current_state == 'MENU' or message_text == '0':
+                                if message_text == '1':
+                                    conversation.move_to('AWAITING_SUBJECT')
+                                    send_messenger_response(sender_psid, "Please enter the subject for your query:")
+                                
+                                elif message_text == '2':
+                                    queries = get_queries_messenger(sender_psid)
+                                    if queries:
+                                        response = "Your recent queries:\n\n"
+                                        response += "\n".join(format_query_status(q) for q in queries)
+                                        response += "\n\nType 0 for main menu, 3 to exit"
+                                    else:
+                                        response = "You have no queries yet.\n\nType 0 for main menu, 3 to exit"
+                                    conversation.move_to('MENU')
+                                    send_messenger_response(sender_psid, response)
+                                
+                                else:
+                                    conversation.move_to('MENU')
+                                    send_messenger_response(sender_psid, MESSENGER_MENU_TEXT)
+
+                            elif current_state == 'AWAITING_SUBJECT':
+                                conversation.move_to('AWAITING_DESCRIPTION', subject=message_text)
+                                send_messenger_response(sender_psid, "Please provide details for your query:")
+
+                            elif current_state == 'AWAITING_DESCRIPTION':
+                                subject = conversation.temp_data.get('subject')
+
+                                if not subject:
+                                    send_messenger_response(sender_psid, "Sorry, there was an error. Please start over.\n\n" + MESSENGER_MENU_TEXT)
+                                    conversation.move_to('MENU')
+                                    continue
+
+                                # Create new query
+                                query = Query.objects.create(
+                                    user=user,
+                                    subject=subject,
+                                    description=message_text,
+                                    source='MESSENGER',
+                                    status='NEW'
+                                )
+                                
+                                conversation.move_to('MENU')
+                                
+                                response = """
 Your query has been submitted successfully! 
 Our team will review it and get back to you.
 
 Type 0 for main menu, 3 to exit
 """
-                            send_messenger_response(sender_psid, response)
+                                send_messenger_response(sender_psid, response)
             
             return HttpResponse('OK', status=200)
             
@@ -467,11 +447,6 @@ def process_instagram_message(sender_igsid, message_id, message_text, attachment
         logger.warning("No message ID provided")
         return
         
-    # Check for duplicate message
-    if InstagramWebhook.objects.filter(message_id=message_id).exists():
-        logger.warning(f"Duplicate Instagram message received: {message_id}")
-        return
-    
     # Get or create user
     try:
         user = get_or_create_user_instagram(sender_igsid)
@@ -480,15 +455,6 @@ def process_instagram_message(sender_igsid, message_id, message_text, attachment
         logger.error(f"Error getting/creating user: {str(e)}", exc_info=True)
         return
     
-    # Get latest state
-    try:
-        last_webhook = get_instagram_latest_state(sender_igsid)
-        current_state = last_webhook.conversation_state if last_webhook else 'MENU'
-        logger.info(f"Current conversation state: {current_state}")
-    except Exception as e:
-        logger.error(f"Error getting conversation state: {str(e)}", exc_info=True)
-        current_state = 'MENU'
-    
     message_type = 'text'
     media_url = None
     
@@ -502,110 +468,107 @@ def process_instagram_message(sender_igsid, message_id, message_text, attachment
                 media_url = attachment.get('payload', {}).get('url')
                 logger.info(f"Media attachment found - Type: {message_type}, URL: {media_url}")
     
-    # Create webhook record
-    try:
-        webhook = InstagramWebhook.objects.create(
-            igsid=sender_igsid,
-            message_id=message_id,
-            message_body=message_text,
-            message_type=message_type,
-            media_url=media_url,
-            timestamp=timezone.now(),
-            status='RECEIVED',
-            user=user,
-            conversation_state=current_state
-        )
-        logger.info(f"Webhook record created: {webhook.id}")
-    except Exception as e:
-        logger.error(f"Error creating webhook record: {str(e)}", exc_info=True)
-        return
-
     # Handle conversation states
     try:
-        if message_text == '3':  # Exit
-            logger.info("User requested exit")
-            send_instagram_response(sender_igsid, "Thank you for using VitiGo Query Management. Goodbye!")
-            webhook.conversation_state = 'MENU'
-            webhook.save()
-            logger.info("Exit response sent successfully")
-            return
-
-        if current_state == 'MENU' or message_text == '0':
-            logger.info("Processing MENU state")
-            if message_text == '1':
-                webhook.conversation_state = 'AWAITING_SUBJECT'
-                webhook.save()
-                send_instagram_response(sender_igsid, "Please enter the subject for your query:")
-                logger.info("Subject prompt sent successfully")
-            
-            elif message_text == '2':
-                queries = get_queries_instagram(sender_igsid)
-                logger.info(f"Retrieved {len(queries)} queries for user")
-                if queries:
-                    response = "Your recent queries:\n\n"
-                    response += "\n".join(format_query_status(q) for q in queries)
-                    response += "\n\nType 0 for main menu, 3 to exit"
-                else:
-                    response = "You have no queries yet.\n\nType 0 for main menu, 3 to exit"
-                send_instagram_response(sender_igsid, response)
-                logger.info("Queries response sent successfully")
-            
-            else:
-                send_instagram_response(sender_igsid, INSTAGRAM_MENU_TEXT)
-                logger.info("Menu text sent successfully")
-
-        elif current_state == 'AWAITING_SUBJECT':
-            logger.info("Processing AWAITING_SUBJECT state")
-            webhook.temp_data = {'subject': message_text}
-            webhook.conversation_state = 'AWAITING_DESCRIPTION'
-            webhook.save()
-            send_instagram_response(sender_igsid, "Please provide details for your query:")
-            logger.info("Description prompt sent successfully")
-
-        elif current_state == 'AWAITING_DESCRIPTION':
-            logger.info("Processing AWAITING_DESCRIPTION state")
-            last_webhook = InstagramWebhook.objects.filter(
+        with transaction.atomic():
+            conversation = get_conversation('INSTAGRAM', sender_igsid, user)
+            current_state = conversation.state
+            logger.info(f"Current conversation state: {current_state}")
+
+            # Create webhook record
+            webhook = record_message(
+                conversation,
+                InstagramWebhook,
                 igsid=sender_igsid,
-                conversation_state='AWAITING_DESCRIPTION'
-            ).exclude(id=webhook.id).last()
-            
-            logger.info(f"Previous webhook found: {last_webhook.id if last_webhook else None}")
+                message_id=message_id,
+                message_body=message_text,
+                message_type=message_type,
+                media_url=media_url,
+                timestamp=timezone.now(),
+                status='RECEIVED',
+                user=user
+            )
+            if webhook is None:
+                logger.warning(f"Duplicate Instagram message received: {message_id}")
+                return
+            logger.info(f"Webhook record created: {webhook.id}")
 
-            if not last_webhook or 'subject' not in last_webhook.temp_data:
-                logger.warning("Missing subject in previous webhook")
-                send_instagram_response(sender_igsid, "Sorry, there was an error. Please start over.\n\n" + INSTAGRAM_MENU_TEXT)
-                webhook.conversation_state = 'MENU'
-                webhook.save()
+            if message_text == '3':  # Exit
+                logger.info("User requested exit")
+                send_instagram_response(sender_igsid, "Thank you for using VitiGo Query Management. Goodbye!")
+                conversation.move_to('MENU')
+                logger.info("Exit response queued successfully")
                 return
 
-            # Create new query
-            query = Query.objects.create(
-                user=user,
-                subject=last_webhook.temp_data['subject'],
-                description=message_text,
-                source='INSTAGRAM',
-                status='NEW'
-            )
-            logger.info(f"New query created: {query.id}")
-            
-            webhook.conversation_state = 'MENU'
-            webhook.save()
-            
-            response = """
+            if current_state == 'MENU' or message_text == '0':
+                logger.info("Processing MENU state")
+                if message_text == '1':
+                    conversation.move_to('AWAITING_SUBJECT')
+                    send_instagram_response(sender_igsid, "Please enter the subject for your query:")
+                    logger.info("Subject prompt queued successfully")
+                
+                elif message_text == '2':
+                    queries = get_queries_instagram(sender_igsid)
+                    logger.info(f"Retrieved {len(queries)} queries for user")
+                    if queries:
+                        response = "Your recent queries:\n\n"
+                        response += "\n".join(format_query_status(q) for q in queries)
+                        response += "\n\nType 0 for main menu, 3 to exit"
+                    else:
+                        response = "You have no queries yet.\n\nType 0 for main menu, 3 to exit"
+                    conversation.move_to('MENU')
+                    send_instagram_response(sender_igsid, response)
+                    logger.info("Queries response queued successfully")
+                
+                else:
+                    conversation.move_to('MENU')
+                    send_instagram_response(sender_igsid, INSTAGRAM_MENU_TEXT)
+                    logger.info("Menu text queued successfully")
+
+            elif current_state == 'AWAITING_SUBJECT':
+                logger.info("Processing AWAITING_SUBJECT state")
+                conversation.move_to('AWAITING_DESCRIPTION', subject=message_text)
+                send_instagram_response(sender_igsid, "Please provide details for your query:")
+                logger.info("Description prompt queued successfully")
+
+            elif current_state == 'AWAITING_DESCRIPTION':
+                logger.info("Processing AWAITING_DESCRIPTION state")
+                subject = conversation.temp_data.get('subject')
+
+                if not subject:
+                    logger.warning("Missing subject in conversation state")
+                    send_instagram_response(sender_igsid, "Sorry, there was an error. Please start over.\n\n" + INSTAGRAM_MENU_TEXT)
+                    conversation.move_to('MENU')
+                    return
+
+                # Create new query
+                query = Query.objects.create(
+                    user=user,
+                    subject=subject,
+                    description=message_text,
+                    source='INSTAGRAM',
+                    status='NEW'
+                )
+                logger.info(f"New query created: {query.query_id}")
+                
+                conversation.move_to('MENU')
+                
+                response = """
 Your query has been submitted successfully! 
 Our team will review it and get back to you.
 
 Type 0 for main menu, 3 to exit
 """
-            send_instagram_response(sender_igsid, response)
-            logger.info("Query confirmation sent successfully")
+                send_instagram_response(sender_igsid, response)
+                logger.info("Query confirmation queued successfully")
             
     except Exception as e:
         logger.error(f"Error processing message state: {str(e)}", exc_info=True)
         try:
-            send_instagram_response(sender_igsid, "Sorry, there was an error. Please try again.\n\n" + INSTAGRAM_MENU_TEXT)
-            webhook.conversation_state = 'MENU'
-            webhook.save()
+            # The failed message was rolled back; start the sender over from the menu
+            with transaction.atomic():
+                get_conversation('INSTAGRAM', sender_igsid).move_to('MENU')
+                send_instagram_response(sender_igsid, "Sorry, there was an error. Please try again.\n\n" + INSTAGRAM_MENU_TEXT)
         except Exception as inner_e:
             logger.error(f"Error sending error response: {str(inner_e)}", exc_info=True)
 